@@ -0,0 +1,331 @@
+"""
+Backend di esecuzione dei worker di analisi
+Tutti espongono l'interfaccia di concurrent.futures.Executor (submit, shutdown, _max_workers):
+- inline: esegue il worker nel loop, senza serializzazione (universi piccoli)
+- thread: pool di thread (utile con NumPy o interpreti senza GIL)
+- process: ProcessPoolExecutor, argomenti serializzati a ogni ciclo
+- shared_memory: processi persistenti; il book viene copiato in memoria condivisa e gli
+  argomenti grandi (metadati, coppie, shard) vengono inviati solo quando cambiano
+Con ANALYSIS_BACKEND = 'auto' una calibrazione all'avvio sul set di simboli corrente
+sceglie il backend più veloce e ne riporta il motivo.
+"""
+
+import decimal
+import multiprocessing
+import pickle
+import queue
+import statistics
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from top_of_book import TopOfBookSnapshot
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_BACKENDS = ('inline', 'thread', 'process', 'shared_memory')
+
+# Colonne del book copiate in memoria condivisa, nell'ordine del costruttore di TopOfBookSnapshot
+_BOOK_COLUMNS = ('bid', 'ask', 'bid_qty', 'ask_qty', 'timestamp')
+_DOUBLE = 8
+
+# Argomenti dict/list con almeno questi elementi vengono inviati solo quando cambia l'oggetto
+_CACHE_MIN_LEN = 64
+
+# Codifica degli argomenti verso i processi persistenti
+_PLAIN, _CACHED, _NEW, _BOOK = range(4)
+
+class InlineExecutor(Executor):
+    """Esegue ogni task subito, nel thread chiamante (il loop asyncio): nessuna serializzazione"""
+
+    def __init__(self):
+        self._max_workers = 1
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+def _set_decimal_context(context: decimal.Context):
+    decimal.setcontext(context.copy())
+
+def _attach_book(name: str, size: int, symbol_ids: Dict[str, int], segments: Dict[str, shared_memory.SharedMemory]) -> TopOfBookSnapshot:
+    """Snapshot del book che legge direttamente le colonne in memoria condivisa"""
+    segment = segments.get(name)
+    if segment is None:
+        # Il segmento viene riallocato quando l'universo cresce: il precedente non serve più
+        for old_name in list(segments):
+            try:
+                segments.pop(old_name).close()
+            except BufferError:
+                pass
+        segment = segments[name] = shared_memory.SharedMemory(name=name)
+    width = size * _DOUBLE
+    columns = [segment.buf[i * width:(i + 1) * width].cast('d') for i in range(len(_BOOK_COLUMNS))]
+    return TopOfBookSnapshot(symbol_ids, *columns)
+
+def _shared_worker_main(conn):
+    """Processo persistente: riceve (funzione, argomenti codificati, kwargs) e restituisce (ok, risultato)"""
+    cache: Dict[tuple, Any] = {}
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+
+    def decode(item):
+        kind = item[0]
+        if kind == _PLAIN:
+            return item[1]
+        if kind == _NEW:
+            cache[item[1]] = item[2]
+            return item[2]
+        if kind == _CACHED:
+            return cache[item[1]]
+        _, name, size, ids = item
+        return _attach_book(name, size, decode(ids), segments)
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        fn, encoded, kwargs = message
+        try:
+            reply = (True, fn(*[decode(item) for item in encoded], **kwargs))
+        except BaseException as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((False, RuntimeError(f"risultato non serializzabile: {e!r}")))
+    for segment in segments.values():
+        try:
+            segment.close()
+        except BufferError:
+            pass
+
+class _SharedWorker:
+    """Un processo persistente con il proprio segmento di memoria condivisa e il thread che lo alimenta"""
+
+    def __init__(self, index: int, tasks: queue.Queue, context):
+        self.index = index
+        self.tasks = tasks
+        self.context = context
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        self._start_process()
+        self.thread = threading.Thread(target=self._serve, name=f"analysis-shm-{index}", daemon=True)
+        self.thread.start()
+
+    def _start_process(self):
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_shared_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Ultimo oggetto inviato per posizione: il processo ne conserva una copia
+        self.sent: Dict[tuple, Any] = {}
+        self.book_written: Optional[TopOfBookSnapshot] = None
+
+    def _encode_cached(self, key: tuple, value: Any) -> tuple:
+        if self.sent.get(key) is value:
+            return (_CACHED, key)
+        self.sent[key] = value
+        return (_NEW, key, value)
+
+    def _encode_book(self, book: TopOfBookSnapshot) -> tuple:
+        size = len(book.bid)
+        width = size * _DOUBLE
+        needed = max(width * len(_BOOK_COLUMNS), 1)
+        if self.segment is None or self.segment.size < needed:
+            self._release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=needed)
+            self.book_written = None
+        # Il processo è fermo tra un task e l'altro: il segmento si può riscrivere senza lock
+        if book is not self.book_written:
+            buf = self.segment.buf
+            for i, column in enumerate(_BOOK_COLUMNS):
+                buf[i * width:(i + 1) * width] = memoryview(getattr(book, column)).cast('B')
+            self.book_written = book
+        return (_BOOK, self.segment.name, size, self._encode_cached(('symbol_ids',), book.symbol_ids))
+
+    def _encode(self, fn: Callable, args: tuple) -> List[tuple]:
+        # Gli oggetti grandi vanno considerati immutabili dopo l'invio (indice, coppie e mappe vengono sostituiti, non modificati)
+        encoded = []
+        for position, arg in enumerate(args):
+            if isinstance(arg, TopOfBookSnapshot):
+                encoded.append(self._encode_book(arg))
+            elif isinstance(arg, (dict, list)) and len(arg) >= _CACHE_MIN_LEN:
+                encoded.append(self._encode_cached((fn.__qualname__, position), arg))
+            else:
+                encoded.append((_PLAIN, arg))
+        return encoded
+
+    def _serve(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self.conn.send((fn, self._encode(fn, args), kwargs))
+                ok, value = self.conn.recv()
+            except (EOFError, OSError) as e:
+                # Processo terminato: si riavvia (con cache vuota) per i task successivi
+                future.set_exception(RuntimeError(f"worker di analisi {self.index} terminato: {e!r}"))
+                self.process.join(timeout=1)
+                self._start_process()
+                continue
+            except BaseException as e:
+                # Errore di serializzazione: gli oggetti segnati come inviati potrebbero non essere arrivati
+                self.sent.clear()
+                future.set_exception(e)
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+
+    def _release_segment(self):
+        if self.segment is None:
+            return
+        self.segment.close()
+        self.segment.unlink()
+        self.segment = None
+
+    def close(self):
+        """Attende la fine del task in corso e del processo, poi libera il segmento"""
+        self.thread.join()
+        self.process.join(timeout=5)
+        self._release_segment()
+
+class SharedMemoryExecutor(Executor):
+    """Processi persistenti con book in memoria condivisa e argomenti grandi inviati solo se cambiati"""
+
+    def __init__(self, max_workers: int, mp_context=None):
+        self._max_workers = max_workers
+        self._tasks: queue.Queue = queue.Queue()
+        self._closed = False
+        context = mp_context or multiprocessing.get_context()
+        # Il tracker dei segmenti deve esistere prima dei processi: lo ereditano invece di avviarne uno
+        # proprio, che alla loro uscita rimuoverebbe i segmenti ancora in uso
+        resource_tracker.ensure_running()
+        self._workers = [_SharedWorker(i, self._tasks, context) for i in range(max_workers)]
+
+    @property
+    def _processes(self) -> Dict[int, Any]:
+        return {worker.process.pid: worker.process for worker in self._workers}
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if self._closed:
+            raise RuntimeError("executor già chiuso")
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs))
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        if self._closed:
+            return
+        self._closed = True
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not None:
+                    task[0].cancel()
+        for _ in self._workers:
+            self._tasks.put(None)
+        if wait:
+            self._close_workers()
+        else:
+            threading.Thread(target=self._close_workers, name='analysis-shm-close', daemon=True).start()
+
+    def _close_workers(self):
+        for worker in self._workers:
+            worker.close()
+
+def create_analysis_executor(backend: str, workers: int) -> Executor:
+    if backend == 'inline':
+        return InlineExecutor()
+    if backend == 'thread':
+        # Il contesto Decimal è per thread: i worker usano la stessa precisione del loop (i processi la ereditano)
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis',
+                                  initializer=_set_decimal_context, initargs=(decimal.getcontext().copy(),))
+    if backend == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    if backend == 'shared_memory':
+        return SharedMemoryExecutor(workers)
+    raise ValueError(f"backend di analisi sconosciuto: {backend!r} (validi: {', '.join(ANALYSIS_BACKENDS)})")
+
+def measure_payload(calls: Sequence[tuple]) -> Tuple[int, float]:
+    """Byte e secondi necessari a serializzare gli argomenti di un ciclo (costo per ciclo del pool di processi)"""
+    start = time.perf_counter()
+    size = sum(len(pickle.dumps(args, pickle.HIGHEST_PROTOCOL)) for args in calls)
+    return size, time.perf_counter() - start
+
+def _gil_enabled() -> bool:
+    check = getattr(sys, '_is_gil_enabled', None)
+    return check() if check is not None else True
+
+async def calibrate_backends(executors: Dict[str, Executor], run_cycle: Callable[[Executor], Awaitable[float]],
+                             cycles: int) -> Dict[str, float]:
+    """Durata mediana di un ciclo di analisi per backend, dopo un ciclo di riscaldamento (i backend in errore vengono esclusi)"""
+    timings = {}
+    for name, executor in executors.items():
+        try:
+            await run_cycle(executor)
+            samples = [await run_cycle(executor) for _ in range(max(1, cycles))]
+        except Exception as e:
+            logger.warning(f"Calibrazione del backend '{name}' fallita: {e}")
+            continue
+        timings[name] = statistics.median(samples)
+    return timings
+
+def choose_backend(timings: Dict[str, float], tolerance: float = 0.05) -> str:
+    """
+    Backend più veloce; a parità di tempi (entro 'tolerance') si preferisce il più semplice,
+    nell'ordine di ANALYSIS_BACKENDS (meno processi e meno stato da mantenere)
+    """
+    fastest = min(timings.values())
+    order = {name: i for i, name in enumerate(ANALYSIS_BACKENDS)}
+    return min((name for name, seconds in timings.items() if seconds <= fastest * (1 + tolerance)),
+               key=lambda name: order.get(name, len(order)))
+
+def explain_choice(best: str, timings: Dict[str, float], payload: Tuple[int, float], workers: int) -> str:
+    """Motivo leggibile della scelta, basato sui tempi misurati e sul costo di serializzazione"""
+    payload_bytes, payload_seconds = payload
+    serialization = f"serializzazione {payload_bytes / 1024:.0f} KB / {payload_seconds * 1000:.1f} ms per ciclo"
+    inline = timings.get('inline')
+    if best == 'inline':
+        reason = f"il passaggio ai worker ({serialization}) costa più del calcolo parallelo"
+    elif best == 'thread':
+        reason = ("interprete senza GIL: i thread calcolano in parallelo senza serializzazione" if not _gil_enabled()
+                  else "i thread evitano la serializzazione e il calcolo per ciclo è breve")
+    elif best == 'process':
+        reason = f"il calcolo domina il costo di {serialization}: conviene il parallelismo su {workers} processi"
+    else:
+        reason = f"parallelismo su {workers} processi senza {serialization}: book in memoria condivisa, metadati e shard inviati solo se cambiano"
+    if inline is not None and best != 'inline':
+        reason += f" (calcolo su un solo core: {inline * 1000:.1f} ms)"
+    others = sorted((name for name in timings if name != best), key=timings.get)
+    if others and timings[others[0]] < timings[best]:
+        reason += f"; entro il margine di '{others[0]}' ({timings[others[0]] * 1000:.1f} ms), preferito perché più semplice"
+    elif others:
+        reason += f"; {(1 - timings[best] / timings[others[0]]) * 100:.0f}% più veloce di '{others[0]}'"
+    return reason
+
+def format_calibration(timings: Dict[str, float]) -> str:
+    return " | ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in sorted(timings.items(), key=lambda item: item[1]))
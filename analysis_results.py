@@ -0,0 +1,107 @@
+"""
+Formato compatto dei risultati dei worker di analisi
+I worker restituiscono un array piatto di (posizione nello shard, profitto %, importo finale)
+e un vettore di contatori a layout fisso; solo le opportunità che superano la
+deduplicazione vengono espanse in forma leggibile nel processo principale
+"""
+
+import math
+from array import array
+from decimal import Decimal
+from typing import Dict, Iterator, Optional, Tuple
+
+# Layout del vettore dei contatori (l'ordine non deve cambiare tra worker e processo principale)
+COUNTER_FIELDS = (
+    'total_triangles', 'low_negative', 'low_positive', 'fail_total',
+    'FAIL_NO_DATA', 'FAIL_STEP_SIZE', 'FAIL_MIN_QTY', 'FAIL_LIQUIDITY', 'FAIL_MIN_NOTIONAL', 'UNKNOWN',
+    'pruned'
+)
+C_TOTAL_TRIANGLES = 0
+C_LOW_NEGATIVE = 1
+C_LOW_POSITIVE = 2
+C_FAIL_TOTAL = 3
+C_PRUNED = COUNTER_FIELDS.index('pruned')  # Triangoli declassati saltati nel ciclo (non valutati)
+FAILURE_COUNTERS = {name: idx for idx, name in enumerate(COUNTER_FIELDS) if name.startswith('FAIL_') or name == 'UNKNOWN'}
+
+# Ogni opportunità occupa OPPORTUNITY_STRIDE valori consecutivi nell'array impacchettato
+OPPORTUNITY_STRIDE = 3
+
+def new_counters() -> array:
+    return array('q', bytes(8 * len(COUNTER_FIELDS)))
+
+def new_packed_opportunities() -> array:
+    return array('d')
+
+def pack_opportunity(packed: array, position: int, profit_perc: float, final_amount: float):
+    packed.extend((position, profit_perc, final_amount))
+
+def merge_counters(total: array, partial: array):
+    for idx, value in enumerate(partial):
+        total[idx] += value
+
+def iter_opportunities(packed: array) -> Iterator[Tuple[int, float, float]]:
+    """Scorre le opportunità impacchettate come (posizione, profitto %, importo finale)"""
+    for i in range(0, len(packed), OPPORTUNITY_STRIDE):
+        yield int(packed[i]), packed[i + 1], packed[i + 2]
+
+def counters_to_stats(counters: array, non_priority: int = 0, static_infeasible: int = 0) -> Dict:
+    """Converte il vettore dei contatori nel dizionario di statistiche usato dai log di ciclo"""
+    return {
+        'total_triangles': counters[C_TOTAL_TRIANGLES] + non_priority + static_infeasible,
+        'non_priority_start': non_priority,
+        'static_infeasible': static_infeasible,
+        'low_profit': {'negative': counters[C_LOW_NEGATIVE], 'positive': counters[C_LOW_POSITIVE]},
+        'pruned': counters[C_PRUNED],
+        'simulation_failures': dict(
+            {'total': counters[C_FAIL_TOTAL]},
+            **{name: counters[idx] for name, idx in FAILURE_COUNTERS.items()}
+        )
+    }
+
+def leg_symbol(start_asset: str, end_asset: str, existing_pairs: Dict[str, Dict[str, str]]) -> Tuple[Optional[str], Optional[str]]:
+    """Simbolo e lato (BUY/SELL) per passare da start_asset a end_asset, come in simulate_trade"""
+    if start_asset in existing_pairs.get(end_asset, {}):
+        return existing_pairs[end_asset][start_asset], 'BUY'
+    if end_asset in existing_pairs.get(start_asset, {}):
+        return existing_pairs[start_asset][end_asset], 'SELL'
+    return None, None
+
+def leg_quotes(triangle: Tuple[str, str, str], legs: int, prices, existing_pairs: Dict[str, Dict[str, str]]) -> Tuple[float, ...]:
+    """
+    Prezzo usato e quantità esposta (ask e ask_qty per gli acquisti, bid e bid_qty per le vendite)
+    delle prime 'legs' gambe, appiattiti come (prezzo1, quantità1, ...). NaN dove il book manca.
+    """
+    p_a, p_b, p_c = triangle
+    quotes = []
+    for start_asset, end_asset in ((p_a, p_b), (p_b, p_c), (p_c, p_a))[:legs]:
+        symbol, side = leg_symbol(start_asset, end_asset, existing_pairs)
+        book = prices.get(symbol) if symbol is not None else None
+        if book is None:
+            quotes.extend((math.nan, math.nan))
+        elif side == 'BUY':
+            quotes.extend((float(book['ask']), float(book['ask_qty'])))
+        else:
+            quotes.extend((float(book['bid']), float(book['bid_qty'])))
+    return tuple(quotes)
+
+def expand_opportunity(triangle: Tuple[str, str, str], profit_perc: float, prices, existing_pairs: Dict[str, Dict[str, str]]) -> Dict:
+    """Ricostruisce il dizionario leggibile di un'opportunità dallo snapshot usato dal worker"""
+    p_a, p_b, p_c = triangle
+    pairs, rates, leg_prices = [], [], []
+    for start_asset, end_asset in ((p_a, p_b), (p_b, p_c), (p_c, p_a)):
+        symbol, side = leg_symbol(start_asset, end_asset, existing_pairs)
+        book = prices.get(symbol)
+        price = book['ask'] if side == 'BUY' else book['bid']
+        pairs.append(symbol)
+        leg_prices.append(str(price))
+        rates.append(str(Decimal(1) / price if side == 'BUY' else price))
+    return {
+        'path': f"{p_a}→{p_b}→{p_c}→{p_a}",
+        'profit_perc': f"{profit_perc:.4f}",
+        'pairs': pairs,
+        # Dettagli aggiuntivi per un logging migliore
+        'details': {
+            'rates': tuple(rates),
+            'prices': tuple(leg_prices)
+        }
+    }
@@ -0,0 +1,161 @@
+"""
+Scheduler adattivo per i cicli di analisi dell'arbitraggio
+Avvia un ciclo quando abbastanza simboli sono cambiati o dopo un'attesa massima,
+impedisce la sovrapposizione dei cicli e scarta i risultati ormai superati
+"""
+
+import asyncio
+import time
+import logging
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class AnalysisScheduler:
+    """Decide quando avviare il prossimo ciclo di analisi e ne misura la durata"""
+
+    def __init__(self,
+                 min_changed_symbols: int = config.SCHEDULER_MIN_CHANGED_SYMBOLS,
+                 max_delay: float = config.SCHEDULER_MAX_DELAY,
+                 min_interval: float = config.SCHEDULER_MIN_INTERVAL,
+                 target_utilization: float = config.SCHEDULER_TARGET_UTILIZATION,
+                 overrun_factor: float = config.SCHEDULER_OVERRUN_FACTOR,
+                 cycle_timeout: float = config.SCHEDULER_CYCLE_TIMEOUT,
+                 max_result_age: float = config.SCHEDULER_MAX_RESULT_AGE):
+        self.min_changed_symbols = min_changed_symbols
+        self.max_delay = max_delay
+        self.min_interval = min_interval
+        self.target_utilization = target_utilization
+        self.overrun_factor = overrun_factor
+        self.cycle_timeout = cycle_timeout
+        self.max_result_age = max_result_age
+
+        self._changed_symbols: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._resume = asyncio.Event()  # Azzerato mentre l'analisi è sospesa per ritardo di ingest
+        self._resume.set()
+        self._inflight: List[Future] = []
+
+        self.generation = 0
+        self.avg_cycle_time: Optional[float] = None
+        self.last_cycle_start = 0.0
+        self.last_cycle_end = 0.0
+        self.last_trigger = 'startup'
+        self.overruns = 0
+        self.stale_discarded = 0
+        self.shed_since: Optional[float] = None
+        self.shed_time = 0.0
+
+    def mark_updated(self, symbol: str):
+        """Registra l'aggiornamento di un simbolo (chiamato per ogni messaggio WebSocket)"""
+        changed = self._changed_symbols
+        changed.add(symbol)
+        if len(changed) >= self.min_changed_symbols:
+            self._wakeup.set()
+
+    def current_gap(self) -> float:
+        """Pausa minima dopo un ciclo, derivata dalla durata media misurata"""
+        if self.avg_cycle_time is None:
+            return self.min_interval
+        # Con utilizzo U, per ogni secondo di analisi servono (1-U)/U secondi di pausa
+        adaptive_gap = self.avg_cycle_time * (1 - self.target_utilization) / self.target_utilization
+        return max(self.min_interval, adaptive_gap)
+
+    def current_timeout(self) -> float:
+        """Durata oltre la quale il ciclo corrente viene considerato in overrun"""
+        if self.avg_cycle_time is None:
+            return self.cycle_timeout
+        return min(self.cycle_timeout, max(self.max_delay, self.avg_cycle_time * self.overrun_factor))
+
+    async def wait_for_next_cycle(self) -> Set[str]:
+        """
+        Attende il momento di avviare un nuovo ciclo.
+        Restituisce l'insieme dei simboli cambiati dall'inizio del ciclo precedente.
+        """
+        # Con l'ingest in ritardo i cicli sono sospesi: il loop serve a riallineare il book
+        if not self._resume.is_set():
+            await self._resume.wait()
+
+        # Un ciclo abbandonato occupa ancora i worker: aspettiamo che finisca per non accodare lavoro
+        if self._inflight:
+            await asyncio.wait([asyncio.wrap_future(f) for f in self._inflight])
+            self._inflight = []
+
+        gap = self.current_gap() - (time.monotonic() - self.last_cycle_end)
+        if gap > 0:
+            await asyncio.sleep(gap)
+
+        if len(self._changed_symbols) >= self.min_changed_symbols:
+            self.last_trigger = 'changes'
+        else:
+            self._wakeup.clear()
+            remaining = self.max_delay - (time.monotonic() - self.last_cycle_start)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(remaining, 0))
+                self.last_trigger = 'changes'
+            except asyncio.TimeoutError:
+                self.last_trigger = 'max_delay'
+
+        changed, self._changed_symbols = self._changed_symbols, set()
+        self._wakeup.clear()
+        return changed
+
+    def shed(self, active: bool):
+        """Sospende (True) o riprende (False) l'avvio di nuovi cicli di analisi"""
+        if active and self._resume.is_set():
+            self._resume.clear()
+            self.shed_since = time.monotonic()
+        elif not active and not self._resume.is_set():
+            self.shed_time += time.monotonic() - self.shed_since
+            self.shed_since = None
+            self._resume.set()
+
+    def begin_cycle(self) -> int:
+        """Apre un nuovo ciclo e restituisce il suo numero di generazione"""
+        self.generation += 1
+        self.last_cycle_start = time.monotonic()
+        return self.generation
+
+    def is_stale(self, snapshot_time: float) -> bool:
+        """Verifica se i prezzi di uno snapshot sono troppo vecchi per essere usati"""
+        return (time.time() - snapshot_time) > self.max_result_age
+
+    def abandon(self, futures: List[Future]):
+        """Cancella i task non ancora avviati di un ciclo in overrun e tiene traccia di quelli in esecuzione"""
+        self.overruns += 1
+        for future in futures:
+            future.cancel()  # Ha effetto solo sui task non ancora partiti
+        self._inflight = [f for f in futures if not f.done()]
+        for future in self._inflight:
+            # Il risultato di un ciclo superato viene ignorato
+            future.add_done_callback(_discard_result)
+        logger.warning(f"⚠️ Ciclo {self.generation} in overrun: {len(futures) - len(self._inflight)} task cancellati, "
+                       f"{len(self._inflight)} ancora in esecuzione (risultati scartati)")
+
+    def end_cycle(self, duration: float, alpha: float = 0.2):
+        """Chiude il ciclo corrente aggiornando la media mobile della durata"""
+        self.last_cycle_end = time.monotonic()
+        if self.avg_cycle_time is None:
+            self.avg_cycle_time = duration
+        else:
+            self.avg_cycle_time = alpha * duration + (1 - alpha) * self.avg_cycle_time
+
+    def get_stats(self) -> Dict:
+        """Restituisce lo stato dello scheduler per le statistiche di ciclo"""
+        return {
+            'generation': self.generation,
+            'trigger': self.last_trigger,
+            'avg_cycle_ms': (self.avg_cycle_time or 0) * 1000,
+            'gap_ms': self.current_gap() * 1000,
+            'overruns': self.overruns,
+            'stale_discarded': self.stale_discarded,
+            'shed_time': self.shed_time
+        }
+
+def _discard_result(future: Future):
+    """Recupera e ignora il risultato di un task abbandonato"""
+    if not future.cancelled():
+        future.exception()
@@ -1,3 +1,6 @@
+import time
+_module_start = time.perf_counter()
+
 import asyncio
 import json
 from decimal import Decimal, getcontext
@@ -5,17 +8,47 @@ from itertools import permutations
 from datetime import datetime
 import requests
 import os
-import time
 from concurrent.futures import ProcessPoolExecutor
 import logging
 from math import ceil
 import concurrent.futures
+import contextlib
+from array import array
 
 psutil_available = False # Disabilitato forzatamente
 
-# Importa i nuovi moduli per il trading automatico
+# I moduli di trading (client Binance, WebSocket e REST) vengono importati solo con AUTO_TRADE_ENABLED
 import config
-from trading_executor import trading_worker_with_affinity
+from analysis_scheduler import AnalysisScheduler
+from top_of_book import TopOfBook, TopOfBookSnapshot
+from opportunity_cooldown import OpportunityCooldown
+from symbol_cache import load_symbol_cache, save_symbol_cache, diff_symbol_maps
+from triangle_index import TriangleIndex
+from profiling import ProfilingControl, WORKER_STAGES, timed_stage, run_profiled
+from work_partition import WorkPartitioner
+from book_recording import BookRecorder
+from evaluation_archive import EvaluationArchive, EvaluationColumns
+from market_data_feeds import FeedMonitor, book_ticker_update_id
+from ingest_conflation import IngestLagMonitor, iter_conflated_batches
+from trading_queue import TradingQueue, TradeCandidate
+from order_plan import build_order_plan, estimate_value
+from liquidation_routes import LiquidationRouter
+from opportunity_lifetime import OpportunityLifetimeTracker, format_lifetime_summary
+from distributed_bus import BookBroadcaster
+from startup import StartupTimer, warm_up_pool
+from config_reload import ConfigReloader
+from scenario_eval import format_scenario_summary, scenario_worker
+from triangle_pruning import TrianglePruner
+from static_feasibility import StaticFeasibilityFilter, first_leg_failure
+from sbe_market_data import best_bid_ask_json, decode_best_bid_ask, websocket_header_kwargs
+from analysis_backends import (
+    calibrate_backends, choose_backend, create_analysis_executor, explain_choice, format_calibration, measure_payload
+)
+from analysis_results import (
+    C_TOTAL_TRIANGLES, C_LOW_NEGATIVE, C_LOW_POSITIVE, C_FAIL_TOTAL, C_PRUNED, FAILURE_COUNTERS, OPPORTUNITY_STRIDE,
+    new_counters, new_packed_opportunities, pack_opportunity, merge_counters,
+    iter_opportunities, counters_to_stats, expand_opportunity, leg_quotes
+)
 
 # --- Configurazione del Logging ---
 # Rimuove i gestori di default per evitare log duplicati
@@ -32,19 +65,35 @@ logger = logging.getLogger(__name__)
 
 # --- Costanti di Configurazione ---
 SYMBOLS_PER_CONNECTION = 200  # Numero di simboli per connessione WebSocket
-TRADING_FEE = Decimal("0.00075")      # Commissione per ogni trade (0.075% con sconto BNB)
-STARTING_ASSETS = {'USDT', 'USDC', 'FDUSD', 'DAI', 'TUSD', 'BTC', 'ETH', 'SOL'} # Asset di partenza per l'analisi di arbitraggio
-OPPORTUNITY_COOLDOWN = 60  # Secondi prima di notificare di nuovo lo stesso triangolo
+# Commissione, asset di partenza e cooldown sono in config.py (ricaricabili a caldo, vedi config_reload.py)
 
 # --- File di Log ---
 PROFITS_FILE = "profitable_opportunities.txt"
 ANOMALIES_FILE = "anomalies.txt"
 
 # --- Variabili Globali ---
-prices_cache = {}
+prices_cache = TopOfBook(())  # Ricostruito in main() dalla mappa dei simboli
 symbol_info_map = {}
+triangle_index = TriangleIndex({}, config.STARTING_ASSETS)  # Ricostruito in main() dalla mappa dei simboli
+symbol_groups = []  # Stream sottoscritti da ogni connessione WebSocket (aggiornati dal refresh dell'universo)
+websocket_connections = {}  # (indice del gruppo, indice del feed) -> connessione WebSocket attiva
+background_tasks = set()  # Riferimenti ai task creati a runtime
 last_check_time = datetime.now()
-profitable_opportunities_set = {}
+opportunity_cooldown = OpportunityCooldown(config.OPPORTUNITY_COOLDOWN, config.OPPORTUNITY_COOLDOWN_CAPACITY, config.OPPORTUNITY_REALERT_MARGIN)
+book_recorder = None  # BookRecorder attivo solo se config.BOOK_RECORDING_DIR è impostato
+evaluation_archive = None  # EvaluationArchive attivo solo se config.EVALUATION_ARCHIVE_DIR è impostato
+feed_monitor = FeedMonitor(config.MARKET_DATA_FEEDS_PER_GROUP, config.WS_ROTATION_INTERVAL, config.WS_ROTATION_STAGGER)
+ingest_lag_monitor = IngestLagMonitor(config.INGEST_LAG_ALERT, config.INGEST_LAG_RECOVER)
+trading_queue = TradingQueue(config.TRADING_QUEUE_MAX_QUOTE_AGE, config.TRADING_QUEUE_CAPACITY)
+liquidation_router = None  # Rotte di rientro, ricostruite a ogni cambio dell'universo dei simboli
+lifetime_tracker = OpportunityLifetimeTracker(config.LIQUIDATION_HUBS)
+book_broadcaster = None  # BookBroadcaster attivo solo con config.DISTRIBUTED_ROLE = 'broadcaster'
+triangle_pruner = (TrianglePruner(config.PRUNING_DEMOTE_AFTER, config.PRUNING_RECHECK_EVERY, config.PRUNING_LIQUIDITY_GAIN)
+                   if config.PRUNING_ENABLED else None)
+static_filter = StaticFeasibilityFilter() if config.STATIC_FEASIBILITY_ENABLED else None  # Triangoli eseguibili al budget corrente
+startup_timer = StartupTimer()  # Fasi di avvio fino al primo ciclo guidato dalle quotazioni
+startup_timer.mark('avvio interprete', _module_start)
+startup_timer.mark('import moduli')
 total_profitable_opportunities_found = 0
 total_low_profit_positive_found = 0
 
@@ -66,6 +115,15 @@ WS_URL = "wss://stream.binance.com:9443/stream"
 price_map = {}
 msg_count = 0  # Contatore globale dei messaggi WebSocket
 
+# Scheduler dei cicli di analisi (alimentato dagli aggiornamenti WebSocket)
+analysis_scheduler = AnalysisScheduler()
+
+# Profilazione su richiesta (segnali SIGUSR1/SIGUSR2 o file di comando)
+profiling_control = ProfilingControl()
+
+# Distribuzione dei triangoli tra i worker in base al costo misurato
+work_partitioner = WorkPartitioner()
+
 # Funzione per inviare messaggio Telegram
 def send_telegram_message(text):
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
@@ -176,66 +234,254 @@ async def monitor_performance(process):
         else:
             log(f"[PERF] CPU: {cpu_display} | RAM: {ram_display} | Cache: {len(current_price_map)} | Stato: Idle")
 
+def parse_exchange_info(data):
+    """Filtra exchangeInfo sulle coppie legate agli asset di partenza e ne converte i filtri in Decimal."""
+    trading_symbols = {s['symbol']: s for s in data['symbols'] if s['status'] == 'TRADING'}
+
+    # Filtra per le valute che hanno una coppia diretta con gli asset di partenza per limitare il campo
+    starting_assets = set(config.STARTING_ASSETS)  # Letti una volta: una ricarica in corso non mescola due insiemi
+    relevant_currencies = set(starting_assets)
+    for symbol, info in trading_symbols.items():
+        if info['quoteAsset'] in starting_assets:
+            relevant_currencies.add(info['baseAsset'])
+        if info['baseAsset'] in starting_assets:
+            relevant_currencies.add(info['quoteAsset'])
+
+    temp_symbol_info_map = {}
+    for symbol, info in trading_symbols.items():
+        if info['baseAsset'] in relevant_currencies and info['quoteAsset'] in relevant_currencies:
+            min_qty, min_notional, step_size = Decimal("0"), Decimal("0"), Decimal("0")
+            for f in info['filters']:
+                if f['filterType'] == 'LOT_SIZE':
+                    min_qty = Decimal(f['minQty'])
+                    step_size = Decimal(f['stepSize'])
+                elif f['filterType'] == 'NOTIONAL' or f['filterType'] == 'MIN_NOTIONAL':
+                    min_notional = Decimal(f.get('notional', f.get('minNotional', "0")))
+
+            temp_symbol_info_map[symbol] = {
+                'base': info['baseAsset'], 'quote': info['quoteAsset'],
+                'minQty': min_qty, 'minNotional': min_notional, 'stepSize': step_size
+            }
+    return temp_symbol_info_map
+
+def format_stream_names(symbol_info_map_local):
+    """Nomi degli stream da sottoscrivere per la mappa dei simboli (bookTicker JSON o bestBidAsk SBE)."""
+    suffix = "@bestBidAsk" if config.MARKET_DATA_ENCODING == 'sbe' else "@bookTicker"
+    return [s.lower() + suffix for s in sorted(symbol_info_map_local)]
+
 async def get_exchange_symbols():
     """Ottiene i simboli e le loro info, focalizzandosi sulle coppie legate agli asset di partenza."""
     try:
         url = "https://api.binance.com/api/v3/exchangeInfo"
-        response = requests.get(url, timeout=10)
+        # Download e parsing (diversi MB) in un thread per non bloccare il loop
+        response = await asyncio.to_thread(requests.get, url, timeout=10)
         response.raise_for_status()
-        data = response.json()
-
-        trading_symbols = {s['symbol']: s for s in data['symbols'] if s['status'] == 'TRADING'}
-
-        # Filtra per le valute che hanno una coppia diretta con gli asset di partenza per limitare il campo
-        relevant_currencies = set(STARTING_ASSETS)
-        for symbol, info in trading_symbols.items():
-            if info['quoteAsset'] in STARTING_ASSETS:
-                relevant_currencies.add(info['baseAsset'])
-            if info['baseAsset'] in STARTING_ASSETS:
-                relevant_currencies.add(info['quoteAsset'])
-
-        symbols_to_subscribe = set()
-        temp_symbol_info_map = {}
-        for symbol, info in trading_symbols.items():
-            if info['baseAsset'] in relevant_currencies and info['quoteAsset'] in relevant_currencies:
-                symbols_to_subscribe.add(symbol)
-                
-                min_qty, min_notional, step_size = Decimal("0"), Decimal("0"), Decimal("0")
-                for f in info['filters']:
-                    if f['filterType'] == 'LOT_SIZE':
-                        min_qty = Decimal(f['minQty'])
-                        step_size = Decimal(f['stepSize'])
-                    elif f['filterType'] == 'NOTIONAL' or f['filterType'] == 'MIN_NOTIONAL':
-                        min_notional = Decimal(f.get('notional', f.get('minNotional', "0")))
-
-                temp_symbol_info_map[symbol] = {
-                    'base': info['baseAsset'], 'quote': info['quoteAsset'],
-                    'minQty': min_qty, 'minNotional': min_notional, 'stepSize': step_size
-                }
-        
-        formatted_symbols = [s.lower() + "@bookTicker" for s in sorted(list(symbols_to_subscribe))]
-        logger.info(f"Ottenuti {len(formatted_symbols)} simboli per l'arbitraggio (legati a {', '.join(sorted(list(STARTING_ASSETS)))}).")
+        temp_symbol_info_map = await asyncio.to_thread(lambda: parse_exchange_info(response.json()))
+
+        formatted_symbols = format_stream_names(temp_symbol_info_map)
+        logger.info(f"Ottenuti {len(formatted_symbols)} simboli per l'arbitraggio (legati a {', '.join(sorted(list(config.STARTING_ASSETS)))}).")
         return formatted_symbols, temp_symbol_info_map
     except Exception as e:
         logger.error(f"Impossibile ottenere i simboli: {e}")
         return [], {}
 
-async def handle_message(msg):
+async def load_symbols_with_cache():
+    """
+    Avvio rapido: usa i metadati salvati su disco se presenti e compatibili,
+    altrimenti scarica exchangeInfo e crea la cache.
+    Restituisce (stream, mappa simboli, True se caricati dalla cache).
+    """
+    cached = load_symbol_cache(config.SYMBOL_CACHE_FILE, config.STARTING_ASSETS)
+    if cached:
+        cached_map, cache_age = cached
+        logger.info(f"⚡ Metadati di {len(cached_map)} simboli caricati dalla cache (età: {cache_age / 60:.1f} min).")
+        return format_stream_names(cached_map), cached_map, True
+
+    symbols, fetched_map = await get_exchange_symbols()
+    if fetched_map:
+        try:
+            save_symbol_cache(config.SYMBOL_CACHE_FILE, fetched_map, config.STARTING_ASSETS)
+        except Exception as e:
+            logger.error(f"Errore salvataggio cache simboli: {e}")
+    return symbols, fetched_map, False
+
+def apply_symbol_universe(fresh_map):
+    """
+    Applica in modo incrementale una nuova mappa dei simboli: metadati, indice dei triangoli e store dei prezzi.
+    Restituisce (aggiunti, rimossi, modificati).
+    """
+    global symbol_info_map, liquidation_router
+    added, removed, changed = diff_symbol_maps(symbol_info_map, fresh_map)
+    if not (added or removed or changed):
+        return added, removed, changed
+
+    triangles_removed = sum(triangle_index.remove_symbol(symbol, symbol_info_map[symbol]) for symbol in removed)
+    triangles_added = sum(triangle_index.add_symbol(symbol, fresh_map[symbol]) for symbol in added)
+    prices_cache.remove_symbols(removed)
+    prices_cache.add_symbols(added)
+    # Nuova mappa invece di modificare quella esistente: i cicli in corso ne hanno già un riferimento
+    symbol_info_map = dict(fresh_map)
+    if config.AUTO_TRADE_ENABLED:
+        liquidation_router = LiquidationRouter(symbol_info_map, config.STARTING_ASSETS, config.LIQUIDATION_HUBS)
+    if book_broadcaster is not None:
+        book_broadcaster.set_universe(symbol_info_map, prices_cache)
+
+    logger.info(f"🔄 Universo aggiornato: +{len(added)} / -{len(removed)} simboli, {len(changed)} con filtri modificati | "
+                f"Triangoli: +{triangles_added} / -{triangles_removed} (totale {len(triangle_index):,})")
+    return added, removed, changed
+
+async def send_subscription(group_index, method, streams):
+    """Invia SUBSCRIBE/UNSUBSCRIBE su tutte le connessioni attive di un gruppo."""
+    request = json.dumps({'method': method, 'params': streams, 'id': int(time.time() * 1000)})
+    for feed_index in range(config.MARKET_DATA_FEEDS_PER_GROUP):
+        websocket = websocket_connections.get((group_index, feed_index))
+        if websocket is None:
+            continue  # Alla riconnessione l'URL conterrà già la lista aggiornata
+        try:
+            await websocket.send(request)
+        except Exception as e:
+            logger.error(f"Errore {method} sul gruppo {group_index} (feed {feed_index}): {e}")
+
+def start_group_feeds(group_index):
+    """Avvia in background le connessioni ridondanti di un nuovo gruppo."""
+    for feed_index in range(config.MARKET_DATA_FEEDS_PER_GROUP):
+        task = asyncio.create_task(websocket_manager(group_index, feed_index))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+async def update_subscriptions(added_symbols, removed_symbols):
+    """Aggiorna le sottoscrizioni delle connessioni esistenti senza riconnetterle."""
+    removed_streams = set(format_stream_names(removed_symbols))
+    for group_index, group in enumerate(symbol_groups):
+        to_remove = [stream for stream in group if stream in removed_streams]
+        if to_remove:
+            group[:] = [stream for stream in group if stream not in removed_streams]
+            await send_subscription(group_index, 'UNSUBSCRIBE', to_remove)
+
+    pending = format_stream_names(added_symbols)
+    for group_index, group in enumerate(symbol_groups):
+        free_slots = SYMBOLS_PER_CONNECTION - len(group)
+        if not pending or free_slots <= 0:
+            continue
+        to_add, pending = pending[:free_slots], pending[free_slots:]
+        group.extend(to_add)
+        await send_subscription(group_index, 'SUBSCRIBE', to_add)
+
+    # Gruppi pieni: i nuovi stream aprono connessioni aggiuntive
+    while pending:
+        symbol_groups.append(pending[:SYMBOLS_PER_CONNECTION])
+        pending = pending[SYMBOLS_PER_CONNECTION:]
+        start_group_feeds(len(symbol_groups) - 1)
+
+async def refresh_symbol_universe():
+    """Scarica exchangeInfo e applica l'universo aggiornato, sottoscrizioni comprese."""
+    _, fresh_map = await get_exchange_symbols()
+    if not fresh_map:
+        return
+
+    added, removed, changed = apply_symbol_universe(fresh_map)
+    if added or removed:
+        await update_subscriptions(added, removed)
+    try:
+        save_symbol_cache(config.SYMBOL_CACHE_FILE, fresh_map, config.STARTING_ASSETS)
+    except Exception as e:
+        logger.error(f"Errore salvataggio cache simboli: {e}")
+
+async def symbol_universe_refresh_task(refresh_now):
+    """Aggiorna periodicamente l'universo dei simboli (nuovi listing, delisting, sospensioni)."""
+    while True:
+        if not refresh_now:
+            await asyncio.sleep(config.SYMBOL_REFRESH_INTERVAL)
+        refresh_now = False
+        await refresh_symbol_universe()
+
+def publish_strategy():
+    """Invia ai detector i parametri di strategia correnti."""
+    if book_broadcaster is not None:
+        book_broadcaster.set_strategy(config.STARTING_ASSETS, config.TRADING_FEE, config.MIN_PROFIT_THRESHOLD,
+                                      config.SIMULATION_BUDGET_USDT)
+
+def apply_strategy_changes(changes):
+    """
+    Aggiorna le strutture che dipendono dai parametri ricaricati (config è già aggiornato).
+    Soglia, commissione e budget sono letti a ogni ciclo: qui si aggiornano solo indice, rotte, cooldown e detector.
+    """
+    global liquidation_router
+    if 'OPPORTUNITY_COOLDOWN' in changes:
+        opportunity_cooldown.cooldown = config.OPPORTUNITY_COOLDOWN  # Le voci già in cooldown mantengono la scadenza
+    if 'OPPORTUNITY_REALERT_MARGIN' in changes:
+        opportunity_cooldown.realert_margin = config.OPPORTUNITY_REALERT_MARGIN
+
+    if 'STARTING_ASSETS' in changes:
+        # Riradica i triangoli sul grafo esistente; i simboli dei nuovi asset arrivano con il refresh dell'universo
+        added, removed = triangle_index.set_starting_assets(config.STARTING_ASSETS)
+        logger.info(f"🔁 Triangoli riradicati sui nuovi asset di partenza: +{added:,} / -{removed:,} (totale {len(triangle_index):,})")
+        if config.AUTO_TRADE_ENABLED:
+            liquidation_router = LiquidationRouter(symbol_info_map, config.STARTING_ASSETS, config.LIQUIDATION_HUBS)
+        # Nuove sottoscrizioni sulle connessioni esistenti, senza riconnessioni
+        task = asyncio.get_running_loop().create_task(refresh_symbol_universe())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    if changes.keys() & {'STARTING_ASSETS', 'TRADING_FEE', 'MIN_PROFIT_THRESHOLD', 'SIMULATION_BUDGET_USDT'}:
+        publish_strategy()
+
+async def handle_message(msg, feed_stats=None):
     global msg_count
     msg_count += 1
     
+    # Frame binari dagli stream SBE, testo JSON per bookTicker e risposte a SUBSCRIBE
+    apply = apply_sbe_best_bid_ask if isinstance(msg, bytes) else apply_book_ticker
+    if profiling_control.ingest_remaining > 0:
+        start_ns = time.perf_counter_ns()
+        apply(msg, feed_stats)
+        profiling_control.record_ingest(time.perf_counter_ns() - start_ns)
+    else:
+        apply(msg, feed_stats)
+
+def apply_book_ticker(msg, feed_stats=None):
+    """Decodifica un messaggio bookTicker e aggiorna lo store dei prezzi."""
+    # Duplicato di un feed più lento: scartato leggendo solo simbolo e update id dal testo grezzo
+    if config.MARKET_DATA_FEEDS_PER_GROUP > 1:
+        update_key = book_ticker_update_id(msg)
+        if update_key is not None and prices_cache.already_applied(*update_key):
+            if feed_stats is not None:
+                feed_stats.record_duplicate(prices_cache.duplicate_lag(*update_key, time.time()))
+            return
+
     # Gestione del formato dello stream combinato
     data = json.loads(msg)
     if 'data' in data:  # Stream combinato
         data = data['data']
+    elif 'id' in data:  # Risposta a SUBSCRIBE/UNSUBSCRIBE
+        if data.get('error'):
+            logger.error(f"Errore sottoscrizione stream: {data['error']}")
+        return
     
-    symbol = data['s']
-    prices_cache[symbol] = {
-        'bid': Decimal(data['b']), 
-        'ask': Decimal(data['a']),
-        'bid_qty': Decimal(data['B']),
-        'ask_qty': Decimal(data['A'])
-    }
+    apply_quote(data['s'], data['u'], float(data['b']), float(data['a']), float(data['B']), float(data['A']), feed_stats, msg)
+
+def apply_sbe_best_bid_ask(frame, feed_stats=None):
+    """Decodifica un messaggio SBE bestBidAsk e aggiorna lo store dei prezzi (nessun JSON, dizionario o Decimal)."""
+    decoded = decode_best_bid_ask(frame)
+    if decoded is None:
+        return  # Altri template dello schema
+    symbol, update_id, bid, ask, bid_qty, ask_qty, _ = decoded
+    apply_quote(symbol, update_id, bid, ask, bid_qty, ask_qty, feed_stats)
+
+def apply_quote(symbol, update_id, bid, ask, bid_qty, ask_qty, feed_stats=None, raw_msg=None):
+    """Applica una quotazione decodificata (JSON o SBE) allo store, con arbitraggio tra feed ridondanti."""
+    # Aggiornamento sul posto delle colonne: nessun dizionario o Decimal per messaggio
+    recv_ts = time.time()
+    if prices_cache.update(symbol, bid, ask, bid_qty, ask_qty, recv_ts, update_id):
+        analysis_scheduler.mark_updated(symbol)
+        if book_recorder is not None:
+            # I frame SBE vengono registrati nella forma bookTicker: le registrazioni restano in un solo formato
+            book_recorder.record(raw_msg or best_bid_ask_json(symbol, update_id, bid, ask, bid_qty, ask_qty), recv_ts)
+        if feed_stats is not None:
+            feed_stats.first_arrivals += 1
+    elif feed_stats is not None:
+        # Già applicato da un feed più veloce: resta solo da misurare il ritardo di questa connessione
+        feed_stats.record_duplicate(prices_cache.duplicate_lag(symbol, update_id, recv_ts))
 
 def format_opportunity_message(opp, prices):
     """Formatta un'opportunità di arbitraggio in un messaggio Telegram leggibile."""
@@ -270,7 +516,7 @@ def format_opportunity_message(opp, prices):
         investimento_usdt = config.SIMULATION_BUDGET_USDT
         guadagno_usdt = investimento_usdt * profit
         finale_usdt = investimento_usdt + guadagno_usdt
-        commissioni_usdt = investimento_usdt * (1 - (1 - TRADING_FEE)**3)
+        commissioni_usdt = investimento_usdt * (1 - (1 - config.TRADING_FEE)**3)
 
         message = f"⚡ *OPPORTUNITÀ DI ARBITRAGGIO*\n\n" \
                     f"🔄 *Percorso:* `{path}`\n" \
@@ -297,98 +543,124 @@ def adjust_quantity_for_step_size(quantity, step_size):
         return (quantity // step_size) * step_size
     return quantity
 
-def find_arbitrage_worker(prices, symbol_info_map_local, profit_threshold, trading_fee, currency_chunk, all_currencies, trade_graph):
-    """Processo worker che cerca opportunità di arbitraggio navigando un grafo pre-calcolato."""
-    profitable_opportunities = []
-    stats = {
-        'total_triangles': 0,
-        'non_priority_start': 0,
-        'low_profit': {'negative': 0, 'positive': 0},
-        'simulation_failures': {
-            'total': 0, 'FAIL_NO_DATA': 0, 'FAIL_STEP_SIZE': 0,
-            'FAIL_MIN_QTY': 0, 'FAIL_LIQUIDITY': 0, 'FAIL_MIN_NOTIONAL': 0,
-            'UNKNOWN': 0
-        }
-    }
+def find_arbitrage_worker(shard_id, prices, symbol_info_map_local, profit_threshold, trading_fee, simulation_budget, triangles, existing_pairs, stage_timing=False, archive=False,
+                          pruning=None, first_leg_limits=None):
+    """
+    Processo worker che valuta uno shard di triangoli pre-calcolati dall'indice.
+    Restituisce (shard_id, opportunità impacchettate, contatori, durata in secondi, tempi per fase o None,
+    valutazioni per triangolo o None, stato di potatura aggiornato o None). Le valutazioni vengono
+    raccolte solo con archive=True; con pruning (PruningState) i triangoli declassati vengono saltati;
+    con first_leg_limits (limiti di prezzo del filtro statico) la prima gamba fuori limite non viene simulata.
+    """
+    worker_start = time.perf_counter()
+    packed = new_packed_opportunities()
+    counters = new_counters()
+    counters[C_TOTAL_TRIANGLES] = len(triangles)
+    evaluations = EvaluationColumns() if archive else None
     
-    existing_pairs = {c: {} for c in all_currencies}
-    for symbol, info in symbol_info_map_local.items():
-        base, quote = info['base'], info['quote']
-        if base not in existing_pairs: existing_pairs[base] = {}
-        existing_pairs[base][quote] = symbol
-
-    # Naviga il grafo per trovare solo percorsi validi
-    for p_a in currency_chunk:
-        if p_a not in trade_graph: continue
-        
-        for p_b in trade_graph[p_a]:
-            if p_b not in trade_graph: continue
-            for p_c in trade_graph[p_b]:
-                if p_c == p_a: continue
-                
-                if p_c in trade_graph and p_a in trade_graph[p_c]:
-                    stats['total_triangles'] += 1
-                    
-                    if p_a not in STARTING_ASSETS:
-                        stats['non_priority_start'] += 1
-                        continue
-
-                    try:
-                        # USA LA VARIABILE DI CONFIG CORRETTA QUI
-                        status, result = simulate_trade(p_a, p_b, config.SIMULATION_BUDGET_USDT, prices, symbol_info_map_local, existing_pairs)
-                        if status != 'SUCCESS':
-                            stats['simulation_failures']['total'] += 1
-                            stats['simulation_failures'][status] = stats['simulation_failures'].get(status, 0) + 1
-                            continue
-                        rate1, amount1, pair1_str = result
-
-                        amount1_after_fee = amount1 * (1 - trading_fee)
-
-                        status, result = simulate_trade(p_b, p_c, amount1_after_fee, prices, symbol_info_map_local, existing_pairs)
-                        if status != 'SUCCESS':
-                            stats['simulation_failures']['total'] += 1
-                            stats['simulation_failures'][status] = stats['simulation_failures'].get(status, 0) + 1
-                            continue
-                        rate2, amount2, pair2_str = result
-
-                        amount2_after_fee = amount2 * (1 - trading_fee)
-
-                        status, result = simulate_trade(p_c, p_a, amount2_after_fee, prices, symbol_info_map_local, existing_pairs)
-                        if status != 'SUCCESS':
-                            stats['simulation_failures']['total'] += 1
-                            stats['simulation_failures'][status] = stats['simulation_failures'].get(status, 0) + 1
-                            continue
-                        rate3, amount3, pair3_str = result
-                        
-                        final_amount = amount3 * (1 - trading_fee)
-                        profit = final_amount - config.SIMULATION_BUDGET_USDT
-                        
-                        if profit > (config.SIMULATION_BUDGET_USDT * profit_threshold):
-                             profit_perc = (profit / config.SIMULATION_BUDGET_USDT) * 100
-                             profitable_opportunities.append({
-                                'path': f"{p_a}→{p_b}→{p_c}→{p_a}",
-                                'profit_perc': f"{profit_perc:.4f}",
-                                'pairs': [pair1_str, pair2_str, pair3_str],
-                                # Dettagli aggiuntivi per un logging migliore
-                                'details': {
-                                    'rates': (str(rate1), str(rate2), str(rate3)),
-                                    'prices': (str(prices.get(pair1_str,{}).get('ask' if p_a==symbol_info_map_local[pair1_str]['quote'] else 'bid')), 
-                                               str(prices.get(pair2_str,{}).get('ask' if p_b==symbol_info_map_local[pair2_str]['quote'] else 'bid')),
-                                               str(prices.get(pair3_str,{}).get('ask' if p_c==symbol_info_map_local[pair3_str]['quote'] else 'bid')))
-                                }
-                            })
-                        else:
-                            if profit < 0:
-                                stats['low_profit']['negative'] += 1
-                            else:
-                                stats['low_profit']['positive'] += 1
-
-                    except Exception:
-                        stats['simulation_failures']['total'] += 1
-                        stats['simulation_failures']['UNKNOWN'] += 1
-                        continue
+    # Con stage_timing ogni gamba e l'impacchettamento del risultato vengono cronometrati separatamente
+    stage_ns = None
+    if stage_timing:
+        stage_ns = dict.fromkeys(WORKER_STAGES, 0)
+        simulate_leg1 = timed_stage(simulate_trade, stage_ns, 'leg1')
+        simulate_leg2 = timed_stage(simulate_trade, stage_ns, 'leg2')
+        simulate_leg3 = timed_stage(simulate_trade, stage_ns, 'leg3')
+        pack_result = timed_stage(pack_opportunity, stage_ns, 'result_build')
+        walk_start_ns = time.perf_counter_ns()
+    else:
+        simulate_leg1 = simulate_leg2 = simulate_leg3 = simulate_trade
+        pack_result = pack_opportunity
+
+    # I triangoli con la stessa prima gamba sono contigui: il limite di prezzo si verifica una volta per gruppo
+    last_first_leg, first_leg_status = None, None
+    # Le gambe leggono i Decimal convertiti una volta per simbolo, non a ogni lettura
+    books = prices.decimal_quotes() if isinstance(prices, TopOfBookSnapshot) else prices
+
+    # Percorre solo i triangoli assegnati a questo shard (tutti partono da un asset prioritario)
+    for position, (p_a, p_b, p_c) in enumerate(triangles):
+        if pruning is not None and pruning.skip(position):
+            counters[C_PRUNED] += 1
+            continue
+        try:
+            status = None
+            if first_leg_limits:
+                if (p_a, p_b) != last_first_leg:
+                    last_first_leg = (p_a, p_b)
+                    limit = first_leg_limits.get(last_first_leg)
+                    first_leg_status = first_leg_failure(limit, prices) if limit is not None else None
+                status = first_leg_status
+            if status is None:
+                # Budget passato dal processo principale: i worker non vedono le ricariche di config.py
+                status, result = simulate_leg1(p_a, p_b, simulation_budget, books, symbol_info_map_local, existing_pairs)
+            if status != 'SUCCESS':
+                counters[C_FAIL_TOTAL] += 1
+                counters[FAILURE_COUNTERS[status]] += 1
+                if evaluations is not None:
+                    evaluations.add_failure(position, status, 1, quotes=leg_quotes((p_a, p_b, p_c), 1, books, existing_pairs))
+                if pruning is not None:
+                    pruning.failed(position, status, 1)
+                continue
+            rate1, amount1 = result[0], result[1]
+
+            amount1_after_fee = amount1 * (1 - trading_fee)
+
+            status, result = simulate_leg2(p_b, p_c, amount1_after_fee, books, symbol_info_map_local, existing_pairs)
+            if status != 'SUCCESS':
+                counters[C_FAIL_TOTAL] += 1
+                counters[FAILURE_COUNTERS[status]] += 1
+                if evaluations is not None:
+                    evaluations.add_failure(position, status, 2, rate1, quotes=leg_quotes((p_a, p_b, p_c), 2, books, existing_pairs))
+                if pruning is not None:
+                    pruning.failed(position, status, 2)
+                continue
+            rate2, amount2 = result[0], result[1]
+
+            amount2_after_fee = amount2 * (1 - trading_fee)
+
+            status, result = simulate_leg3(p_c, p_a, amount2_after_fee, books, symbol_info_map_local, existing_pairs)
+            if status != 'SUCCESS':
+                counters[C_FAIL_TOTAL] += 1
+                counters[FAILURE_COUNTERS[status]] += 1
+                if evaluations is not None:
+                    evaluations.add_failure(position, status, 3, rate1, rate2, quotes=leg_quotes((p_a, p_b, p_c), 3, books, existing_pairs))
+                if pruning is not None:
+                    pruning.failed(position, status, 3)
+                continue
+            amount3 = result[1]
+            
+            final_amount = amount3 * (1 - trading_fee)
+            profit = final_amount - simulation_budget
+            if evaluations is not None:
+                evaluations.add_result(position, profit / simulation_budget * 100, rate1, rate2, result[0],
+                                       leg_quotes((p_a, p_b, p_c), 3, books, existing_pairs))
+            if pruning is not None:
+                pruning.evaluated(position)
+            
+            if profit > (simulation_budget * profit_threshold):
+                profit_perc = (profit / simulation_budget) * 100
+                # Solo id, profitto e importo: la forma leggibile si costruisce dopo la deduplicazione
+                pack_result(packed, position, float(profit_perc), float(final_amount))
+            else:
+                if profit < 0:
+                    counters[C_LOW_NEGATIVE] += 1
+                else:
+                    counters[C_LOW_POSITIVE] += 1
+
+        except Exception:
+            counters[C_FAIL_TOTAL] += 1
+            counters[FAILURE_COUNTERS['UNKNOWN']] += 1
+            if evaluations is not None:
+                evaluations.add_failure(position, 'UNKNOWN', 0)
+            if pruning is not None:
+                pruning.failed(position, 'UNKNOWN', 0)
+            continue
     
-    return {'profitable': profitable_opportunities, 'stats': stats}
+    if stage_timing:
+        # Il tempo non speso nelle gambe o nei risultati è navigazione del grafo
+        timed_ns = sum(stage_ns.values())
+        stage_ns['graph_walk'] = time.perf_counter_ns() - walk_start_ns - timed_ns
+
+    return shard_id, packed, counters, time.perf_counter() - worker_start, stage_ns, evaluations, pruning
 
 def simulate_trade(start_asset, end_asset, amount_in, prices, symbol_info, existing_pairs):
     """
@@ -442,10 +714,19 @@ def cpu_stress_test_worker(iterations):
     return x
 
 async def handle_trading_result(future):
-    """Gestisce il risultato del trading asincrono"""
+    """
+    Gestisce il risultato del trading asincrono.
+    Il timeout non interrompe il trade: il processo di trading continua a inviare ordini,
+    quindi si segnala il ritardo e si attende comunque l'esito.
+    """
     try:
-        # Timeout di 30 secondi per l'esecuzione
-        result = await asyncio.wait_for(future, timeout=config.TRADING_TIMEOUT)
+        try:
+            # shield: allo scadere del timeout il future dell'executor non viene annullato
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=config.TRADING_TIMEOUT)
+        except asyncio.TimeoutError:
+            log(f"⚠️ Trading oltre il timeout di {config.TRADING_TIMEOUT}s: il trade è ancora in corso, "
+                f"slot e simboli restano riservati fino al termine")
+            result = await future
         log(f"Trading completato: {result.get('status', 'Unknown')}")
         
         if result.get('status') == 'SUCCESS':
@@ -454,139 +735,282 @@ async def handle_trading_result(future):
         elif result.get('status') == 'FAILED':
             log(f"❌ Arbitraggio fallito: {result.get('error', 'Unknown error')}")
             
-    except asyncio.TimeoutError:
-        log("⚠️ Trading timeout - processo ucciso")
-        # Il processo verrà terminato automaticamente
     except Exception as e:
         log(f"❌ Errore gestione risultato trading: {e}")
 
+async def trading_dispatch_task(trading_executor):
+    """Invia all'esecutore l'opportunità migliore della coda ogni volta che si libera un core di trading."""
+    free_slots = asyncio.Semaphore(config.TRADING_CORES)
+    while True:
+        # La scelta avviene solo a slot libero: vince il candidato migliore e più fresco in quel momento
+        await free_slots.acquire()
+        candidate = await trading_queue.get()
+        from trading_executor import trading_worker_with_affinity  # Già importato da main() con il trading attivo
+        quote_age_ms = (time.time() - candidate.quote_time) * 1000
+        logger.info(f"📤 Invio al trading: {candidate.path} | Guadagno atteso: {candidate.expected_profit:.4f} USDT | "
+                    f"Età prezzi: {quote_age_ms:.0f} ms | In coda: {len(trading_queue)}")
+        future = asyncio.wrap_future(trading_executor.submit(trading_worker_with_affinity, candidate.trading_data))
+        # Slot e simboli si liberano quando il processo di trading ha davvero finito, non quando finisce l'attesa
+        future.add_done_callback(lambda _, done=candidate: trading_queue.finished(done))
+        future.add_done_callback(lambda _: free_slots.release())
+        task = asyncio.create_task(handle_trading_result(future))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+def enqueue_trade(triangle, triangle_key, current_prices, existing_pairs, snapshot_time):
+    """Accoda un'opportunità per il trading con il guadagno atteso in USDT, per confrontare asset di partenza diversi."""
+    # Il budget è in USDT: la prima gamba spende l'equivalente nell'asset di partenza ai prezzi dello snapshot
+    start_asset = triangle[0]
+    budget = estimate_value(config.TRADE_BUDGET_USDT, 'USDT', start_asset, current_prices, existing_pairs)
+    if budget is None:
+        logger.warning(f"Opportunità non accodata: nessun prezzo {start_asset}/USDT per convertirne il budget ({'→'.join(triangle)})")
+        return
+    # Piano d'ordine completo: il processo di trading deve solo firmare e inviare
+    plan = build_order_plan(triangle, budget, config.TRADING_FEE, current_prices, existing_pairs, symbol_info_map, liquidation_router)
+    if plan is None:
+        return
+    # Budget e importo finale sono nell'asset di partenza: il guadagno si converte ai prezzi dello stesso snapshot
+    expected_gain = Decimal(plan['expected_final']) - Decimal(plan['budget'])
+    expected_profit = estimate_value(expected_gain, plan['start_asset'], 'USDT', current_prices, existing_pairs)
+    if expected_profit is None:
+        logger.warning(f"Opportunità non accodata: nessun prezzo {plan['start_asset']}/USDT per stimarne il guadagno ({plan['path']})")
+        return
+    trading_queue.push(TradeCandidate(
+        triangle_key, plan['path'], tuple(leg['symbol'] for leg in plan['legs']), float(expected_profit), snapshot_time,
+        {'plan': plan, 'timestamp': snapshot_time}
+    ))
+
+async def process_opportunity(triangle, triangle_key, profit_perc_val, current_prices, existing_pairs, snapshot_time):
+    """Accodamento per il trading, cooldown, file e notifica di un'opportunità rilevata (localmente o da un detector remoto)."""
+    global total_profitable_opportunities_found
+    # Accodamento per il trading prima di tutto (il tempo conta): il cooldown limita solo log e notifiche,
+    # la coda unisce da sé le rilevazioni ripetute e sovrapposte
+    if config.AUTO_TRADE_ENABLED and profit_perc_val <= 50.0:
+        enqueue_trade(triangle, triangle_key, current_prices, existing_pairs, snapshot_time)
+
+    if not opportunity_cooldown.should_alert(triangle_key, profit_perc_val, time.time()):
+        return
+    total_profitable_opportunities_found += 1 # Incrementa il contatore globale
+
+    # Espansione in forma leggibile solo per le opportunità sopravvissute al cooldown
+    opp = expand_opportunity(triangle, profit_perc_val, current_prices, existing_pairs)
+    path = opp['path']
+
+    # --- LOG E FILE: SEMPRE PRIMA DI NOTIFICA ---
+    guadagno_stimato = config.SIMULATION_BUDGET_USDT * (profit_perc_val / 100)
+    # Calcolo importo ottimale e volumi
+    try:
+        importo_ottimale, volumi = calcola_importo_ottimale_con_buffer(opp['pairs'], current_prices, symbol_info_map)
+    except Exception as e:
+        importo_ottimale, volumi = 0, []
+        logger.error(f"Errore calcolo importo ottimale: {e}")
+    log_line = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} | {path} | Profitto Netto: {profit_perc_val:.4f}% | Guadagno Stimato ({config.SIMULATION_BUDGET_USDT} USDT): {guadagno_stimato:.4f} USDT\n"
+    log_line += f"Importo ottimale investibile (buffer {int(BUFFER_SICUREZZA*100)}%): {importo_ottimale:.4f} USDT\n"
+    for v in volumi:
+        log_line += f"  - {v['pair']} {v['side']}_qty: {v['qty']:.4f}\n"
+    file_to_write = ANOMALIES_FILE if profit_perc_val > 50.0 else PROFITS_FILE
+    try:
+        with open(file_to_write, "a", encoding="utf-8") as f:
+            f.write(log_line if profit_perc_val <= 50.0 else f"[ANOMALIA] {log_line}")
+    except Exception as e:
+        logger.error(f"Errore scrittura file opportunità: {e}")
+    # Logga sempre anche nel file delle profittevoli se sopra soglia
+    if profit_perc_val >= float(config.MIN_PROFIT_THRESHOLD) * 100:
+        try:
+            save_profitable_opportunity(opp)
+        except Exception as e:
+            logger.error(f"Errore scrittura file profittevoli: {e}")
+
+    # --- NOTIFICA TELEGRAM ROBUSTA ---
+    try:
+        msg = format_opportunity_message(opp, current_prices)
+        await send_telegram_notification(msg)
+    except Exception as e:
+        logger.error(f"Errore nella formattazione o invio Telegram per {path}: {e}\nDati: {opp}")
+
+def prepare_analysis_work():
+    """
+    Triangoli da assegnare ai worker: l'indice, o solo quelli eseguibili al budget corrente se il filtro
+    statico è attivo (ricalcolato se indice, metadati o budget cambiano).
+    Restituisce (indice di lavoro, coppie, limiti di prezzo della prima gamba o None, triangoli scartati).
+    """
+    existing_pairs = triangle_index.pairs_snapshot()
+    if static_filter is None:
+        return triangle_index, existing_pairs, None, 0
+    if static_filter.refresh(triangle_index, symbol_info_map, existing_pairs, config.SIMULATION_BUDGET_USDT):
+        logger.info(f"🧮 Filtro statico: {len(static_filter):,} triangoli eseguibili, {static_filter.dropped_total:,} scartati "
+                    f"({', '.join(f'{reason} {count:,}' for reason, count in static_filter.dropped.items()) or 'nessuno'}), "
+                    f"{len(static_filter.first_leg_limits):,} prime gambe con limite di prezzo")
+    return static_filter, existing_pairs, static_filter.first_leg_limits, static_filter.dropped_total
+
+def calibration_book() -> TopOfBookSnapshot:
+    """
+    Book sintetico per la calibrazione (all'avvio le quotazioni non sono ancora arrivate):
+    prezzo 1 e quantità ampia su ogni simbolo, così che tutte le gambe vengano simulate
+    """
+    size = len(prices_cache.bid)
+    prices = array('d', [1.0]) * size
+    quantities = array('d', [1e12]) * size
+    return TopOfBookSnapshot(prices_cache.symbol_ids, prices, array('d', prices), quantities, array('d', quantities),
+                             array('d', [time.time()]) * size)
+
+async def select_analysis_backend(executors):
+    """
+    Misura un ciclo di analisi completo sui triangoli correnti con ogni backend candidato
+    e restituisce il nome del più veloce, registrando tempi e motivo della scelta
+    """
+    work_index, existing_pairs, first_leg_limits, _ = prepare_analysis_work()
+    partitioners = {}  # Per numero di worker: gli shard restano gli stessi oggetti tra i cicli, come nel ciclo live
+
+    def cycle_calls(workers):
+        num_workers = min(config.MAX_CONCURRENT_ANALYSIS, workers)
+        shards = partitioners.setdefault(workers, WorkPartitioner()).shards(work_index, num_workers)
+        book = calibration_book()  # Nuovo snapshot a ogni ciclo, come prices_cache.snapshot()
+        return [(worker_id, book, symbol_info_map, config.MIN_PROFIT_THRESHOLD, config.TRADING_FEE, config.SIMULATION_BUDGET_USDT,
+                 shard, existing_pairs, False, False, None, first_leg_limits)
+                for worker_id, shard in enumerate(shards)]
+
+    async def run_cycle(executor):
+        calls = cycle_calls(executor._max_workers)
+        start = time.perf_counter()
+        await asyncio.gather(*(asyncio.wrap_future(executor.submit(find_arbitrage_worker, *args)) for args in calls))
+        return time.perf_counter() - start
+
+    timings = await calibrate_backends(executors, run_cycle, config.ANALYSIS_CALIBRATION_CYCLES)
+    if not timings:
+        backend = 'process' if 'process' in executors else next(iter(executors))
+        logger.warning(f"Calibrazione dei backend di analisi fallita, uso '{backend}'")
+        return backend
+    backend = choose_backend(timings)
+    payload = measure_payload(cycle_calls(config.ANALYSIS_CORES))
+    logger.info(f"⚙️ Backend di analisi: '{backend}' su {len(work_index):,} triangoli | {format_calibration(timings)}")
+    logger.info(f"   Motivo: {explain_choice(backend, timings, payload, min(config.MAX_CONCURRENT_ANALYSIS, config.ANALYSIS_CORES))}")
+    return backend
+
 async def main_loop(analysis_executor, trading_executor):
     """Ciclo principale che coordina i worker e gestisce i risultati (ottimizzato per performance)."""
-    global total_profitable_opportunities_found, total_low_profit_positive_found
+    global total_low_profit_positive_found
     
     while True:
-        await asyncio.sleep(config.ARBITRAGE_CHECK_INTERVAL)  # Usa il valore da config
+        changed_symbols = await analysis_scheduler.wait_for_next_cycle()
         if not symbol_info_map:
             logger.info("Mappa dei simboli non ancora pronta, attendo...")
             continue
         
-        logger.info("Inizio controllo opportunità di arbitraggio...")
+        generation = analysis_scheduler.begin_cycle()
         start_time = time.perf_counter()
 
-        current_prices = dict(prices_cache)
-        loop = asyncio.get_running_loop()
-        
-        all_currencies = sorted(list(set([info['base'] for info in symbol_info_map.values()] + [info['quote'] for info in symbol_info_map.values()])))
+        current_prices = prices_cache.snapshot()
+        snapshot_time = time.time()
         
         # Limita il numero di worker per ridurre carico CPU
         num_workers = min(config.MAX_CONCURRENT_ANALYSIS, analysis_executor._max_workers)
-        chunk_size = (len(all_currencies) + num_workers - 1) // num_workers
-        currency_chunks = [all_currencies[i:i + chunk_size] for i in range(0, len(all_currencies), chunk_size)]
+        work_index, existing_pairs, first_leg_limits, static_infeasible = prepare_analysis_work()
+        # Shard bilanciati sul costo stimato dei triangoli (ribilanciati con i tempi misurati)
+        shards = work_partitioner.shards(work_index, num_workers)
+        pruning_states = [None] * len(shards)
+        if triangle_pruner is not None:
+            # I triangoli declassati tornano attivi se la gamba che falliva ora espone più quantità
+            # (prima di copiare gli stati per i worker, così la riattivazione vale già in questo ciclo)
+            triangle_pruner.promote_on_liquidity(changed_symbols, current_prices)
+            pruning_states = triangle_pruner.states(shards)
+
+        # Future concorrenti: permettono di cancellare i task non ancora partiti in caso di overrun
+        profile_prefix, stage_timing = profiling_control.next_cycle(generation)
+        worker_futures = []
+        for worker_id, shard in enumerate(shards):
+            worker_args = (worker_id, current_prices, symbol_info_map, config.MIN_PROFIT_THRESHOLD, config.TRADING_FEE,
+                           config.SIMULATION_BUDGET_USDT, shard, existing_pairs, stage_timing,
+                           evaluation_archive is not None, pruning_states[worker_id], first_leg_limits)
+            if profile_prefix:
+                worker_futures.append(analysis_executor.submit(run_profiled, f"{profile_prefix}_worker{worker_id}.prof", find_arbitrage_worker, *worker_args))
+            else:
+                worker_futures.append(analysis_executor.submit(find_arbitrage_worker, *worker_args))
+        futures = [asyncio.wrap_future(f) for f in worker_futures]
         
-        # --- Costruzione del Grafo di Trading (ottimizzata) ---
-        trade_graph = {c: [] for c in all_currencies}
-        for symbol, info in symbol_info_map.items():
-            base, quote = info['base'], info['quote']
-            if base in trade_graph and quote in trade_graph:
-                trade_graph[base].append(quote)
-                trade_graph[quote].append(base)
-        # ------------------------------------
-
-        futures = [loop.run_in_executor(analysis_executor, find_arbitrage_worker, current_prices, symbol_info_map, config.MIN_PROFIT_THRESHOLD, TRADING_FEE, chunk, all_currencies, trade_graph) for chunk in currency_chunks]
-        
-        aggregated_stats = {
-            'total_triangles': 0,
-            'non_priority_start': 0,
-            'low_profit': {'negative': 0, 'positive': 0},
-            'simulation_failures': {
-                'total': 0, 'FAIL_NO_DATA': 0, 'FAIL_STEP_SIZE': 0,
-                'FAIL_MIN_QTY': 0, 'FAIL_LIQUIDITY': 0, 'FAIL_MIN_NOTIONAL': 0,
-                'UNKNOWN': 0
-            }
-        }
+        cycle_counters = new_counters()
+        shard_elapsed = [None] * len(shards)
         total_profitable_found = 0
+        worker_stage_timings = []
+        cycle_timeout = analysis_scheduler.current_timeout()
+        cycle_complete = True
 
-        # Processa i risultati con timeout per evitare blocchi
+        # Processa i risultati con timeout adattivo: un ciclo in overrun viene abbandonato
         try:
-            for future in asyncio.as_completed(futures, timeout=30):  # Timeout di 30 secondi
+            for future in asyncio.as_completed(futures, timeout=cycle_timeout):
                 try:
-                    worker_result = await future
-                    opportunities = worker_result.get('profitable', [])
-                    worker_stats = worker_result.get('stats', {})
-
-                    # Aggrega le statistiche
-                    if worker_stats:
-                        aggregated_stats['total_triangles'] += worker_stats.get('total_triangles', 0)
-                        aggregated_stats['non_priority_start'] += worker_stats.get('non_priority_start', 0)
-                        
-                        # Aggrega low_profit
-                        low_profit_stats = worker_stats.get('low_profit', {})
-                        aggregated_stats['low_profit']['negative'] += low_profit_stats.get('negative', 0)
-                        aggregated_stats['low_profit']['positive'] += low_profit_stats.get('positive', 0)
-
-                        # Aggrega simulation_failures
-                        sim_fail_stats = worker_stats.get('simulation_failures', {})
-                        for key, value in sim_fail_stats.items():
-                            aggregated_stats['simulation_failures'][key] += value
-
-                    if not opportunities: continue
+                    shard_id, packed, counters, elapsed, stage_ns, evaluations, pruning_state = await future
+
+                    # Aggrega le statistiche (vettori a layout fisso)
+                    merge_counters(cycle_counters, counters)
+                    shard_elapsed[shard_id] = elapsed
+                    if stage_ns:
+                        worker_stage_timings.append(stage_ns)
+                    if evaluations:
+                        # Solo accodamento: codifica, compressione e scrittura avvengono nel thread dell'archivio
+                        evaluation_archive.submit(generation, snapshot_time, shards[shard_id], evaluations)
+                    if pruning_state is not None:
+                        triangle_pruner.record(shard_id, pruning_state, current_prices, existing_pairs)
+
+                    if not packed: continue
                     
-                    total_profitable_found += len(opportunities)
-
-                    for opp in opportunities:
-                        path, profit_perc_str = opp.get('path'), opp.get('profit_perc')
-                        if not path: continue
-                        
-                        triangle_key = tuple(sorted(path.split('→')[:3]))
-                        current_time = time.time()
+                    found = len(packed) // OPPORTUNITY_STRIDE
+                    total_profitable_found += found
+
+                    # Prezzi ormai superati: le opportunità non sono più affidabili (ma contano per la loro durata)
+                    stale = analysis_scheduler.is_stale(snapshot_time)
+                    if stale:
+                        analysis_scheduler.stale_discarded += found
+
+                    shard = shards[shard_id]
+                    for position, profit_perc_val, final_amount in iter_opportunities(packed):
+                        triangle = shard[position]
+                        triangle_key = opportunity_cooldown.triangle_key(triangle)
+                        lifetime_tracker.observe(triangle_key, triangle, profit_perc_val, snapshot_time)
+                        if stale:
+                            continue
                         
-                        if (current_time - profitable_opportunities_set.get(triangle_key, 0)) > OPPORTUNITY_COOLDOWN:
-                            profitable_opportunities_set[triangle_key] = current_time
-                            total_profitable_opportunities_found += 1 # Incrementa il contatore globale
-
-                            # --- LOG E FILE: SEMPRE PRIMA DI NOTIFICA ---
-                            profit_perc_val = float(profit_perc_str)
-                            guadagno_stimato = config.SIMULATION_BUDGET_USDT * (profit_perc_val / 100)
-                            # Calcolo importo ottimale e volumi
-                            try:
-                                importo_ottimale, volumi = calcola_importo_ottimale_con_buffer(opp['pairs'], current_prices, symbol_info_map)
-                            except Exception as e:
-                                importo_ottimale, volumi = 0, []
-                                logger.error(f"Errore calcolo importo ottimale: {e}")
-                            log_line = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} | {path} | Profitto Netto: {profit_perc_val:.4f}% | Guadagno Stimato ({config.SIMULATION_BUDGET_USDT} USDT): {guadagno_stimato:.4f} USDT\n"
-                            log_line += f"Importo ottimale investibile (buffer {int(BUFFER_SICUREZZA*100)}%): {importo_ottimale:.4f} USDT\n"
-                            for v in volumi:
-                                log_line += f"  - {v['pair']} {v['side']}_qty: {v['qty']:.4f}\n"
-                            file_to_write = ANOMALIES_FILE if profit_perc_val > 50.0 else PROFITS_FILE
-                            try:
-                                with open(file_to_write, "a", encoding="utf-8") as f:
-                                    f.write(log_line if profit_perc_val <= 50.0 else f"[ANOMALIA] {log_line}")
-                            except Exception as e:
-                                logger.error(f"Errore scrittura file opportunità: {e}")
-                            # Logga sempre anche nel file delle profittevoli se sopra soglia
-                            if profit_perc_val >= float(config.MIN_PROFIT_THRESHOLD) * 100:
-                                try:
-                                    save_profitable_opportunity(opp)
-                                except Exception as e:
-                                    logger.error(f"Errore scrittura file profittevoli: {e}")
-
-                            # --- NOTIFICA TELEGRAM ROBUSTA ---
-                            try:
-                                msg = format_opportunity_message(opp, current_prices)
-                                await send_telegram_notification(msg)
-                            except Exception as e:
-                                logger.error(f"Errore nella formattazione o invio Telegram per {path}: {e}\nDati: {opp}")
+                        await process_opportunity(triangle, triangle_key, profit_perc_val, current_prices, existing_pairs, snapshot_time)
 
                 except Exception as e:
                     logger.error(f"Errore nel processare il risultato del worker: {e}")
+                    # Shard senza risultati: le opportunità non osservate non si possono dare per chiuse
+                    cycle_complete = False
                     
         except asyncio.TimeoutError:
-            logger.warning("⚠️ Timeout nell'analisi dei worker (30s)")
+            logger.warning(f"⚠️ Timeout nell'analisi dei worker ({cycle_timeout:.1f}s)")
+            analysis_scheduler.abandon(worker_futures)
+            cycle_complete = False
+
+        # Le opportunità non più sopra soglia in questo snapshot si chiudono qui
+        lifetime_tracker.end_cycle(snapshot_time, cycle_complete)
+        if triangle_pruner is not None:
+            triangle_pruner.end_cycle()
+
+        if not startup_timer.done and changed_symbols and cycle_complete:
+            logger.info(startup_timer.finish('primo ciclo sulle quotazioni'))
+
+        # Tempi misurati per shard: guidano il ribilanciamento del ciclo successivo
+        work_partitioner.record(shard_elapsed)
+        partition_stats = work_partitioner.get_stats()
         
+        if worker_stage_timings:
+            try:
+                profiling_control.save_stage_timings(generation, worker_stage_timings)
+            except Exception as e:
+                logger.error(f"Errore salvataggio tempi per fase: {e}")
+        if profile_prefix:
+            logger.info(f"🔬 Profili cProfile del ciclo {generation} salvati in {profile_prefix}_worker*.prof")
+
+        # I triangoli con partenza non prioritaria non arrivano ai worker: li conta l'indice
+        aggregated_stats = counters_to_stats(cycle_counters, triangle_index.non_priority_count, static_infeasible)
+
         # Aggiorna il contatore globale dei quasi-profittevoli
         total_low_profit_positive_found += aggregated_stats['low_profit']['positive']
 
         duration_ms = (time.perf_counter() - start_time) * 1000
+        analysis_scheduler.end_cycle(duration_ms / 1000)
+        scheduler_stats = analysis_scheduler.get_stats()
         total_low_profit = aggregated_stats['low_profit']['negative'] + aggregated_stats['low_profit']['positive']
         total_sim_failures = aggregated_stats['simulation_failures']['total']
 
@@ -600,8 +1024,17 @@ async def main_loop(analysis_executor, trading_executor):
         if should_log_detailed:
             logger.info("--- Statistiche Ciclo di Analisi ---")
             logger.info(f"Durata Analisi: {duration_ms:.2f} ms")
+            logger.info(f"Scheduler: ciclo {generation} (avvio: {scheduler_stats['trigger']}, simboli cambiati: {len(changed_symbols):,}) | "
+                        f"Media: {scheduler_stats['avg_cycle_ms']:.1f} ms | Pausa: {scheduler_stats['gap_ms']:.1f} ms | "
+                        f"Overrun: {scheduler_stats['overruns']} | Scartate (prezzi superati): {scheduler_stats['stale_discarded']} | "
+                        f"Sospensione per ritardo ingest: {scheduler_stats['shed_time']:.1f}s")
+            logger.info(f"Worker: {len(shards)} shard | Skew (max/media): {partition_stats['skew']:.2f} | "
+                        f"Più lento: {partition_stats['max_ms']:.1f} ms | Più veloce: {partition_stats['min_ms']:.1f} ms | "
+                        f"Ribilanciamenti: {partition_stats['rebalances']}")
             logger.info(f"Triangoli validi trovati: {aggregated_stats['total_triangles']:,}")
             logger.info(f"  - Scartati (partenza non prioritaria): {aggregated_stats['non_priority_start']:,}")
+            logger.info(f"  - Scartati (ineseguibili al budget, filtro statico): {aggregated_stats['static_infeasible']:,}")
+            logger.info(f"  - Saltati (declassati, rivalutati a rotazione): {aggregated_stats['pruned']:,}")
             logger.info(f"  - Scartati (fallimento simulazione): {total_sim_failures:,}")
             
             if total_sim_failures > 0:
@@ -619,25 +1052,88 @@ async def main_loop(analysis_executor, trading_executor):
                 logger.info(f"    - Negativo (perdita): {aggregated_stats['low_profit']['negative']:,}")
                 logger.info(f"    - Positivo (sotto soglia): {aggregated_stats['low_profit']['positive']:,}")
             logger.info(f"Opportunità Profittevoli Trovate: {total_profitable_found}")
+            cooldown_stats = opportunity_cooldown.get_stats()
+            logger.info(f"Cooldown: {cooldown_stats['size']:,} triangoli | Soppresse: {cooldown_stats['suppressed']:,} | "
+                        f"Rinotificate: {cooldown_stats['realerts']:,} | Espulse (capacità): {cooldown_stats['evictions']:,}")
+            if triangle_pruner is not None:
+                pruning_stats = triangle_pruner.get_stats()
+                logger.info(f"Potatura: {pruning_stats['demoted']:,} triangoli declassati | Declassamenti: {pruning_stats['demotions']:,} | "
+                            f"Riattivati (rivalutazione): {pruning_stats['recheck_promotions']:,} | "
+                            f"Riattivati (liquidità): {pruning_stats['liquidity_promotions']:,}")
+            if config.AUTO_TRADE_ENABLED:
+                queue_stats = trading_queue.get_stats()
+                logger.info(f"Coda trading: {queue_stats['depth']} in attesa | Inviate: {queue_stats['dispatched']} "
+                            f"({queue_stats['in_flight']} in corso) | "
+                            f"Unite: {queue_stats['coalesced']} | Scartate (prezzi vecchi): {queue_stats['dropped_stale']} | "
+                            f"Scartate (capacità): {queue_stats['dropped_capacity']} | Attesa media: {queue_stats['avg_wait_ms']:.0f} ms "
+                            f"(max {queue_stats['max_wait_ms']:.0f} ms) | Età prezzi all'invio: {queue_stats['avg_quote_age_ms']:.0f} ms")
+            if evaluation_archive is not None:
+                archive_stats = evaluation_archive.get_stats()
+                logger.info(f"Archivio valutazioni: {archive_stats['rows_written']:,} righe scritte "
+                            f"({archive_stats['bytes_written'] / 1048576:.1f} MB) | In memoria: {archive_stats['pending']:,} | "
+                            f"Cicli scartati (scrittura in ritardo): {archive_stats['dropped_cycles']}")
             logger.info("------------------------------------")
         else:
             # Log sintetico per cicli normali
-            logger.info(f"Analisi completata: {duration_ms:.1f}ms | Triangoli: {aggregated_stats['total_triangles']:,} | Opportunità: {total_profitable_found}")
+            logger.info(f"Analisi completata: {duration_ms:.1f}ms | Triangoli: {aggregated_stats['total_triangles']:,} | Opportunità: {total_profitable_found} | Avvio: {scheduler_stats['trigger']} ({len(changed_symbols):,} simboli) | Skew worker: {partition_stats['skew']:.2f}")
+
+async def broadcast_loop():
+    """Modalità broadcaster: al posto dei cicli locali pubblica ai detector i simboli cambiati."""
+    last_report = time.monotonic()
+    while True:
+        # Stessa cadenza dei cicli locali: abbastanza simboli cambiati o attesa massima
+        changed_symbols = await analysis_scheduler.wait_for_next_cycle()
+        analysis_scheduler.begin_cycle()
+        start_time = time.perf_counter()
+        book_broadcaster.publish(changed_symbols, time.time())
+        analysis_scheduler.end_cycle(time.perf_counter() - start_time)
+        if not startup_timer.done and changed_symbols:
+            logger.info(startup_timer.finish('prima pubblicazione delle quotazioni'))
+        if time.monotonic() - last_report >= config.FEED_STATS_INTERVAL:
+            last_report = time.monotonic()
+            logger.info(book_broadcaster.report())
+
+async def handle_remote_results(node_id, result):
+    """Opportunità trovate da un detector remoto: stesso percorso di quelle rilevate localmente."""
+    global total_low_profit_positive_found
+    total_low_profit_positive_found += result['counters'][C_LOW_POSITIVE]
+    opportunities = result['opportunities']
+    if not opportunities:
+        return
+    snapshot_time = result['snapshot_time']
+    if analysis_scheduler.is_stale(snapshot_time):
+        analysis_scheduler.stale_discarded += len(opportunities)
+        return
+    # Snapshot del broadcaster: almeno recente quanto quello usato dal detector
+    current_prices = prices_cache.snapshot()
+    existing_pairs = triangle_index.pairs_snapshot()
+    for a, b, c, profit_perc_val in opportunities:
+        triangle = (a, b, c)
+        try:
+            await process_opportunity(triangle, opportunity_cooldown.triangle_key(triangle), profit_perc_val,
+                                      current_prices, existing_pairs, snapshot_time)
+        except Exception as e:
+            logger.error(f"Errore nel processare l'opportunità del detector {node_id}: {e}")
 
 async def send_telegram_notification(message):
     if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID: return
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     try:
         async with asyncio.timeout(10):
-            response = requests.post(url, data={'chat_id': TELEGRAM_CHAT_ID, 'text': message, 'parse_mode': 'Markdown'})
+            # In un thread: la richiesta sincrona non deve bloccare il loop (e il timeout deve poterla interrompere)
+            response = await asyncio.to_thread(requests.post, url, data={'chat_id': TELEGRAM_CHAT_ID, 'text': message, 'parse_mode': 'Markdown'}, timeout=10)
             if response.status_code != 200:
                 logger.warning(f"Errore invio Telegram: {response.status_code} {response.text}")
     except Exception as e:
         logger.error(f"Eccezione invio Telegram: {e}")
 
-async def websocket_manager(symbols):
+async def websocket_manager(group_index, feed_index=0):
     """Gestisce una singola connessione WebSocket con riconnessione e ottimizzazioni."""
-    url = f"wss://stream.binance.com:9443/stream?streams={'/'.join(symbols)}"
+    symbols = symbol_groups[group_index]  # Lista condivisa, aggiornata da update_subscriptions
+    sbe = config.MARKET_DATA_ENCODING == 'sbe'
+    endpoints = config.MARKET_DATA_SBE_ENDPOINTS if sbe else config.MARKET_DATA_WS_ENDPOINTS
+    endpoint = endpoints[feed_index % len(endpoints)]  # Feed ridondanti su percorsi diversi
+    connection_key = (group_index, feed_index)
     reconnect_delay = 5
     max_reconnect_delay = 60
     
@@ -646,23 +1142,99 @@ async def websocket_manager(symbols):
             # Importa websockets solo quando necessario
             import websockets
             
+            if not symbols:
+                # Gruppo svuotato dai delisting: si riattiva se il refresh vi aggiunge stream
+                await asyncio.sleep(max_reconnect_delay)
+                continue
+
+            # L'URL viene ricostruito a ogni connessione per includere gli stream aggiunti nel frattempo
+            url = f"{endpoint}?streams={'/'.join(symbols)}"
+            # Gli stream SBE richiedono la chiave API nell'header della connessione
+            headers = websocket_header_kwargs(websockets, {'X-MBX-APIKEY': config.BINANCE_API_KEY}) if sbe else {}
             async with websockets.connect(
                 url, 
                 ping_interval=30,  # Aumentato da 20 a 30
                 ping_timeout=60,
                 close_timeout=10,
-                max_size=2**20  # Limita dimensione messaggi
+                max_size=2**20,  # Limita dimensione messaggi
+                **headers
             ) as websocket:
-                logger.info(f"Connessione WebSocket stabilita per {len(symbols)} simboli.")
+                logger.info(f"Connessione WebSocket stabilita per {len(symbols)} simboli (gruppo {group_index}, feed {feed_index}).")
+                startup_timer.mark_once('prima connessione WebSocket')
                 reconnect_delay = 5  # Reset delay su successo
+                websocket_connections[connection_key] = websocket
+                feed_stats = feed_monitor.connected(group_index, feed_index)
                 
-                async for message in websocket:
-                    await handle_message(message)
+                # Rotazione volontaria prima della disconnessione forzata dell'exchange
+                rotate_at = asyncio.get_running_loop().time() + feed_monitor.rotation_delay(group_index, feed_index)
+                try:
+                    async with asyncio.timeout_at(rotate_at):
+                        if config.INGEST_CONFLATION:
+                            await consume_conflated(websocket, connection_key, feed_stats)
+                        else:
+                            async for message in websocket:
+                                await handle_message(message, feed_stats)
+                except TimeoutError:
+                    feed_monitor.rotations += 1
+                    logger.info(f"Rotazione programmata della connessione (gruppo {group_index}, feed {feed_index}).")
+                    continue
                     
         except Exception as e:
             logger.error(f"Errore WebSocket ({len(symbols)} simboli): {e}. Riconnessione tra {reconnect_delay}s.")
             await asyncio.sleep(reconnect_delay)
             reconnect_delay = min(reconnect_delay * 2, max_reconnect_delay)  # Backoff esponenziale
+        finally:
+            websocket_connections.pop(connection_key, None)
+            feed_monitor.disconnected(group_index, feed_index)
+            ingest_lag_monitor.forget(connection_key)
+
+async def consume_conflated(websocket, connection_key, feed_stats):
+    """Applica i frame a lotti conflati e sospende l'analisi se l'ingest resta indietro."""
+    # aclosing: alla rotazione o alla chiusura il task di lettura viene fermato subito
+    async with contextlib.aclosing(iter_conflated_batches(websocket)) as batches:
+        async for frames, received, oldest_ts in batches:
+            for message in frames:
+                await handle_message(message, feed_stats)
+            lag = time.time() - oldest_ts
+            lag_changed = ingest_lag_monitor.record(connection_key, lag, received, len(frames))
+            if lag_changed:
+                analysis_scheduler.shed(True)
+                logger.warning(f"⚠️ Ingest in ritardo di {lag:.2f}s (gruppo {connection_key[0]}, feed {connection_key[1]}): analisi sospesa")
+                task = asyncio.create_task(send_telegram_notification(
+                    f"⚠️ *Ingest in ritardo*\n\nRitardo: `{lag:.2f}s` su {received} frame. Analisi sospesa fino al riallineamento."))
+                background_tasks.add(task)
+                task.add_done_callback(background_tasks.discard)
+            elif lag_changed is False:
+                analysis_scheduler.shed(False)
+                logger.info(f"✅ Ingest riallineato (ritardo {lag * 1000:.0f} ms): analisi ripresa")
+
+async def feed_stats_task():
+    """Registra periodicamente messaggi, primi arrivi e ritardo di ogni connessione market data."""
+    while True:
+        await asyncio.sleep(config.FEED_STATS_INTERVAL)
+        logger.info(f"--- Feed market data ({config.MARKET_DATA_FEEDS_PER_GROUP} per gruppo, rotazioni: {feed_monitor.rotations}) ---")
+        for line in feed_monitor.report():
+            logger.info(line)
+        if config.INGEST_CONFLATION:
+            logger.info(ingest_lag_monitor.report())
+
+async def scenario_analysis_task(analysis_executor):
+    """Confronta periodicamente la configurazione live con gli scenari di config.SCENARIOS sullo stesso snapshot."""
+    while True:
+        await asyncio.sleep(config.SCENARIO_INTERVAL)
+        if not config.SCENARIOS or not len(triangle_index):
+            continue
+        # La configurazione live è il primo scenario: è il riferimento per gli altri
+        scenarios = [(float(config.TRADING_FEE), float(config.SIMULATION_BUDGET_USDT), float(config.MIN_PROFIT_THRESHOLD))]
+        scenarios.extend(tuple(float(value) for value in scenario) for scenario in config.SCENARIOS)
+        triangles = triangle_index.triangles()
+        try:
+            summaries, elapsed = await asyncio.wrap_future(analysis_executor.submit(
+                scenario_worker, prices_cache.snapshot(), symbol_info_map, triangles, triangle_index.pairs_snapshot(), scenarios))
+        except Exception as e:
+            logger.error(f"Errore nella valutazione degli scenari: {e}")
+            continue
+        logger.info(format_scenario_summary(summaries, elapsed, len(triangles)))
 
 async def hourly_summary_task(bot_start_time):
     """Invia un riepilogo orario su Telegram."""
@@ -682,8 +1254,10 @@ async def hourly_summary_task(bot_start_time):
             f"🕒 *Riepilogo Orario*\n\n"
             f"✅ *Uptime:* `{uptime_str}`\n"
             f"💰 *Opportunità Trovate:* `{total_profitable_opportunities_found}`\n"
-            f"🤏 *Quasi Profittevoli (sotto soglia):* `{total_low_profit_positive_found}`"
+            f"🤏 *Quasi Profittevoli (sotto soglia):* `{total_low_profit_positive_found}`\n\n"
+            f"{format_lifetime_summary(lifetime_tracker.summary())}"
         )
+        logger.info(summary_message)
         await send_telegram_notification(summary_message)
 
 def calcola_importo_ottimale_con_buffer(pairs, prices, symbol_info_map):
@@ -730,7 +1304,7 @@ def calcola_importo_ottimale_con_buffer(pairs, prices, symbol_info_map):
     return importo_ottimale, volumi
 
 async def main():
-    global symbol_info_map
+    global symbol_info_map, prices_cache, triangle_index, symbol_groups, book_recorder, evaluation_archive, liquidation_router, book_broadcaster
     
     # Stampa configurazione all'avvio
     config.print_config_summary()
@@ -745,28 +1319,115 @@ async def main():
             logger.error("Il bot continuerà solo con l'analisi (trading disabilitato)")
             config.AUTO_TRADE_ENABLED = False
     
+    if config.MARKET_DATA_ENCODING == 'sbe' and not config.BINANCE_API_KEY:
+        logger.warning("⚠️ Stream SBE senza BINANCE_API_KEY: l'exchange rifiuterà le connessioni market data")
+
     getcontext().prec = 15
     bot_start_time = time.time()
+    startup_timer.mark('configurazione')
     
     logger.info("Avvio programma di arbitraggio triangolare Binance...")
-    await send_telegram_notification("🤖 Avvio del bot di arbitraggio...")
+    # La notifica non deve ritardare l'avvio
+    notify_task = asyncio.create_task(send_telegram_notification("🤖 Avvio del bot di arbitraggio..."))
+    background_tasks.add(notify_task)
+    notify_task.add_done_callback(background_tasks.discard)
 
-    symbols, symbol_info_map = await get_exchange_symbols()
-    if not symbols:
-        logger.error("Nessun simbolo ottenuto. Impossibile procedere.")
-        return
+    # Executor separati per analisi e trading, creati per primi: i processi partono mentre si caricano i metadati
+    trading_initializer = None
+    if config.AUTO_TRADE_ENABLED:
+        # Dipendenze di trading (client Binance, WebSocket e REST) caricate solo se servono
+        from trading_executor import init_trading_worker
+        trading_initializer = init_trading_worker
+    # Con ANALYSIS_BACKEND = 'auto' partono tutti i candidati: la calibrazione tiene il più veloce
+    backend_names = config.ANALYSIS_BACKEND_CANDIDATES if config.ANALYSIS_BACKEND == 'auto' else (config.ANALYSIS_BACKEND,)
+    with contextlib.ExitStack() as analysis_stack:
+        analysis_executors = {name: analysis_stack.enter_context(create_analysis_executor(name, config.ANALYSIS_CORES))
+                              for name in backend_names}
+        # I worker di trading aprono WebSocket e pool REST all'avvio, non al primo trade
+        with ProcessPoolExecutor(max_workers=config.TRADING_CORES, initializer=trading_initializer) as trading_executor:
+            pool_warm_ups = [warm_up_pool(executor, config.ANALYSIS_CORES) for executor in analysis_executors.values()]
+            if config.AUTO_TRADE_ENABLED:
+                pool_warm_ups.append(warm_up_pool(trading_executor, config.TRADING_CORES))
+            pools_ready = asyncio.ensure_future(asyncio.gather(*pool_warm_ups))
+
+            symbols, symbol_info_map, from_cache = await load_symbols_with_cache()
+            if not symbols:
+                logger.error("Nessun simbolo ottenuto. Impossibile procedere.")
+                pools_ready.cancel()
+                return
+            startup_timer.mark('metadati simboli')
+
+            # Le connessioni partono subito (tutte insieme): l'indice dei triangoli si costruisce durante l'handshake
+            prices_cache = TopOfBook(symbol_info_map)
+            symbol_groups = [symbols[i:i + SYMBOLS_PER_CONNECTION] for i in range(0, len(symbols), SYMBOLS_PER_CONNECTION)]
+            websocket_tasks = [
+                asyncio.create_task(websocket_manager(group_index, feed_index))
+                for group_index in range(len(symbol_groups))
+                for feed_index in range(config.MARKET_DATA_FEEDS_PER_GROUP)
+            ]
+
+            triangle_index = await asyncio.to_thread(TriangleIndex, symbol_info_map, config.STARTING_ASSETS)
+            logger.info(f"Indice triangoli: {len(triangle_index):,} triangoli su {len(triangle_index.graph):,} valute.")
+            startup_timer.mark('indice triangoli')
+            if config.AUTO_TRADE_ENABLED:
+                liquidation_router = LiquidationRouter(symbol_info_map, config.STARTING_ASSETS, config.LIQUIDATION_HUBS)
+                route_stats = liquidation_router.get_stats()
+                logger.info(f"Rotte di liquidazione: {route_stats['direct']:,} dirette, {route_stats['two_hop']:,} via hub, "
+                            f"{route_stats['unreachable']:,} irraggiungibili.")
+            
+            profiling_control.install_signal_handlers(asyncio.get_running_loop())
+            config_reloader = ConfigReloader(apply_strategy_changes)
+            config_reloader.install_signal_handler(asyncio.get_running_loop())
+            if config.BOOK_RECORDING_DIR:
+                book_recorder = BookRecorder(config.BOOK_RECORDING_DIR, config.BOOK_RECORDING_FLUSH_LINES)
+                logger.info(f"Registrazione bookTicker attiva in '{config.BOOK_RECORDING_DIR}'")
+            if config.DISTRIBUTED_ROLE == 'broadcaster':
+                # I detector (python detector_node.py) si collegano al bus e si dividono i triangoli
+                book_broadcaster = BookBroadcaster(config.DISTRIBUTED_BUS_HOST, config.DISTRIBUTED_BUS_PORT,
+                                                   handle_remote_results, config.DISTRIBUTED_MAX_NODE_BUFFER,
+                                                   max(config.DISTRIBUTED_NODE_TIMEOUT,
+                                                       config.SCHEDULER_CYCLE_TIMEOUT + config.SCHEDULER_MAX_DELAY))
+                publish_strategy()
+                book_broadcaster.set_universe(symbol_info_map, prices_cache)
+                await book_broadcaster.start()
+            if config.EVALUATION_ARCHIVE_DIR:
+                evaluation_archive = EvaluationArchive(config.EVALUATION_ARCHIVE_DIR, config.EVALUATION_ARCHIVE_FLUSH_ROWS,
+                                                       config.EVALUATION_ARCHIVE_FLUSH_INTERVAL)
+                logger.info(f"Archivio delle valutazioni attivo in '{config.EVALUATION_ARCHIVE_DIR}'")
+
+            ready_counts = await pools_ready
+            startup_timer.mark('pool di processi')
+            analysis_ready, trading_ready = ready_counts[:len(analysis_executors)], ready_counts[len(analysis_executors):]
+            logger.info("Pool pronti: worker di analisi " + ", ".join(f"{name} {count}" for name, count in zip(analysis_executors, analysis_ready))
+                        + (f" | {trading_ready[0]} processi di trading" if trading_ready else ""))
+
+            if len(analysis_executors) > 1:
+                analysis_backend = await select_analysis_backend(analysis_executors)
+                for name, executor in analysis_executors.items():
+                    if name != analysis_backend:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                startup_timer.mark('calibrazione backend di analisi')
+            else:
+                analysis_backend = backend_names[0]
+            analysis_executor = analysis_executors[analysis_backend]
 
-    symbol_groups = [symbols[i:i + SYMBOLS_PER_CONNECTION] for i in range(0, len(symbols), SYMBOLS_PER_CONNECTION)]
-    
-    # Executor separati per analisi e trading
-    with ProcessPoolExecutor(max_workers=config.ANALYSIS_CORES) as analysis_executor:
-        with ProcessPoolExecutor(max_workers=config.TRADING_CORES) as trading_executor:
-            websocket_tasks = [websocket_manager(group) for group in symbol_groups]
             all_tasks = websocket_tasks + [
-                main_loop(analysis_executor, trading_executor),
-                hourly_summary_task(bot_start_time)
+                broadcast_loop() if book_broadcaster is not None else main_loop(analysis_executor, trading_executor),
+                trading_dispatch_task(trading_executor),
+                hourly_summary_task(bot_start_time),
+                # Partendo dalla cache l'universo viene riallineato subito, poi a intervalli regolari
+                symbol_universe_refresh_task(refresh_now=from_cache),
+                profiling_control.watch_command_file(),
+                feed_stats_task(),
+                scenario_analysis_task(analysis_executor)
             ]
-            await asyncio.gather(*all_tasks)
+            if config.CONFIG_RELOAD_WATCH:
+                all_tasks.append(config_reloader.watch_file(config.CONFIG_WATCH_INTERVAL))
+            try:
+                await asyncio.gather(*all_tasks)
+            finally:
+                if evaluation_archive is not None:
+                    evaluation_archive.close()  # Scrive le valutazioni ancora in memoria
 
 if __name__ == "__main__":
     try:
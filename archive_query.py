@@ -0,0 +1,162 @@
+"""
+Interrogazione dell'archivio delle valutazioni dei triangoli
+Aggrega le righe scritte da EvaluationArchive per triangolo, asset di partenza,
+esito, gamba fallita, ora o ciclo, con filtri su esito, asset e profitto.
+Vengono decompresse solo le colonne necessarie alla query.
+
+Esempi:
+    python archive_query.py archive/evaluations_20240101.tca --group-by status
+    python archive_query.py 'archive/*.tca' --group-by path --status EVALUATED --min-profit -0.05 --top 30
+    python archive_query.py 'archive/*.tca' --group-by leg --start USDT --sort count
+"""
+
+import argparse
+import csv
+import glob
+import math
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from evaluation_archive import STATUS_CODES, STATUSES, read_blocks
+
+GROUPS = ('path', 'start', 'status', 'leg', 'hour', 'cycle')
+# Colonne necessarie per ciascun raggruppamento (oltre a esito e profitto, sempre lette)
+_GROUP_COLUMNS = {
+    'path': ('asset_a', 'asset_b', 'asset_c'),
+    'start': ('asset_a',),
+    'status': (),
+    'leg': ('failed_leg',),
+    'hour': ('ts',),
+    'cycle': ('cycle',)
+}
+
+class GroupStats:
+    """Conteggi ed elenco dei profitti delle righe valutate di un gruppo"""
+    __slots__ = ('rows', 'failures', 'profits')
+
+    def __init__(self):
+        self.rows = 0
+        self.failures = 0
+        self.profits = array('d')
+
+    def percentile(self, q: float) -> float:
+        if not self.profits:
+            return math.nan
+        ordered = sorted(self.profits)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict:
+        evaluated = len(self.profits)
+        return {
+            'rows': self.rows,
+            'failures': self.failures,
+            'evaluated': evaluated,
+            'mean_profit': sum(self.profits) / evaluated if evaluated else math.nan,
+            'p50_profit': self.percentile(0.5),
+            'p95_profit': self.percentile(0.95),
+            'max_profit': max(self.profits) if evaluated else math.nan
+        }
+
+def _group_key(group_by: str, row: int, block: Dict[str, array], assets: List[str]) -> str:
+    if group_by == 'path':
+        a, b, c = assets[block['asset_a'][row]], assets[block['asset_b'][row]], assets[block['asset_c'][row]]
+        return f"{a}→{b}→{c}→{a}"
+    if group_by == 'start':
+        return assets[block['asset_a'][row]]
+    if group_by == 'status':
+        return STATUSES[block['status'][row]]
+    if group_by == 'leg':
+        leg = block['failed_leg'][row]
+        return f"gamba {leg}" if leg else '-'
+    if group_by == 'hour':
+        return time.strftime('%Y-%m-%d %H:00', time.localtime(block['ts'][row]))
+    return str(block['cycle'][row])
+
+def aggregate(paths: Iterable[str], group_by: str, status: Optional[str] = None, start: Optional[str] = None,
+              min_profit: Optional[float] = None) -> Dict[str, GroupStats]:
+    """Aggrega le righe dei file indicati per gruppo, applicando i filtri"""
+    columns = {'status', 'profit_perc'}.union(_GROUP_COLUMNS[group_by])
+    if start:
+        columns.add('asset_a')
+    status_code = STATUS_CODES[status] if status else None
+
+    groups: Dict[str, GroupStats] = {}
+    for assets, block in read_blocks(paths, columns):
+        start_code = assets.index(start) if start in assets else None
+        if start and start_code is None:
+            continue  # Asset assente dal dizionario del blocco: nessuna riga corrisponde
+        statuses, profits = block['status'], block['profit_perc']
+        for row in range(len(statuses)):
+            if status_code is not None and statuses[row] != status_code:
+                continue
+            if start_code is not None and block['asset_a'][row] != start_code:
+                continue
+            profit = profits[row]
+            if min_profit is not None and not profit >= min_profit:  # NaN (fallimenti) esclusi
+                continue
+            key = _group_key(group_by, row, block, assets)
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = GroupStats()
+            stats.rows += 1
+            if statuses[row]:
+                stats.failures += 1
+            else:
+                stats.profits.append(profit)
+    return groups
+
+def _format_profit(value: float) -> str:
+    return f"{value:9.4f}%" if not math.isnan(value) else f"{'-':>10}"
+
+def print_report(summaries: Dict[str, Dict], group_by: str, top: int):
+    total = sum(summary['rows'] for summary in summaries.values()) or 1
+    print(f"{group_by:<28} {'righe':>12} {'quota':>7} {'falliti':>12} {'media':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    for key, summary in list(summaries.items())[:top]:
+        print(f"{key:<28} {summary['rows']:>12,} {summary['rows'] / total * 100:6.2f}% {summary['failures']:>12,} "
+              f"{_format_profit(summary['mean_profit'])} {_format_profit(summary['p50_profit'])} "
+              f"{_format_profit(summary['p95_profit'])} {_format_profit(summary['max_profit'])}")
+    if len(summaries) > top:
+        print(f"... altri {len(summaries) - top:,} gruppi")
+
+def write_csv(summaries: Dict[str, Dict], group_by: str, path: str):
+    fields = ('rows', 'failures', 'evaluated', 'mean_profit', 'p50_profit', 'p95_profit', 'max_profit')
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow((group_by,) + fields)
+        for key, summary in summaries.items():
+            writer.writerow([key] + ['' if isinstance(summary[field], float) and math.isnan(summary[field])
+                                     else summary[field] for field in fields])
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregazioni sull'archivio delle valutazioni dei triangoli")
+    parser.add_argument('archives', nargs='+', help="File scritti da EvaluationArchive (anche glob)")
+    parser.add_argument('--group-by', choices=GROUPS, default='status')
+    parser.add_argument('--status', choices=STATUSES, help="Solo le righe con questo esito")
+    parser.add_argument('--start', help="Solo i triangoli con questo asset di partenza")
+    parser.add_argument('--min-profit', type=float, help="Profitto minimo in punti %% (esclude i fallimenti)")
+    parser.add_argument('--sort', choices=('rows', 'failures', 'mean_profit', 'max_profit', 'key'), default='rows')
+    parser.add_argument('--top', type=int, default=50, help="Gruppi mostrati")
+    parser.add_argument('--csv', help="File CSV con tutti i gruppi")
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.archives for path in (glob.glob(pattern) or [pattern]))
+    start = time.perf_counter()
+    groups = aggregate(paths, args.group_by, args.status, args.start, args.min_profit)
+    summaries = {key: stats.summary() for key, stats in groups.items()}
+    if args.sort == 'key':
+        summaries = dict(sorted(summaries.items()))
+    else:
+        # I NaN (gruppi senza righe valutate) vanno in fondo
+        summaries = dict(sorted(summaries.items(), key=lambda item: (not math.isnan(item[1][args.sort]), item[1][args.sort]),
+                                reverse=True))
+    rows = sum(summary['rows'] for summary in summaries.values())
+    print(f"{rows:,} righe in {len(summaries):,} gruppi da {len(paths)} file ({time.perf_counter() - start:.1f}s)\n")
+
+    print_report(summaries, args.group_by, args.top)
+    if args.csv:
+        write_csv(summaries, args.group_by, args.csv)
+        print(f"\nGruppi salvati in {args.csv}")
+
+if __name__ == "__main__":
+    main()
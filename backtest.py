@@ -0,0 +1,236 @@
+"""
+Backtest della sensibilità alla latenza su registrazioni bookTicker
+Rigioca le registrazioni di BookRecorder, rileva i triangoli profittevoli a intervalli
+regolari (solo quelli toccati da simboli aggiornati) e li ri-simula dopo ogni latenza
+Δ richiesta, per misurare quanto del profitto stimato sopravvive al ritardo.
+
+Esempio:
+    python backtest.py recordings/book_20240101.log --latencies 0,50,100,250,500,1000
+"""
+
+import argparse
+import csv
+import glob
+import heapq
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from book_recording import BookUpdate, read_recording
+from symbol_cache import load_symbol_cache, read_cached_starting_assets
+from top_of_book import TopOfBook
+from triangle_eval import build_triangle_legs, simulate_triangle
+from triangle_index import Triangle, TriangleIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCIES_MS = (0, 50, 100, 250, 500, 1000)
+DEFAULT_TRADING_FEE = float(config.TRADING_FEE)
+
+# Accumulatori per (triangolo, latenza)
+A_DETECTIONS = 0
+A_DETECTED_PROFIT = 1  # Somma dei profitti % stimati alla rilevazione
+A_REALIZED_PROFIT = 2  # Somma dei profitti % realizzati (solo simulazioni riuscite)
+A_FILLED = 3  # Simulazioni riuscite dopo la latenza
+A_SURVIVED = 4  # Simulazioni ancora sopra la soglia dopo la latenza
+
+class LatencyBacktest:
+    """Motore di rilevazione offline con ri-simulazione a t + Δ"""
+
+    def __init__(self, symbol_info_map: Dict[str, Dict], starting_assets: Iterable[str],
+                 latencies_ms: Iterable[int], budget: float, fee: float, threshold: float):
+        self.book = TopOfBook(symbol_info_map)
+        index = TriangleIndex(symbol_info_map, starting_assets)
+        existing_pairs = index.pairs_snapshot()
+
+        self.latencies = [lat / 1000 for lat in latencies_ms]
+        self.budget = budget
+        self.fee = fee
+        self.threshold = threshold
+
+        self.triangles: List[Triangle] = []
+        self.legs = []
+        self.by_symbol: Dict[int, List[int]] = defaultdict(list)  # id simbolo -> triangoli che lo usano
+        for triangle in index.triangles():
+            legs = build_triangle_legs(triangle, existing_pairs, symbol_info_map, self.book.symbol_ids)
+            if legs is None:
+                continue
+            tri_id = len(self.triangles)
+            self.triangles.append(triangle)
+            self.legs.append(legs)
+            for sid in {leg[0] for leg in legs}:
+                self.by_symbol[sid].append(tri_id)
+
+        self._profitable = bytearray(len(self.triangles))  # Esito dell'ultima valutazione
+        self._pending: List[Tuple[float, int, int, int, float]] = []  # (scadenza, seq, triangolo, latenza, profitto)
+        self._seq = 0
+        self.stats: Dict[int, List[List[float]]] = {}
+        self.updates = 0
+        self.evaluations = 0
+
+    def _profit_perc(self, tri_id: int) -> Optional[float]:
+        """Profitto % del triangolo sul book corrente, None se la simulazione fallisce"""
+        self.evaluations += 1
+        status, final_amount = simulate_triangle(self.legs[tri_id], self.book, self.budget, self.fee)
+        if status != 'SUCCESS':
+            return None
+        return (final_amount / self.budget - 1) * 100
+
+    def _detect(self, dirty: Iterable[int], now: float):
+        """Valuta i triangoli toccati dai simboli aggiornati e pianifica le ri-simulazioni"""
+        touched = set()
+        for sid in dirty:
+            touched.update(self.by_symbol.get(sid, ()))
+        for tri_id in touched:
+            profit = self._profit_perc(tri_id)
+            profitable = profit is not None and profit > self.threshold
+            # Si conta solo il fronte di salita: un triangolo che resta profittevole è la stessa opportunità
+            if profitable and not self._profitable[tri_id]:
+                rows = self.stats.get(tri_id)
+                if rows is None:
+                    rows = self.stats[tri_id] = [[0, 0.0, 0.0, 0, 0] for _ in self.latencies]
+                for lat_idx, latency in enumerate(self.latencies):
+                    rows[lat_idx][A_DETECTIONS] += 1
+                    rows[lat_idx][A_DETECTED_PROFIT] += profit
+                    self._seq += 1
+                    heapq.heappush(self._pending, (now + latency, self._seq, tri_id, lat_idx, profit))
+            self._profitable[tri_id] = profitable
+
+    def _fill_due(self, until: float):
+        """Ri-simula le opportunità la cui latenza scade prima di 'until' (book com'era in quell'istante)"""
+        pending = self._pending
+        while pending and pending[0][0] <= until:
+            _, _, tri_id, lat_idx, _ = heapq.heappop(pending)
+            profit = self._profit_perc(tri_id)
+            if profit is None:
+                continue
+            row = self.stats[tri_id][lat_idx]
+            row[A_FILLED] += 1
+            row[A_REALIZED_PROFIT] += profit
+            if profit > self.threshold:
+                row[A_SURVIVED] += 1
+
+    def run(self, updates: Iterable[BookUpdate], step: float):
+        """Rigioca gli aggiornamenti valutando i simboli modificati ogni 'step' secondi"""
+        symbol_ids = self.book.symbol_ids
+        window_end = None
+        dirty = set()
+        for ts, symbol, bid, ask, bid_qty, ask_qty in updates:
+            self._fill_due(ts)
+            if window_end is None:
+                window_end = ts + step
+            elif ts >= window_end:
+                self._detect(dirty, window_end)
+                dirty = set()
+                self._fill_due(ts)
+                window_end = ts + step
+            sid = symbol_ids.get(symbol)
+            if sid is None:
+                continue
+            self.book.update(symbol, bid, ask, bid_qty, ask_qty, ts)
+            dirty.add(sid)
+            self.updates += 1
+
+        if window_end is not None:
+            self._detect(dirty, window_end)
+        self._fill_due(float('inf'))
+
+    def summarize(self, group_key=None) -> Dict:
+        """Aggrega gli accumulatori per latenza, raggruppando i triangoli con group_key (None = totale)"""
+        groups: Dict = defaultdict(lambda: [[0, 0.0, 0.0, 0, 0] for _ in self.latencies])
+        for tri_id, rows in self.stats.items():
+            key = group_key(self.triangles[tri_id]) if group_key else 'TOTALE'
+            target = groups[key]
+            for lat_idx, row in enumerate(rows):
+                for field, value in enumerate(row):
+                    target[lat_idx][field] += value
+        return groups
+
+def _format_row(latency: float, row: List[float]) -> str:
+    detections, detected, realized, filled, survived = row
+    if not detections:
+        return f"  Δ={latency * 1000:>6.0f}ms  nessuna rilevazione"
+    mean_realized = realized / filled if filled else 0.0
+    return (f"  Δ={latency * 1000:>6.0f}ms  rilevate={detections:>7,}  "
+            f"sopravvissute={survived / detections * 100:6.2f}%  "
+            f"profitto stimato={detected / detections:+.4f}%  realizzato={mean_realized:+.4f}%  "
+            f"fallite={(detections - filled) / detections * 100:6.2f}%")
+
+def print_report(backtest: LatencyBacktest, top: int):
+    print("\n=== Decadimento del profitto con la latenza ===")
+    for key, rows in backtest.summarize().items():
+        print(f"{key}:")
+        for latency, row in zip(backtest.latencies, rows):
+            print(_format_row(latency, row))
+
+    print("\n=== Per asset di partenza ===")
+    for asset, rows in sorted(backtest.summarize(lambda triangle: triangle[0]).items()):
+        print(f"{asset}:")
+        for latency, row in zip(backtest.latencies, rows):
+            print(_format_row(latency, row))
+
+    ranked = sorted(backtest.stats.items(), key=lambda item: item[1][0][A_DETECTIONS], reverse=True)
+    print(f"\n=== Top {top} triangoli per rilevazioni ===")
+    for tri_id, rows in ranked[:top]:
+        a, b, c = backtest.triangles[tri_id]
+        print(f"{a}→{b}→{c}→{a}:")
+        for latency, row in zip(backtest.latencies, rows):
+            print(_format_row(latency, row))
+
+def write_csv(backtest: LatencyBacktest, path: str):
+    """Esporta una riga per (triangolo, latenza) per analisi successive"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'start_asset', 'latency_ms', 'detections', 'mean_detected_perc',
+                         'filled', 'mean_realized_perc', 'survived'])
+        for tri_id, rows in sorted(backtest.stats.items()):
+            a, b, c = backtest.triangles[tri_id]
+            for latency, (detections, detected, realized, filled, survived) in zip(backtest.latencies, rows):
+                writer.writerow([f"{a}→{b}→{c}→{a}", a, round(latency * 1000), detections,
+                                 f"{detected / detections:.6f}" if detections else '',
+                                 filled, f"{realized / filled:.6f}" if filled else '', survived])
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest della sensibilità alla latenza su registrazioni bookTicker")
+    parser.add_argument('recordings', nargs='+', help="File registrati da BookRecorder (anche glob o .gz)")
+    parser.add_argument('--symbol-cache', default=config.SYMBOL_CACHE_FILE, help="Cache dei metadati dei simboli")
+    parser.add_argument('--latencies', default=','.join(str(lat) for lat in DEFAULT_LATENCIES_MS),
+                        help="Latenze da simulare in ms, separate da virgola")
+    parser.add_argument('--step', type=float, default=100, help="Intervallo tra due rilevazioni in ms")
+    parser.add_argument('--budget', type=float, default=float(config.SIMULATION_BUDGET_USDT))
+    parser.add_argument('--fee', type=float, default=DEFAULT_TRADING_FEE)
+    parser.add_argument('--threshold', type=float, default=float(config.MIN_PROFIT_THRESHOLD) * 100,
+                        help="Profitto minimo in punti %%")
+    parser.add_argument('--top', type=int, default=20, help="Triangoli mostrati nel dettaglio")
+    parser.add_argument('--csv', help="File CSV con i risultati per triangolo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    starting_assets = read_cached_starting_assets(args.symbol_cache)
+    cached = load_symbol_cache(args.symbol_cache, starting_assets or ())
+    if not cached:
+        logger.error(f"Cache simboli '{args.symbol_cache}' non disponibile: avviare prima il bot per crearla")
+        return
+    symbol_info_map, _ = cached
+
+    paths = sorted(path for pattern in args.recordings for path in (glob.glob(pattern) or [pattern]))
+    latencies = [int(value) for value in args.latencies.split(',') if value.strip()]
+    backtest = LatencyBacktest(symbol_info_map, starting_assets, latencies, args.budget, args.fee, args.threshold)
+    logger.info(f"Backtest su {len(paths)} file: {len(backtest.triangles):,} triangoli, latenze {latencies} ms")
+
+    start = time.perf_counter()
+    backtest.run(read_recording(paths), args.step / 1000)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Rigiocati {backtest.updates:,} aggiornamenti con {backtest.evaluations:,} valutazioni "
+                f"in {elapsed:.1f}s")
+
+    print_report(backtest, args.top)
+    if args.csv:
+        write_csv(backtest, args.csv)
+        logger.info(f"Risultati per triangolo salvati in {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Registrazione e rilettura dei messaggi bookTicker ricevuti
+Ogni riga contiene il timestamp locale di ricezione e il messaggio grezzo,
+così da poter rigiocare la sessione offline (vedi backtest.py)
+"""
+
+import gzip
+import json
+import os
+import time
+import logging
+from typing import Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+BookUpdate = Tuple[float, str, float, float, float, float]
+
+class BookRecorder:
+    """Accumula i messaggi in memoria e li scrive su file giornalieri a blocchi"""
+
+    def __init__(self, directory: str, flush_lines: int = 2000):
+        self.directory = directory
+        self.flush_lines = flush_lines
+        self._buffer: List[str] = []
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, raw_msg: str, recv_ts: float):
+        self._buffer.append(f"{recv_ts:.6f} {raw_msg}\n")
+        if len(self._buffer) >= self.flush_lines:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        path = os.path.join(self.directory, f"book_{time.strftime('%Y%m%d')}.log")
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.writelines(self._buffer)
+        except Exception as e:
+            logger.error(f"Errore scrittura registrazione book: {e}")
+        self._buffer = []
+
+def read_raw_recording(paths: Iterable[str]) -> Iterator[Tuple[float, str]]:
+    """Rilegge una o più registrazioni (anche .gz) come (ts, messaggio grezzo)"""
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                ts_str, _, raw = line.partition(' ')
+                yield float(ts_str), raw
+
+def read_recording(paths: Iterable[str]) -> Iterator[BookUpdate]:
+    """Rilegge una o più registrazioni (anche .gz) come (ts, simbolo, bid, ask, bid_qty, ask_qty)"""
+    for ts, raw in read_raw_recording(paths):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        if 'data' in data:
+            data = data['data']
+        if 's' not in data:
+            continue  # Risposte a SUBSCRIBE/UNSUBSCRIBE
+        yield (ts, data['s'], float(data['b']), float(data['a']),
+               float(data['B']), float(data['A']))
@@ -19,13 +19,26 @@ DRY_RUN_MODE = True
 # BUDGET MASSIMO PER TRADE (in USDT)
 TRADE_BUDGET_USDT = Decimal("10")
 
+# SALDI IN CACHE NEL PROCESSO DI TRADING: limite per asset senza una chiamata di rete per trade
+BALANCE_CACHE_TTL = 60  # Secondi dopo i quali i saldi vengono riletti in background
+
 # TIMEOUT PER L'ESECUZIONE DEL TRADING (secondi)
 TRADING_TIMEOUT = 30
 
+# HUB PER LA LIQUIDAZIONE D'EMERGENZA (in ordine di liquidità)
+# Usati quando l'asset da liquidare non ha una coppia diretta con l'asset di partenza
+LIQUIDATION_HUBS = ['USDT', 'BTC', 'ETH', 'BNB', 'USDC', 'FDUSD']
+
+# CODA DI PRIORITÀ DELLE OPPORTUNITÀ DA ESEGUIRE
+TRADING_QUEUE_MAX_QUOTE_AGE = 1.0  # Età massima dei prezzi di un'opportunità al momento dell'invio (secondi)
+TRADING_QUEUE_CAPACITY = 50  # Opportunità in attesa oltre le quali si scartano le meno promettenti
+
 # Configurazione WebSocket Trading
 WEBSOCKET_TRADING_ENABLED = True  # Abilita trading via WebSocket
 WEBSOCKET_TIMEOUT = 5.0  # Timeout per ordini WebSocket (secondi)
 WEBSOCKET_MAX_FAILURES = 3  # Numero massimo fallimenti prima del fallback
+WEBSOCKET_RECV_WINDOW = 5000  # recvWindow degli ordini WebSocket (millisecondi): oltre, un ordine senza risposta non può più essere eseguito
+ORDER_LOOKUP_CLOCK_MARGIN = 1.0  # Margine sullo scarto degli orologi prima di cercare un ordine rimasto senza risposta (secondi)
 WEBSOCKET_PING_INTERVAL = 20  # Intervallo ping WebSocket (secondi)
 
 # Configurazione performance
@@ -33,6 +46,29 @@ MAX_EXECUTION_TIME = 10.0  # Tempo massimo di esecuzione per trade (secondi)
 MIN_PROFIT_THRESHOLD = Decimal('0.0005')  # Profitto minimo per notifica/trade (0.05%)
 ARBITRAGE_CHECK_INTERVAL = 5  # Secondi tra i cicli di analisi del mercato
 
+# ============================================================================
+# CONFIGURAZIONE STRATEGIA (RICARICABILE A CALDO)
+# ============================================================================
+
+# Soglia, asset di partenza, commissione, budget e cooldown si ricaricano senza riavvio:
+# kill -HUP <pid> oppure, con CONFIG_RELOAD_WATCH, salvando questo file
+TRADING_FEE = Decimal("0.00075")  # Commissione per ogni trade (0.075% con sconto BNB)
+STARTING_ASSETS = {'USDT', 'USDC', 'FDUSD', 'DAI', 'TUSD', 'BTC', 'ETH', 'SOL'}  # Asset di partenza per l'analisi di arbitraggio
+OPPORTUNITY_COOLDOWN = 60  # Secondi prima di notificare di nuovo lo stesso triangolo
+OPPORTUNITY_COOLDOWN_CAPACITY = 10000  # Numero massimo di triangoli tenuti in cooldown
+OPPORTUNITY_REALERT_MARGIN = None  # Punti % di miglioramento per rinotificare durante il cooldown (None = mai)
+CONFIG_RELOAD_WATCH = True  # Ricarica automatica quando config.py viene modificato
+CONFIG_WATCH_INTERVAL = 2.0  # Intervallo di controllo della data di modifica (secondi)
+
+# ============================================================================
+# CONFIGURAZIONE SCENARI ALTERNATIVI
+# ============================================================================
+
+# Lo snapshot corrente viene rivalutato a intervalli regolari con commissioni, budget e soglie
+# alternativi, in un solo passaggio batch accanto al ciclo live (es. fee tier VIP o budget maggiori)
+SCENARIOS = []  # Lista di (commissione, budget USDT, soglia), ricaricabile a caldo, es. [(0.0009, 22, 0.0005), (0.00075, 100, 0.0005)]
+SCENARIO_INTERVAL = 60  # Secondi tra due valutazioni degli scenari (la configurazione live è sempre inclusa)
+
 # ============================================================================
 # CONFIGURAZIONE SISTEMA E PERFORMANCE
 # ============================================================================
@@ -45,8 +81,111 @@ ANALYSIS_CORES = 14 # Core per l'analisi (16 - 1 - 1)
 
 # Ottimizzazioni performance per ridurre carico CPU
 MAX_CONCURRENT_ANALYSIS = 2  # Limita analisi concorrenti
+
+# Backend di esecuzione dell'analisi: 'inline' (nel loop), 'thread', 'process', 'shared_memory'
+# (processi persistenti con book in memoria condivisa) o 'auto' (scelto da una calibrazione all'avvio)
+ANALYSIS_BACKEND = 'auto'
+ANALYSIS_BACKEND_CANDIDATES = ('inline', 'thread', 'process', 'shared_memory')  # Backend provati dalla calibrazione
+ANALYSIS_CALIBRATION_CYCLES = 3  # Cicli misurati per backend (dopo uno di riscaldamento)
 ANALYSIS_BATCH_SIZE = 200  # Dimensione batch per analisi
 PRICE_CACHE_TTL = 5  # TTL cache prezzi (secondi)
+PARTITION_REBALANCE_SKEW = 1.2  # Ribilancia gli shard se il worker più lento supera la media di questo fattore
+
+# Potatura adattiva: i triangoli che falliscono sempre allo stesso modo (liquidità, minNotional,
+# stepSize, minQty) vengono rivalutati a rotazione invece che a ogni ciclo
+PRUNING_ENABLED = True  # Attiva la potatura adattiva dei triangoli ineseguibili
+PRUNING_DEMOTE_AFTER = 20  # Cicli consecutivi di fallimento prima del declassamento
+PRUNING_RECHECK_EVERY = 10  # Un triangolo declassato viene rivalutato un ciclo ogni N
+PRUNING_LIQUIDITY_GAIN = 0.2  # Aumento relativo della quantità sulla gamba fallita che lo riattiva subito
+
+# Pre-filtro statico: i triangoli la cui prima gamba non può rispettare minQty/minNotional/stepSize
+# con SIMULATION_BUDGET_USDT a nessun prezzo non vengono inviati ai worker
+STATIC_FEASIBILITY_ENABLED = True  # Ricalcolato a ogni cambio di indice, metadati o budget
+
+# ============================================================================
+# CONFIGURAZIONE SCHEDULER ANALISI
+# ============================================================================
+
+# Un ciclo parte appena abbastanza simboli sono cambiati o dopo l'attesa massima
+SCHEDULER_MIN_CHANGED_SYMBOLS = 50  # Simboli aggiornati che avviano subito un nuovo ciclo
+SCHEDULER_MAX_DELAY = ARBITRAGE_CHECK_INTERVAL  # Attesa massima tra due cicli (secondi)
+SCHEDULER_MIN_INTERVAL = 0.05  # Pausa minima tra la fine di un ciclo e l'inizio del successivo (secondi)
+SCHEDULER_TARGET_UTILIZATION = 0.8  # Frazione di tempo dedicata all'analisi (adatta la cadenza)
+SCHEDULER_OVERRUN_FACTOR = 3.0  # Un ciclo che dura N volte la media viene considerato in overrun
+SCHEDULER_CYCLE_TIMEOUT = 30  # Limite assoluto di durata di un ciclo (secondi)
+SCHEDULER_MAX_RESULT_AGE = 2.0  # Età massima dei prezzi per processare le opportunità (secondi)
+
+# ============================================================================
+# CONFIGURAZIONE CACHE METADATI SIMBOLI
+# ============================================================================
+
+SYMBOL_CACHE_FILE = "symbol_cache.json"  # Metadati dei simboli salvati per un avvio rapido
+SYMBOL_REFRESH_INTERVAL = 900  # Intervallo di aggiornamento dell'universo dei simboli (secondi)
+
+# ============================================================================
+# CONFIGURAZIONE PROFILAZIONE
+# ============================================================================
+
+# Attivabile senza riavvio: kill -USR1 <pid> (cProfile dei cicli), kill -USR2 <pid> (tempi per fase)
+# oppure scrivendo nel file di comando righe come "cycles 5", "stages 10", "ingest 50000"
+PROFILING_OUTPUT_DIR = "profiling"  # Cartella dei file .prof e delle tracce per fase
+PROFILING_COMMAND_FILE = "profiling_command.txt"  # File di comando letto ogni secondo
+PROFILING_DEFAULT_CYCLES = 5  # Cicli profilati se il comando non specifica un numero
+PROFILING_DEFAULT_INGEST_MESSAGES = 50000  # Messaggi profilati se il comando non specifica un numero
+
+# ============================================================================
+# CONFIGURAZIONE REGISTRAZIONI OFFLINE (BACKTEST E ARCHIVIO VALUTAZIONI)
+# ============================================================================
+
+# I messaggi bookTicker ricevuti vengono salvati per il backtest offline (python backtest.py)
+BOOK_RECORDING_DIR = None  # Cartella dei file giornalieri (None = registrazione disattivata)
+BOOK_RECORDING_FLUSH_LINES = 2000  # Messaggi accumulati in memoria prima di ogni scrittura
+
+# Ogni triangolo valutato (esito, gamba fallita, profitto, tassi) viene archiviato in formato colonnare
+# compresso per la taratura offline (python archive_query.py)
+EVALUATION_ARCHIVE_DIR = None  # Cartella dei file giornalieri (None = archivio disattivato)
+EVALUATION_ARCHIVE_FLUSH_ROWS = 500000  # Righe accumulate prima di scrivere un blocco
+EVALUATION_ARCHIVE_FLUSH_INTERVAL = 60  # Secondi massimi tra due scritture
+
+# ============================================================================
+# CONFIGURAZIONE FEED MARKET DATA
+# ============================================================================
+
+# Con più feed per gruppo ogni aggiornamento arriva più volte: vince il primo (update id 'u')
+MARKET_DATA_FEEDS_PER_GROUP = 1  # Connessioni WebSocket ridondanti per ogni gruppo di simboli
+MARKET_DATA_WS_ENDPOINTS = [  # Endpoint usati a rotazione dai feed di uno stesso gruppo
+    "wss://stream.binance.com:9443/stream",
+    "wss://stream.binance.com:443/stream",
+]
+# Codifica degli stream: 'json' (<simbolo>@bookTicker) o 'sbe' (<simbolo>@bestBidAsk binario, decodificato
+# senza JSON né Decimal; richiede una chiave API Ed25519 in BINANCE_API_KEY, vedi sbe_market_data.py)
+MARKET_DATA_ENCODING = 'json'
+MARKET_DATA_SBE_ENDPOINTS = [  # Endpoint SBE usati a rotazione al posto di MARKET_DATA_WS_ENDPOINTS
+    "wss://stream-sbe.binance.com:9443/stream",
+    "wss://stream-sbe.binance.com/stream",
+]
+WS_ROTATION_INTERVAL = 23 * 3600  # Rotazione volontaria prima della disconnessione forzata a 24h (secondi)
+WS_ROTATION_STAGGER = 600  # Distanza tra le rotazioni dei feed di uno stesso gruppo (secondi)
+FEED_STATS_INTERVAL = 300  # Intervallo del report di ritardo per connessione (secondi)
+
+# Ingest conflato: ogni connessione applica solo l'ultimo aggiornamento per simbolo di ogni lotto
+INGEST_CONFLATION = False  # Attiva la conflazione dei frame in coda
+INGEST_LAG_ALERT = 1.0  # Ritardo di un lotto oltre il quale si avvisa e si sospende l'analisi (secondi)
+INGEST_LAG_RECOVER = 0.2  # Ritardo sotto il quale l'analisi riprende (secondi)
+
+# ============================================================================
+# CONFIGURAZIONE RILEVAZIONE DISTRIBUITA
+# ============================================================================
+
+# Con 'broadcaster' questo processo riceve il book e lo pubblica sul bus; i detector
+# (python detector_node.py) si dividono i triangoli e restituiscono le opportunità
+DISTRIBUTED_ROLE = None  # None = analisi locale, 'broadcaster' = analisi sui nodi detector
+DISTRIBUTED_BUS_HOST = '127.0.0.1'  # Indirizzo del bus (solo locale: il traffico non è autenticato)
+DISTRIBUTED_BUS_PORT = 7878  # Porta TCP del bus
+DISTRIBUTED_MAX_NODE_BUFFER = 8 * 1024 * 1024  # Byte in coda oltre i quali un detector lento viene disconnesso
+# Secondi senza risultati dopo i quali un detector viene considerato morto: deve superare la durata
+# massima di un ciclo più l'attesa tra due cicli, altrimenti un ciclo lento fa scollegare il nodo
+DISTRIBUTED_NODE_TIMEOUT = 2 * SCHEDULER_CYCLE_TIMEOUT
 
 # ============================================================================
 # CONFIGURAZIONE BINANCE API
@@ -58,6 +197,12 @@ BINANCE_SECRET_KEY = os.environ.get('BINANCE_SECRET_KEY', '')
 
 # URL API Binance
 BINANCE_API_URL = "https://api.binance.com"
+
+# Client REST asincrono per gli ordini (ripiego del WebSocket di trading)
+REST_POOL_SIZE = 4  # Connessioni keep-alive tenute aperte verso l'API
+REST_REQUEST_TIMEOUT = 2.0  # Tempo massimo per una richiesta d'ordine (secondi)
+REST_KEEPALIVE_INTERVAL = 30  # Intervallo dei ping che mantengono vive le connessioni (secondi)
+REST_RECV_WINDOW = 5000  # recvWindow degli ordini firmati (millisecondi)
 BINANCE_TESTNET_URL = "https://testnet.binance.vision"
 
 # Usa testnet se DRY_RUN_MODE è True
@@ -109,6 +254,7 @@ def print_config_summary():
     print(f"Timeout Trading: {TRADING_TIMEOUT} secondi")
     print(f"Core Totali: {TOTAL_CORES}")
     print(f"Core Analisi: {ANALYSIS_CORES}")
+    print(f"Backend Analisi: {ANALYSIS_BACKEND}")
     print(f"Core Trading: {TRADING_CORES}")
     print("==========================================")
     
@@ -0,0 +1,164 @@
+"""
+Ricarica a caldo dei parametri di strategia
+Rilegge config.py (segnale SIGHUP o modifica del file), valida i nuovi valori e li
+applica tutti insieme al modulo config; le strutture che ne dipendono vengono
+aggiornate da un callback con l'elenco dei parametri cambiati. Le connessioni
+di market data restano aperte.
+"""
+
+import asyncio
+import os
+import runpy
+import signal
+import logging
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Parametri applicati senza riavvio (gli altri, se cambiati, vengono solo segnalati)
+RELOADABLE = (
+    'MIN_PROFIT_THRESHOLD', 'STARTING_ASSETS', 'TRADING_FEE', 'SIMULATION_BUDGET_USDT', 'TRADE_BUDGET_USDT',
+    'OPPORTUNITY_COOLDOWN', 'OPPORTUNITY_REALERT_MARGIN', 'SCENARIOS'
+)
+
+def _as_decimal(value: Any) -> Decimal:
+    if isinstance(value, bool) or not isinstance(value, (Decimal, int, float, str)):
+        raise ValueError(f"valore non numerico: {value!r}")
+    number = Decimal(str(value))
+    if not number.is_finite():
+        raise ValueError(f"valore non finito: {value!r}")
+    return number
+
+def validate_strategy(values: Dict[str, Any]) -> List[str]:
+    """Errori dei parametri ricaricabili (lista vuota se validi)"""
+    errors = []
+    checks = {
+        'MIN_PROFIT_THRESHOLD': lambda v: Decimal('0') <= _as_decimal(v) < Decimal('1'),
+        'TRADING_FEE': lambda v: Decimal('0') <= _as_decimal(v) < Decimal('0.1'),
+        'SIMULATION_BUDGET_USDT': lambda v: _as_decimal(v) > 0,
+        'TRADE_BUDGET_USDT': lambda v: _as_decimal(v) > 0,
+        'OPPORTUNITY_COOLDOWN': lambda v: _as_decimal(v) >= 0,
+        'OPPORTUNITY_REALERT_MARGIN': lambda v: v is None or _as_decimal(v) >= 0,
+        'STARTING_ASSETS': lambda v: isinstance(v, (set, frozenset, list, tuple)) and len(v) > 0
+                                     and all(isinstance(asset, str) and asset.isalnum() for asset in v),
+        'SCENARIOS': lambda v: isinstance(v, (list, tuple)) and all(
+            len(scenario) == 3 and Decimal('0') <= _as_decimal(scenario[0]) < Decimal('0.1')
+            and _as_decimal(scenario[1]) > 0 and _as_decimal(scenario[2]) >= 0 for scenario in v)
+    }
+    for name, check in checks.items():
+        if name not in values:
+            errors.append(f"{name} mancante")
+            continue
+        try:
+            if not check(values[name]):
+                errors.append(f"{name} fuori intervallo: {values[name]!r}")
+        except (TypeError, ValueError, ArithmeticError) as e:
+            errors.append(f"{name} non valido: {e}")
+    return errors
+
+def _normalize(name: str, value: Any) -> Any:
+    """Stessi tipi dei valori caricati all'avvio (Decimal per importi e soglie, set per gli asset)"""
+    if name == 'STARTING_ASSETS':
+        return set(value)
+    if name == 'SCENARIOS':
+        return [tuple(scenario) for scenario in value]
+    if name in ('MIN_PROFIT_THRESHOLD', 'TRADING_FEE', 'SIMULATION_BUDGET_USDT', 'TRADE_BUDGET_USDT'):
+        return _as_decimal(value)
+    return value
+
+def _settings(namespace: Dict[str, Any]) -> Dict[str, Any]:
+    """Solo le costanti (nomi maiuscoli) di un namespace di configurazione"""
+    return {name: value for name, value in namespace.items() if name.isupper() and not callable(value)}
+
+class ConfigReloader:
+    """Rilettura, validazione e applicazione atomica dei parametri ricaricabili"""
+
+    def __init__(self, on_change: Callable[[Dict[str, tuple]], None], path: Optional[str] = None):
+        self.on_change = on_change  # Riceve {nome: (vecchio, nuovo)} dopo l'applicazione
+        self.path = path or config.__file__
+        self._mtime = self._current_mtime()
+        # Valori del file all'ultima lettura: i parametri non ricaricabili si confrontano con questi,
+        # non con config (che a runtime può differire, es. AUTO_TRADE_ENABLED disattivato dalla validazione)
+        try:
+            self._file_settings = _settings(runpy.run_path(self.path))
+        except Exception:
+            self._file_settings = _settings(vars(config))
+        self.reloads = 0
+        self.rejected = 0
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def reload(self, reason: str = 'richiesta') -> Dict[str, tuple]:
+        """
+        Rilegge il file e applica i parametri ricaricabili cambiati, tutti o nessuno.
+        Restituisce i parametri applicati ({nome: (vecchio, nuovo)}).
+        """
+        try:
+            namespace = runpy.run_path(self.path)
+        except Exception as e:
+            self.rejected += 1
+            logger.error(f"❌ Ricarica configurazione ({reason}) fallita, file non valido: {e}")
+            return {}
+
+        errors = validate_strategy(namespace)
+        if errors:
+            self.rejected += 1
+            logger.error(f"❌ Ricarica configurazione ({reason}) rifiutata: " + "; ".join(errors))
+            return {}
+
+        changes = {}
+        for name in RELOADABLE:
+            new_value = _normalize(name, namespace[name])
+            old_value = getattr(config, name)
+            if new_value != old_value:
+                changes[name] = (old_value, new_value)
+        # Gli altri parametri sono letti solo all'avvio (connessioni, pool, feed)
+        settings = _settings(namespace)
+        restart_needed = sorted(name for name, value in settings.items()
+                                if name not in RELOADABLE and self._file_settings.get(name, value) != value)
+        self._file_settings = settings
+        if restart_needed:
+            logger.warning(f"⚠️ Parametri modificati che richiedono un riavvio: {', '.join(restart_needed)}")
+        if not changes:
+            logger.info(f"🔁 Ricarica configurazione ({reason}): nessun parametro di strategia modificato")
+            return {}
+
+        # Tutti i valori vengono sostituiti senza cedere il controllo al loop: nessun ciclo vede un insieme misto
+        for name, (_, new_value) in changes.items():
+            setattr(config, name, new_value)
+        self.reloads += 1
+        logger.info(f"🔁 Configurazione ricaricata ({reason}): " +
+                    ", ".join(f"{name} {_describe(old)} → {_describe(new)}" for name, (old, new) in changes.items()))
+        try:
+            self.on_change(changes)
+        except Exception as e:
+            logger.error(f"Errore nell'applicazione della nuova configurazione: {e}", exc_info=True)
+        return changes
+
+    def install_signal_handler(self, loop: asyncio.AbstractEventLoop):
+        """SIGHUP: ricarica immediata (solo sistemi POSIX)"""
+        if not hasattr(signal, 'SIGHUP'):
+            return
+        loop.add_signal_handler(signal.SIGHUP, self.reload, 'SIGHUP')
+
+    async def watch_file(self, interval: float = 2.0):
+        """Ricarica quando cambia la data di modifica del file"""
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._current_mtime()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            self.reload('file modificato')
+
+def _describe(value: Any) -> str:
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(value)) + '}'
+    return str(value)
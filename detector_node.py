@@ -0,0 +1,276 @@
+"""
+Nodo detector della rilevazione distribuita
+Si collega al bus del broadcaster (arbitraggio.py con DISTRIBUTED_ROLE = 'broadcaster'),
+mantiene una copia locale del top-of-book e valuta con i propri processi di analisi
+solo la quota di triangoli assegnata, restituendo le opportunità al broadcaster.
+Ogni nodo aggiunto riduce la quota degli altri: a parità di durata del ciclo
+aumenta il numero di triangoli valutati.
+
+Esempio (più nodi sulla stessa macchina del broadcaster):
+    python detector_node.py --cores 4 &
+    python detector_node.py --cores 4 &
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import config
+from analysis_results import merge_counters, new_counters, iter_opportunities
+from analysis_scheduler import AnalysisScheduler
+from static_feasibility import StaticFeasibilityFilter
+from arbitraggio import find_arbitrage_worker
+from distributed_bus import (
+    MSG_ASSIGN, MSG_QUOTES, MSG_RESULTS, MSG_STRATEGY, MSG_UNIVERSE,
+    decode_quotes, encode_json, node_share, read_frame, write_frame
+)
+from symbol_cache import decode_symbol_map
+from top_of_book import TopOfBook
+from triangle_index import TriangleIndex
+from triangle_pruning import TrianglePruner
+from work_partition import WorkPartitioner
+
+logger = logging.getLogger(__name__)
+
+class _NodeShare:
+    """Quota di triangoli del nodo, con l'interfaccia dell'indice usata da WorkPartitioner"""
+
+    def __init__(self, version: int, triangles: List[tuple]):
+        self.version = version
+        self._triangles = triangles
+
+    def __len__(self) -> int:
+        return len(self._triangles)
+
+    def triangles(self) -> List[tuple]:
+        return self._triangles
+
+class DetectorNode:
+    """Copia locale di universo e book, cicli di analisi sulla quota assegnata"""
+
+    def __init__(self, host: str, port: int, executor: ProcessPoolExecutor, num_workers: int):
+        self.host = host
+        self.port = port
+        self.executor = executor
+        self.num_workers = num_workers
+        self.scheduler = AnalysisScheduler()
+        self.partitioner = WorkPartitioner()
+        self.pruner = (TrianglePruner(config.PRUNING_DEMOTE_AFTER, config.PRUNING_RECHECK_EVERY, config.PRUNING_LIQUIDITY_GAIN)
+                       if config.PRUNING_ENABLED else None)
+        self.static_filter = StaticFeasibilityFilter() if config.STATIC_FEASIBILITY_ENABLED else None
+
+        self.version = 0  # Versione dell'universo del broadcaster (0 = non ancora ricevuto)
+        self.symbols: List[str] = []
+        self.symbol_info_map: Dict[str, Dict] = {}
+        # Parametri di strategia inviati dal broadcaster (seguono le ricariche della sua configurazione)
+        self.starting_assets = frozenset(config.STARTING_ASSETS)
+        self.trading_fee = config.TRADING_FEE
+        self.min_profit_threshold = config.MIN_PROFIT_THRESHOLD
+        self.simulation_budget = config.SIMULATION_BUDGET_USDT
+        self.prices = TopOfBook(())
+        self.index: Optional[TriangleIndex] = None
+        self.node_index = 0
+        self.node_count = 1
+        self.share: Optional[_NodeShare] = None
+        self._share_version = 0
+        self.last_seq = 0
+
+    def _apply_universe(self, universe: Dict):
+        self.version = universe['version']
+        self.symbols = universe['symbols']
+        self.symbol_info_map = decode_symbol_map(universe['symbol_info'])
+        self.prices = TopOfBook(self.symbols)
+        self.index = TriangleIndex(self.symbol_info_map, self.starting_assets)
+        self._update_share()
+
+    def _apply_strategy(self, strategy: Dict):
+        self.trading_fee = Decimal(strategy['trading_fee'])
+        self.min_profit_threshold = Decimal(strategy['min_profit_threshold'])
+        self.simulation_budget = Decimal(strategy['simulation_budget'])
+        starting_assets = frozenset(strategy['starting_assets'])
+        if starting_assets == self.starting_assets:
+            return
+        self.starting_assets = starting_assets
+        if self.index is not None:
+            added, removed = self.index.set_starting_assets(starting_assets)
+            logger.info(f"🔁 Asset di partenza aggiornati: triangoli +{added:,} / -{removed:,}")
+            self._update_share()
+
+    def _update_share(self):
+        if self.index is None:
+            return
+        self._share_version += 1
+        self.share = _NodeShare(self._share_version, node_share(self.index.triangles(), self.node_index, self.node_count))
+        logger.info(f"📐 Nodo {self.node_index + 1}/{self.node_count}: {len(self.share):,} triangoli su {len(self.index):,}")
+
+    def _apply_quotes(self, payload: bytes):
+        version, seq, ts, records = decode_quotes(payload)
+        if version != self.version:
+            return  # Universo non ancora allineato: arriverà un nuovo snapshot completo
+        self.last_seq = seq
+        symbols, prices, scheduler = self.symbols, self.prices, self.scheduler
+        for idx, bid, ask, bid_qty, ask_qty in records:
+            symbol = symbols[idx]
+            prices.update(symbol, bid, ask, bid_qty, ask_qty, ts)
+            scheduler.mark_updated(symbol)
+
+    async def _receive(self, reader: asyncio.StreamReader):
+        while True:
+            msg_type, payload = await read_frame(reader)
+            if msg_type == MSG_QUOTES:
+                self._apply_quotes(payload)
+            elif msg_type == MSG_UNIVERSE:
+                self._apply_universe(json.loads(payload))
+            elif msg_type == MSG_STRATEGY:
+                self._apply_strategy(json.loads(payload))
+            elif msg_type == MSG_ASSIGN:
+                assignment = json.loads(payload)
+                self.node_index, self.node_count = assignment['node_index'], assignment['node_count']
+                self._update_share()
+
+    async def _run_cycle(self, writer: asyncio.StreamWriter, changed_symbols):
+        """Un ciclo di analisi sulla quota del nodo, come main_loop ma con i risultati inviati sul bus"""
+        generation = self.scheduler.begin_cycle()
+        start_time = time.perf_counter()
+        current_prices = self.prices.snapshot()
+        snapshot_time = time.time()
+        version, seq, share = self.version, self.last_seq, self.share
+        existing_pairs = self.index.pairs_snapshot()
+        # Il filtro statico segue quota, metadati e budget ricevuti dal broadcaster
+        work, first_leg_limits = share, None
+        if self.static_filter is not None:
+            if self.static_filter.refresh(share, self.symbol_info_map, existing_pairs, self.simulation_budget):
+                logger.info(f"🧮 Filtro statico: {len(self.static_filter):,} triangoli eseguibili su {len(share):,}")
+            work, first_leg_limits = self.static_filter, self.static_filter.first_leg_limits
+        shards = self.partitioner.shards(work, self.num_workers)
+        pruning_states = [None] * len(shards)
+        if self.pruner is not None:
+            pruning_states = self.pruner.states(shards)
+            self.pruner.promote_on_liquidity(changed_symbols, current_prices)
+
+        worker_futures = [
+            self.executor.submit(find_arbitrage_worker, worker_id, current_prices, self.symbol_info_map,
+                                 self.min_profit_threshold, self.trading_fee, self.simulation_budget, shard, existing_pairs,
+                                 False, False, pruning_states[worker_id], first_leg_limits)
+            for worker_id, shard in enumerate(shards)
+        ]
+        counters = new_counters()
+        shard_elapsed = [None] * len(shards)
+        opportunities = []
+        complete = True
+        try:
+            for future in asyncio.as_completed([asyncio.wrap_future(f) for f in worker_futures],
+                                               timeout=self.scheduler.current_timeout()):
+                shard_id, packed, shard_counters, elapsed, _, _, pruning_state = await future
+                merge_counters(counters, shard_counters)
+                if pruning_state is not None:
+                    self.pruner.record(shard_id, pruning_state, current_prices, existing_pairs)
+                shard_elapsed[shard_id] = elapsed
+                shard = shards[shard_id]
+                for position, profit_perc, _ in iter_opportunities(packed):
+                    opportunities.append(list(shard[position]) + [profit_perc])
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Timeout nell'analisi del ciclo {generation}")
+            self.scheduler.abandon(worker_futures)
+            complete = False
+
+        self.partitioner.record(shard_elapsed)
+        if self.pruner is not None:
+            self.pruner.end_cycle()
+        duration = time.perf_counter() - start_time
+        self.scheduler.end_cycle(duration)
+        write_frame(writer, MSG_RESULTS, encode_json({
+            'version': version,
+            'seq': seq,
+            'snapshot_time': snapshot_time,
+            'cycle_ms': duration * 1000,
+            'triangles': len(share),
+            'complete': complete,
+            'counters': counters.tolist(),
+            'opportunities': opportunities
+        }))
+        await writer.drain()
+        return duration, len(opportunities)
+
+    async def _send_idle_results(self, writer: asyncio.StreamWriter):
+        """
+        Risultati vuoti di un nodo senza triangoli (più nodi che gruppi, o universo non ancora ricevuto):
+        il broadcaster scollega i detector silenziosi, e una riassegnazione non darebbe loro lavoro
+        """
+        self.scheduler.begin_cycle()  # Il ciclo successivo parte dopo l'attesa massima, non subito
+        write_frame(writer, MSG_RESULTS, encode_json({
+            'version': self.version,
+            'seq': self.last_seq,
+            'snapshot_time': time.time(),
+            'cycle_ms': 0.0,
+            'triangles': 0,
+            'complete': True,
+            'counters': new_counters().tolist(),
+            'opportunities': []
+        }))
+        await writer.drain()
+
+    async def _analysis_loop(self, writer: asyncio.StreamWriter):
+        cycles, busy, found = 0, 0.0, 0
+        last_report = time.monotonic()
+        while True:
+            changed_symbols = await self.scheduler.wait_for_next_cycle()
+            if not self.share:
+                await self._send_idle_results(writer)
+                continue
+            duration, opportunities = await self._run_cycle(writer, changed_symbols)
+            cycles += 1
+            busy += duration
+            found += opportunities
+            if time.monotonic() - last_report >= 60:
+                logger.info(f"Nodo {self.node_index + 1}/{self.node_count}: {cycles} cicli su {len(self.share):,} triangoli | "
+                            f"Media: {busy / cycles * 1000:.1f} ms | Opportunità: {found}"
+                            + (f" | Declassati: {len(self.pruner):,}" if self.pruner is not None else ""))
+                cycles, busy, found = 0, 0.0, 0
+                last_report = time.monotonic()
+
+    async def run(self):
+        """Connessione al bus con riconnessione automatica"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logger.warning(f"Bus {self.host}:{self.port} non raggiungibile ({e}), nuovo tentativo tra 2s")
+                await asyncio.sleep(2)
+                continue
+            logger.info(f"🔌 Collegato al broadcaster {self.host}:{self.port}")
+            analysis = asyncio.create_task(self._analysis_loop(writer))
+            try:
+                await self._receive(reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("🔌 Connessione al broadcaster chiusa")
+            finally:
+                analysis.cancel()
+                writer.close()
+            # Alla riconnessione universo, quota e book vengono inviati di nuovo
+            self.version = 0
+            self.share = None
+            await asyncio.sleep(1)
+
+async def run_node(host: str, port: int, cores: int):
+    with ProcessPoolExecutor(max_workers=cores) as executor:
+        await DetectorNode(host, port, executor, cores).run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Nodo detector della rilevazione distribuita")
+    parser.add_argument('--host', default=config.DISTRIBUTED_BUS_HOST)
+    parser.add_argument('--port', type=int, default=config.DISTRIBUTED_BUS_PORT)
+    parser.add_argument('--cores', type=int, default=config.ANALYSIS_CORES, help="Processi di analisi del nodo")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_node(args.host, args.port, args.cores))
+    except KeyboardInterrupt:
+        logger.info("Nodo detector interrotto manualmente.")
+
+if __name__ == "__main__":
+    main()
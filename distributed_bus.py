@@ -0,0 +1,252 @@
+"""
+Bus TCP locale per la rilevazione distribuita su più nodi
+Il nodo broadcaster (arbitraggio.py con DISTRIBUTED_ROLE = 'broadcaster') pubblica
+metadati dei simboli e variazioni compatte del top-of-book; ogni detector
+(detector_node.py) valuta la propria quota di triangoli e restituisce le opportunità.
+
+Frame: tipo (uint8) + lunghezza (uint32 LE) + payload.
+  UNIVERSE  JSON: versione, simboli in ordine di indice, metadati (formato della cache)
+  STRATEGY  JSON: asset di partenza, fee, soglia di profitto, budget di simulazione (inviato prima
+            dell'universo e di nuovo a ogni ricarica della configurazione)
+  ASSIGN    JSON: indice del nodo e numero di nodi attivi
+  QUOTES    versione universo (uint32), sequenza (uint64), istante (double), poi
+            record (indice simbolo uint16, bid, ask, bid_qty, ask_qty double)
+  RESULTS   JSON dal detector: sequenza e istante dello snapshot, durata, triangoli valutati, opportunità
+"""
+
+import asyncio
+import json
+import struct
+import time
+import logging
+from itertools import groupby
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from symbol_cache import encode_symbol_map
+
+logger = logging.getLogger(__name__)
+
+MSG_UNIVERSE = 1
+MSG_ASSIGN = 2
+MSG_QUOTES = 3
+MSG_RESULTS = 4
+MSG_STRATEGY = 5
+
+_FRAME = struct.Struct('<BI')
+_QUOTES_HEADER = struct.Struct('<IQd')
+_QUOTE = struct.Struct('<Hdddd')
+
+QuoteRecord = Tuple[int, float, float, float, float]
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    header = await reader.readexactly(_FRAME.size)
+    msg_type, length = _FRAME.unpack(header)
+    return msg_type, await reader.readexactly(length)
+
+def write_frame(writer: asyncio.StreamWriter, msg_type: int, payload: bytes):
+    """Scrittura non bloccante: il controllo del buffer è a carico del chiamante"""
+    writer.write(_FRAME.pack(msg_type, len(payload)) + payload)
+
+def encode_json(data: Dict) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def encode_quotes(version: int, seq: int, ts: float, records: Iterable[QuoteRecord]) -> bytes:
+    parts = [_QUOTES_HEADER.pack(version, seq, ts)]
+    parts.extend(_QUOTE.pack(*record) for record in records)
+    return b''.join(parts)
+
+def decode_quotes(payload: bytes) -> Tuple[int, int, float, Iterator[QuoteRecord]]:
+    version, seq, ts = _QUOTES_HEADER.unpack_from(payload)
+    return version, seq, ts, _QUOTE.iter_unpack(memoryview(payload)[_QUOTES_HEADER.size:])
+
+def node_share(triangles: List[Tuple[str, str, str]], node_index: int, node_count: int) -> List[Tuple[str, str, str]]:
+    """
+    Quota di triangoli di un nodo. I triangoli (ordinati) sono raggruppati per prima gamba
+    come in WorkPartitioner e i gruppi assegnati al nodo meno carico: ogni nodo calcola
+    la stessa ripartizione in modo indipendente, senza coordinamento.
+    """
+    if node_count <= 1:
+        return list(triangles)
+    groups = [list(members) for _, members in groupby(triangles, key=lambda t: (t[0], t[1]))]
+    loads = [0] * node_count
+    owner = []
+    for members in sorted(groups, key=len, reverse=True):
+        target = loads.index(min(loads))
+        loads[target] += len(members)
+        owner.append((target, members))
+    share = [t for target, members in owner if target == node_index for t in members]
+    share.sort()
+    return share
+
+class _DetectorLink:
+    """Connessione di un detector con le sue statistiche"""
+
+    def __init__(self, node_id: int, peer: str, writer: asyncio.StreamWriter):
+        self.node_id = node_id
+        self.peer = peer
+        self.writer = writer
+        self.cycles = 0
+        self.triangles = 0  # Triangoli valutati nell'ultimo ciclo
+        self.cycle_ms_sum = 0.0
+        self.opportunities = 0
+        self.last_lag_ms = 0.0  # Ritardo tra lo snapshot del detector e l'arrivo dei risultati
+
+class BookBroadcaster:
+    """Server del bus: distribuisce universo e book ai detector e ne raccoglie i risultati"""
+
+    def __init__(self, host: str, port: int, on_results: Callable[[int, Dict], Awaitable[None]],
+                 max_node_buffer: int = 8 * 1024 * 1024, node_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.on_results = on_results
+        self.max_node_buffer = max_node_buffer
+        self.node_timeout = node_timeout
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._links: Dict[int, _DetectorLink] = {}
+        self._next_node_id = 0
+
+        self.version = 0
+        self.seq = 0
+        self._universe_frame = b''
+        self._strategy_frame = b''
+        self._symbol_index: Dict[str, int] = {}
+        self._prices = None
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.disconnected_slow = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"📡 Bus distribuito in ascolto su {self.host}:{self.port}")
+
+    def set_universe(self, symbol_info_map: Dict[str, Dict], prices):
+        """Pubblica una nuova versione dell'universo: i detector ricostruiscono indice e book"""
+        self.version += 1
+        symbols = sorted(symbol_info_map)
+        self._symbol_index = {symbol: idx for idx, symbol in enumerate(symbols)}
+        self._prices = prices
+        self._universe_frame = encode_json({
+            'version': self.version,
+            'symbols': symbols,
+            'symbol_info': encode_symbol_map(symbol_info_map)
+        })
+        for link in list(self._links.values()):
+            self._send_universe(link)
+
+    def set_strategy(self, starting_assets: Iterable[str], trading_fee, min_profit_threshold, simulation_budget):
+        """
+        Pubblica i parametri di strategia: i detector li applicano dal ciclo successivo
+        (un cambio di asset di partenza riradica l'indice senza ricostruire il book)
+        """
+        self._strategy_frame = encode_json({
+            'starting_assets': sorted(starting_assets),
+            'trading_fee': str(trading_fee),
+            'min_profit_threshold': str(min_profit_threshold),
+            'simulation_budget': str(simulation_budget)
+        })
+        for link in list(self._links.values()):
+            self._send(link, MSG_STRATEGY, self._strategy_frame)
+
+    def publish(self, symbols: Iterable[str], ts: float):
+        """Invia a tutti i detector il book corrente dei simboli indicati"""
+        if not self._links:
+            return
+        records = self._records(symbols)
+        if not records:
+            return
+        self.seq += 1
+        payload = encode_quotes(self.version, self.seq, ts, records)
+        for link in list(self._links.values()):
+            self._send(link, MSG_QUOTES, payload)
+
+    def _records(self, symbols: Iterable[str]) -> List[QuoteRecord]:
+        records = []
+        index, prices = self._symbol_index, self._prices
+        for symbol in symbols:
+            idx = index.get(symbol)
+            view = prices.get(symbol) if idx is not None else None
+            if view is not None:
+                records.append((idx,) + view.as_floats())
+        return records
+
+    def _send(self, link: _DetectorLink, msg_type: int, payload: bytes):
+        transport = link.writer.transport
+        if transport.is_closing():
+            return
+        # Un detector che non legge non deve far crescere la memoria: si riconnetterà con uno snapshot completo
+        if transport.get_write_buffer_size() > self.max_node_buffer:
+            logger.warning(f"⚠️ Detector {link.node_id} ({link.peer}) troppo lento: disconnesso")
+            self.disconnected_slow += 1
+            transport.close()
+            return
+        write_frame(link.writer, msg_type, payload)
+        self.frames_sent += 1
+        self.bytes_sent += len(payload) + _FRAME.size
+
+    def _send_universe(self, link: _DetectorLink):
+        self._send(link, MSG_UNIVERSE, self._universe_frame)
+        # Snapshot completo del book: il detector parte allineato senza attendere gli aggiornamenti
+        self.seq += 1
+        self._send(link, MSG_QUOTES, encode_quotes(self.version, self.seq, time.time(), self._records(self._symbol_index)))
+
+    def _reassign(self):
+        """Ripartisce i triangoli tra i detector connessi (in ordine di connessione)"""
+        count = len(self._links)
+        for node_index, link in enumerate(sorted(self._links.values(), key=lambda l: l.node_id)):
+            self._send(link, MSG_ASSIGN, encode_json({'node_index': node_index, 'node_count': count}))
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        node_id = self._next_node_id
+        self._next_node_id += 1
+        peer = str(writer.get_extra_info('peername'))
+        link = _DetectorLink(node_id, peer, writer)
+        self._links[node_id] = link
+        logger.info(f"🔌 Detector {node_id} connesso da {peer} ({len(self._links)} nodi attivi)")
+        if self._strategy_frame:
+            self._send(link, MSG_STRATEGY, self._strategy_frame)
+        if self._universe_frame:
+            self._send_universe(link)
+        self._reassign()
+        try:
+            while True:
+                # Ogni detector invia i risultati a ogni ciclo (vuoti se non ha triangoli): il silenzio oltre
+                # la durata massima di un ciclo indica un nodo bloccato o morto
+                msg_type, payload = await asyncio.wait_for(read_frame(reader), self.node_timeout)
+                if msg_type != MSG_RESULTS:
+                    continue
+                result = json.loads(payload)
+                if result.get('version') != self.version:
+                    continue  # Calcolato su un universo superato
+                link.cycles += 1
+                link.triangles = result['triangles']
+                link.cycle_ms_sum += result['cycle_ms']
+                link.opportunities += len(result['opportunities'])
+                link.last_lag_ms = (time.time() - result['snapshot_time']) * 1000
+                await self.on_results(node_id, result)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Detector {node_id} ({peer}) senza risultati da {self.node_timeout:.0f}s: disconnesso")
+        except Exception as e:
+            logger.error(f"Errore sul bus con il detector {node_id}: {e}")
+        finally:
+            del self._links[node_id]
+            writer.close()
+            logger.warning(f"🔌 Detector {node_id} disconnesso ({len(self._links)} nodi attivi)")
+            self._reassign()
+
+    def report(self) -> str:
+        """Copertura e cadenza per nodo dall'ultimo report (poi azzera i contatori di periodo)"""
+        coverage = sum(link.triangles for link in self._links.values())
+        lines = [f"Bus distribuito: {len(self._links)} detector | Copertura: {coverage:,} triangoli per ciclo | "
+                 f"Inviati: {self.frames_sent:,} frame ({self.bytes_sent / 1048576:.1f} MB) | "
+                 f"Disconnessi (lenti): {self.disconnected_slow}"]
+        for link in sorted(self._links.values(), key=lambda l: l.node_id):
+            avg_ms = link.cycle_ms_sum / link.cycles if link.cycles else 0.0
+            lines.append(f"  - Detector {link.node_id} ({link.peer}): {link.triangles:,} triangoli | {link.cycles} cicli, "
+                         f"media {avg_ms:.1f} ms | Opportunità: {link.opportunities} | Ritardo risultati: {link.last_lag_ms:.0f} ms")
+            link.cycles = link.opportunities = 0
+            link.cycle_ms_sum = 0.0
+        self.frames_sent = self.bytes_sent = 0
+        return "\n".join(lines)
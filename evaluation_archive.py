@@ -0,0 +1,221 @@
+"""
+Archivio colonnare compresso delle valutazioni dei triangoli
+I worker di analisi registrano per ogni triangolo valutato esito, gamba fallita,
+profitto, tassi di conversione delle gambe e, per ogni gamba raggiunta (compresa quella
+fallita), prezzo del book e quantità esposta; un thread dedicato accumula i cicli
+e li scrive a blocchi, una colonna zlib per campo, così da non rallentare la rilevazione.
+
+Formato di un blocco: MAGIC, lunghezza dell'intestazione (uint32 LE), intestazione JSON
+(righe, byteorder, dizionario degli asset, [nome, typecode, byte compressi] per colonna),
+poi i dati compressi delle colonne nello stesso ordine. Vedi archive_query.py per le interrogazioni.
+"""
+
+import json
+import math
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+import logging
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TCA1'
+_HEADER_SIZE = struct.Struct('<I')
+
+# Esiti di una valutazione (l'ordine non deve cambiare: è il codice salvato su disco)
+STATUSES = ('EVALUATED', 'FAIL_NO_DATA', 'FAIL_STEP_SIZE', 'FAIL_MIN_QTY', 'FAIL_LIQUIDITY', 'FAIL_MIN_NOTIONAL', 'UNKNOWN')
+STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+# Colonne del file nell'ordine di scrittura
+COLUMNS = (
+    ('cycle', 'q'), ('ts', 'd'),
+    ('asset_a', 'H'), ('asset_b', 'H'), ('asset_c', 'H'),
+    ('status', 'B'), ('failed_leg', 'B'), ('profit_perc', 'd'),
+    ('rate1', 'd'), ('rate2', 'd'), ('rate3', 'd'),
+    ('price1', 'd'), ('qty1', 'd'), ('price2', 'd'), ('qty2', 'd'), ('price3', 'd'), ('qty3', 'd')
+)
+# Colonne di prezzo e quantità esposta, nell'ordine delle righe di EvaluationColumns.quotes
+QUOTE_COLUMNS = ('price1', 'qty1', 'price2', 'qty2', 'price3', 'qty3')
+
+NAN = math.nan
+
+class EvaluationColumns:
+    """Valutazioni di uno shard raccolte dal worker (una riga per triangolo)"""
+    __slots__ = ('position', 'status', 'failed_leg', 'profit_perc', 'rates', 'quotes')
+
+    def __init__(self):
+        self.position = array('I')
+        self.status = array('B')
+        self.failed_leg = array('B')  # 1-3 per i fallimenti di simulazione, 0 altrimenti
+        self.profit_perc = array('d')
+        self.rates = array('d')  # Tre tassi per riga, NaN per le gambe non raggiunte
+        # Prezzo e quantità esposta per gamba (sei valori per riga), NaN per le gambe non raggiunte
+        self.quotes = array('d')
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def add_failure(self, position: int, status: str, leg: int, rate1=NAN, rate2=NAN, quotes: Sequence[float] = ()):
+        """quotes: prezzo e quantità delle gambe raggiunte, fallita compresa (vedi analysis_results.leg_quotes)"""
+        self.position.append(position)
+        self.status.append(STATUS_CODES[status])
+        self.failed_leg.append(leg)
+        self.profit_perc.append(NAN)
+        self.rates.extend((float(rate1), float(rate2), NAN))
+        self.quotes.extend(quotes)
+        self.quotes.extend((NAN,) * (len(QUOTE_COLUMNS) - len(quotes)))
+
+    def add_result(self, position: int, profit_perc, rate1, rate2, rate3, quotes: Sequence[float]):
+        self.position.append(position)
+        self.status.append(0)
+        self.failed_leg.append(0)
+        self.profit_perc.append(float(profit_perc))
+        self.rates.extend((float(rate1), float(rate2), float(rate3)))
+        self.quotes.extend(quotes)
+
+class _Block:
+    """Righe in attesa di scrittura con il proprio dizionario degli asset"""
+
+    def __init__(self):
+        self.assets: Dict[str, int] = {}
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns['cycle'])
+
+    def append(self, cycle: int, ts: float, triangles: Sequence[Tuple[str, str, str]], evaluations: EvaluationColumns):
+        rows = len(evaluations)
+        cols = self.columns
+        codes = self.assets
+        asset_a, asset_b, asset_c = cols['asset_a'], cols['asset_b'], cols['asset_c']
+        for position in evaluations.position:
+            a, b, c = triangles[position]
+            asset_a.append(codes.setdefault(a, len(codes)))
+            asset_b.append(codes.setdefault(b, len(codes)))
+            asset_c.append(codes.setdefault(c, len(codes)))
+        cols['cycle'].extend(array('q', (cycle,)) * rows)
+        cols['ts'].extend(array('d', (ts,)) * rows)
+        cols['status'].extend(evaluations.status)
+        cols['failed_leg'].extend(evaluations.failed_leg)
+        cols['profit_perc'].extend(evaluations.profit_perc)
+        cols['rate1'].extend(evaluations.rates[0::3])
+        cols['rate2'].extend(evaluations.rates[1::3])
+        cols['rate3'].extend(evaluations.rates[2::3])
+        width = len(QUOTE_COLUMNS)
+        for offset, name in enumerate(QUOTE_COLUMNS):
+            cols[name].extend(evaluations.quotes[offset::width])
+
+    def encode(self) -> bytes:
+        blobs = [zlib.compress(self.columns[name].tobytes()) for name, _ in COLUMNS]
+        header = json.dumps({
+            'rows': len(self),
+            'byteorder': sys.byteorder,
+            'assets': list(self.assets),  # I dizionari mantengono l'ordine di inserimento = codice
+            'columns': [[name, typecode, len(blob)] for (name, typecode), blob in zip(COLUMNS, blobs)]
+        }).encode('utf-8')
+        return MAGIC + _HEADER_SIZE.pack(len(header)) + header + b''.join(blobs)
+
+class EvaluationArchive:
+    """Scrittura in background: submit() è un semplice accodamento, i cicli in eccesso vengono scartati"""
+
+    def __init__(self, directory: str, flush_rows: int = 500000, flush_interval: float = 60.0, queue_size: int = 64):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._block = _Block()
+        self._last_flush = time.monotonic()
+
+        self.dropped = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='evaluation-archive', daemon=True)
+        self._thread.start()
+
+    def submit(self, cycle: int, ts: float, triangles: Sequence[Tuple[str, str, str]], evaluations: EvaluationColumns):
+        """Accoda le valutazioni di uno shard (triangles: lo shard, indicizzato da position)"""
+        try:
+            self._queue.put_nowait((cycle, ts, triangles, evaluations))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._flush()
+                return
+            if item:
+                try:
+                    self._block.append(*item)
+                except Exception as e:
+                    logger.error(f"Errore archiviazione valutazioni: {e}")
+            if len(self._block) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        block, self._block = self._block, _Block()
+        if not len(block):
+            return
+        path = os.path.join(self.directory, f"evaluations_{time.strftime('%Y%m%d')}.tca")
+        try:
+            data = block.encode()
+            with open(path, 'ab') as f:
+                f.write(data)
+        except Exception as e:
+            logger.error(f"Errore scrittura archivio valutazioni: {e}")
+            return
+        self.rows_written += len(block)
+        self.bytes_written += len(data)
+
+    def close(self):
+        """Scrive le righe ancora in memoria e ferma il thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def get_stats(self) -> Dict:
+        return {
+            'rows_written': self.rows_written,
+            'bytes_written': self.bytes_written,
+            'pending': len(self._block),
+            'dropped_cycles': self.dropped
+        }
+
+def read_blocks(paths: Iterable[str], columns: Optional[Iterable[str]] = None) -> Iterator[Tuple[List[str], Dict[str, array]]]:
+    """
+    Rilegge i blocchi come (dizionario degli asset, colonne).
+    Con 'columns' vengono decompresse solo le colonne indicate, le altre vengono saltate.
+    """
+    wanted = set(columns) if columns is not None else None
+    for path in paths:
+        with open(path, 'rb') as f:
+            while True:
+                prefix = f.read(len(MAGIC) + _HEADER_SIZE.size)
+                if not prefix:
+                    break
+                if prefix[:len(MAGIC)] != MAGIC:
+                    logger.error(f"Blocco non valido in {path}: lettura interrotta")
+                    break
+                header = json.loads(f.read(_HEADER_SIZE.unpack_from(prefix, len(MAGIC))[0]))
+                block: Dict[str, array] = {}
+                for name, typecode, size in header['columns']:
+                    if wanted is not None and name not in wanted:
+                        f.seek(size, os.SEEK_CUR)
+                        continue
+                    values = array(typecode)
+                    values.frombytes(zlib.decompress(f.read(size)))
+                    if header['byteorder'] != sys.byteorder:
+                        values.byteswap()
+                    block[name] = values
+                yield header['assets'], block
@@ -0,0 +1,128 @@
+"""
+Ingest con conflazione per simbolo (semantica "ultimo valore")
+Ogni connessione svuota tutti i frame disponibili e applica solo l'ultimo
+aggiornamento di ogni stream; il ritardo di ogni lotto viene misurato e, se
+supera la soglia, l'analisi viene sospesa finché il book non torna allineato
+"""
+
+import asyncio
+import time
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from sbe_market_data import frame_symbol
+
+logger = logging.getLogger(__name__)
+
+_STREAM_KEY = '"stream"'
+
+def conflate_frames(frames: List[Union[str, bytes]]) -> List[Union[str, bytes]]:
+    """
+    Tiene solo l'ultimo frame per stream, leggendo il nome dello stream dal testo grezzo
+    (nessun json.loads per i frame scartati) o il simbolo dal frame SBE binario. I frame
+    senza stream, come le risposte a SUBSCRIBE, vengono mantenuti tutti.
+    """
+    latest: Dict[Union[str, bytes], Union[str, bytes]] = {}
+    passthrough: List[Union[str, bytes]] = []
+    for frame in frames:
+        if isinstance(frame, bytes):
+            symbol = frame_symbol(frame)
+            if symbol is None:
+                passthrough.append(frame)
+            else:
+                latest[symbol] = frame
+            continue
+        key = frame.find(_STREAM_KEY)
+        if key < 0:
+            passthrough.append(frame)
+            continue
+        start = frame.find('"', key + len(_STREAM_KEY)) + 1  # Apertura del valore, dopo i due punti
+        latest[frame[start:frame.find('"', start)]] = frame
+    if passthrough:
+        return passthrough + list(latest.values())
+    return list(latest.values())
+
+async def iter_conflated_batches(websocket) -> AsyncIterator[Tuple[List[str], int, float]]:
+    """
+    Legge la connessione in un task separato e restituisce lotti già conflati come
+    (frame da applicare, frame ricevuti, istante di ricezione del frame più vecchio).
+    Termina (o rilancia l'errore) quando la connessione si chiude.
+    """
+    frames: List[str] = []
+    ready = asyncio.Event()
+    oldest_ts = 0.0
+
+    async def receive():
+        nonlocal oldest_ts
+        async for message in websocket:
+            if not frames:
+                oldest_ts = time.time()
+            frames.append(message)
+            ready.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            if not frames:
+                if receiver.done():
+                    receiver.result()  # Rilancia l'eventuale errore della connessione
+                    return
+                ready.clear()
+                waiter = asyncio.ensure_future(ready.wait())
+                await asyncio.wait((receiver, waiter), return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                continue
+            batch, batch_ts = frames[:], oldest_ts
+            frames.clear()
+            yield conflate_frames(batch), len(batch), batch_ts
+    finally:
+        receiver.cancel()
+
+class IngestLagMonitor:
+    """Ritardo di ingest per connessione con isteresi tra allerta e rientro"""
+
+    def __init__(self, alert_lag: float, recover_lag: float):
+        self.alert_lag = alert_lag
+        self.recover_lag = recover_lag
+        self.lagging = False
+        self.episodes = 0
+        self.frames_received = 0
+        self.frames_applied = 0
+        self.max_lag = 0.0
+        self._lag_by_connection: Dict[Tuple[int, int], float] = {}
+
+    def record(self, connection_key: Tuple[int, int], lag: float, received: int, applied: int) -> Optional[bool]:
+        """
+        Registra il ritardo di un lotto.
+        Restituisce True quando scatta l'allerta, False al rientro, None se lo stato non cambia.
+        """
+        self.frames_received += received
+        self.frames_applied += applied
+        if lag > self.max_lag:
+            self.max_lag = lag
+        lags = self._lag_by_connection
+        lags[connection_key] = lag
+
+        if not self.lagging and lag > self.alert_lag:
+            self.lagging = True
+            self.episodes += 1
+            return True
+        if self.lagging and max(lags.values()) < self.recover_lag:
+            self.lagging = False
+            return False
+        return None
+
+    def forget(self, connection_key: Tuple[int, int]):
+        """Una connessione chiusa non deve tenere attiva l'allerta"""
+        self._lag_by_connection.pop(connection_key, None)
+
+    def report(self) -> str:
+        """Riepilogo dall'ultimo report (poi azzera i contatori di periodo)"""
+        conflated = self.frames_received - self.frames_applied
+        ratio = conflated / self.frames_received * 100 if self.frames_received else 0.0
+        line = (f"Ingest conflato: {self.frames_received:,} frame ricevuti, {conflated:,} superati ({ratio:.1f}%) | "
+                f"ritardo max {self.max_lag * 1000:.0f} ms | episodi di ritardo: {self.episodes}"
+                f"{' | ANALISI SOSPESA' if self.lagging else ''}")
+        self.frames_received = self.frames_applied = 0
+        self.max_lag = 0.0
+        return line
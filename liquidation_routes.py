@@ -0,0 +1,88 @@
+"""
+Tabella precalcolata delle rotte di liquidazione d'emergenza
+Per ogni coppia (asset, asset di partenza) indica la via più rapida per rientrare:
+una coppia diretta con il lato corretto oppure due passaggi attraverso un hub liquido.
+Le gambe hanno lo stesso formato dei piani d'ordine (vedi order_plan.leg_amount).
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis_results import leg_symbol
+
+Route = Tuple[Dict, ...]
+
+class LiquidationRouter:
+    """Rotte di rientro costruite una volta dai metadati dei simboli"""
+
+    def __init__(self, symbol_info_map: Dict[str, Dict], starting_assets: Iterable[str], hubs: Iterable[str]):
+        self.hubs = list(hubs)
+        existing_pairs: Dict[str, Dict[str, str]] = {}
+        currencies = set()
+        for symbol, info in symbol_info_map.items():
+            existing_pairs.setdefault(info['base'], {})[info['quote']] = symbol
+            currencies.update((info['base'], info['quote']))
+
+        self._hops: Dict[Tuple[str, str], Optional[Dict]] = {}
+        self.routes: Dict[Tuple[str, str], Route] = {}
+        self.direct = 0
+        self.two_hop = 0
+        self.unreachable = 0
+        for target in currencies.intersection(starting_assets):
+            for asset in currencies:
+                if asset == target:
+                    continue
+                route = self._find_route(asset, target, existing_pairs, symbol_info_map)
+                if route is None:
+                    self.unreachable += 1
+                    continue
+                self.routes[(asset, target)] = route
+                if len(route) == 1:
+                    self.direct += 1
+                else:
+                    self.two_hop += 1
+
+    def _hop(self, from_asset: str, to_asset: str, existing_pairs: Dict[str, Dict[str, str]],
+             symbol_info_map: Dict[str, Dict]) -> Optional[Dict]:
+        """Gamba singola da from_asset a to_asset (condivisa tra tutte le rotte che la usano)"""
+        key = (from_asset, to_asset)
+        if key not in self._hops:
+            symbol, side = leg_symbol(from_asset, to_asset, existing_pairs)
+            self._hops[key] = None if symbol is None else {
+                'symbol': symbol,
+                'side': side,
+                # BUY: si spende tutto l'asset quotato; SELL: si vende l'asset base arrotondato allo stepSize
+                'amount_field': 'quoteOrderQty' if side == 'BUY' else 'quantity',
+                'step_size': str(symbol_info_map[symbol]['stepSize']),
+                'from_asset': from_asset,
+                'to_asset': to_asset
+            }
+        return self._hops[key]
+
+    def _find_route(self, asset: str, target: str, existing_pairs: Dict[str, Dict[str, str]],
+                    symbol_info_map: Dict[str, Dict]) -> Optional[Route]:
+        direct = self._hop(asset, target, existing_pairs, symbol_info_map)
+        if direct is not None:
+            return (direct,)
+        # Hub in ordine di liquidità: il primo che collega entrambi gli asset vince
+        for hub in self.hubs:
+            if hub in (asset, target):
+                continue
+            first = self._hop(asset, hub, existing_pairs, symbol_info_map)
+            if first is None:
+                continue
+            second = self._hop(hub, target, existing_pairs, symbol_info_map)
+            if second is not None:
+                return (first, second)
+        return None
+
+    def route(self, asset: str, target: str) -> Optional[List[Dict]]:
+        route = self.routes.get((asset, target))
+        return list(route) if route is not None else None
+
+    def get_stats(self) -> Dict:
+        return {
+            'routes': len(self.routes),
+            'direct': self.direct,
+            'two_hop': self.two_hop,
+            'unreachable': self.unreachable
+        }
@@ -0,0 +1,107 @@
+"""
+Statistiche e rotazione delle connessioni market data ridondanti
+Ogni gruppo di simboli può essere servito da più connessioni: il primo arrivo di
+un update id vince, i duplicati misurano quanto ogni connessione è in ritardo
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+_SYMBOL_KEY = '"s":"'
+_UPDATE_ID_KEY = '"u":'
+
+def book_ticker_update_id(msg: str) -> Optional[Tuple[str, int]]:
+    """
+    Simbolo e update id di un messaggio bookTicker letti dal testo grezzo, senza json.loads:
+    bastano a scartare i duplicati dei feed più lenti. None se il messaggio non li contiene.
+    """
+    start = msg.find(_UPDATE_ID_KEY)
+    symbol_start = msg.find(_SYMBOL_KEY)
+    if start < 0 or symbol_start < 0:
+        return None
+    start += len(_UPDATE_ID_KEY)
+    symbol_start += len(_SYMBOL_KEY)
+    try:
+        update_id = int(msg[start:msg.find(',', start)])
+    except ValueError:
+        return None
+    return msg[symbol_start:msg.find('"', symbol_start)], update_id
+
+class FeedStats:
+    """Contatori di una singola connessione (gruppo, feed), azzerati a ogni report"""
+    __slots__ = ('connected_at', 'reconnects', 'first_arrivals', 'duplicates', 'obsolete', 'lag_sum', 'lag_max')
+
+    def __init__(self):
+        self.connected_at: Optional[float] = None
+        self.reconnects = 0
+        self.reset()
+
+    def reset(self):
+        self.first_arrivals = 0  # Aggiornamenti applicati per primi da questa connessione
+        self.duplicates = 0  # Stesso update id già applicato da un'altra connessione
+        self.obsolete = 0  # Update id più vecchio di quello già applicato
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+
+    def record_duplicate(self, lag: Optional[float]):
+        if lag is None:
+            self.obsolete += 1
+            return
+        self.duplicates += 1
+        self.lag_sum += lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+
+class FeedMonitor:
+    """Registro delle connessioni market data con rotazione programmata sfalsata"""
+
+    def __init__(self, feeds_per_group: int, rotation_interval: float, rotation_stagger: float):
+        self.feeds_per_group = feeds_per_group
+        self.rotation_interval = rotation_interval
+        self.rotation_stagger = rotation_stagger
+        self.rotations = 0
+        self._feeds: Dict[Tuple[int, int], FeedStats] = {}
+
+    def stats(self, group_index: int, feed_index: int) -> FeedStats:
+        key = (group_index, feed_index)
+        stats = self._feeds.get(key)
+        if stats is None:
+            stats = self._feeds[key] = FeedStats()
+        return stats
+
+    def connected(self, group_index: int, feed_index: int) -> FeedStats:
+        stats = self.stats(group_index, feed_index)
+        if stats.connected_at is not None:
+            stats.reconnects += 1
+        stats.connected_at = time.time()
+        return stats
+
+    def disconnected(self, group_index: int, feed_index: int):
+        self.stats(group_index, feed_index).connected_at = None
+
+    def rotation_delay(self, group_index: int, feed_index: int) -> float:
+        """
+        Secondi di vita della connessione prima della rotazione volontaria.
+        I feed dello stesso gruppo ruotano a distanza di rotation_stagger, così
+        almeno uno resta sempre connesso; i gruppi sono sfalsati di pochi secondi.
+        """
+        delay = self.rotation_interval - feed_index * self.rotation_stagger - (group_index % 30) * 2
+        return max(delay, 60.0)
+
+    def report(self) -> List[str]:
+        """Righe di riepilogo per connessione dall'ultimo report (poi azzera i contatori)"""
+        lines = []
+        for (group_index, feed_index), stats in sorted(self._feeds.items()):
+            if stats.connected_at is None:
+                state = "disconnessa"
+            else:
+                state = f"connessa da {(time.time() - stats.connected_at) / 60:.0f}m"
+            received = stats.first_arrivals + stats.duplicates + stats.obsolete
+            first_share = stats.first_arrivals / received * 100 if received else 0.0
+            mean_lag_ms = stats.lag_sum / stats.duplicates * 1000 if stats.duplicates else 0.0
+            lines.append(f"Feed {group_index}.{feed_index} ({state}, riconnessioni {stats.reconnects}): "
+                         f"{received:,} aggiornamenti | primi arrivi {first_share:.1f}% | "
+                         f"ritardo duplicati medio {mean_lag_ms:.1f} ms, max {stats.lag_max * 1000:.1f} ms | "
+                         f"obsoleti {stats.obsolete:,}")
+            stats.reset()
+        return lines
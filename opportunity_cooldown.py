@@ -0,0 +1,92 @@
+"""
+Cache di cooldown per la deduplicazione delle opportunità di arbitraggio
+Le chiavi sono interi canonici per triangolo, le scadenze sono gestite con un heap
+e la capacità è limitata: la memoria resta costante anche dopo settimane di uptime
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bit riservati per ogni id di valuta nella chiave del triangolo (fino a ~2 milioni di valute)
+_CURRENCY_ID_BITS = 21
+
+class OpportunityCooldown:
+    """Cooldown con scadenza a heap, limite di capacità e isteresi opzionale sul profitto"""
+
+    def __init__(self, cooldown: float, capacity: int, realert_margin: Optional[float] = None):
+        self.cooldown = cooldown
+        self.capacity = capacity
+        self.realert_margin = realert_margin  # Miglioramento minimo (punti %) per notificare di nuovo
+
+        self._currency_ids: Dict[str, int] = {}
+        self._entries: Dict[int, Tuple[float, float]] = {}  # chiave -> (scadenza, ultimo profitto notificato)
+        self._expiry_heap: List[Tuple[float, int]] = []  # Scadenze con cancellazione pigra
+
+        self.suppressed = 0
+        self.realerts = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def triangle_key(self, currencies: Iterable[str]) -> int:
+        """Chiave intera canonica di un triangolo, indipendente dal verso e dal punto di partenza"""
+        ids = self._currency_ids
+        a, b, c = sorted(ids.setdefault(currency, len(ids)) for currency in currencies)
+        return (a << (2 * _CURRENCY_ID_BITS)) | (b << _CURRENCY_ID_BITS) | c
+
+    def should_alert(self, key: int, profit: float, now: float) -> bool:
+        """
+        Restituisce True se l'opportunità va notificata e la registra nel cooldown.
+        Durante il cooldown notifica di nuovo solo se il profitto è migliorato del margine.
+        """
+        self._expire(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self.realert_margin is None or profit < entry[1] + self.realert_margin:
+                self.suppressed += 1
+                return False
+            self.realerts += 1
+        elif len(self._entries) >= self.capacity:
+            self._evict_one()
+
+        expiry = now + self.cooldown
+        self._entries[key] = (expiry, profit)
+        heapq.heappush(self._expiry_heap, (expiry, key))
+        if len(self._expiry_heap) > 2 * self.capacity:
+            self._compact()
+        return True
+
+    def _expire(self, now: float):
+        """Rimuove le voci scadute (O(1) ammortizzato per inserimento)"""
+        heap, entries = self._expiry_heap, self._entries
+        while heap and heap[0][0] <= now:
+            expiry, key = heapq.heappop(heap)
+            entry = entries.get(key)
+            if entry is not None and entry[0] == expiry:
+                del entries[key]
+
+    def _evict_one(self):
+        """Rimuove la voce valida più vicina alla scadenza per rispettare la capacità"""
+        heap, entries = self._expiry_heap, self._entries
+        while heap:
+            expiry, key = heapq.heappop(heap)
+            entry = entries.get(key)
+            if entry is not None and entry[0] == expiry:
+                del entries[key]
+                self.evictions += 1
+                return
+
+    def _compact(self):
+        """Ricostruisce l'heap eliminando le scadenze superate da una nuova notifica"""
+        self._expiry_heap = [(expiry, key) for key, (expiry, _) in self._entries.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def get_stats(self) -> Dict:
+        return {
+            'size': len(self._entries),
+            'suppressed': self.suppressed,
+            'realerts': self.realerts,
+            'evictions': self.evictions
+        }
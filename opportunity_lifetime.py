@@ -0,0 +1,151 @@
+"""
+Durata di vita delle opportunità di arbitraggio
+Ogni triangolo viene seguito dal primo ciclo di analisi in cui supera la soglia di
+profitto fino al primo ciclo completo in cui non la supera più: durata, profitto di
+picco e numero di aggiornamenti (cicli) sopravvissuti misurano il margine di latenza
+reale di tutto ciò che segue la rilevazione
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+NO_HUB = '-'
+
+def percentile(ordered, q: float) -> float:
+    """Percentile (nearest-rank) di una sequenza già ordinata e non vuota"""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class _LiveOpportunity:
+    __slots__ = ('start_asset', 'hub', 'first_seen', 'last_seen', 'peak', 'updates', 'cycle')
+
+    def __init__(self, start_asset: str, hub: str, now: float, profit: float, cycle: int):
+        self.start_asset = start_asset
+        self.hub = hub
+        self.first_seen = now
+        self.last_seen = now
+        self.peak = profit
+        self.updates = 1
+        self.cycle = cycle
+
+class OpportunityLifetimeTracker:
+    """Opportunità aperte per chiave di triangolo e durate concluse raccolte per periodo di report"""
+
+    def __init__(self, hubs: Iterable[str]):
+        self.hubs = list(hubs)
+        self._live: Dict[int, _LiveOpportunity] = {}
+        self._cycle = 0
+
+        # Opportunità concluse nel periodo: colonne parallele (durata in secondi, picco %, cicli)
+        self._lifetimes = array('d')
+        self._peaks = array('d')
+        self._updates = array('q')
+        self._start_assets: List[str] = []
+        self._hubs: List[str] = []
+        self.closed_total = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def hub_of(self, triangle: Tuple[str, str, str]) -> str:
+        """Primo hub (in ordine di liquidità) tra le valute intermedie del triangolo"""
+        for hub in self.hubs:
+            if hub == triangle[1] or hub == triangle[2]:
+                return hub
+        return NO_HUB
+
+    def observe(self, key: int, triangle: Tuple[str, str, str], profit: float, now: float):
+        """Registra un triangolo sopra soglia nel ciclo corrente (chiave canonica, come nel cooldown)"""
+        live = self._live.get(key)
+        if live is None:
+            self._live[key] = _LiveOpportunity(triangle[0], self.hub_of(triangle), now, profit, self._cycle)
+            return
+        if live.cycle != self._cycle:
+            live.cycle = self._cycle
+            live.updates += 1
+            live.last_seen = now
+        if profit > live.peak:
+            live.peak = profit
+
+    def end_cycle(self, now: float, complete: bool = True):
+        """
+        Chiude le opportunità non osservate in questo ciclo (durata fino a 'now', istante dello snapshot).
+        Un ciclo incompleto (worker in timeout o in errore) non chiude nulla: l'assenza non è una misura.
+        """
+        cycle = self._cycle
+        self._cycle += 1
+        if not complete:
+            return
+        vanished = [key for key, live in self._live.items() if live.cycle != cycle]
+        for key in vanished:
+            live = self._live.pop(key)
+            self._lifetimes.append(now - live.first_seen)
+            self._peaks.append(live.peak)
+            self._updates.append(live.updates)
+            self._start_assets.append(live.start_asset)
+            self._hubs.append(live.hub)
+        self.closed_total += len(vanished)
+
+    def _summarize(self, indices: Iterable[int]) -> Dict:
+        indices = list(indices)
+        lifetimes = sorted(self._lifetimes[i] for i in indices)
+        peaks = sorted(self._peaks[i] for i in indices)
+        return {
+            'count': len(indices),
+            'p50_ms': percentile(lifetimes, 0.5) * 1000,
+            'p90_ms': percentile(lifetimes, 0.9) * 1000,
+            'p99_ms': percentile(lifetimes, 0.99) * 1000,
+            'max_ms': lifetimes[-1] * 1000,
+            'p50_peak': percentile(peaks, 0.5),
+            'max_peak': peaks[-1],
+            'avg_updates': sum(self._updates[i] for i in indices) / len(indices)
+        }
+
+    def summary(self, reset: bool = True) -> Optional[Dict]:
+        """
+        Percentili delle durate concluse nel periodo, in totale, per asset di partenza e per hub.
+        Restituisce None se nessuna opportunità si è conclusa; con reset il periodo riparte.
+        """
+        if not self._lifetimes:
+            return None
+        by_start: Dict[str, List[int]] = {}
+        by_hub: Dict[str, List[int]] = {}
+        for i, (start_asset, hub) in enumerate(zip(self._start_assets, self._hubs)):
+            by_start.setdefault(start_asset, []).append(i)
+            by_hub.setdefault(hub, []).append(i)
+        result = {
+            'overall': self._summarize(range(len(self._lifetimes))),
+            'by_start': {asset: self._summarize(idx) for asset, idx in by_start.items()},
+            'by_hub': {hub: self._summarize(idx) for hub, idx in by_hub.items()},
+            'live': len(self._live)
+        }
+        if reset:
+            self._lifetimes = array('d')
+            self._peaks = array('d')
+            self._updates = array('q')
+            self._start_assets = []
+            self._hubs = []
+        return result
+
+def format_lifetime_summary(summary: Optional[Dict], limit: int = 5) -> str:
+    """Sezione Markdown del riepilogo orario"""
+    if summary is None:
+        return "⏳ *Durata opportunità:* nessuna opportunità conclusa"
+
+    def line(label: str, stats: Dict) -> str:
+        return (f"`{label}`: {stats['count']} | p50 {stats['p50_ms']:.0f} ms | p90 {stats['p90_ms']:.0f} ms | "
+                f"p99 {stats['p99_ms']:.0f} ms | picco p50 {stats['p50_peak']:.3f}%")
+
+    overall = summary['overall']
+    lines = [
+        f"⏳ *Durata opportunità* ({overall['count']} concluse, {summary['live']} aperte)",
+        line('Totale', overall),
+        f"Aggiornamenti sopravvissuti (media): `{overall['avg_updates']:.1f}` | Durata max: `{overall['max_ms']:.0f} ms` | "
+        f"Picco max: `{overall['max_peak']:.3f}%`",
+        "_Per asset di partenza:_"
+    ]
+    for asset, stats in sorted(summary['by_start'].items(), key=lambda item: -item[1]['count'])[:limit]:
+        lines.append(line(asset, stats))
+    lines.append("_Per hub:_")
+    for hub, stats in sorted(summary['by_hub'].items(), key=lambda item: -item[1]['count'])[:limit]:
+        lines.append(line(hub, stats))
+    return "\n".join(lines)
@@ -0,0 +1,99 @@
+"""
+Piani d'ordine precompilati per l'esecuzione dei triangoli
+Il lato analisi ricava per ogni gamba simbolo, lato e importo (quoteOrderQty per
+gli acquisti, quantità arrotondata allo stepSize per le vendite); il processo di
+trading deve solo applicare gli importi effettivamente ricevuti e inviare
+"""
+
+from decimal import ROUND_DOWN, Context, Decimal
+from typing import Dict, Optional, Tuple
+
+from analysis_results import leg_symbol
+
+def floor_to_step(quantity: Decimal, step_size: Decimal) -> Decimal:
+    """Arrotonda per difetto la quantità allo stepSize (come adjust_quantity_for_step_size)"""
+    if step_size > 0:
+        return (quantity // step_size) * step_size
+    return quantity
+
+_AMOUNT_QUANTUM = Decimal('1e-8')
+# Precisione propria: con il contesto dell'analisi (12 cifre) gli importi oltre 10^4 non entrano in 8 decimali
+_AMOUNT_CONTEXT = Context(prec=40)
+
+def format_amount(amount: Decimal) -> str:
+    """
+    Importo nel formato accettato da Binance (massimo 8 decimali, senza zeri finali).
+    I decimali in eccesso vengono troncati: un importo arrotondato per eccesso può superare il saldo.
+    """
+    truncated = amount.quantize(_AMOUNT_QUANTUM, rounding=ROUND_DOWN, context=_AMOUNT_CONTEXT)
+    return f"{truncated:f}".rstrip('0').rstrip('.')
+
+def leg_amount(leg: Dict, available: Decimal) -> str:
+    """Importo da inviare per una gamba disponendo di 'available' unità dell'asset in ingresso"""
+    if leg['side'] == 'BUY':
+        return format_amount(available)  # quoteOrderQty: si spende tutto l'asset quotato
+    return format_amount(floor_to_step(available, Decimal(leg['step_size'])))
+
+def estimate_value(amount: Decimal, asset: str, quote_asset: str, prices,
+                   existing_pairs: Dict[str, Dict[str, str]]) -> Optional[Decimal]:
+    """
+    Valore di 'amount' unità di asset in quote_asset ai prezzi dello snapshot (coppia diretta, senza commissioni).
+    None se la coppia diretta manca o non ha prezzi.
+    """
+    if asset == quote_asset:
+        return amount
+    symbol, side = leg_symbol(asset, quote_asset, existing_pairs)
+    book = prices.get(symbol) if symbol else None
+    if book is None:
+        return None
+    if side == 'BUY':
+        return amount / book['ask'] if book['ask'] else None
+    return amount * book['bid']
+
+def build_order_plan(triangle: Tuple[str, str, str], budget: Decimal, trading_fee: Decimal, prices,
+                     existing_pairs: Dict[str, Dict[str, str]], symbol_info_map: Dict[str, Dict],
+                     liquidation_router=None) -> Optional[Dict]:
+    """
+    Costruisce il piano d'ordine di un triangolo dallo snapshot usato in analisi.
+    Il budget è espresso nell'asset di partenza del triangolo.
+    Le gambe successive alla prima riportano importi stimati: in esecuzione vengono
+    ricalcolati con leg_amount() sull'importo realmente ricevuto.
+    Con un LiquidationRouter ogni gamba intermedia porta con sé la rotta di rientro.
+    """
+    p_a, p_b, p_c = triangle
+    legs = []
+    amount = budget
+    for start_asset, end_asset in ((p_a, p_b), (p_b, p_c), (p_c, p_a)):
+        symbol, side = leg_symbol(start_asset, end_asset, existing_pairs)
+        book = prices.get(symbol) if symbol else None
+        if book is None:
+            return None
+        info = symbol_info_map[symbol]
+        if side == 'BUY':
+            received = amount / book['ask']
+        else:
+            amount = floor_to_step(amount, info['stepSize'])
+            received = amount * book['bid']
+        if amount <= 0:
+            return None  # Importo sotto lo stepSize: nessun ordine eseguibile
+        received_net = received * (1 - trading_fee)
+        legs.append({
+            'symbol': symbol,
+            'side': side,
+            'amount_field': 'quoteOrderQty' if side == 'BUY' else 'quantity',
+            'amount': format_amount(amount),
+            'step_size': str(info['stepSize']),
+            'expected_received': format_amount(received_net),
+            'from_asset': start_asset,
+            'to_asset': end_asset
+        })
+        if liquidation_router is not None and start_asset != p_a:
+            legs[-1]['liquidation'] = liquidation_router.route(start_asset, p_a)
+        amount = received_net
+    return {
+        'path': f"{p_a}→{p_b}→{p_c}→{p_a}",
+        'start_asset': p_a,
+        'budget': legs[0]['amount'],  # Importo effettivamente inviato con la prima gamba (già arrotondato)
+        'expected_final': format_amount(amount),
+        'legs': legs
+    }
@@ -0,0 +1,172 @@
+"""
+Profilazione su richiesta dei percorsi critici (analisi e ricezione dati)
+Si attiva senza riavvio tramite segnali o un file di comando e scrive file
+leggibili dai visualizzatori standard (pstats/snakeviz per .prof, Perfetto o
+chrome://tracing per i tempi per fase)
+"""
+
+import asyncio
+import cProfile
+import json
+import os
+import signal
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Fasi misurate all'interno di find_arbitrage_worker
+WORKER_STAGES = ('graph_walk', 'leg1', 'leg2', 'leg3', 'result_build')
+
+def timed_stage(func: Callable, stage_ns: Dict[str, int], stage: str) -> Callable:
+    """Avvolge una funzione accumulando il tempo speso (ns) nella fase indicata"""
+    perf_counter_ns = time.perf_counter_ns
+
+    def wrapper(*args):
+        start = perf_counter_ns()
+        try:
+            return func(*args)
+        finally:
+            stage_ns[stage] += perf_counter_ns() - start
+    return wrapper
+
+def run_profiled(profile_path: str, func: Callable, *args):
+    """Esegue func nel processo worker sotto cProfile e salva le statistiche in profile_path"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        profiler.dump_stats(profile_path)
+
+def write_stage_trace(path: str, generation: int, worker_stages: List[Dict[str, int]]):
+    """Scrive i tempi per fase di ogni worker in formato Chrome Trace (una riga per worker)"""
+    events = []
+    for worker_id, stage_ns in enumerate(worker_stages):
+        ts = 0.0
+        for stage in WORKER_STAGES:
+            duration_us = stage_ns.get(stage, 0) / 1000
+            events.append({'name': stage, 'ph': 'X', 'pid': generation, 'tid': worker_id,
+                           'ts': ts, 'dur': duration_us, 'args': {'ms': duration_us / 1000}})
+            ts += duration_us
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class ProfilingControl:
+    """Stato dei profiler attivabili a runtime"""
+
+    def __init__(self, output_dir: str = config.PROFILING_OUTPUT_DIR):
+        self.output_dir = output_dir
+        self.profile_cycles = 0  # Cicli ancora da profilare con cProfile nei worker
+        self.stage_cycles = 0  # Cicli ancora da misurare per fase
+        self.ingest_remaining = 0  # Messaggi ancora da profilare in handle_message
+
+        self._ingest_profiler: Optional[cProfile.Profile] = None
+        self._ingest_messages = 0
+        self._ingest_busy_ns = 0
+        self._ingest_started = 0.0
+
+    def _path(self, name: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{time.strftime('%Y%m%d_%H%M%S')}_{name}")
+
+    # --- Richieste -------------------------------------------------------
+
+    def request(self, command: str, count: Optional[int] = None):
+        """Attiva un profiler: 'cycles', 'stages' o 'ingest'"""
+        if command == 'cycles':
+            self.profile_cycles = count or config.PROFILING_DEFAULT_CYCLES
+            logger.info(f"🔬 Profilazione cProfile dei prossimi {self.profile_cycles} cicli di analisi")
+        elif command == 'stages':
+            self.stage_cycles = count or config.PROFILING_DEFAULT_CYCLES
+            logger.info(f"🔬 Tempi per fase dei prossimi {self.stage_cycles} cicli di analisi")
+        elif command == 'ingest':
+            if self._ingest_profiler is None:
+                self.ingest_remaining = count or config.PROFILING_DEFAULT_INGEST_MESSAGES
+                self._start_ingest_profile()
+        else:
+            logger.warning(f"Comando di profilazione sconosciuto: {command}")
+
+    def install_signal_handlers(self, loop: asyncio.AbstractEventLoop):
+        """SIGUSR1: cProfile dei cicli, SIGUSR2: tempi per fase (solo sistemi POSIX)"""
+        if not hasattr(signal, 'SIGUSR1'):
+            return
+        loop.add_signal_handler(signal.SIGUSR1, self.request, 'cycles')
+        loop.add_signal_handler(signal.SIGUSR2, self.request, 'stages')
+
+    async def watch_command_file(self, path: str = config.PROFILING_COMMAND_FILE, interval: float = 1.0):
+        """
+        Legge comandi da un file locale, una riga per comando (es. 'cycles 5', 'stages 10', 'ingest 50000').
+        Il file viene eliminato dopo la lettura.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lines = f.read().splitlines()
+                os.remove(path)
+            except Exception as e:
+                logger.error(f"Errore lettura comandi di profilazione: {e}")
+                continue
+            for line in lines:
+                parts = line.split()
+                if not parts:
+                    continue
+                count = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+                self.request(parts[0].lower(), count)
+
+    # --- Cicli di analisi ------------------------------------------------
+
+    def next_cycle(self, generation: int):
+        """
+        Opzioni di profilazione per il ciclo che sta per partire.
+        Restituisce (prefisso dei file .prof o None, True se misurare le fasi).
+        """
+        profile_prefix = None
+        if self.profile_cycles > 0:
+            self.profile_cycles -= 1
+            profile_prefix = self._path(f"cycle{generation}")
+        stage_timing = self.stage_cycles > 0
+        if stage_timing:
+            self.stage_cycles -= 1
+        return profile_prefix, stage_timing
+
+    def save_stage_timings(self, generation: int, worker_stages: List[Dict[str, int]]):
+        """Salva e riassume i tempi per fase raccolti dai worker"""
+        path = self._path(f"cycle{generation}_stages.json")
+        write_stage_trace(path, generation, worker_stages)
+        totals = {stage: sum(w.get(stage, 0) for w in worker_stages) / 1e6 for stage in WORKER_STAGES}
+        summary = " | ".join(f"{stage}: {ms:.1f} ms" for stage, ms in totals.items())
+        logger.info(f"🔬 Fasi ciclo {generation} (somma worker): {summary} → {path}")
+
+    # --- Ricezione dati --------------------------------------------------
+
+    def _start_ingest_profile(self):
+        self._ingest_profiler = cProfile.Profile()
+        self._ingest_messages = 0
+        self._ingest_busy_ns = 0
+        self._ingest_started = time.perf_counter()
+        self._ingest_profiler.enable()
+        logger.info(f"🔬 Profilazione di handle_message per {self.ingest_remaining} messaggi")
+
+    def record_ingest(self, elapsed_ns: int):
+        """Registra un messaggio profilato; chiude il profilo al raggiungimento del limite"""
+        self._ingest_messages += 1
+        self._ingest_busy_ns += elapsed_ns
+        self.ingest_remaining -= 1
+        if self.ingest_remaining > 0:
+            return
+
+        self._ingest_profiler.disable()
+        path = self._path("ingest.prof")
+        self._ingest_profiler.dump_stats(path)
+        self._ingest_profiler = None
+
+        wall = time.perf_counter() - self._ingest_started
+        avg_us = self._ingest_busy_ns / self._ingest_messages / 1000
+        logger.info(f"🔬 Ingest: {self._ingest_messages} messaggi in {wall:.1f}s "
+                    f"({self._ingest_messages / wall:.0f} msg/s, {avg_us:.1f} µs/msg in handle_message) → {path}")
@@ -0,0 +1,223 @@
+"""
+Client REST asincrono per gli ordini di mercato su Binance
+Mantiene un pool di connessioni keep-alive già negoziate (TLS compreso) così che il
+ripiego dal WebSocket costi un solo round trip, con un tempo massimo per richiesta
+"""
+
+import asyncio
+import hmac
+import hashlib
+import itertools
+import os
+import time
+import logging
+from decimal import Decimal
+from typing import Dict, Optional
+
+import aiohttp
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Codice d'errore di Binance per un ordine inesistente (ricerca per newClientOrderId)
+_ORDER_DOES_NOT_EXIST = -2013
+
+_order_counter = itertools.count(1)
+
+def new_client_order_id() -> str:
+    """newClientOrderId univoco tra i processi di trading: permette di ritrovare un ordine rimasto senza risposta"""
+    return f"tri{os.getpid()}-{int(time.time() * 1000)}-{next(_order_counter)}"
+
+def order_result(data: Dict, symbol: str, side: str, method: str, execution_time: Optional[float] = None) -> Dict:
+    """
+    Risultato uniforme dalla risposta dell'exchange a un ordine (WebSocket, REST o ricerca dell'ordine).
+    Vale solo l'esecuzione completa: un ordine scaduto o parziale è NOT_FILLED con la parte eseguita.
+    """
+    quantity = Decimal(data.get('executedQty', '0'))
+    fills = data.get('fills') or []
+    result = {
+        'status': 'SUCCESS' if data.get('status') == 'FILLED' else 'NOT_FILLED',
+        'symbol': symbol,
+        'side': side,
+        'quantity': quantity,
+        # Asset ottenuto: base per gli acquisti, quotato per le vendite
+        'received': quantity if side == 'BUY' else Decimal(data.get('cummulativeQuoteQty', '0')),
+        # Asset ceduto: quotato per gli acquisti, base per le vendite
+        'spent': Decimal(data.get('cummulativeQuoteQty', '0')) if side == 'BUY' else quantity,
+        'price': Decimal(fills[0]['price']) if fills else None,
+        'execution_time': execution_time,
+        'order_id': data.get('orderId'),
+        'client_order_id': data.get('clientOrderId'),
+        'method': method
+    }
+    if result['status'] == 'NOT_FILLED':
+        result['error'] = f"Ordine {data.get('status')}: eseguito {quantity}"
+    return result
+
+class AsyncRestTrader:
+    """Ordini REST firmati su una sessione aiohttp persistente"""
+
+    def __init__(self, api_key: str, secret_key: str,
+                 base_url: Optional[str] = None,
+                 pool_size: int = config.REST_POOL_SIZE,
+                 request_timeout: float = config.REST_REQUEST_TIMEOUT,
+                 keepalive_interval: float = config.REST_KEEPALIVE_INTERVAL):
+        self.api_key = api_key
+        # Testnet in DRY_RUN, come il client python-binance: le chiavi di test non valgono in produzione
+        self.base_url = (base_url or config.get_binance_url()).rstrip('/')
+        self.pool_size = pool_size
+        self.request_timeout = request_timeout
+        self.keepalive_interval = keepalive_interval
+        self._signer = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+        self.orders_sent = 0
+        self.timeouts = 0
+        self.last_latency_ms = 0.0
+
+    async def start(self):
+        """Crea la sessione con il pool di connessioni (idempotente)"""
+        if self._session and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=self.keepalive_interval * 3,
+            ttl_dns_cache=3600
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={'X-MBX-APIKEY': self.api_key},
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    async def warm_up(self):
+        """Apre in parallelo tutte le connessioni del pool e le tiene vive con ping periodici"""
+        await self.start()
+        start_time = time.time()
+        results = await asyncio.gather(*(self._ping() for _ in range(self.pool_size)), return_exceptions=True)
+        warmed = sum(1 for result in results if result is True)
+        logger.info(f"🔥 Pool REST pronto: {warmed}/{self.pool_size} connessioni in {(time.time() - start_time) * 1000:.0f}ms")
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keep_alive())
+
+    async def _ping(self) -> bool:
+        async with self._session.get(f"{self.base_url}/api/v3/ping") as response:
+            await response.read()
+            return response.status == 200
+
+    async def _keep_alive(self):
+        """Impedisce che il server chiuda le connessioni inattive del pool"""
+        while self._session and not self._session.closed:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await asyncio.gather(*(self._ping() for _ in range(self.pool_size)))
+            except Exception as e:
+                logger.warning(f"⚠️ Keep-alive REST fallito: {e}")
+
+    def _sign(self, query: str) -> str:
+        signer = self._signer.copy()
+        signer.update(query.encode('utf-8'))
+        return signer.hexdigest()
+
+    async def place_market_order(self, symbol: str, side: str, amount: str,
+                                 amount_field: str = 'quantity', test: bool = False,
+                                 client_order_id: Optional[str] = None) -> Dict:
+        """
+        Invia un ordine di mercato (amount_field: 'quantity' o 'quoteOrderQty').
+        Restituisce lo stesso formato dei risultati WebSocket; gli errori non sollevano eccezioni.
+        Con esito sconosciuto (TIMEOUT) il risultato porta newClientOrderId e scadenza per query_order.
+        """
+        await self.start()
+        client_order_id = client_order_id or new_client_order_id()
+        timestamp = int(time.time() * 1000)
+        query = (f"symbol={symbol}&side={side}&type=MARKET&{amount_field}={amount}&newClientOrderId={client_order_id}"
+                 f"&newOrderRespType=FULL&recvWindow={config.REST_RECV_WINDOW}&timestamp={timestamp}")
+        body = f"{query}&signature={self._sign(query)}"
+        endpoint = '/api/v3/order/test' if test else '/api/v3/order'
+
+        start_time = time.time()
+        self.orders_sent += 1
+        try:
+            async with self._session.post(
+                f"{self.base_url}{endpoint}", data=body,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'}
+            ) as response:
+                data = await response.json(content_type=None)
+                status_code = response.status
+        except aiohttp.ClientConnectorError as e:
+            # Connessione non stabilita: la richiesta non è partita
+            logger.error(f"❌ REST ORDER EXCEPTION: {e}")
+            return {'status': 'GENERAL_ERROR', 'error': str(e)}
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            # Richiesta partita senza risposta: l'ordine può essere stato eseguito
+            self.timeouts += 1
+            logger.error(f"⏰ REST ORDER TIMEOUT ({self.request_timeout}s): {side} {amount} {symbol} ({client_order_id})")
+            return {
+                'status': 'TIMEOUT',
+                'error': f"Nessuna risposta REST: {e or f'timeout dopo {self.request_timeout}s'}",
+                'symbol': symbol,
+                'side': side,
+                'client_order_id': client_order_id,
+                'expires_at': (timestamp + config.REST_RECV_WINDOW) / 1000
+            }
+
+        execution_time = (time.time() - start_time) * 1000
+        self.last_latency_ms = execution_time
+        if status_code != 200:
+            logger.error(f"❌ REST ORDER ERROR {status_code}: {data}")
+            return {'status': 'API_ERROR', 'error': data.get('msg', str(data)) if isinstance(data, dict) else str(data)}
+
+        if test:
+            logger.info(f"🧪 REST TEST ORDER: {side} {amount_field}={amount} {symbol} ({execution_time:.1f}ms)")
+            return {
+                'status': 'TEST_SUCCESS',
+                'symbol': symbol,
+                'side': side,
+                'quantity': Decimal(amount),
+                'price': None,
+                'execution_time': execution_time,
+                'method': 'rest_api'
+            }
+
+        result = order_result(data, symbol, side, 'rest_api', execution_time)
+        if result['status'] == 'SUCCESS':
+            logger.info(f"✅ REST ORDER SUCCESS: {side} {amount_field}={amount} {symbol} ({execution_time:.1f}ms)")
+        else:
+            logger.error(f"❌ REST ORDER NOT FILLED ({data.get('status')}): {side} {amount_field}={amount} {symbol} "
+                         f"eseguito {result['quantity']}")
+        return result
+
+    async def query_order(self, symbol: str, side: str, client_order_id: str) -> Dict:
+        """
+        Cerca un ordine per newClientOrderId. Restituisce il risultato dell'ordine come place_market_order,
+        NOT_FOUND se l'exchange non lo conosce, TIMEOUT o API_ERROR se la ricerca stessa non ha esito.
+        """
+        await self.start()
+        query = (f"symbol={symbol}&origClientOrderId={client_order_id}"
+                 f"&recvWindow={config.REST_RECV_WINDOW}&timestamp={int(time.time() * 1000)}")
+        start_time = time.time()
+        try:
+            async with self._session.get(f"{self.base_url}/api/v3/order?{query}&signature={self._sign(query)}") as response:
+                data = await response.json(content_type=None)
+                status_code = response.status
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            logger.error(f"⏰ Ricerca dell'ordine {client_order_id} su {symbol} senza esito: {e or 'timeout'}")
+            return {'status': 'TIMEOUT', 'error': f"Ricerca dell'ordine senza esito: {e or 'timeout'}",
+                    'symbol': symbol, 'side': side, 'client_order_id': client_order_id}
+        if status_code != 200:
+            if isinstance(data, dict) and data.get('code') == _ORDER_DOES_NOT_EXIST:
+                return {'status': 'NOT_FOUND', 'symbol': symbol, 'side': side, 'client_order_id': client_order_id}
+            logger.error(f"❌ Ricerca dell'ordine {client_order_id} fallita {status_code}: {data}")
+            return {'status': 'API_ERROR', 'error': data.get('msg', str(data)) if isinstance(data, dict) else str(data),
+                    'symbol': symbol, 'side': side, 'client_order_id': client_order_id}
+        result = order_result(data, symbol, side, 'rest_lookup', (time.time() - start_time) * 1000)
+        logger.warning(f"🔎 Ordine {client_order_id} ritrovato: {data.get('status')} {side} {symbol} eseguito {result['quantity']}")
+        return result
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+        if self._session and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,290 @@
+"""
+Decodifica dei market data SBE (Simple Binary Encoding) di Binance
+Gli stream SBE <simbolo>@bestBidAsk inviano messaggi binari a layout fisso (schema
+spot_stream 1:0, template BestBidAskStreamEvent): prezzi e quantità sono mantisse
+intere con esponente decimale, decodificate con un solo struct.unpack_from e divise
+per la potenza di 10 esatta, senza json.loads, dizionari intermedi o Decimal.
+Il modulo include l'encoder usato per le fixture registrate e per lo stream locale
+di prova, e il confronto con il percorso JSON.
+
+Esempi:
+    python sbe_market_data.py convert recordings/book_20240101.log fixture.sbe
+    python sbe_market_data.py verify recordings/book_20240101.log fixture.sbe
+    python sbe_market_data.py bench recordings/book_20240101.log
+    python sbe_market_data.py serve fixture.sbe --port 9555
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import struct
+import time
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from book_recording import read_raw_recording
+from top_of_book import TopOfBook
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_ID = 1
+SCHEMA_VERSION = 0
+BEST_BID_ASK_TEMPLATE = 10001
+
+# Header SBE (blockLength, templateId, schemaId, version) + blocco fisso di BestBidAskStreamEvent
+# (eventTime µs, bookUpdateId, priceExponent, qtyExponent, bidPrice, bidQty, askPrice, askQty)
+# + lunghezza del simbolo (varString8)
+_HEADER_SIZE = 8
+_BLOCK_LENGTH = 50
+_BEST_BID_ASK = struct.Struct('<HHHHqqbbqqqqB')
+
+# Divisori interi esatti: la divisione int/int è arrotondata correttamente, come float() sul testo JSON
+_POW10 = tuple(10 ** exponent for exponent in range(19))
+
+# Decodificato: (simbolo, update id, bid, ask, bid_qty, ask_qty, istante dell'evento in µs)
+BestBidAsk = Tuple[str, int, float, float, float, float, int]
+
+def _scale(mantissa: int, exponent: int) -> float:
+    if exponent <= 0:
+        return mantissa / 10 ** -exponent
+    return float(mantissa * 10 ** exponent)
+
+def decode_best_bid_ask(frame: bytes) -> Optional[BestBidAsk]:
+    """Decodifica un messaggio BestBidAskStreamEvent; None per gli altri template o schemi"""
+    if len(frame) < _BEST_BID_ASK.size:
+        return None
+    (block_length, template_id, schema_id, _, event_time, update_id, price_exponent, qty_exponent,
+     bid, bid_qty, ask, ask_qty, symbol_length) = _BEST_BID_ASK.unpack_from(frame)
+    if template_id != BEST_BID_ASK_TEMPLATE or schema_id != SCHEMA_ID:
+        return None
+    offset = _HEADER_SIZE + block_length
+    if block_length != _BLOCK_LENGTH:
+        # Versioni successive dello schema possono estendere il blocco fisso: il simbolo segue il blocco
+        symbol_length = frame[offset]
+    symbol = frame[offset + 1:offset + 1 + symbol_length].decode('ascii')
+    if -19 < price_exponent <= 0 and -19 < qty_exponent <= 0:
+        price_div, qty_div = _POW10[-price_exponent], _POW10[-qty_exponent]
+        return symbol, update_id, bid / price_div, ask / price_div, bid_qty / qty_div, ask_qty / qty_div, event_time
+    return (symbol, update_id, _scale(bid, price_exponent), _scale(ask, price_exponent),
+            _scale(bid_qty, qty_exponent), _scale(ask_qty, qty_exponent), event_time)
+
+def frame_symbol(frame: bytes) -> Optional[bytes]:
+    """Simbolo grezzo di un messaggio bestBidAsk (chiave di conflazione), None per gli altri messaggi"""
+    if len(frame) < _BEST_BID_ASK.size:
+        return None
+    block_length, template_id = struct.unpack_from('<HH', frame)
+    if template_id != BEST_BID_ASK_TEMPLATE:
+        return None
+    offset = _HEADER_SIZE + block_length
+    return frame[offset + 1:offset + 1 + frame[offset]]
+
+def _mantissas(values: Iterable[float]) -> Tuple[int, List[int]]:
+    """Esponente comune più piccolo che rappresenta esattamente tutti i valori, e le mantisse"""
+    decimals = [Decimal(repr(value)) for value in values]
+    exponent = min(0, min(value.as_tuple().exponent for value in decimals))
+    return exponent, [int(value.scaleb(-exponent)) for value in decimals]
+
+def encode_best_bid_ask(symbol: str, update_id: int, bid: float, ask: float, bid_qty: float, ask_qty: float,
+                        event_time_us: int = 0) -> bytes:
+    """Codifica un messaggio BestBidAskStreamEvent (fixture e stream locale di prova)"""
+    price_exponent, (bid_m, ask_m) = _mantissas((bid, ask))
+    qty_exponent, (bid_qty_m, ask_qty_m) = _mantissas((bid_qty, ask_qty))
+    raw_symbol = symbol.encode('ascii')
+    return _BEST_BID_ASK.pack(_BLOCK_LENGTH, BEST_BID_ASK_TEMPLATE, SCHEMA_ID, SCHEMA_VERSION, event_time_us, update_id,
+                              price_exponent, qty_exponent, bid_m, bid_qty_m, ask_m, ask_qty_m, len(raw_symbol)) + raw_symbol
+
+def best_bid_ask_json(symbol: str, update_id: int, bid: float, ask: float, bid_qty: float, ask_qty: float) -> str:
+    """Forma bookTicker equivalente, per BookRecorder (le registrazioni restano rigiocabili da backtest.py)"""
+    return f'{{"u":{update_id},"s":"{symbol}","b":"{bid!r}","B":"{bid_qty!r}","a":"{ask!r}","A":"{ask_qty!r}"}}'
+
+def websocket_header_kwargs(websockets_module, headers: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """Argomento di connect() per gli header HTTP: il nome cambia con la versione di websockets"""
+    major = int(str(getattr(websockets_module, '__version__', '0')).split('.')[0] or 0)
+    return {'additional_headers' if major >= 14 else 'extra_headers': headers}
+
+# --- Fixture: frame SBE con l'istante di ricezione originale ---
+
+_FIXTURE_RECORD = struct.Struct('<dH')  # (istante di ricezione, lunghezza del frame)
+
+def write_fixture(path: str, frames: Iterable[Tuple[float, bytes]]) -> int:
+    """Scrive (istante, frame) in un file binario; restituisce il numero di frame"""
+    count = 0
+    with open(path, 'wb') as f:
+        for ts, frame in frames:
+            f.write(_FIXTURE_RECORD.pack(ts, len(frame)))
+            f.write(frame)
+            count += 1
+    return count
+
+def read_fixture(path: str) -> Iterator[Tuple[float, bytes]]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset, size = 0, _FIXTURE_RECORD.size
+    while offset + size <= len(data):
+        ts, length = _FIXTURE_RECORD.unpack_from(data, offset)
+        offset += size
+        yield ts, data[offset:offset + length]
+        offset += length
+
+def _recording_messages(paths: Iterable[str]) -> Iterator[Tuple[float, str, int, float, float, float, float]]:
+    """Messaggi bookTicker registrati con l'update id (read_recording non lo restituisce)"""
+    for ts, raw in read_raw_recording(paths):
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        data = data.get('data', data)
+        if 's' in data:
+            yield (ts, data['s'], int(data.get('u', 0)), float(data['b']), float(data['a']),
+                   float(data['B']), float(data['A']))
+
+def convert_recording(paths: Iterable[str], fixture_path: str) -> int:
+    """Converte registrazioni bookTicker (JSON) in una fixture SBE con gli stessi valori"""
+    return write_fixture(fixture_path, (
+        (ts, encode_best_bid_ask(symbol, update_id, bid, ask, bid_qty, ask_qty, int(ts * 1_000_000)))
+        for ts, symbol, update_id, bid, ask, bid_qty, ask_qty in _recording_messages(paths)))
+
+def verify_fixture(paths: Iterable[str], fixture_path: str) -> Tuple[int, int]:
+    """
+    Confronta la decodifica SBE della fixture con il percorso JSON sulla registrazione d'origine.
+    Restituisce (messaggi confrontati, differenze); i valori devono coincidere bit a bit.
+    """
+    compared = mismatches = 0
+    frames = read_fixture(fixture_path)
+    for ts, symbol, update_id, bid, ask, bid_qty, ask_qty in _recording_messages(paths):
+        _, frame = next(frames, (None, b''))
+        decoded = decode_best_bid_ask(frame)
+        compared += 1
+        if decoded is None or decoded[:6] != (symbol, update_id, bid, ask, bid_qty, ask_qty):
+            mismatches += 1
+            if mismatches <= 5:
+                logger.warning(f"Differenza al messaggio {compared}: JSON {(symbol, update_id, bid, ask, bid_qty, ask_qty)} | SBE {decoded}")
+    return compared, mismatches
+
+def benchmark(json_frames: List[str], sbe_frames: List[bytes], repeat: int = 3) -> Dict[str, float]:
+    """
+    Costo per messaggio (µs) di decodifica e aggiornamento dello store: percorso JSON come
+    apply_book_ticker, percorso SBE con decode_best_bid_ask. Migliore di 'repeat' passate.
+    """
+    symbols = {decoded[0] for decoded in map(decode_best_bid_ask, sbe_frames) if decoded is not None}
+    results = {}
+
+    def run_json(book):
+        loads, update = json.loads, book.update
+        for frame in json_frames:
+            data = loads(frame)
+            if 'data' in data:
+                data = data['data']
+            update(data['s'], float(data['b']), float(data['a']), float(data['B']), float(data['A']), 0.0, data['u'])
+
+    def run_sbe(book):
+        decode, update = decode_best_bid_ask, book.update
+        for frame in sbe_frames:
+            decoded = decode(frame)
+            if decoded is not None:
+                symbol, update_id, bid, ask, bid_qty, ask_qty, _ = decoded
+                update(symbol, bid, ask, bid_qty, ask_qty, 0.0, update_id)
+
+    for name, run, count in (('json', run_json, len(json_frames)), ('sbe', run_sbe, len(sbe_frames))):
+        best = float('inf')
+        for _ in range(repeat):
+            book = TopOfBook(symbols)  # Store nuovo: gli update id ripartono, ogni messaggio viene applicato
+            start = time.perf_counter()
+            run(book)
+            best = min(best, time.perf_counter() - start)
+        results[name] = best / max(count, 1) * 1_000_000
+    return results
+
+# --- Stream locale di prova ---
+
+def _requested_symbols(path: str) -> Optional[set]:
+    """Simboli richiesti nell'URL (?streams=btcusdt@bestBidAsk/...), None = tutti"""
+    _, _, query = path.partition('?streams=')
+    if not query:
+        return None
+    return {stream.partition('@')[0].upper().encode('ascii') for stream in query.split('/') if stream}
+
+async def serve_fixture(fixture_path: str, host: str = '127.0.0.1', port: int = 9555, speed: float = 1.0, loop_forever: bool = True):
+    """
+    Stream SBE locale che imita l'endpoint di Binance: invia i frame della fixture come messaggi
+    binari (con i tempi registrati divisi per 'speed', 0 = senza pause) filtrati sugli stream
+    richiesti, e risponde alle richieste SUBSCRIBE/UNSUBSCRIBE come l'exchange
+    """
+    import websockets
+
+    frames = list(read_fixture(fixture_path))
+
+    async def answer_requests(websocket):
+        async for message in websocket:
+            if isinstance(message, str):
+                request = json.loads(message)
+                await websocket.send(json.dumps({'result': None, 'id': request.get('id')}))
+
+    async def handler(websocket, path=None):
+        request = getattr(websocket, 'request', None)
+        wanted = _requested_symbols(request.path if request is not None else (path or getattr(websocket, 'path', '')))
+        requests_task = asyncio.create_task(answer_requests(websocket))
+        try:
+            while True:
+                previous_ts = None
+                for ts, frame in frames:
+                    if wanted is not None and frame_symbol(frame) not in wanted:
+                        continue
+                    if speed > 0 and previous_ts is not None and ts > previous_ts:
+                        await asyncio.sleep((ts - previous_ts) / speed)
+                    previous_ts = ts
+                    await websocket.send(frame)
+                if not loop_forever:
+                    break
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            requests_task.cancel()
+
+    async with websockets.serve(handler, host, port):
+        logger.info(f"Stream SBE di prova su ws://{host}:{port}/stream ({len(frames):,} frame da {fixture_path})")
+        await asyncio.Future()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixture, verifica, benchmark e stream di prova per i market data SBE")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help="Converte registrazioni bookTicker in una fixture SBE")
+    convert.add_argument('recordings', nargs='+', help="File registrati da BookRecorder (anche glob o .gz)")
+    convert.add_argument('fixture', help="File di destinazione")
+    verify = commands.add_parser('verify', help="Confronta la decodifica SBE con il percorso JSON")
+    verify.add_argument('recordings', nargs='+')
+    verify.add_argument('fixture')
+    bench = commands.add_parser('bench', help="Costo per messaggio dei percorsi JSON e SBE")
+    bench.add_argument('recordings', nargs='+')
+    bench.add_argument('--repeat', type=int, default=3)
+    serve = commands.add_parser('serve', help="Stream SBE locale che rigioca una fixture")
+    serve.add_argument('fixture')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=9555)
+    serve.add_argument('--speed', type=float, default=1.0, help="Moltiplicatore della velocità (0 = senza pause)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'serve':
+        asyncio.run(serve_fixture(args.fixture, args.host, args.port, args.speed))
+        return
+    paths = sorted(path for pattern in args.recordings for path in (glob.glob(pattern) or [pattern]))
+    if args.command == 'convert':
+        count = convert_recording(paths, args.fixture)
+        logger.info(f"Fixture {args.fixture}: {count:,} frame SBE")
+    elif args.command == 'verify':
+        compared, mismatches = verify_fixture(paths, args.fixture)
+        logger.info(f"Verifica: {compared:,} messaggi confrontati, {mismatches:,} differenze")
+    else:
+        json_frames = [raw for _, raw in read_raw_recording(paths) if '"s"' in raw]
+        sbe_frames = [encode_best_bid_ask(symbol, update_id, bid, ask, bid_qty, ask_qty)
+                      for _, symbol, update_id, bid, ask, bid_qty, ask_qty in _recording_messages(paths)]
+        costs = benchmark(json_frames, sbe_frames, args.repeat)
+        logger.info(f"Ingest su {len(sbe_frames):,} messaggi: JSON {costs['json']:.2f} µs/msg | SBE {costs['sbe']:.2f} µs/msg "
+                    f"({costs['json'] / costs['sbe']:.1f}x)")
+
+if __name__ == "__main__":
+    main()
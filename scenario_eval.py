@@ -0,0 +1,143 @@
+"""
+Valutazione batch di più scenari (commissione, budget, soglia) su un unico snapshot
+Le quotazioni delle gambe di ogni triangolo vengono lette una sola volta e condivise
+da tutti gli scenari; gli scenari che differiscono solo per la soglia condividono
+anche la simulazione. Usata dal ciclo live (config.SCENARIOS) per confrontare la
+configurazione corrente con fee tier, budget e soglie alternativi.
+"""
+
+import math
+import time
+from array import array
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from evaluation_archive import STATUS_CODES, STATUSES
+from triangle_eval import Leg, build_triangle_legs, read_leg_quotes, simulate_quotes
+
+# Scenario: (commissione per gamba, budget iniziale, soglia di profitto in frazione come MIN_PROFIT_THRESHOLD)
+Scenario = Tuple[float, float, float]
+
+_EVALUATED = STATUS_CODES['EVALUATED']
+_NO_DATA = STATUS_CODES['FAIL_NO_DATA']
+
+def scenario_grid(fees: Iterable[float], budgets: Iterable[float], thresholds: Iterable[float]) -> List[Scenario]:
+    """Prodotto cartesiano di commissioni, budget e soglie"""
+    return [(float(fee), float(budget), float(threshold)) for fee, budget, threshold in product(fees, budgets, thresholds)]
+
+class ScenarioResults:
+    """
+    Esito e profitto % di ogni triangolo per ogni simulazione distinta (commissione, budget);
+    gli scenari puntano alla loro simulazione e applicano solo la propria soglia
+    """
+
+    def __init__(self, scenarios: Sequence[Scenario], triangles: int):
+        self.scenarios = [tuple(float(v) for v in scenario) for scenario in scenarios]
+        self.triangles = triangles
+        self.simulations: List[Tuple[float, float]] = []
+        self.simulation_of: List[int] = []  # Indice della simulazione di ogni scenario
+        positions: Dict[Tuple[float, float], int] = {}
+        for fee, budget, _ in self.scenarios:
+            key = (fee, budget)
+            if key not in positions:
+                positions[key] = len(self.simulations)
+                self.simulations.append(key)
+            self.simulation_of.append(positions[key])
+        self.status = [bytearray(triangles) for _ in self.simulations]
+        self.profit = [array('d', [math.nan]) * triangles for _ in self.simulations]  # NaN per i fallimenti
+        self.elapsed = 0.0
+
+    def profit_perc(self, scenario: int, position: int) -> Optional[float]:
+        """Profitto % del triangolo nello scenario, None se non eseguibile"""
+        profit = self.profit[self.simulation_of[scenario]][position]
+        return None if math.isnan(profit) else profit
+
+    def profitable(self, scenario: int) -> List[Tuple[int, float]]:
+        """(posizione, profitto %) dei triangoli sopra la soglia dello scenario, dal più profittevole"""
+        threshold_perc = self.scenarios[scenario][2] * 100
+        profits = self.profit[self.simulation_of[scenario]]
+        found = [(position, profit) for position, profit in enumerate(profits) if profit > threshold_perc]
+        found.sort(key=lambda item: -item[1])
+        return found
+
+    def summary(self) -> List[Dict]:
+        """Per scenario: eseguibili, profittevoli, fallimenti per motivo, profitto medio e migliore"""
+        per_simulation = []
+        for status, profits in zip(self.status, self.profit):
+            failures = {STATUSES[code]: status.count(code) for code in set(status) if code != _EVALUATED}
+            feasible = [profit for profit in profits if not math.isnan(profit)]
+            best, best_profit = None, -math.inf
+            for position, profit in enumerate(profits):
+                if profit > best_profit:  # NaN non supera mai il confronto
+                    best, best_profit = position, profit
+            per_simulation.append((failures, feasible, best))
+
+        summaries = []
+        for (fee, budget, threshold), sim in zip(self.scenarios, self.simulation_of):
+            failures, feasible, best = per_simulation[sim]
+            threshold_perc = threshold * 100
+            summaries.append({
+                'fee': fee,
+                'budget': budget,
+                'threshold': threshold,
+                'feasible': len(feasible),
+                'profitable': sum(1 for profit in feasible if profit > threshold_perc),
+                'failures': failures,
+                'mean_profit': sum(feasible) / len(feasible) if feasible else math.nan,
+                'best_profit': self.profit[sim][best] if best is not None else math.nan,
+                'best_position': best
+            })
+        return summaries
+
+def evaluate_scenarios(legs_list: Sequence[Optional[List[Leg]]], book, scenarios: Sequence[Scenario]) -> ScenarioResults:
+    """
+    Valuta tutti i triangoli (gambe precompilate, None se una coppia manca) in tutti gli scenari
+    in un solo passaggio sullo snapshot
+    """
+    start = time.perf_counter()
+    results = ScenarioResults(scenarios, len(legs_list))
+    # Per simulazione: (budget, quota trattenuta dopo la commissione, colonne dei risultati)
+    simulations = [(budget, 1 - fee, status, profits)
+                   for (fee, budget), status, profits in zip(results.simulations, results.status, results.profit)]
+
+    for position, legs in enumerate(legs_list):
+        if legs is None:
+            for _, _, status, _ in simulations:
+                status[position] = _NO_DATA
+            continue
+        quotes = read_leg_quotes(legs, book)  # Letture condivise da tutti gli scenari
+        for budget, keep, status, profits in simulations:
+            outcome, final_amount = simulate_quotes(quotes, budget, keep)
+            if outcome == 'SUCCESS':
+                profits[position] = (final_amount / budget - 1) * 100
+            else:
+                status[position] = STATUS_CODES[outcome]
+    results.elapsed = time.perf_counter() - start
+    return results
+
+def scenario_worker(prices, symbol_info_map: Dict[str, Dict], triangles: Sequence[Tuple[str, str, str]],
+                    existing_pairs: Dict[str, Dict[str, str]], scenarios: Sequence[Scenario]) -> Tuple[List[Dict], float]:
+    """
+    Processo worker: precompila le gambe sullo snapshot e valuta gli scenari.
+    Restituisce (riepilogo per scenario con il percorso migliore, durata in secondi).
+    """
+    start = time.perf_counter()
+    symbol_ids = prices.symbol_ids
+    legs_list = [build_triangle_legs(triangle, existing_pairs, symbol_info_map, symbol_ids) for triangle in triangles]
+    results = evaluate_scenarios(legs_list, prices, scenarios)
+    summaries = results.summary()
+    for summary in summaries:
+        best = summary.pop('best_position')
+        if best is not None:
+            a, b, c = triangles[best]
+            summary['best_path'] = f"{a}→{b}→{c}→{a}"
+    return summaries, time.perf_counter() - start
+
+def format_scenario_summary(summaries: List[Dict], elapsed: float, triangles: int) -> str:
+    """Tabella di confronto degli scenari per i log"""
+    lines = [f"🧪 Scenari su {triangles:,} triangoli ({elapsed * 1000:.0f} ms):"]
+    for summary in summaries:
+        best = f"{summary['best_profit']:+.4f}% {summary.get('best_path', '')}" if summary['feasible'] else '-'
+        lines.append(f"  fee {summary['fee'] * 100:.4f}% | budget {summary['budget']:g} | soglia {summary['threshold'] * 100:.3f}% → "
+                     f"eseguibili {summary['feasible']:,} | profittevoli {summary['profitable']:,} | migliore {best}")
+    return "\n".join(lines)
@@ -0,0 +1,62 @@
+"""
+Misura e accelerazione della fase di avvio
+Registra l'istante di fine di ogni fase rispetto all'avvio del processo (le fasi
+possono sovrapporsi) e avvia in anticipo i processi dei pool, così che il primo
+ciclo di analisi non paghi la creazione dei worker
+"""
+
+import asyncio
+import os
+import time
+import logging
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def process_uptime() -> float:
+    """Secondi trascorsi dall'avvio del processo (interprete compreso), 0 se non disponibile"""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            start_ticks = int(f.read().rpartition(b')')[2].split()[19])
+        with open('/proc/uptime', 'rb') as f:
+            system_uptime = float(f.read().split()[0])
+        return max(0.0, system_uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+class StartupTimer:
+    """Istanti di fine delle fasi di avvio, misurati dall'avvio del processo"""
+
+    def __init__(self):
+        self._origin = time.perf_counter() - process_uptime()
+        self.stages: List[Tuple[str, float]] = []
+        self.done = False
+
+    def mark(self, stage: str, at: Optional[float] = None):
+        """Registra la fine di una fase (at: istante perf_counter, default adesso)"""
+        self.stages.append((stage, (time.perf_counter() if at is None else at) - self._origin))
+
+    def mark_once(self, stage: str):
+        if not self.done and all(name != stage for name, _ in self.stages):
+            self.mark(stage)
+
+    def finish(self, stage: str) -> str:
+        """Chiude la misura con l'ultima fase e restituisce il riepilogo"""
+        self.mark(stage)
+        self.done = True
+        parts = [f"{name} +{elapsed * 1000:.0f} ms" for name, elapsed in self.stages]
+        return f"⏱️ Avvio completato in {self.stages[-1][1] * 1000:.0f} ms: " + " | ".join(parts)
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+async def warm_up_pool(executor: Executor, workers: int) -> int:
+    """
+    Avvia tutti i processi del pool con task vuoti concorrenti (l'initializer, se presente,
+    viene eseguito qui). Restituisce il numero di processi avviati.
+    """
+    futures = [asyncio.wrap_future(executor.submit(_worker_ready)) for _ in range(workers)]
+    pids = await asyncio.gather(*futures, return_exceptions=True)
+    processes = getattr(executor, '_processes', None)  # Un worker veloce può rispondere a più task
+    return len(processes) if processes is not None else len({pid for pid in pids if isinstance(pid, int)})
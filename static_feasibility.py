@@ -0,0 +1,119 @@
+"""
+Pre-filtro statico di eseguibilità dei triangoli
+Dai soli metadati dei simboli (minQty, minNotional, stepSize) e dal budget di simulazione
+stabilisce quali triangoli non possono superare la prima gamba a nessun prezzo e li esclude
+dai cicli di analisi. Per le prime gambe che dipendono dal prezzo precalcola il limite
+(ask massimo per un acquisto, bid minimo per una vendita) oltre il quale falliscono comunque:
+i worker lo verificano una volta per gruppo di triangoli con la stessa prima gamba.
+Il filtro viene ricalcolato quando cambiano l'indice, i metadati o il budget.
+"""
+
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from analysis_results import leg_symbol
+
+# Limite di prezzo di una prima gamba dipendente dal prezzo:
+# (simbolo, è un acquisto, limite, limite oltre il quale la quantità si azzera o None)
+FirstLegLimit = Tuple[str, bool, float, Optional[float]]
+
+# Margine relativo sui limiti: i prezzi sono float, simulate_trade lavora in Decimal
+_BOUND_MARGIN = 1e-9
+
+def analyze_first_leg(symbol: str, is_buy: bool, info: Dict, budget: Decimal) -> Tuple[Optional[str], Optional[FirstLegLimit]]:
+    """
+    Esito statico della prima gamba con importo 'budget' dell'asset di partenza, con gli stessi
+    controlli di simulate_trade. Restituisce (motivo se impossibile a qualsiasi prezzo, limite di prezzo).
+    """
+    min_qty, min_notional, step = info['minQty'], info['minNotional'], info['stepSize']
+    if is_buy:
+        # Si spende al massimo il budget: il nozionale non può superarlo
+        if min_notional > budget:
+            return 'FAIL_MIN_NOTIONAL', None
+        # La quantità acquistata scende al salire dell'ask: sopra budget / max(minQty, stepSize) non basta più
+        smallest = max(min_qty, step)
+        if smallest <= 0:
+            return None, None
+        return None, (symbol, True, float(budget / smallest), float(budget / step) if step > 0 else None)
+
+    # Vendita: la quantità è il budget arrotondato allo stepSize, indipendente dal prezzo
+    quantity = (budget // step) * step if step > 0 else budget
+    if quantity == 0:
+        return 'FAIL_STEP_SIZE', None
+    if quantity < min_qty:
+        return 'FAIL_MIN_QTY', None
+    if min_notional <= 0:
+        return None, None
+    # Il nozionale scende con il bid: sotto minNotional / quantità la vendita fallisce
+    return None, (symbol, False, float(min_notional / quantity), None)
+
+def first_leg_failure(limit: FirstLegLimit, prices) -> Optional[str]:
+    """Esito della prima gamba se il prezzo corrente supera il limite precalcolato, None se va simulata"""
+    symbol, is_buy, bound, zero_bound = limit
+    sid = prices.symbol_ids.get(symbol)
+    if sid is None:
+        return None
+    if is_buy:
+        ask = prices.ask[sid]
+        if ask <= bound * (1 + _BOUND_MARGIN):
+            return None
+        return 'FAIL_STEP_SIZE' if zero_bound is not None and ask > zero_bound * (1 + _BOUND_MARGIN) else 'FAIL_MIN_QTY'
+    bid = prices.bid[sid]
+    if bid <= 0 or bid >= bound * (1 - _BOUND_MARGIN):
+        return None  # Senza prezzo decide simulate_trade (FAIL_NO_DATA)
+    return 'FAIL_MIN_NOTIONAL'
+
+class StaticFeasibilityFilter:
+    """Triangoli dell'indice eseguibili al budget corrente, con l'interfaccia usata da WorkPartitioner"""
+
+    def __init__(self):
+        self.version = 0
+        self._key = None
+        self._symbol_info_map: Optional[Dict[str, Dict]] = None
+        self._triangles: List[Tuple[str, str, str]] = []
+        self.first_leg_limits: Dict[Tuple[str, str], FirstLegLimit] = {}
+        self.dropped: Dict[str, int] = {}  # Motivo -> triangoli esclusi
+        self.dropped_total = 0
+
+    def __len__(self) -> int:
+        return len(self._triangles)
+
+    def triangles(self) -> List[Tuple[str, str, str]]:
+        return self._triangles
+
+    def refresh(self, index, symbol_info_map: Dict[str, Dict], existing_pairs: Dict[str, Dict[str, str]], budget: Decimal) -> bool:
+        """
+        Ricalcola il filtro se indice (o quota di triangoli), mappa dei simboli (sostituita a ogni
+        cambio di metadati) o budget sono cambiati. Restituisce True se è stato ricalcolato.
+        """
+        key = (index.version, budget)
+        if key == self._key and symbol_info_map is self._symbol_info_map:
+            return False
+        self._key = key
+        self._symbol_info_map = symbol_info_map
+
+        verdicts: Dict[Tuple[str, str], Optional[str]] = {}  # Prima gamba -> motivo dell'esclusione o None
+        limits: Dict[Tuple[str, str], FirstLegLimit] = {}
+        dropped: Dict[str, int] = {}
+        triangles = []
+        for triangle in index.triangles():
+            first_leg = (triangle[0], triangle[1])
+            if first_leg not in verdicts:
+                symbol, side = leg_symbol(triangle[0], triangle[1], existing_pairs)
+                info = symbol_info_map.get(symbol) if symbol is not None else None
+                reason, limit = analyze_first_leg(symbol, side == 'BUY', info, budget) if info else (None, None)
+                verdicts[first_leg] = reason
+                if limit is not None:
+                    limits[first_leg] = limit
+            reason = verdicts[first_leg]
+            if reason is None:
+                triangles.append(triangle)
+            else:
+                dropped[reason] = dropped.get(reason, 0) + 1
+
+        self._triangles = triangles
+        self.first_leg_limits = limits
+        self.dropped = dropped
+        self.dropped_total = sum(dropped.values())
+        self.version += 1
+        return True
@@ -0,0 +1,85 @@
+"""
+Cache su disco dei metadati dei simboli (exchangeInfo già filtrato e convertito)
+Permette un avvio immediato dopo un riavvio: i metadati vengono poi aggiornati in background
+"""
+
+import json
+import os
+import time
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Da incrementare ogni volta che cambia il formato del file o il parsing dei filtri
+SYMBOL_CACHE_VERSION = 1
+
+# Ordine dei campi salvati per ogni simbolo
+_FIELDS = ('base', 'quote', 'minQty', 'minNotional', 'stepSize')
+_DECIMAL_FIELDS = ('minQty', 'minNotional', 'stepSize')
+
+def encode_symbol_map(symbol_info_map: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """Forma compatta serializzabile in JSON (usata dalla cache e dal bus distribuito)"""
+    return {symbol: [str(info[field]) for field in _FIELDS] for symbol, info in symbol_info_map.items()}
+
+def decode_symbol_map(encoded: Dict[str, List[str]]) -> Dict[str, Dict]:
+    symbol_info_map = {}
+    for symbol, values in encoded.items():
+        info = dict(zip(_FIELDS, values))
+        for field in _DECIMAL_FIELDS:
+            info[field] = Decimal(info[field])
+        symbol_info_map[symbol] = info
+    return symbol_info_map
+
+def save_symbol_cache(path: str, symbol_info_map: Dict[str, Dict], starting_assets: Iterable[str]):
+    """Salva la mappa dei simboli in formato compatto con scrittura atomica"""
+    payload = {
+        'version': SYMBOL_CACHE_VERSION,
+        'starting_assets': sorted(starting_assets),
+        'saved_at': time.time(),
+        'symbols': encode_symbol_map(symbol_info_map)
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def load_symbol_cache(path: str, starting_assets: Iterable[str]) -> Optional[Tuple[Dict[str, Dict], float]]:
+    """
+    Carica la mappa dei simboli dalla cache.
+    Restituisce (symbol_info_map, età in secondi) o None se la cache manca o non è compatibile.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Cache simboli illeggibile ({path}): {e}")
+        return None
+
+    if payload.get('version') != SYMBOL_CACHE_VERSION:
+        logger.info(f"Cache simboli ignorata: versione {payload.get('version')} diversa da {SYMBOL_CACHE_VERSION}")
+        return None
+    if payload.get('starting_assets') != sorted(starting_assets):
+        logger.info("Cache simboli ignorata: asset di partenza cambiati")
+        return None
+
+    return decode_symbol_map(payload.get('symbols', {})), time.time() - payload.get('saved_at', 0)
+
+def read_cached_starting_assets(path: str) -> Optional[List[str]]:
+    """Asset di partenza con cui è stata costruita la cache (per gli strumenti offline)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('starting_assets')
+    except Exception:
+        return None
+
+def diff_symbol_maps(old: Dict[str, Dict], new: Dict[str, Dict]) -> Tuple[set, set, set]:
+    """Confronta due mappe di simboli: restituisce (aggiunti, rimossi, con metadati cambiati)"""
+    old_symbols, new_symbols = set(old), set(new)
+    added = new_symbols - old_symbols
+    removed = old_symbols - new_symbols
+    changed = {s for s in old_symbols & new_symbols if old[s] != new[s]}
+    return added, removed, changed
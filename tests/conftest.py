@@ -0,0 +1,6 @@
+"""Configurazione comune dei test: i moduli del bot vivono nella radice del repository"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
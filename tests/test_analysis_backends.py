@@ -0,0 +1,71 @@
+"""Test del backend a memoria condivisa: invalidazione della cache degli argomenti e crescita del segmento del book"""
+
+import os
+
+import pytest
+
+from analysis_backends import SharedMemoryExecutor
+from top_of_book import TopOfBook
+
+def describe(table):
+    """Identità dell'oggetto nel processo worker e contenuto: lo stesso id indica un oggetto preso dalla cache"""
+    return id(table), sum(table.values())
+
+def read_bids(book, symbols):
+    return [book.bid[book.symbol_ids[symbol]] for symbol in symbols], len(book.bid)
+
+def crash():
+    os._exit(1)
+
+def book(size, bid=1.0):
+    symbols = [f"S{i}USDT" for i in range(size)]
+    prices = TopOfBook(symbols)
+    for i, symbol in enumerate(symbols):
+        prices.update(symbol, bid + i, bid + i + 0.5, 1.0, 1.0, 1.0)
+    return prices.snapshot()
+
+@pytest.fixture
+def executor():
+    executor = SharedMemoryExecutor(1)
+    yield executor
+    executor.shutdown()
+
+def test_large_arguments_are_resent_only_when_replaced(executor):
+    table = {f"k{i}": i for i in range(100)}
+    first_id, first_sum = executor.submit(describe, table).result(timeout=10)
+    cached_id, cached_sum = executor.submit(describe, table).result(timeout=10)
+    assert (cached_id, cached_sum) == (first_id, first_sum)
+
+    # Un oggetto nuovo (anche con lo stesso contenuto) sostituisce quello in cache
+    replaced = {f"k{i}": 2 * i for i in range(100)}
+    replaced_id, replaced_sum = executor.submit(describe, replaced).result(timeout=10)
+    assert replaced_sum == 2 * first_sum
+    assert executor.submit(describe, dict(replaced)).result(timeout=10)[1] == replaced_sum
+
+    # Argomenti piccoli: sempre inviati per valore, la cache resta quella dell'ultimo oggetto grande
+    last_large = executor._workers[0].sent[('describe', 0)]
+    assert executor.submit(describe, {'a': 1}).result(timeout=10)[1] == 1
+    assert executor._workers[0].sent[('describe', 0)] is last_large
+
+def test_book_segment_grows_with_the_universe_and_is_rewritten_per_snapshot(executor):
+    worker = executor._workers[0]
+    assert executor.submit(read_bids, book(2), ['S1USDT']).result(timeout=10) == ([2.0], 2)
+    small_segment = worker.segment.name
+
+    # Universo più grande: nuovo segmento, il worker si collega a quello nuovo
+    bids, size = executor.submit(read_bids, book(500), ['S0USDT', 'S499USDT']).result(timeout=10)
+    assert (bids, size) == ([1.0, 500.0], 500)
+    assert worker.segment.name != small_segment
+
+    # Universo più piccolo: stesso segmento, riscritto con il nuovo snapshot
+    grown_segment = worker.segment.name
+    assert executor.submit(read_bids, book(3, bid=10.0), ['S2USDT']).result(timeout=10) == ([12.0], 3)
+    assert worker.segment.name == grown_segment
+
+def test_crashed_worker_restarts_with_empty_cache(executor):
+    table = {f"k{i}": i for i in range(100)}
+    executor.submit(describe, table).result(timeout=10)
+    with pytest.raises(RuntimeError):
+        executor.submit(crash).result(timeout=10)
+    # Il processo nuovo non ha la cache del precedente: l'oggetto viene reinviato
+    assert executor.submit(describe, table).result(timeout=10)[1] == sum(range(100))
@@ -0,0 +1,93 @@
+"""Test della ricarica a caldo: validazione dei parametri di strategia e applicazione tutto o niente"""
+
+import shutil
+from decimal import Decimal
+
+import pytest
+
+import config
+from config_reload import RELOADABLE, ConfigReloader, validate_strategy
+
+def strategy(**overrides):
+    values = {name: getattr(config, name) for name in RELOADABLE}
+    values.update(overrides)
+    return values
+
+def test_current_configuration_is_valid():
+    assert validate_strategy(strategy()) == []
+
+@pytest.mark.parametrize('name, value', [
+    ('MIN_PROFIT_THRESHOLD', Decimal('1')),
+    ('MIN_PROFIT_THRESHOLD', 'abc'),
+    ('TRADING_FEE', -0.001),
+    ('SIMULATION_BUDGET_USDT', 0),
+    ('SIMULATION_BUDGET_USDT', float('inf')),
+    ('TRADE_BUDGET_USDT', float('nan')),
+    ('TRADE_BUDGET_USDT', True),
+    ('OPPORTUNITY_COOLDOWN', -1),
+    ('OPPORTUNITY_REALERT_MARGIN', 'x'),
+    ('STARTING_ASSETS', set()),
+    ('STARTING_ASSETS', {'USDT', 'BAD ASSET'}),
+    ('SCENARIOS', [(0.001, 22)]),
+    ('SCENARIOS', [(0.2, 22, 0.0005)]),
+])
+def test_invalid_values_are_reported(name, value):
+    errors = validate_strategy(strategy(**{name: value}))
+    assert len(errors) == 1 and errors[0].startswith(name)
+
+def test_missing_parameter_is_reported():
+    values = strategy()
+    del values['TRADING_FEE']
+    assert validate_strategy(values) == ['TRADING_FEE mancante']
+
+@pytest.fixture
+def reloader(tmp_path, monkeypatch):
+    """ConfigReloader su una copia di config.py; i valori di config vengono ripristinati a fine test"""
+    for name in RELOADABLE:
+        monkeypatch.setattr(config, name, getattr(config, name))
+    path = tmp_path / 'config.py'
+    shutil.copy(config.__file__, path)
+    changes = []
+    return ConfigReloader(changes.append, str(path)), path, changes
+
+def edit(path, *replacements):
+    text = path.read_text(encoding='utf-8')
+    for old, new in replacements:
+        assert old in text
+        text = text.replace(old, new, 1)
+    path.write_text(text, encoding='utf-8')
+
+THRESHOLD = "MIN_PROFIT_THRESHOLD = Decimal('0.0005')"
+FEE = 'TRADING_FEE = Decimal("0.00075")'
+
+def test_valid_changes_are_applied_together(reloader):
+    reloader, path, changes = reloader
+    edit(path, (THRESHOLD, "MIN_PROFIT_THRESHOLD = Decimal('0.001')"), (FEE, 'TRADING_FEE = 0.001'))
+    applied = reloader.reload()
+    assert set(applied) == {'MIN_PROFIT_THRESHOLD', 'TRADING_FEE'}
+    assert config.MIN_PROFIT_THRESHOLD == Decimal('0.001') and config.TRADING_FEE == Decimal('0.001')
+    assert isinstance(config.TRADING_FEE, Decimal)  # Stesso tipo dei valori caricati all'avvio
+    assert changes == [applied] and reloader.reloads == 1
+
+def test_one_invalid_value_rejects_the_whole_reload(reloader):
+    reloader, path, changes = reloader
+    before = {name: getattr(config, name) for name in RELOADABLE}
+    edit(path, (THRESHOLD, "MIN_PROFIT_THRESHOLD = Decimal('0.001')"), (FEE, 'TRADING_FEE = Decimal("0.5")'))
+    assert reloader.reload() == {}
+    # Nemmeno la soglia valida viene applicata
+    assert {name: getattr(config, name) for name in RELOADABLE} == before
+    assert changes == [] and reloader.rejected == 1
+
+def test_broken_file_changes_nothing(reloader):
+    reloader, path, changes = reloader
+    before = {name: getattr(config, name) for name in RELOADABLE}
+    edit(path, (THRESHOLD, "MIN_PROFIT_THRESHOLD = Decimal('0.001'"))
+    assert reloader.reload() == {}
+    assert {name: getattr(config, name) for name in RELOADABLE} == before
+    assert changes == [] and reloader.rejected == 1
+
+def test_restart_only_parameters_are_not_applied(reloader):
+    reloader, path, changes = reloader
+    edit(path, ('REST_POOL_SIZE = 4', 'REST_POOL_SIZE = 8'))
+    assert reloader.reload() == {}
+    assert config.REST_POOL_SIZE == 4 and changes == [] and reloader.rejected == 0
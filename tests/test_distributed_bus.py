@@ -0,0 +1,85 @@
+"""
+Test del bus distribuito: un broadcaster locale e più processi detector_node.py
+Con soglia di profitto negativa ogni triangolo valutato diventa un'opportunità,
+così i risultati dei detector mostrano esattamente la quota di ciascuno.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from decimal import Decimal
+
+from distributed_bus import BookBroadcaster
+from top_of_book import TopOfBook
+from triangle_index import TriangleIndex
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRICES = {
+    'BTCUSDT': 60000.0, 'ETHUSDT': 3000.0, 'BNBUSDT': 600.0,
+    'ETHBTC': 0.05, 'BNBBTC': 0.01, 'BNBETH': 0.2,
+}
+
+def symbol_info_map():
+    return {
+        symbol: {'base': symbol[:3], 'quote': symbol[3:], 'minQty': Decimal('0.00001'),
+                 'minNotional': Decimal('0.0000001'), 'stepSize': Decimal('0.00001')}
+        for symbol in PRICES
+    }
+
+def book(now: float) -> TopOfBook:
+    prices = TopOfBook(PRICES)
+    for symbol, price in PRICES.items():
+        prices.update(symbol, price * 0.9999, price * 1.0001, 1e6, 1e6, now)
+    return prices
+
+async def run_bus(node_count: int, deadline: float):
+    """Avvia broadcaster e detector, restituisce l'ultimo risultato per nodo e il numero di connessioni"""
+    latest = {}
+
+    async def on_results(node_id, result):
+        latest[node_id] = result
+
+    info = symbol_info_map()
+    broadcaster = BookBroadcaster('127.0.0.1', 0, on_results)
+    broadcaster.set_strategy({'USDT'}, Decimal('0.001'), Decimal('-0.5'), Decimal('100'))
+    broadcaster.set_universe(info, book(time.time()))
+    await broadcaster.start()
+    port = broadcaster._server.sockets[0].getsockname()[1]
+    expected = TriangleIndex(info, {'USDT'}).triangles()
+
+    detectors = [
+        subprocess.Popen([sys.executable, 'detector_node.py', '--host', '127.0.0.1', '--port', str(port), '--cores', '1'],
+                         cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(node_count)
+    ]
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+            # Ultimo risultato di ogni nodo connesso, calcolato con la ripartizione a node_count nodi
+            results = [latest.get(node_id) for node_id in broadcaster._links]
+            if len(results) == node_count and None not in results:
+                found = [tuple(opportunity[:3]) for result in results for opportunity in result['opportunities']]
+                if sorted(found) == expected:
+                    break
+        return [latest.get(node_id) for node_id in broadcaster._links], broadcaster._next_node_id, expected
+    finally:
+        # SIGINT come da terminale: il detector chiude il proprio pool di processi prima di uscire
+        for detector in detectors:
+            detector.send_signal(signal.SIGINT)
+        for detector in detectors:
+            detector.wait(timeout=10)
+        broadcaster._server.close()
+
+def test_detector_shares_cover_all_triangles_once():
+    # Tre gruppi di prima gamba su quattro nodi: un detector resta senza triangoli
+    results, connections, expected = asyncio.run(run_bus(4, time.monotonic() + 30))
+    assert connections == 4  # Nessun detector scollegato e riconnesso
+    assert None not in results and len(results) == 4
+    shares = [sorted(tuple(opportunity[:3]) for opportunity in result['opportunities']) for result in results]
+    assert [len(share) for share in shares] == [result['triangles'] for result in results]
+    assert sorted(t for share in shares for t in share) == expected
+    assert [] in shares  # Il nodo senza quota invia comunque i risultati
@@ -0,0 +1,46 @@
+"""Test dell'archivio delle valutazioni: prezzo e quantità esposta di ogni gamba raggiunta, fallita compresa"""
+
+import math
+from decimal import Decimal
+
+from arbitraggio import find_arbitrage_worker
+from evaluation_archive import STATUS_CODES, EvaluationArchive, read_blocks
+from top_of_book import TopOfBook
+
+SYMBOL_INFO = {
+    symbol: {'base': base, 'quote': quote, 'minQty': Decimal('0.00001'), 'minNotional': Decimal('0.0001'),
+             'stepSize': Decimal('0.00001')}
+    for symbol, base, quote in (('BTCUSDT', 'BTC', 'USDT'), ('ETHBTC', 'ETH', 'BTC'), ('ETHUSDT', 'ETH', 'USDT'))
+}
+EXISTING_PAIRS = {'BTC': {'USDT': 'BTCUSDT'}, 'ETH': {'BTC': 'ETHBTC', 'USDT': 'ETHUSDT'}}
+
+def archived_rows(tmp_path, ethbtc_ask_qty):
+    prices = TopOfBook(SYMBOL_INFO)
+    prices.update('BTCUSDT', 59999.0, 60000.0, 10.0, 10.0, 1.0)
+    prices.update('ETHBTC', 0.0499, 0.05, 100.0, ethbtc_ask_qty, 1.0)
+    prices.update('ETHUSDT', 3001.0, 3002.0, 100.0, 7.0, 1.0)
+    triangles = [('USDT', 'BTC', 'ETH')]
+    _, _, _, _, _, evaluations, _ = find_arbitrage_worker(
+        0, prices.snapshot(), SYMBOL_INFO, Decimal('0.001'), Decimal('0.001'), Decimal('600'), triangles,
+        EXISTING_PAIRS, archive=True)
+
+    archive = EvaluationArchive(str(tmp_path))
+    archive.submit(1, 1.0, triangles, evaluations)
+    archive.close()
+    (assets, block), = read_blocks(tmp_path.glob('*.tca'))
+    return {name: values[0] for name, values in block.items()}
+
+def test_failing_leg_price_and_quantity_are_archived(tmp_path):
+    # 600 USDT comprano 0.01 BTC, che comprano 0.2 ETH: l'ask di ETHBTC ne espone solo 0.05
+    row = archived_rows(tmp_path, ethbtc_ask_qty=0.05)
+    assert row['status'] == STATUS_CODES['FAIL_LIQUIDITY'] and row['failed_leg'] == 2
+    assert (row['price1'], row['qty1']) == (60000.0, 10.0)
+    assert (row['price2'], row['qty2']) == (0.05, 0.05)
+    assert math.isnan(row['rate2']) and math.isnan(row['price3']) and math.isnan(row['qty3'])
+
+def test_evaluated_row_archives_all_legs(tmp_path):
+    row = archived_rows(tmp_path, ethbtc_ask_qty=100.0)
+    assert row['status'] == STATUS_CODES['EVALUATED']
+    # Vendita finale su ETHUSDT: bid e quantità esposta sul bid
+    assert [row[name] for name in ('price1', 'qty1', 'price2', 'qty2', 'price3', 'qty3')] == \
+        [60000.0, 10.0, 0.05, 100.0, 3001.0, 100.0]
@@ -0,0 +1,139 @@
+"""Test delle rotte di liquidazione d'emergenza eseguite in DRY_RUN"""
+
+import asyncio
+from decimal import Decimal
+
+import config
+from liquidation_routes import LiquidationRouter
+from trading_executor import TradingExecutor
+
+SYMBOL_INFO = {
+    'XYZBTC': {'base': 'XYZ', 'quote': 'BTC', 'stepSize': '1'},
+    'BTCUSDT': {'base': 'BTC', 'quote': 'USDT', 'stepSize': '0.00001'},
+}
+
+class TestOrderClient:
+    """Client Binance minimo: registra gli ordini di test"""
+    __test__ = False
+
+    def __init__(self):
+        self.orders = []
+
+    def create_test_order(self, **params):
+        self.orders.append(params)
+        return {}
+
+def test_two_hop_route_runs_in_dry_run(monkeypatch):
+    monkeypatch.setattr(config, 'DRY_RUN_MODE', True)
+    monkeypatch.setattr(config, 'AUTO_TRADE_ENABLED', False)
+    router = LiquidationRouter(SYMBOL_INFO, ['USDT'], ['BTC'])
+    route = router.route('XYZ', 'USDT')
+    assert [(hop['symbol'], hop['side']) for hop in route] == [('XYZBTC', 'SELL'), ('BTCUSDT', 'SELL')]
+
+    executor = TradingExecutor()
+    executor.client = TestOrderClient()
+    result = asyncio.run(executor.emergency_liquidation('XYZ', 'USDT', Decimal('12.7'), route))
+
+    assert result['status'] == 'TEST_SUCCESS'
+    assert [order['symbol'] for order in executor.client.orders] == ['XYZBTC', 'BTCUSDT']
+    # Il primo passaggio vende la quantità arrotondata allo stepSize
+    assert executor.client.orders[0]['quantity'] == '12'
+
+TRIANGLE_INFO = {
+    'BTCUSDT': {'base': 'BTC', 'quote': 'USDT', 'stepSize': Decimal('0.00001')},
+    'ETHBTC': {'base': 'ETH', 'quote': 'BTC', 'stepSize': Decimal('0.0001')},
+    'ETHUSDT': {'base': 'ETH', 'quote': 'USDT', 'stepSize': Decimal('0.0001')},
+}
+
+class ScriptedHybridExecutor:
+    """Executor ibrido minimo: esiti delle gambe per simbolo e ricerca dell'ordine registrata"""
+
+    def __init__(self, outcomes, lookup=None):
+        self.outcomes = outcomes
+        self.lookup = lookup
+        self.rest_client = object()
+        self.orders = []
+        self.lookups = []
+
+    def prepare_legs(self, legs):
+        return [None] * len(legs)
+
+    async def execute_planned_order(self, leg, template, amount):
+        self.orders.append((leg['symbol'], leg['side'], amount))
+        outcome = self.outcomes.get(leg['symbol'], 'fill')
+        if outcome == 'timeout':
+            return {'status': 'TIMEOUT', 'symbol': leg['symbol'], 'side': leg['side'],
+                    'client_order_id': 'tri-1', 'expires_at': 0.0}
+        if outcome == 'partial':
+            # Metà dell'importo eseguita a un prezzo fisso di 0.05
+            spent = Decimal(amount) / 2
+            return {'status': 'NOT_FILLED', 'symbol': leg['symbol'], 'side': leg['side'],
+                    'quantity': spent / Decimal('0.05'), 'received': spent / Decimal('0.05'), 'spent': spent}
+        return self.filled(leg, amount)
+
+    @staticmethod
+    def filled(leg, amount):
+        return {'status': 'SUCCESS', 'symbol': leg['symbol'], 'side': leg['side'], 'quantity': Decimal(amount),
+                'received': Decimal(leg.get('expected_received', amount)), 'method': 'websocket'}
+
+    async def resolve_order(self, symbol, side, client_order_id, expires_at):
+        self.lookups.append(client_order_id)
+        if self.lookup == 'filled':
+            return {'status': 'SUCCESS', 'symbol': symbol, 'side': side, 'quantity': Decimal('0.1'),
+                    'received': Decimal('0.1'), 'method': 'rest_lookup'}
+        return {'status': self.lookup, 'symbol': symbol, 'side': side, 'client_order_id': client_order_id}
+
+    def get_performance_stats(self):
+        return {}
+
+def run_triangle(monkeypatch, tmp_path, hybrid):
+    """USDT→BTC→ETH→USDT con le rotte di rientro verso USDT e l'executor ibrido dato"""
+    from order_plan import build_order_plan
+    from top_of_book import TopOfBook
+
+    monkeypatch.setattr(config, 'TRADING_LOG_FILE', str(tmp_path / 'trades.log'))
+    monkeypatch.setattr(config, 'TRADING_ERROR_LOG_FILE', str(tmp_path / 'errors.log'))
+    monkeypatch.setattr(TradingExecutor, '_send_telegram_notification', lambda self, message: None)
+    prices = TopOfBook(TRIANGLE_INFO)
+    prices.update('BTCUSDT', 59999.0, 60000.0, 10.0, 10.0, 1.0)
+    prices.update('ETHBTC', 0.0499, 0.05, 100.0, 100.0, 1.0)
+    prices.update('ETHUSDT', 3001.0, 3002.0, 100.0, 100.0, 1.0)
+    existing_pairs = {'BTC': {'USDT': 'BTCUSDT'}, 'ETH': {'BTC': 'ETHBTC', 'USDT': 'ETHUSDT'}}
+    plan = build_order_plan(('USDT', 'BTC', 'ETH'), Decimal('600'), Decimal('0'), prices.snapshot(),
+                            existing_pairs, TRIANGLE_INFO, LiquidationRouter(TRIANGLE_INFO, ['USDT'], ['BTC']))
+
+    executor = TradingExecutor()
+    executor.hybrid_executor = hybrid
+    executor._balances = {'USDT': Decimal('1000')}
+    executor._balances_time = float('inf')
+    monkeypatch.setattr(executor, '_schedule_balance_refresh', lambda: None)
+    return asyncio.run(executor.execute_arbitrage({'plan': plan}))
+
+def test_timed_out_leg_found_filled_continues(monkeypatch, tmp_path):
+    hybrid = ScriptedHybridExecutor({'ETHBTC': 'timeout'}, lookup='filled')
+    result = run_triangle(monkeypatch, tmp_path, hybrid)
+    assert result['status'] == 'SUCCESS'
+    assert hybrid.lookups == ['tri-1']
+    # Nessuna liquidazione: la terza gamba vende quanto trovato con la ricerca
+    assert [order[0] for order in hybrid.orders] == ['BTCUSDT', 'ETHBTC', 'ETHUSDT']
+    assert hybrid.orders[-1] == ('ETHUSDT', 'SELL', '0.1')
+
+def test_timed_out_leg_never_executed_liquidates_the_input(monkeypatch, tmp_path):
+    hybrid = ScriptedHybridExecutor({'ETHBTC': 'timeout'}, lookup='NOT_FOUND')
+    result = run_triangle(monkeypatch, tmp_path, hybrid)
+    assert result['status'] == 'FAILED'
+    assert hybrid.orders[-1] == ('BTCUSDT', 'SELL', '0.01')
+
+def test_unresolved_timeout_is_not_liquidated(monkeypatch, tmp_path):
+    hybrid = ScriptedHybridExecutor({'ETHBTC': 'timeout'}, lookup='TIMEOUT')
+    result = run_triangle(monkeypatch, tmp_path, hybrid)
+    assert result['status'] == 'FAILED'
+    # L'ordine può essere stato eseguito: vendere i BTC potrebbe vendere ciò che non si possiede più
+    assert [order[0] for order in hybrid.orders] == ['BTCUSDT', 'ETHBTC']
+
+def test_partial_fill_liquidates_remainder_and_received(monkeypatch, tmp_path):
+    hybrid = ScriptedHybridExecutor({'ETHBTC': 'partial'})
+    result = run_triangle(monkeypatch, tmp_path, hybrid)
+    assert result['status'] == 'FAILED'
+    # Metà dei 0.01 BTC è rimasta, l'altra metà è diventata 0.1 ETH: ognuno rientra con la propria rotta
+    assert hybrid.orders[2:] == [('BTCUSDT', 'SELL', '0.005'), ('ETHUSDT', 'SELL', '0.1')]
@@ -0,0 +1,40 @@
+"""Test dell'arbitraggio tra feed market data ridondanti"""
+
+import json
+from decimal import Decimal
+
+import arbitraggio
+from market_data_feeds import FeedStats, book_ticker_update_id
+from top_of_book import TopOfBook
+
+def book_ticker(update_id, bid='25.35190000', symbol='BNBUSDT'):
+    """Messaggio bookTicker dello stream combinato, compatto come lo invia Binance"""
+    data = {'u': update_id, 's': symbol, 'b': bid, 'B': '31.21000000', 'a': '25.36520000', 'A': '40.66000000'}
+    return json.dumps({'stream': f'{symbol.lower()}@bookTicker', 'data': data}, separators=(',', ':'))
+
+def test_book_ticker_update_id_reads_raw_text():
+    assert book_ticker_update_id(book_ticker(400900217)) == ('BNBUSDT', 400900217)
+    assert book_ticker_update_id('{"result":null,"id":1}') is None
+
+def test_duplicates_are_dropped_before_decoding(monkeypatch):
+    class Scheduler:
+        def mark_updated(self, symbol):
+            pass
+
+    monkeypatch.setattr(arbitraggio.config, 'MARKET_DATA_FEEDS_PER_GROUP', 2)
+    monkeypatch.setattr(arbitraggio, 'prices_cache', TopOfBook(['BNBUSDT']))
+    monkeypatch.setattr(arbitraggio, 'analysis_scheduler', Scheduler())
+    fast, slow = FeedStats(), FeedStats()
+    arbitraggio.apply_book_ticker(book_ticker(10, bid='25.1'), fast)
+    arbitraggio.apply_book_ticker(book_ticker(11, bid='25.2'), fast)
+
+    def no_decode(msg):
+        raise AssertionError("duplicato decodificato")
+
+    monkeypatch.setattr(arbitraggio.json, 'loads', no_decode)
+    arbitraggio.apply_book_ticker(book_ticker(11, bid='99.0'), slow)
+    arbitraggio.apply_book_ticker(book_ticker(10, bid='99.0'), slow)
+
+    assert fast.first_arrivals == 2
+    assert (slow.first_arrivals, slow.duplicates, slow.obsolete) == (0, 1, 1)
+    assert arbitraggio.prices_cache.get('BNBUSDT')['bid'] == Decimal('25.2')
@@ -0,0 +1,114 @@
+"""Test dei piani d'ordine: budget nell'asset di partenza e limite sul saldo del processo di trading"""
+
+import asyncio
+import time
+from decimal import Decimal, localcontext
+
+import arbitraggio
+import config
+from top_of_book import TopOfBook
+from trading_executor import TradingExecutor
+from trading_queue import TradingQueue
+
+SYMBOL_INFO = {
+    'BTCUSDT': {'base': 'BTC', 'quote': 'USDT', 'minQty': Decimal('0.00001'), 'minNotional': Decimal('5'), 'stepSize': Decimal('0.00001')},
+    'ETHBTC': {'base': 'ETH', 'quote': 'BTC', 'minQty': Decimal('0.0001'), 'minNotional': Decimal('0.0001'), 'stepSize': Decimal('0.0001')},
+    'ETHUSDT': {'base': 'ETH', 'quote': 'USDT', 'minQty': Decimal('0.0001'), 'minNotional': Decimal('5'), 'stepSize': Decimal('0.0001')},
+}
+EXISTING_PAIRS = {'BTC': {'USDT': 'BTCUSDT'}, 'ETH': {'BTC': 'ETHBTC', 'USDT': 'ETHUSDT'}}
+
+def book():
+    prices = TopOfBook(SYMBOL_INFO)
+    prices.update('BTCUSDT', 59999.0, 60000.0, 10.0, 10.0, 1.0)
+    prices.update('ETHBTC', 0.0499, 0.05, 100.0, 100.0, 1.0)
+    prices.update('ETHUSDT', 3001.0, 3002.0, 100.0, 100.0, 1.0)
+    return prices
+
+def test_budget_is_converted_to_the_start_asset(monkeypatch):
+    queue = TradingQueue(max_quote_age=60.0, capacity=10)
+    monkeypatch.setattr(arbitraggio, 'symbol_info_map', SYMBOL_INFO)
+    monkeypatch.setattr(arbitraggio, 'trading_queue', queue)
+    monkeypatch.setattr(config, 'TRADE_BUDGET_USDT', Decimal('10'))
+    prices = book().snapshot()
+    arbitraggio.enqueue_trade(('BTC', 'ETH', 'USDT'), 1, prices, EXISTING_PAIRS, time.time())
+
+    plan = queue.pop().trading_data['plan']
+    first_leg = plan['legs'][0]
+    # 10 USDT all'ask di BTCUSDT, non 10 BTC
+    assert (first_leg['symbol'], first_leg['amount_field']) == ('ETHBTC', 'quoteOrderQty')
+    assert Decimal(plan['budget']) == Decimal(first_leg['amount'])
+    # 10 / 60000 = 0.0001666..., troncato a 8 decimali (mai arrotondato per eccesso)
+    assert first_leg['amount'] == '0.00016666'
+
+def test_sell_first_leg_is_floored_to_step(monkeypatch):
+    queue = TradingQueue(max_quote_age=60.0, capacity=10)
+    monkeypatch.setattr(arbitraggio, 'symbol_info_map', SYMBOL_INFO)
+    monkeypatch.setattr(arbitraggio, 'trading_queue', queue)
+    monkeypatch.setattr(config, 'TRADE_BUDGET_USDT', Decimal('10'))
+    arbitraggio.enqueue_trade(('ETH', 'BTC', 'USDT'), 1, book().snapshot(), EXISTING_PAIRS, time.time())
+
+    first_leg = queue.pop().trading_data['plan']['legs'][0]
+    # 10 / 3002 = 0.003331... ETH, arrotondati per difetto allo stepSize 0.0001
+    assert (first_leg['symbol'], first_leg['side'], first_leg['amount']) == ('ETHBTC', 'SELL', '0.0033')
+
+def test_missing_usdt_price_skips_the_candidate(monkeypatch):
+    queue = TradingQueue(max_quote_age=60.0, capacity=10)
+    monkeypatch.setattr(arbitraggio, 'symbol_info_map', SYMBOL_INFO)
+    monkeypatch.setattr(arbitraggio, 'trading_queue', queue)
+    prices = TopOfBook(SYMBOL_INFO)
+    prices.update('ETHBTC', 0.0499, 0.05, 100.0, 100.0, 1.0)
+    arbitraggio.enqueue_trade(('BTC', 'ETH', 'USDT'), 1, prices.snapshot(), EXISTING_PAIRS, time.time())
+    assert len(queue) == 0
+
+class AccountClient:
+    """Client Binance minimo: saldi fissi e ordini di test registrati"""
+
+    def __init__(self, balances):
+        self.balances = balances
+        self.account_reads = 0
+        self.orders = []
+
+    def get_account(self):
+        self.account_reads += 1
+        return {'balances': [{'asset': asset, 'free': free} for asset, free in self.balances.items()]}
+
+    def create_test_order(self, **params):
+        self.orders.append(params)
+        return {}
+
+def test_balance_cap_blocks_oversized_first_leg(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'DRY_RUN_MODE', True)
+    monkeypatch.setattr(config, 'AUTO_TRADE_ENABLED', False)
+    monkeypatch.setattr(config, 'TRADING_LOG_FILE', str(tmp_path / 'trades.log'))
+    monkeypatch.setattr(config, 'TRADING_ERROR_LOG_FILE', str(tmp_path / 'errors.log'))
+    monkeypatch.setattr(TradingExecutor, '_send_telegram_notification', lambda self, message: None)
+    plan = arbitraggio.build_order_plan(('BTC', 'ETH', 'USDT'), Decimal('0.0002'), config.TRADING_FEE,
+                                        book().snapshot(), EXISTING_PAIRS, SYMBOL_INFO)
+    executor = TradingExecutor()
+    executor.client = AccountClient({'BTC': '0.0001', 'USDT': '50'})
+
+    async def run():
+        await executor.warm_up()
+        blocked = await executor.execute_arbitrage({'plan': plan})
+        executor.client.balances['BTC'] = '0.01'
+        await executor.refresh_balances()
+        allowed = await executor.execute_arbitrage({'plan': plan})
+        return blocked, allowed
+
+    blocked, allowed = asyncio.run(run())
+    assert blocked['status'] == 'INSUFFICIENT_BALANCE'
+    assert allowed['status'] == 'SUCCESS'
+    # Solo il secondo trade invia ordini; i saldi non vengono letti prima di ogni trade
+    assert [order['symbol'] for order in executor.client.orders] == ['ETHBTC', 'ETHUSDT', 'BTCUSDT']
+    assert executor.client.account_reads <= 4
+
+def test_format_amount_truncates_without_rounding_up():
+    from order_plan import format_amount
+    assert format_amount(Decimal('0.123456789')) == '0.12345678'
+    assert format_amount(Decimal('0.000000015')) == '0.00000001'  # Il mezzo viene troncato, non arrotondato al pari
+    assert format_amount(Decimal('1.50000000')) == '1.5'
+    assert format_amount(Decimal('3')) == '3'
+    # Importi grandi anche con la precisione ridotta usata dall'analisi
+    with localcontext() as context:
+        context.prec = 12
+        assert format_amount(Decimal('65432.123456789')) == '65432.12345678'
@@ -0,0 +1,96 @@
+"""Test del client REST asincrono contro un server locale che imita l'API ordini di Binance"""
+
+import asyncio
+
+from aiohttp import web
+
+import config
+from rest_trader import AsyncRestTrader
+
+def test_default_url_follows_dry_run(monkeypatch):
+    monkeypatch.setattr(config, 'DRY_RUN_MODE', True)
+    assert AsyncRestTrader('key', 'secret').base_url == config.BINANCE_TESTNET_URL
+    monkeypatch.setattr(config, 'DRY_RUN_MODE', False)
+    assert AsyncRestTrader('key', 'secret').base_url == config.BINANCE_API_URL
+
+async def place_against(order_response, **order):
+    """Invia un ordine a un server locale che risponde sempre con order_response"""
+    requests = []
+
+    async def handle_order(request):
+        requests.append((request.path, dict(await request.post())))
+        return web.json_response(order_response)
+
+    app = web.Application()
+    app.router.add_post('/api/v3/order', handle_order)
+    app.router.add_post('/api/v3/order/test', handle_order)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    trader = AsyncRestTrader('key', 'secret', base_url=f"http://127.0.0.1:{port}")
+    try:
+        return await trader.place_market_order(**order), requests
+    finally:
+        await trader.close()
+        await runner.cleanup()
+
+def test_filled_order_is_success():
+    response = {'orderId': 7, 'status': 'FILLED', 'executedQty': '0.5', 'cummulativeQuoteQty': '30000.1',
+                'fills': [{'price': '60000.2'}]}
+    result, requests = asyncio.run(place_against(response, symbol='BTCUSDT', side='SELL', amount='0.5'))
+    assert result['status'] == 'SUCCESS'
+    assert str(result['received']) == '30000.1'
+    path, form = requests[0]
+    assert path == '/api/v3/order'
+    assert form['quantity'] == '0.5' and 'signature' in form
+    assert form['newClientOrderId'].startswith('tri')  # Ritrovabile con query_order in caso di timeout
+
+def test_expired_or_partial_order_is_not_a_fill():
+    for order_status in ('EXPIRED', 'PARTIALLY_FILLED'):
+        response = {'orderId': 8, 'status': order_status, 'executedQty': '0.2', 'cummulativeQuoteQty': '12000'}
+        result, _ = asyncio.run(place_against(response, symbol='BTCUSDT', side='SELL', amount='0.5'))
+        assert result['status'] == 'NOT_FILLED'
+        assert str(result['quantity']) == '0.2'
+
+def test_test_order_uses_test_endpoint():
+    result, requests = asyncio.run(place_against({}, symbol='BTCUSDT', side='BUY', amount='10',
+                                                 amount_field='quoteOrderQty', test=True))
+    assert result['status'] == 'TEST_SUCCESS'
+    assert requests[0][0] == '/api/v3/order/test'
+
+async def query_against(status_code, order_response):
+    """Cerca un ordine su un server locale che risponde con (status_code, order_response)"""
+    queries = []
+
+    async def handle_query(request):
+        queries.append(dict(request.query))
+        return web.json_response(order_response, status=status_code)
+
+    app = web.Application()
+    app.router.add_get('/api/v3/order', handle_query)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    trader = AsyncRestTrader('key', 'secret', base_url=f"http://127.0.0.1:{port}")
+    try:
+        return await trader.query_order('BTCUSDT', 'SELL', 'tri1-2-3'), queries
+    finally:
+        await trader.close()
+        await runner.cleanup()
+
+def test_query_order_finds_order_by_client_id():
+    response = {'orderId': 9, 'clientOrderId': 'tri1-2-3', 'status': 'FILLED', 'executedQty': '0.5',
+                'cummulativeQuoteQty': '30000.1'}
+    result, queries = asyncio.run(query_against(200, response))
+    assert result['status'] == 'SUCCESS' and str(result['received']) == '30000.1'
+    assert queries[0]['origClientOrderId'] == 'tri1-2-3' and 'signature' in queries[0]
+
+def test_query_order_reports_unknown_order():
+    result, _ = asyncio.run(query_against(400, {'code': -2013, 'msg': 'Order does not exist.'}))
+    assert result['status'] == 'NOT_FOUND'
+    result, _ = asyncio.run(query_against(400, {'code': -1021, 'msg': 'Timestamp outside of the recvWindow.'}))
+    assert result['status'] == 'API_ERROR'
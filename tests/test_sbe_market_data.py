@@ -0,0 +1,87 @@
+"""
+Test dei market data SBE sulla fixture registrata in tests/fixtures:
+best_bid_ask.sbe è la conversione di book_ticker.log (python sbe_market_data.py convert)
+"""
+
+import asyncio
+import json
+import os
+import socket
+
+import websockets
+
+import arbitraggio
+from sbe_market_data import decode_best_bid_ask, read_fixture, serve_fixture, verify_fixture
+from top_of_book import TopOfBook
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+RECORDING = os.path.join(FIXTURES, 'book_ticker.log')
+FIXTURE = os.path.join(FIXTURES, 'best_bid_ask.sbe')
+
+def recorded_quotes():
+    """Messaggi bookTicker della registrazione come (simbolo, update id, bid, ask, bid_qty, ask_qty)"""
+    quotes = []
+    with open(RECORDING, encoding='utf-8') as f:
+        for line in f:
+            data = json.loads(line.partition(' ')[2])
+            data = data.get('data', data)
+            if 's' in data:
+                quotes.append((data['s'], data['u'], float(data['b']), float(data['a']),
+                               float(data['B']), float(data['A'])))
+    return quotes
+
+def test_fixture_decodes_to_json_values():
+    decoded = [decode_best_bid_ask(frame)[:6] for _, frame in read_fixture(FIXTURE)]
+    assert decoded == recorded_quotes()
+    assert verify_fixture([RECORDING], FIXTURE) == (len(decoded), 0)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+async def receive_from_server(port: int, streams: str):
+    """Collega un client allo stream di prova e applica ogni frame allo store come websocket_manager"""
+    server = asyncio.create_task(serve_fixture(FIXTURE, '127.0.0.1', port, speed=0, loop_forever=False))
+    try:
+        for _ in range(50):
+            try:
+                websocket = await websockets.connect(f"ws://127.0.0.1:{port}/stream?streams={streams}")
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        received = 0
+        async with websocket:
+            # Con loop_forever=False il server chiude la connessione dopo l'ultimo frame
+            async for frame in websocket:
+                arbitraggio.apply_sbe_best_bid_ask(frame)
+                received += 1
+        return received
+    finally:
+        server.cancel()
+
+def test_served_frames_reach_top_of_book(monkeypatch):
+    class Scheduler:
+        def __init__(self):
+            self.updated = []
+
+        def mark_updated(self, symbol):
+            self.updated.append(symbol)
+
+    scheduler = Scheduler()
+    prices = TopOfBook({quote[0] for quote in recorded_quotes()})
+    monkeypatch.setattr(arbitraggio, 'prices_cache', prices)
+    monkeypatch.setattr(arbitraggio, 'analysis_scheduler', scheduler)
+
+    received = asyncio.run(receive_from_server(free_port(), 'btcusdt@bestBidAsk/shibusdt@bestBidAsk'))
+
+    expected = [quote for quote in recorded_quotes() if quote[0] in ('BTCUSDT', 'SHIBUSDT')]
+    assert received == len(expected)
+    assert scheduler.updated == [quote[0] for quote in expected]
+    latest = {quote[0]: quote for quote in expected}
+    for symbol, update_id, bid, ask, bid_qty, ask_qty in latest.values():
+        idx = prices.symbol_ids[symbol]
+        assert prices.get(symbol).as_floats() == (bid, ask, bid_qty, ask_qty)
+        assert prices.update_id[idx] == update_id
+    # Gli stream non richiesti non vengono inviati
+    assert 'ETHUSDT' not in prices
@@ -0,0 +1,87 @@
+"""
+Test del filtro statico di eseguibilità: su metadati e prezzi casuali, e in particolare
+ai limiti di prezzo precalcolati, deve concordare con simulate_trade
+"""
+
+import random
+from decimal import Decimal, localcontext
+
+from arbitraggio import simulate_trade
+from static_feasibility import StaticFeasibilityFilter, analyze_first_leg, first_leg_failure
+from top_of_book import TopOfBook
+
+STEPS = ('0.00000001', '0.00001', '0.001', '0.1', '1', '10')
+MIN_NOTIONALS = ('0', '0.0001', '1', '5', '10', '100')
+SYMBOL = 'XYZUSDT'
+EXISTING_PAIRS = {'XYZ': {'USDT': SYMBOL}}
+
+def random_info(rng):
+    step = Decimal(rng.choice(STEPS))
+    return {'base': 'XYZ', 'quote': 'USDT', 'stepSize': step, 'minQty': step * rng.randint(1, 20),
+            'minNotional': Decimal(rng.choice(MIN_NOTIONALS))}
+
+def random_budget(rng):
+    return Decimal(str(round(10 ** rng.uniform(-3, 4), 4)))
+
+def candidate_prices(rng, limit):
+    """Prezzi casuali più quelli a cavallo dei limiti (il caso in cui un errore di confine si vede)"""
+    prices = [10 ** rng.uniform(-2, 5) for _ in range(5)]
+    if limit is not None:
+        for bound in limit[2:]:
+            if bound is not None:
+                prices += [bound, bound * (1 + 1e-7), bound * (1 - 1e-7), bound * 1.01, bound * 0.99]
+    return [price for price in prices if price > 0]
+
+def simulated_status(is_buy, budget, price, info):
+    prices = TopOfBook([SYMBOL])
+    prices.update(SYMBOL, price, price, 1e12, 1e12, 1.0)
+    snapshot = prices.snapshot()
+    start, end = ('USDT', 'XYZ') if is_buy else ('XYZ', 'USDT')
+    status, _ = simulate_trade(start, end, budget, snapshot.decimal_quotes(), {SYMBOL: info}, EXISTING_PAIRS)
+    return status, snapshot
+
+def check_random_first_leg(rng) -> int:
+    """Confronta filtro e simulazione su un simbolo casuale; restituisce i prezzi confrontati con un limite"""
+    info, budget, is_buy = random_info(rng), random_budget(rng), rng.random() < 0.5
+    reason, limit = analyze_first_leg(SYMBOL, is_buy, info, budget)
+    checked = 0
+    for price in candidate_prices(rng, limit):
+        status, snapshot = simulated_status(is_buy, budget, price, info)
+        if reason is not None:
+            # Esclusa a priori: nessun prezzo la rende eseguibile
+            assert status != 'SUCCESS', (info, budget, is_buy, price)
+            continue
+        if limit is None:
+            continue
+        failure = first_leg_failure(limit, snapshot)
+        if failure is not None:
+            # Oltre il limite: stesso esito che avrebbe dato la simulazione
+            assert failure == status, (info, budget, is_buy, price, limit)
+        checked += 1
+    return checked
+
+def test_first_leg_verdicts_agree_with_simulate_trade():
+    rng = random.Random(20240607)
+    checked = 0
+    with localcontext() as context:
+        context.prec = 15  # Precisione impostata da main()
+        for _ in range(1500):
+            checked += check_random_first_leg(rng)
+    assert checked > 1000
+
+def test_filter_drops_only_first_legs_impossible_at_any_price():
+    class Index:
+        version = 1
+
+        def triangles(self):
+            return [('USDT', 'XYZ', 'BTC'), ('USDT', 'XYZ', 'ETH'), ('XYZ', 'USDT', 'BTC')]
+
+    info = {SYMBOL: {'base': 'XYZ', 'quote': 'USDT', 'stepSize': Decimal('1'), 'minQty': Decimal('1'),
+                     'minNotional': Decimal('50')}}
+    static_filter = StaticFeasibilityFilter()
+    assert static_filter.refresh(Index(), info, EXISTING_PAIRS, Decimal('10'))
+    # Acquisto: 10 USDT non raggiungono mai 50 di nozionale; vendita: 10 XYZ bastano se il bid è almeno 5
+    assert static_filter.triangles() == [('XYZ', 'USDT', 'BTC')]
+    assert static_filter.dropped == {'FAIL_MIN_NOTIONAL': 2}
+    assert static_filter.first_leg_limits == {('XYZ', 'USDT'): (SYMBOL, False, 5.0, None)}
+    assert not static_filter.refresh(Index(), info, EXISTING_PAIRS, Decimal('10'))
@@ -0,0 +1,47 @@
+"""Test delle quote in Decimal lette dai worker sugli snapshot del top-of-book"""
+
+from decimal import Decimal
+
+from top_of_book import TopOfBook
+
+def expected_quotes(store):
+    """Conversione completa di riferimento, come il vecchio dizionario per simbolo"""
+    return {
+        symbol: {field: Decimal(repr(getattr(store, field)[idx])) for field in ('bid', 'ask', 'bid_qty', 'ask_qty')}
+        for symbol, idx in store.symbol_ids.items() if store.timestamp[idx]
+    }
+
+def test_decimal_quotes_match_full_conversion():
+    store = TopOfBook(['BTCUSDT', 'ETHBTC', 'ETHUSDT'])
+    store.update('BTCUSDT', 60000.1, 60000.2, 0.5, 0.25, 1.0)
+    store.update('ETHUSDT', 3000.01, 3000.02, 2.0, 3.0, 1.0)
+    quotes = store.snapshot().decimal_quotes()
+    assert quotes == expected_quotes(store)
+    assert 'ETHBTC' not in quotes
+    assert quotes['BTCUSDT']['ask'] == Decimal('60000.2')
+
+def test_decimal_quotes_follow_updates_between_snapshots():
+    store = TopOfBook(['BTCUSDT', 'ETHBTC', 'ETHUSDT'])
+    store.update('BTCUSDT', 60000.1, 60000.2, 0.5, 0.25, 1.0)
+    store.update('ETHUSDT', 3000.01, 3000.02, 2.0, 3.0, 1.0)
+    first = store.snapshot().decimal_quotes()
+
+    # Riconversione incrementale: una riga cambiata, una nuova, le altre riusate
+    store.update('BTCUSDT', 60001.5, 60001.6, 0.5, 0.125, 2.0)
+    store.update('ETHBTC', 0.05, 0.0501, 10.0, 12.0, 2.0)
+    second = store.snapshot().decimal_quotes()
+    assert second == expected_quotes(store)
+    assert second['ETHUSDT'] is first['ETHUSDT']
+    assert first['BTCUSDT']['ask'] == Decimal('60000.2')  # Le quote precedenti non vengono modificate
+
+    # Cambio della tabella dei simboli: conversione completa
+    store.remove_symbols(['ETHUSDT'])
+    store.add_symbols(['BNBUSDT'])
+    store.update('BNBUSDT', 500.5, 500.6, 1.0, 1.0, 3.0)
+    assert store.snapshot().decimal_quotes() == expected_quotes(store)
+
+def test_decimal_quotes_on_unchanged_snapshot_reuse_previous_conversion():
+    store = TopOfBook(['BTCUSDT'])
+    store.update('BTCUSDT', 60000.1, 60000.2, 0.5, 0.25, 1.0)
+    first = store.snapshot().decimal_quotes()
+    assert store.snapshot().decimal_quotes() is first
@@ -0,0 +1,50 @@
+"""Test dell'invio al trading: un trade oltre il timeout tiene occupati slot e simboli fino al termine"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import arbitraggio
+import config
+import trading_executor
+from trading_queue import TradeCandidate, TradingQueue
+
+def candidate(key, symbols):
+    return TradeCandidate(key, f"path{key}", symbols, 1.0, time.time(), {'key': key})
+
+def test_slow_trade_keeps_slot_and_symbols_until_it_finishes(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def slow_worker(trading_data):
+        started.append(trading_data['key'])
+        release.wait(5)
+        return {'status': 'SUCCESS', 'profit_percentage': 0.1}
+
+    monkeypatch.setattr(config, 'TRADING_TIMEOUT', 0.1)
+    monkeypatch.setattr(config, 'TRADING_CORES', 1)
+    monkeypatch.setattr(trading_executor, 'trading_worker_with_affinity', slow_worker)
+
+    async def run():
+        queue = TradingQueue(max_quote_age=60.0, capacity=10)
+        monkeypatch.setattr(arbitraggio, 'trading_queue', queue)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            dispatcher = asyncio.create_task(arbitraggio.trading_dispatch_task(pool))
+            queue.push(candidate(1, ('BTCUSDT', 'ETHBTC', 'ETHUSDT')))
+            await asyncio.sleep(0.05)
+            queue.push(candidate(2, ('BNBUSDT', 'BNBBTC', 'BTCUSDT')))
+            await asyncio.sleep(0.4)
+            # Timeout scaduto ma trade ancora in corso: il secondo candidato (stesso BTCUSDT) non parte
+            during = (list(started), queue.in_flight, len(queue))
+            release.set()
+            for _ in range(50):
+                if len(started) == 2:
+                    break
+                await asyncio.sleep(0.05)
+            dispatcher.cancel()
+            return during, list(started)
+
+    during, after = asyncio.run(run())
+    assert during == ([1], 1, 1)
+    assert after == [1, 2]
@@ -0,0 +1,73 @@
+"""Test della coda di priorità del trading"""
+
+import asyncio
+import time
+from decimal import Decimal
+
+from order_plan import estimate_value
+from top_of_book import TopOfBook
+from trading_queue import TradeCandidate, TradingQueue
+
+def candidate(key, symbols, profit, quote_time=None):
+    return TradeCandidate(key, f"triangolo {key}", symbols, profit,
+                          time.time() if quote_time is None else quote_time, {})
+
+def test_overlapping_triangles_are_coalesced():
+    queue = TradingQueue(max_quote_age=5.0, capacity=10)
+    assert queue.push(candidate(1, ('BTCUSDT', 'ETHBTC', 'ETHUSDT'), 1.0))
+    # Gamba ETHBTC in comune: vince il candidato migliore
+    assert not queue.push(candidate(2, ('ETHBTC', 'BNBETH', 'BNBBTC'), 0.5))
+    assert queue.push(candidate(3, ('ETHBTC', 'XRPETH', 'XRPBTC'), 2.0))
+    assert len(queue) == 1
+    # Nessun simbolo in comune: entrambi in attesa
+    assert queue.push(candidate(4, ('SOLUSDT', 'SOLBNB', 'BNBUSDT'), 0.1))
+    assert len(queue) == 2
+    # Un candidato che ne sovrappone due li sostituisce solo se è migliore di entrambi
+    assert queue.push(candidate(5, ('XRPBTC', 'SOLBNB', 'XRPBNB'), 3.0))
+    assert len(queue) == 1
+    assert queue.pop().key == 5
+    assert queue.coalesced == 3
+
+def test_pop_skips_candidates_on_symbols_in_flight():
+    queue = TradingQueue(max_quote_age=5.0, capacity=10)
+    queue.push(candidate(1, ('BTCUSDT', 'ETHBTC', 'ETHUSDT'), 1.0))
+    first = queue.pop()
+    queue.push(candidate(2, ('ETHUSDT', 'BNBETH', 'BNBUSDT'), 5.0))
+    queue.push(candidate(3, ('SOLUSDT', 'SOLBNB', 'BNBBTC'), 0.1))
+    assert queue.pop().key == 3  # Il migliore tocca ETHUSDT, ancora in esecuzione
+    assert queue.pop() is None
+    queue.finished(first)
+    assert queue.pop().key == 2
+
+def test_get_wakes_up_when_execution_finishes():
+    async def scenario():
+        queue = TradingQueue(max_quote_age=5.0, capacity=10)
+        queue.push(candidate(1, ('BTCUSDT', 'ETHBTC', 'ETHUSDT'), 1.0))
+        first = await queue.get()
+        queue.push(candidate(2, ('ETHUSDT', 'BNBETH', 'BNBUSDT'), 1.0))
+        waiter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        queue.finished(first)
+        return (await asyncio.wait_for(waiter, 1.0)).key
+
+    assert asyncio.run(scenario()) == 2
+
+def test_stale_candidates_are_dropped():
+    queue = TradingQueue(max_quote_age=1.0, capacity=10)
+    queue.push(candidate(1, ('BTCUSDT',), 1.0, quote_time=time.time() - 2.0))
+    assert queue.pop() is None
+    assert queue.dropped_stale == 1
+    # Il simbolo del candidato scartato torna libero
+    assert queue.push(candidate(2, ('BTCUSDT',), 0.1))
+
+def test_expected_profit_is_compared_in_usdt():
+    store = TopOfBook(['BTCUSDT', 'USDTTRY'])
+    store.update('BTCUSDT', 60000.0, 60001.0, 1.0, 1.0, time.time())
+    store.update('USDTTRY', 32.0, 32.5, 1000.0, 1000.0, time.time())
+    prices = store.snapshot()
+    pairs = {'BTC': {'USDT': 'BTCUSDT'}, 'USDT': {'TRY': 'USDTTRY'}}
+    assert estimate_value(Decimal('0.01'), 'BTC', 'USDT', prices, pairs) == Decimal('600')
+    assert estimate_value(Decimal('65'), 'TRY', 'USDT', prices, pairs) == Decimal('2')
+    assert estimate_value(Decimal('3'), 'USDT', 'USDT', prices, pairs) == Decimal('3')
+    assert estimate_value(Decimal('1'), 'ETH', 'USDT', prices, pairs) is None
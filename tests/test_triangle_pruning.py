@@ -0,0 +1,144 @@
+"""Test della potatura adattiva: declassamento, rivalutazione a rotazione, riattivazione per liquidità e riallineamento"""
+
+from decimal import Decimal
+
+from top_of_book import TopOfBook
+from triangle_pruning import ACTIVE, DEMOTED, TrianglePruner
+
+SYMBOL_INFO = {symbol: {'stepSize': Decimal('0.0001')} for symbol in ('BTCUSDT', 'ETHBTC', 'ETHUSDT', 'BNBUSDT', 'BNBBTC')}
+EXISTING_PAIRS = {'BTC': {'USDT': 'BTCUSDT'}, 'ETH': {'BTC': 'ETHBTC', 'USDT': 'ETHUSDT'}, 'BNB': {'USDT': 'BNBUSDT', 'BTC': 'BNBBTC'}}
+ETH_TRIANGLE = ('USDT', 'BTC', 'ETH')
+BNB_TRIANGLE = ('USDT', 'BTC', 'BNB')
+
+def book(ethbtc_ask_qty=1.0):
+    prices = TopOfBook(SYMBOL_INFO)
+    prices.update('BTCUSDT', 59999.0, 60000.0, 10.0, 10.0, 1.0)
+    prices.update('ETHBTC', 0.0499, 0.05, 100.0, ethbtc_ask_qty, 1.0)
+    prices.update('ETHUSDT', 3001.0, 3002.0, 100.0, 100.0, 1.0)
+    prices.update('BNBUSDT', 599.0, 600.0, 100.0, 100.0, 1.0)
+    prices.update('BNBBTC', 0.0099, 0.01, 100.0, 100.0, 1.0)
+    return prices
+
+def run_cycle(pruner, shards, prices, outcome):
+    """Ciclo simulato: outcome(shard_id, position, state) aggiorna la copia come farebbe il worker"""
+    states = pruner.states(shards)
+    for shard_id, (shard, state) in enumerate(zip(shards, states)):
+        for position in range(len(shard)):
+            if not state.skip(position):
+                outcome(shard_id, position, state)
+        pruner.record(shard_id, state, prices, EXISTING_PAIRS)
+    pruner.end_cycle()
+    return states
+
+def liquidity_failure(shard_id, position, state):
+    state.failed(position, 'FAIL_LIQUIDITY', 2)
+
+def test_persistent_failures_demote_and_other_failures_reset():
+    pruner = TrianglePruner(demote_after=3, recheck_every=4, liquidity_gain=0.5)
+    shards = [[ETH_TRIANGLE, BNB_TRIANGLE]]
+    prices = book()
+
+    def outcome(shard_id, position, state):
+        if position == 0:
+            liquidity_failure(shard_id, position, state)
+        elif pruner.cycle == 1:
+            state.failed(position, 'FAIL_NO_DATA', 1)  # Non persistente: azzera la serie
+        else:
+            liquidity_failure(shard_id, position, state)
+
+    for _ in range(3):
+        run_cycle(pruner, shards, prices, outcome)
+    assert len(pruner) == 1 and pruner.demotions == 1
+    assert pruner._states[0].tier[0] == DEMOTED and pruner._states[0].streaks[1] == 1
+
+def test_demoted_triangle_is_rechecked_every_n_cycles_and_promoted():
+    pruner = TrianglePruner(demote_after=1, recheck_every=4, liquidity_gain=0.5)
+    shards = [[ETH_TRIANGLE]]
+    prices = book()
+    run_cycle(pruner, shards, prices, liquidity_failure)
+    assert len(pruner) == 1
+
+    evaluated_cycles = []
+
+    def outcome(shard_id, position, state):
+        evaluated_cycles.append(pruner.cycle)
+        liquidity_failure(shard_id, position, state)
+
+    for _ in range(8):
+        run_cycle(pruner, shards, prices, outcome)
+    # Posizione 0: rivalutata quando il ciclo è multiplo di recheck_every
+    assert evaluated_cycles == [4, 8]
+
+    def success(shard_id, position, state):
+        state.evaluated(position)
+
+    for _ in range(4):
+        run_cycle(pruner, shards, prices, success)
+    assert len(pruner) == 0 and pruner.recheck_promotions == 1
+
+def test_liquidity_gain_on_failing_leg_promotes():
+    pruner = TrianglePruner(demote_after=1, recheck_every=100, liquidity_gain=0.5)
+    shards = [[ETH_TRIANGLE, BNB_TRIANGLE]]
+    prices = book(ethbtc_ask_qty=1.0)
+    # Gamba 2 di USDT→BTC→ETH: acquisto su ETHBTC, quantità esposta all'ask
+    run_cycle(pruner, shards, prices, liquidity_failure)
+    assert len(pruner) == 2
+
+    assert pruner.promote_on_liquidity(['ETHBTC'], book(ethbtc_ask_qty=1.4)) == 0  # Sotto il +50%
+    assert pruner.promote_on_liquidity(['ETHBTC'], book(ethbtc_ask_qty=2.0)) == 1
+    assert pruner._states[0].tier[0] == ACTIVE and pruner._states[0].tier[1] == DEMOTED
+    # La riattivazione vale già per le copie del ciclo successivo
+    assert not pruner.states(shards)[0].skip(0)
+    assert pruner.liquidity_promotions == 1
+
+def test_remap_carries_state_and_watch_to_new_positions():
+    pruner = TrianglePruner(demote_after=1, recheck_every=100, liquidity_gain=0.5)
+    prices = book(ethbtc_ask_qty=1.0)
+    run_cycle(pruner, [[ETH_TRIANGLE, BNB_TRIANGLE]], prices, lambda s, p, state: liquidity_failure(s, p, state) if p == 0 else None)
+
+    # Ribilanciamento: il triangolo declassato passa in un altro shard e posizione
+    shards = [[BNB_TRIANGLE], [('USDT', 'ETH', 'BNB'), ETH_TRIANGLE]]
+    states = pruner.states(shards)
+    assert [list(state.tier) for state in states] == [[ACTIVE], [ACTIVE, DEMOTED]]
+    assert pruner._watched == {(1, 1): 'ETHBTC'}
+    assert pruner.promote_on_liquidity(['ETHBTC'], book(ethbtc_ask_qty=2.0)) == 1
+    assert pruner._states[1].tier[1] == ACTIVE
+
+def test_abandoned_worker_does_not_touch_the_next_cycle():
+    pruner = TrianglePruner(demote_after=1, recheck_every=100, liquidity_gain=0.5)
+    shards = [[ETH_TRIANGLE]]
+    abandoned = pruner.states(shards)[0]  # Ciclo abbandonato: lo stato non viene mai registrato
+    pruner.end_cycle()
+    current = pruner.states(shards)[0]
+    # Il worker in ritardo continua a scrivere sulla propria copia
+    abandoned.failed(0, 'FAIL_LIQUIDITY', 2)
+    assert abandoned.demoted == [(0, 2)]
+    assert current.tier[0] == ACTIVE and current.streaks[0] == 0 and current.demoted == []
+    assert len(pruner) == 0
+
+def test_worker_demotes_and_skips_with_the_pruning_state():
+    from arbitraggio import find_arbitrage_worker
+    from analysis_results import C_PRUNED, FAILURE_COUNTERS
+
+    info = {symbol: {'minQty': Decimal('0.00001'), 'minNotional': Decimal('0.0001'), 'stepSize': Decimal('0.00001')}
+            for symbol in SYMBOL_INFO}
+    pruner = TrianglePruner(demote_after=2, recheck_every=3, liquidity_gain=0.5)
+    shards = [[ETH_TRIANGLE, BNB_TRIANGLE]]
+    prices = book(ethbtc_ask_qty=0.01)  # 600 USDT → 0.01 BTC → 0.2 ETH: l'ask di ETHBTC non basta
+    snapshot = prices.snapshot()
+
+    pruned, liquidity_failures = [], []
+    for _ in range(4):
+        state = pruner.states(shards)[0]
+        _, _, counters, _, _, _, state = find_arbitrage_worker(
+            0, snapshot, info, Decimal('0.001'), Decimal('0.001'), Decimal('600'), shards[0], EXISTING_PAIRS,
+            pruning=state)
+        pruner.record(0, state, snapshot, EXISTING_PAIRS)
+        pruner.end_cycle()
+        pruned.append(counters[C_PRUNED])
+        liquidity_failures.append(counters[FAILURE_COUNTERS['FAIL_LIQUIDITY']])
+
+    # Declassato al secondo fallimento, poi saltato tranne al ciclo di rivalutazione (posizione 0, ciclo 3)
+    assert liquidity_failures == [1, 1, 0, 1]
+    assert pruned == [0, 0, 1, 0]
+    assert pruner.demotions == 1 and pruner._watched == {(0, 0): 'ETHBTC'}
@@ -0,0 +1,132 @@
+"""
+Test del ripiego WebSocket → REST contro un server order.place locale:
+un ordine rimasto senza risposta viene cercato prima di essere reinviato
+"""
+
+import asyncio
+import json
+import time
+
+import websockets
+
+import config
+from websocket_trader import BinanceWebSocketTrader, HybridTradingExecutor
+
+LEG = {'symbol': 'BTCUSDT', 'side': 'BUY', 'amount_field': 'quoteOrderQty'}
+
+def filled(request_number):
+    return {'status': 'FILLED', 'orderId': request_number, 'executedQty': '0.001',
+            'cummulativeQuoteQty': '60', 'fills': [{'price': '60000'}]}
+
+class RestStub:
+    """Client REST registrato: ordini inviati e ricerche per newClientOrderId"""
+
+    def __init__(self, lookup_status='NOT_FOUND'):
+        self.lookup_status = lookup_status
+        self.orders = []
+        self.lookups = []
+
+    async def place_market_order(self, symbol, side, amount, amount_field='quantity', test=False, client_order_id=None):
+        self.orders.append((symbol, side, amount))
+        return {'status': 'SUCCESS', 'symbol': symbol, 'side': side, 'method': 'rest_api'}
+
+    async def query_order(self, symbol, side, client_order_id):
+        self.lookups.append((client_order_id, time.time()))
+        if self.lookup_status == 'NOT_FOUND':
+            return {'status': 'NOT_FOUND', 'symbol': symbol, 'side': side, 'client_order_id': client_order_id}
+        return {'status': self.lookup_status, 'symbol': symbol, 'side': side, 'client_order_id': client_order_id,
+                'method': 'rest_lookup'}
+
+async def run_orders(actions, rest, orders=1, **trader_options):
+    """
+    Server locale che risponde all'n-esima richiesta secondo actions[n]:
+    'fill', 'expire', 'reject', 'silent' (nessuna risposta) o 'late' (risposta dopo il timeout)
+    """
+    requests = []
+
+    async def handler(websocket, path=None):
+        async for message in websocket:
+            request = json.loads(message)
+            requests.append(request['params'])
+            action = actions[len(requests) - 1]
+            reply = {'id': request['id']}
+            if action == 'silent':
+                continue
+            if action == 'late':
+                await asyncio.sleep(0.4)
+            if action == 'reject':
+                reply['error'] = {'code': -2010, 'msg': 'Account has insufficient balance'}
+            else:
+                reply['result'] = filled(len(requests))
+                if action == 'expire':
+                    reply['result'].update(status='EXPIRED', executedQty='0.0004', cummulativeQuoteQty='24')
+            await websocket.send(json.dumps(reply))
+
+    async with websockets.serve(handler, '127.0.0.1', 0) as server:
+        port = next(iter(server.sockets)).getsockname()[1]
+        executor = HybridTradingExecutor()
+        executor.ws_trader = BinanceWebSocketTrader('key', 'secret', ws_url=f"ws://127.0.0.1:{port}",
+                                                    reply_timeout=0.2, recv_window=300, **trader_options)
+        executor.rest_client = rest
+        await executor.ws_trader.connect()
+        results = []
+        for _ in range(orders):
+            template = executor.ws_trader.prepare_order(LEG['symbol'], LEG['side'], LEG['amount_field'])
+            results.append(await executor.execute_planned_order(LEG, template, '60'))
+        await executor.ws_trader.disconnect()
+        return results, requests, executor
+
+def test_unanswered_order_is_looked_up_not_resent(monkeypatch):
+    monkeypatch.setattr(config, 'ORDER_LOOKUP_CLOCK_MARGIN', 0.0)
+    rest = RestStub(lookup_status='SUCCESS')
+    started = time.time()
+    (result,), requests, _ = asyncio.run(run_orders(['silent'], rest))
+    assert result['status'] == 'SUCCESS' and result['method'] == 'rest_lookup'
+    assert rest.orders == []
+    client_order_id, looked_up_at = rest.lookups[0]
+    assert client_order_id == requests[0]['newClientOrderId']
+    # La ricerca attende la scadenza del recvWindow della richiesta
+    assert looked_up_at >= started + 0.3
+
+def test_order_never_received_is_resent_via_rest(monkeypatch):
+    monkeypatch.setattr(config, 'ORDER_LOOKUP_CLOCK_MARGIN', 0.0)
+    rest = RestStub(lookup_status='NOT_FOUND')
+    (result,), _, executor = asyncio.run(run_orders(['silent'], rest))
+    assert result['method'] == 'rest_api'
+    assert rest.orders == [('BTCUSDT', 'BUY', '60')]
+    assert executor.use_websocket  # Un solo fallimento: il trasporto non cambia
+
+def test_rejected_order_falls_back_and_transport_switches_after_max_failures(monkeypatch):
+    monkeypatch.setattr(config, 'WEBSOCKET_MAX_FAILURES', 2)
+    rest = RestStub()
+    results, requests, executor = asyncio.run(run_orders(['reject', 'reject', 'fill'], rest, orders=3))
+    assert [result['method'] for result in results] == ['rest_api'] * 3
+    assert rest.lookups == []
+    # Dopo due rifiuti il terzo ordine non passa più dal WebSocket
+    assert len(requests) == 2 and not executor.use_websocket
+
+def test_partial_fill_is_not_resent():
+    rest = RestStub()
+    (result,), _, _ = asyncio.run(run_orders(['expire'], rest))
+    assert result['status'] == 'NOT_FILLED' and result['method'] == 'websocket'
+    assert str(result['received']) == '0.0004'
+    assert rest.orders == [] and rest.lookups == []
+
+def test_late_reply_is_not_read_by_the_next_order(monkeypatch):
+    monkeypatch.setattr(config, 'ORDER_LOOKUP_CLOCK_MARGIN', 0.0)
+    rest = RestStub(lookup_status='SUCCESS')
+    results, _, executor = asyncio.run(run_orders(['late', 'fill'], rest, orders=2))
+    assert results[0]['method'] == 'rest_lookup'
+    # La seconda risposta è quella della seconda richiesta, non quella tardiva della prima
+    assert results[1]['method'] == 'websocket' and results[1]['order_id'] == 2
+    assert executor.ws_trader.late_replies == 1
+
+def test_templates_are_built_once_per_leg():
+    trader = BinanceWebSocketTrader('key', 'secret')
+    first = trader.prepare_order('BTCUSDT', 'BUY', 'quoteOrderQty')
+    assert trader.prepare_order('BTCUSDT', 'BUY', 'quoteOrderQty') is first
+    assert trader.prepare_order('BTCUSDT', 'SELL', 'quantity') is not first
+    # Due invii dallo stesso template differiscono solo per importo, id e timestamp
+    one = json.loads(first.stamp('10', 1, 'tri-a', 1000))['params']
+    two = json.loads(first.stamp('20', 2, 'tri-b', 2000))['params']
+    assert {key for key in one if one[key] != two[key]} == {'quoteOrderQty', 'newClientOrderId', 'timestamp', 'signature'}
@@ -0,0 +1,236 @@
+"""
+Archivio colonnare del top-of-book (miglior bid/ask) per tutti i simboli monitorati
+Ogni simbolo ha un id intero fisso; prezzi, quantità e timestamp vivono in array
+preallocati aggiornati sul posto, senza allocazioni per messaggio
+"""
+
+from array import array
+from decimal import Decimal
+from itertools import compress
+from operator import ne
+from typing import Dict, Iterable, List, Optional
+
+# Colonne esposte dalle viste, con gli stessi nomi del vecchio dizionario per simbolo
+QUOTE_FIELDS = ('bid', 'ask', 'bid_qty', 'ask_qty')
+
+def _zeros(typecode: str, size: int) -> array:
+    """Crea un array preallocato inizializzato a zero"""
+    return array(typecode, bytes(array(typecode).itemsize * size))
+
+_id_order: tuple = ({}, [])  # Ultima tabella simbolo->id vista e simboli in ordine di id
+# Ultime quote convertite nel processo: (simboli in ordine di id, colonne come liste, quote in Decimal).
+# Le quote sono condivise tra snapshot successivi e vanno trattate in sola lettura.
+_last_quotes: Optional[tuple] = None
+
+def _to_decimals(values: Iterable[float]) -> List[Decimal]:
+    # repr() restituisce la rappresentazione più corta che riproduce il float, cioè la stringa di Binance
+    return list(map(Decimal, map(repr, values)))
+
+def _symbols_by_id(symbol_ids: Dict[str, int], size: int) -> List[Optional[str]]:
+    """Simboli in ordine di id (None per gli id liberi), ricalcolati solo se la tabella cambia"""
+    global _id_order
+    known_ids, names = _id_order
+    if len(names) != size or (symbol_ids is not known_ids and symbol_ids != known_ids):
+        names = [None] * size
+        for symbol, idx in symbol_ids.items():
+            names[idx] = symbol
+    _id_order = (symbol_ids, names)
+    return names
+
+class QuoteView:
+    """
+    Vista leggera sul book di un simbolo.
+    Si usa come il vecchio dizionario: view['ask'], view.get('bid_qty').
+    I valori vengono convertiti in Decimal solo quando letti.
+    """
+    __slots__ = ('_columns', '_idx')
+
+    def __init__(self, columns: Dict[str, array], idx: int):
+        self._columns = columns
+        self._idx = idx
+
+    def __getitem__(self, field: str) -> Decimal:
+        # repr() restituisce la rappresentazione più corta che riproduce il float, cioè la stringa di Binance
+        return Decimal(repr(self._columns[field][self._idx]))
+
+    def get(self, field: str, default=None):
+        if field not in self._columns:
+            return default
+        return self[field]
+
+    def as_floats(self):
+        """Restituisce (bid, ask, bid_qty, ask_qty) come float senza conversioni"""
+        columns, idx = self._columns, self._idx
+        return columns['bid'][idx], columns['ask'][idx], columns['bid_qty'][idx], columns['ask_qty'][idx]
+
+class _QuoteColumns:
+    """Base comune di store e snapshot: tabella degli id e colonne parallele"""
+
+    def __init__(self, symbol_ids: Dict[str, int], bid: array, ask: array,
+                 bid_qty: array, ask_qty: array, timestamp: array):
+        self.symbol_ids = symbol_ids
+        self.bid = bid
+        self.ask = ask
+        self.bid_qty = bid_qty
+        self.ask_qty = ask_qty
+        self.timestamp = timestamp
+        self._columns = {'bid': bid, 'ask': ask, 'bid_qty': bid_qty, 'ask_qty': ask_qty}
+
+    def __reduce__(self):
+        # Solo tabella e array vengono serializzati (il dizionario delle colonne viene ricostruito)
+        return (self.__class__, (self.symbol_ids, self.bid, self.ask, self.bid_qty, self.ask_qty, self.timestamp))
+
+    def __contains__(self, symbol: str) -> bool:
+        idx = self.symbol_ids.get(symbol)
+        return idx is not None and self.timestamp[idx] > 0
+
+    def __len__(self) -> int:
+        """Numero di simboli che hanno ricevuto almeno un aggiornamento"""
+        return len(self.timestamp) - self.timestamp.tolist().count(0.0)
+
+    def get(self, symbol: str, default=None) -> Optional[QuoteView]:
+        """Vista sul book del simbolo, o default se il simbolo non ha ancora dati"""
+        idx = self.symbol_ids.get(symbol)
+        if idx is None or self.timestamp[idx] == 0:
+            return default
+        return QuoteView(self._columns, idx)
+
+    def get_by_id(self, idx: int) -> Optional[QuoteView]:
+        if self.timestamp[idx] == 0:
+            return None
+        return QuoteView(self._columns, idx)
+
+    def age(self, symbol: str, now: float) -> Optional[float]:
+        """Secondi trascorsi dall'ultimo aggiornamento del simbolo"""
+        idx = self.symbol_ids.get(symbol)
+        if idx is None or self.timestamp[idx] == 0:
+            return None
+        return now - self.timestamp[idx]
+
+class TopOfBookSnapshot(_QuoteColumns):
+    """Copia immutabile dello store, economica da serializzare verso i worker"""
+
+    def decimal_quotes(self) -> Dict[str, Dict[str, Decimal]]:
+        """
+        Quote di tutti i simboli con dati come dizionari di Decimal, per le letture ripetute dei worker.
+        Rispetto all'ultima conversione fatta nel processo vengono riconvertite solo le righe cambiate.
+        """
+        global _last_quotes
+        columns = [self._columns[field].tolist() for field in QUOTE_FIELDS]
+        columns.append(self.timestamp.tolist())
+        names = _symbols_by_id(self.symbol_ids, len(columns[-1]))
+        last = _last_quotes
+        if last is not None and last[0] is names:
+            # Stessi simboli dell'ultima conversione: si riconvertono solo le righe cambiate
+            rows = list(compress(range(len(names)), map(ne, zip(*columns), zip(*last[1]))))
+            quotes = last[2].copy() if rows else last[2]
+        else:
+            quotes = {}
+            rows = range(len(names))
+        timestamp = columns[4]
+        # I simboli senza ancora dati restano fuori, come nello store
+        for idx in rows:
+            if not timestamp[idx] and names[idx] is not None:
+                quotes.pop(names[idx], None)
+        rows = [idx for idx in rows if timestamp[idx] and names[idx] is not None]
+        bid, ask, bid_qty, ask_qty = (_to_decimals(map(column.__getitem__, rows)) for column in columns[:4])
+        quotes.update({
+            names[idx]: {'bid': b, 'ask': a, 'bid_qty': b_qty, 'ask_qty': a_qty}
+            for idx, b, a, b_qty, a_qty in zip(rows, bid, ask, bid_qty, ask_qty)
+        })
+        _last_quotes = (names, columns, quotes)
+        return quotes
+
+class TopOfBook(_QuoteColumns):
+    """Store del top-of-book con tabella simbolo→id costruita da symbol_info_map"""
+
+    def __init__(self, symbols: Iterable[str]):
+        symbol_list: List[str] = sorted(symbols)
+        size = len(symbol_list)
+        super().__init__(
+            {symbol: idx for idx, symbol in enumerate(symbol_list)},
+            _zeros('d', size), _zeros('d', size), _zeros('d', size), _zeros('d', size),
+            _zeros('d', size)
+        )
+        self.symbols: List[Optional[str]] = symbol_list
+        self._free_ids: List[int] = []
+        # Ultimo update id ('u') applicato per simbolo: arbitra i feed ridondanti (non va negli snapshot)
+        self.update_id = _zeros('q', size)
+
+    def __reduce__(self):
+        return (TopOfBookSnapshot, (self.symbol_ids, self.bid, self.ask, self.bid_qty, self.ask_qty, self.timestamp))
+
+    def update(self, symbol: str, bid: float, ask: float, bid_qty: float, ask_qty: float, timestamp: float,
+               update_id: int = 0) -> bool:
+        """
+        Aggiorna sul posto il book di un simbolo.
+        Con update_id vince il primo arrivo: un id già visto o più vecchio viene scartato.
+        Restituisce False se il simbolo non è monitorato o l'aggiornamento è un duplicato.
+        """
+        idx = self.symbol_ids.get(symbol)
+        if idx is None:
+            return False
+        if update_id:
+            if update_id <= self.update_id[idx]:
+                return False
+            self.update_id[idx] = update_id
+        self.bid[idx] = bid
+        self.ask[idx] = ask
+        self.bid_qty[idx] = bid_qty
+        self.ask_qty[idx] = ask_qty
+        self.timestamp[idx] = timestamp
+        return True
+
+    def already_applied(self, symbol: str, update_id: int) -> bool:
+        """True se l'update id del simbolo è già stato applicato (o superato) da un altro feed"""
+        idx = self.symbol_ids.get(symbol)
+        return idx is not None and 0 < update_id <= self.update_id[idx]
+
+    def duplicate_lag(self, symbol: str, update_id: int, timestamp: float) -> Optional[float]:
+        """Ritardo di un duplicato rispetto al primo arrivo dello stesso update id (None se più vecchio)"""
+        idx = self.symbol_ids.get(symbol)
+        if idx is None or update_id != self.update_id[idx]:
+            return None
+        return timestamp - self.timestamp[idx]
+
+    def add_symbols(self, symbols: Iterable[str]):
+        """Aggiunge simboli riusando gli id liberi o estendendo le colonne"""
+        # La tabella viene sostituita, non modificata: gli snapshot in volo restano coerenti
+        symbol_ids = dict(self.symbol_ids)
+        for symbol in sorted(symbols):
+            if symbol in symbol_ids:
+                continue
+            if self._free_ids:
+                idx = self._free_ids.pop()
+                self.symbols[idx] = symbol
+            else:
+                idx = len(self.symbols)
+                self.symbols.append(symbol)
+                for column in (self.bid, self.ask, self.bid_qty, self.ask_qty, self.timestamp):
+                    column.append(0.0)
+                self.update_id.append(0)
+            symbol_ids[symbol] = idx
+        self.symbol_ids = symbol_ids
+
+    def remove_symbols(self, symbols: Iterable[str]):
+        """Rimuove simboli azzerandone la riga e liberandone l'id"""
+        symbol_ids = dict(self.symbol_ids)
+        for symbol in symbols:
+            idx = symbol_ids.pop(symbol, None)
+            if idx is None:
+                continue
+            for column in (self.bid, self.ask, self.bid_qty, self.ask_qty, self.timestamp):
+                column[idx] = 0.0
+            self.update_id[idx] = 0
+            self.symbols[idx] = None
+            self._free_ids.append(idx)
+        self.symbol_ids = symbol_ids
+
+    def snapshot(self) -> TopOfBookSnapshot:
+        """Copia le colonne (memcpy) in uno snapshot coerente per un ciclo di analisi"""
+        return TopOfBookSnapshot(
+            self.symbol_ids,
+            array('d', self.bid), array('d', self.ask),
+            array('d', self.bid_qty), array('d', self.ask_qty),
+            array('d', self.timestamp)
+        )
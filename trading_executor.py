@@ -12,6 +12,7 @@ from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceOrderException
 import config
 from websocket_trader import HybridTradingExecutor
+from order_plan import format_amount, leg_amount
 
 # Configurazione logging
 logger = logging.getLogger(__name__)
@@ -26,6 +27,10 @@ class TradingExecutor:
         self.trade_count = 0
         self.success_count = 0
         self.failure_count = 0
+        # Saldi liberi per asset letti dal conto: limitano l'importo della prima gamba
+        self._balances: Optional[Dict[str, Decimal]] = None
+        self._balances_time = 0.0
+        self._balances_refresh: Optional[asyncio.Task] = None
         
         # Inizializza il client Binance
         self._init_binance_client()
@@ -64,6 +69,42 @@ class TradingExecutor:
             logger.error(f"❌ Errore inizializzazione executor ibrido: {e}")
             self.hybrid_executor = None
     
+    async def warm_up(self):
+        """Apre in anticipo le connessioni di trading (WebSocket e pool REST) e legge i saldi"""
+        tasks = [self.refresh_balances()]
+        if self.hybrid_executor:
+            tasks.append(self.hybrid_executor.warm_up())
+        await asyncio.gather(*tasks)
+    
+    async def refresh_balances(self):
+        """Rilegge i saldi liberi di tutti gli asset (una sola chiamata get_account)"""
+        if not self.client:
+            self._balances = {}
+            return
+        try:
+            account = await asyncio.to_thread(self.client.get_account)
+        except Exception as e:
+            logger.error(f"Errore lettura saldi: {e}")
+            return
+        self._balances = {balance['asset']: Decimal(balance['free']) for balance in account['balances']}
+        self._balances_time = time.time()
+    
+    def _schedule_balance_refresh(self):
+        """Rilettura dei saldi in background (al più una alla volta)"""
+        if self._balances_refresh is None or self._balances_refresh.done():
+            self._balances_refresh = asyncio.create_task(self.refresh_balances())
+    
+    async def balance_cap(self, asset: str) -> Decimal:
+        """
+        Saldo libero in cache dell'asset. Solo senza saldi in cache (primo trade o letture fallite)
+        la lettura avviene prima del trade; saldi scaduti vengono riletti in background.
+        """
+        if self._balances is None:
+            await self.refresh_balances()
+        elif time.time() - self._balances_time > config.BALANCE_CACHE_TTL:
+            self._schedule_balance_refresh()
+        return (self._balances or {}).get(asset, Decimal("0"))
+    
     def _log_trade_result(self, result: Dict, is_error: bool = False):
         """Logga il risultato del trade su file"""
         timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
@@ -87,7 +128,7 @@ class TradingExecutor:
             if not self.client:
                 return Decimal("0")
             
-            account = self.client.get_account()
+            account = await asyncio.to_thread(self.client.get_account)
             for balance in account['balances']:
                 if balance['asset'] == asset:
                     return Decimal(balance['free'])
@@ -108,7 +149,7 @@ class TradingExecutor:
                 raise ValueError("Client Binance non inizializzato")
             
             # Arrotonda la quantità per rispettare stepSize
-            quantity_str = f"{quantity:.8f}".rstrip('0').rstrip('.')
+            quantity_str = format_amount(quantity)
             
             order_params = {
                 'symbol': symbol,
@@ -119,7 +160,7 @@ class TradingExecutor:
             
             if config.DRY_RUN_MODE:
                 # Modalità test - usa order test
-                result = self.client.create_test_order(**order_params)
+                result = await asyncio.to_thread(self.client.create_test_order, **order_params)
                 logger.info(f"🧪 TEST ORDER: {side} {quantity_str} {symbol}")
                 return {
                     'status': 'TEST_SUCCESS',
@@ -131,7 +172,7 @@ class TradingExecutor:
                 }
             else:
                 # Ordine reale
-                result = self.client.create_order(**order_params)
+                result = await asyncio.to_thread(self.client.create_order, **order_params)
                 logger.info(f"📈 REAL ORDER: {side} {quantity_str} {symbol}")
                 return {
                     'status': 'SUCCESS',
@@ -152,8 +193,13 @@ class TradingExecutor:
             logger.error(f"Errore generico per {symbol}: {e}")
             return {'status': 'GENERAL_ERROR', 'error': str(e)}
     
-    async def emergency_liquidation(self, asset: str, target_asset: str, quantity: Decimal) -> Dict:
+    async def emergency_liquidation(self, asset: str, target_asset: str, quantity: Decimal,
+                                    route: Optional[List[Dict]] = None, templates: Optional[List] = None) -> Dict:
         """Liquidazione d'emergenza per tornare all'asset di partenza"""
+        if route:
+            return await self._execute_liquidation_route(route, templates or [None] * len(route), quantity)
+        
+        # Senza rotta precalcolata: ricerca della coppia via rete (lenta, solo come ultima risorsa)
         try:
             # Trova la coppia di trading
             symbol = f"{asset}{target_asset}"
@@ -179,6 +225,20 @@ class TradingExecutor:
             logger.error(f"Errore liquidazione d'emergenza: {e}")
             return {'status': 'LIQUIDATION_ERROR', 'error': str(e)}
     
+    async def _execute_liquidation_route(self, route: List[Dict], templates: List, quantity: Decimal) -> Dict:
+        """Esegue una rotta della tabella di liquidazione: lati e simboli sono già noti"""
+        available = quantity
+        result = {'status': 'LIQUIDATION_ERROR', 'error': 'Rotta vuota'}
+        for hop, template in zip(route, templates):
+            result = await self.execute_leg(hop, template, leg_amount(hop, available))
+            if result['status'] not in ['SUCCESS', 'TEST_SUCCESS']:
+                logger.error(f"❌ Liquidazione d'emergenza fallita su {hop['symbol']} ({hop['side']}): {result}")
+                return result
+            available = result['received']
+        route_desc = '→'.join([route[0]['from_asset']] + [hop['to_asset'] for hop in route])
+        logger.warning(f"🆘 Liquidazione d'emergenza completata: {quantity} {route_desc} = {available}")
+        return result
+    
     def _symbol_exists(self, symbol: str) -> bool:
         """Verifica se un simbolo esiste"""
         try:
@@ -189,26 +249,122 @@ class TradingExecutor:
         except:
             return False
     
+    async def execute_leg(self, leg: Dict, template, amount: str) -> Dict:
+        """Esegue una gamba di un piano d'ordine (template precompilato se disponibile)"""
+        try:
+            if self.hybrid_executor:
+                return await self.hybrid_executor.execute_planned_order(leg, template, amount)
+            
+            if not self.client:
+                raise ValueError("Client Binance non inizializzato")
+            
+            order_params = {
+                'symbol': leg['symbol'],
+                'side': leg['side'],
+                'type': 'MARKET',
+                leg['amount_field']: amount
+            }
+            
+            if config.DRY_RUN_MODE:
+                await asyncio.to_thread(self.client.create_test_order, **order_params)
+                logger.info(f"🧪 TEST ORDER: {leg['side']} {leg['amount_field']}={amount} {leg['symbol']}")
+                return {
+                    'status': 'TEST_SUCCESS',
+                    'symbol': leg['symbol'],
+                    'side': leg['side'],
+                    'quantity': Decimal(amount),
+                    # Stima del piano: nessun eseguito in test. Le gambe delle rotte di liquidazione
+                    # non hanno stima (l'importo dipende da dove si è interrotto il trade): si passa quanto inviato
+                    'received': Decimal(leg.get('expected_received', amount)),
+                    'price': None,
+                    'method': 'rest_api'
+                }
+            
+            result = await asyncio.to_thread(self.client.create_order, **order_params)
+            logger.info(f"📈 REAL ORDER: {leg['side']} {leg['amount_field']}={amount} {leg['symbol']}")
+            quantity = Decimal(result['executedQty'])
+            return {
+                'status': 'SUCCESS',
+                'symbol': leg['symbol'],
+                'side': leg['side'],
+                'quantity': quantity,
+                'received': quantity if leg['side'] == 'BUY' else Decimal(result['cummulativeQuoteQty']),
+                'price': Decimal(result['fills'][0]['price']) if result['fills'] else None,
+                'method': 'rest_api'
+            }
+                
+        except BinanceAPIException as e:
+            logger.error(f"Errore API Binance per {leg['symbol']}: {e}")
+            return {'status': 'API_ERROR', 'error': str(e)}
+        except BinanceOrderException as e:
+            logger.error(f"Errore ordine Binance per {leg['symbol']}: {e}")
+            return {'status': 'ORDER_ERROR', 'error': str(e)}
+        except Exception as e:
+            logger.error(f"Errore generico per {leg['symbol']}: {e}")
+            return {'status': 'GENERAL_ERROR', 'error': str(e)}
+    
+    async def _resolve_timeout(self, leg: Dict, result: Dict) -> Dict:
+        """
+        Esito di una gamba rimasta senza risposta, cercata per newClientOrderId.
+        Un ordine che l'exchange non conosce dopo la scadenza non è stato eseguito: NOT_FILLED senza eseguito.
+        """
+        if not (self.hybrid_executor and self.hybrid_executor.rest_client and result.get('client_order_id')):
+            return result
+        resolved = await self.hybrid_executor.resolve_order(leg['symbol'], leg['side'], result['client_order_id'],
+                                                            result.get('expires_at', time.time()))
+        if resolved['status'] == 'NOT_FOUND':
+            return {'status': 'NOT_FILLED', 'symbol': leg['symbol'], 'side': leg['side'],
+                    'quantity': Decimal('0'), 'received': Decimal('0'), 'spent': Decimal('0'),
+                    'error': f"Ordine {result['client_order_id']} mai eseguito"}
+        return resolved
+    
+    async def _unwind_failed_leg(self, legs: List[Dict], leg_number: int, trade_result: Dict,
+                                 available: Decimal, start_asset: str, liquidation_templates: List) -> List[Dict]:
+        """
+        Rientro all'asset di partenza dopo una gamba fallita.
+        Si liquida solo ciò che si possiede davvero: la parte non eseguita dell'asset in ingresso
+        e quanto ricevuto dall'esecuzione parziale. Con esito ancora sconosciuto non si liquida nulla.
+        """
+        leg = legs[leg_number - 1]
+        status = trade_result['status']
+        if status == 'TIMEOUT':
+            logger.error(f"🚨 Trade {leg_number} su {leg['symbol']} con esito sconosciuto: nessuna liquidazione automatica")
+            return []
+        if status == 'NOT_FILLED':
+            remainder = available - trade_result.get('spent', Decimal('0'))
+            received = trade_result.get('received', Decimal('0'))
+        else:
+            # Ordine rifiutato o mai partito: l'asset in ingresso è ancora tutto disponibile
+            remainder = available
+            received = Decimal('0')
+        
+        liquidations = []
+        if remainder > 0 and leg_number > 1:
+            logger.warning(f"⚠️ Trade {leg_number} fallito, liquidazione d'emergenza di {remainder} {leg['from_asset']}...")
+            liquidations.append(await self.emergency_liquidation(
+                leg['from_asset'], start_asset, remainder,
+                leg.get('liquidation'), liquidation_templates[leg_number - 1]
+            ))
+        if received > 0 and leg_number < len(legs):
+            # L'asset ricevuto è quello in ingresso alla gamba successiva: se ne usa la rotta di rientro
+            logger.warning(f"⚠️ Trade {leg_number} eseguito in parte, liquidazione d'emergenza di {received} {leg['to_asset']}...")
+            liquidations.append(await self.emergency_liquidation(
+                leg['to_asset'], start_asset, received,
+                legs[leg_number].get('liquidation'), liquidation_templates[leg_number]
+            ))
+        return liquidations
+    
     async def execute_arbitrage(self, trading_data: Dict) -> Dict:
-        """Esegue l'arbitraggio triangolare completo"""
+        """Esegue l'arbitraggio triangolare seguendo il piano d'ordine preparato dall'analisi"""
         start_time = time.time()
         self.trade_count += 1
         
-        # Estrai i dati
-        path = trading_data['path']
-        pairs = trading_data['pairs']
-        prices = trading_data['prices']
-        timestamp = trading_data['timestamp']
-        
-        # Parsing del percorso
-        steps = path.split('→')
-        if len(steps) != 4:
-            return {'status': 'INVALID_PATH', 'error': f'Percorso non valido: {path}'}
-        
-        start_asset = steps[0]
-        intermediate1 = steps[1]
-        intermediate2 = steps[2]
-        end_asset = steps[3]  # Dovrebbe essere uguale a start_asset
+        # Il piano contiene già simboli, lati e importi di ogni gamba
+        plan = trading_data['plan']
+        path = plan['path']
+        start_asset = plan['start_asset']
+        legs = plan['legs']
+        initial_amount = Decimal(plan['budget'])
         
         logger.info(f"🚀 Inizio arbitraggio: {path}")
         
@@ -219,13 +375,19 @@ class TradingExecutor:
         if not self.client and not self.hybrid_executor:
             return {'status': 'CLIENT_NOT_READY', 'error': 'Client Binance non inizializzato'}
         
+        # Limite sul saldo in cache: un importo mal convertito o un conto vuoto non arrivano all'exchange
+        balance = await self.balance_cap(start_asset)
+        if initial_amount > balance:
+            logger.warning(f"💰 Saldo insufficiente per {path}: {balance} {start_asset} disponibili, {initial_amount} richiesti")
+            return {'status': 'INSUFFICIENT_BALANCE', 'path': path,
+                    'error': f"Saldo insufficiente: {balance} {start_asset} (richiesti {initial_amount})"}
+        
         # Imposta flag di trading
         self.is_trading = True
         
         # Dizionario per tracciare i tempi
         timing = {
             'preparation': 0,
-            'balance_check': 0,
             'trade1': 0,
             'trade2': 0,
             'trade3': 0,
@@ -233,71 +395,50 @@ class TradingExecutor:
         }
         
         try:
-            # Step 1: Verifica saldo iniziale
-            balance_start = time.time()
-            initial_balance = await self.get_account_balance(start_asset)
-            timing['balance_check'] = (time.time() - balance_start) * 1000
-            
-            if initial_balance < config.TRADE_BUDGET_USDT:
-                raise ValueError(f"Saldo insufficiente: {initial_balance} {start_asset}")
-            
-            logger.info(f"💰 Saldo iniziale: {initial_balance} {start_asset} (verifica: {timing['balance_check']:.1f}ms)")
-            
-            # Step 2: Trade 1 (start_asset -> intermediate1)
-            trade1_start = time.time()
-            trade1_result = await self.execute_market_order(
-                pairs[0], 'BUY', config.TRADE_BUDGET_USDT
-            )
-            timing['trade1'] = (time.time() - trade1_start) * 1000
-            
-            if trade1_result['status'] not in ['SUCCESS', 'TEST_SUCCESS']:
-                raise ValueError(f"Trade 1 fallito: {trade1_result}")
-            
-            quantity1 = trade1_result['quantity']
-            method1 = trade1_result.get('method', 'unknown')
-            logger.info(f"✅ Trade 1 completato: {quantity1} {intermediate1} (tempo: {timing['trade1']:.1f}ms, metodo: {method1})")
-            
-            # Step 3: Trade 2 (intermediate1 -> intermediate2)
-            trade2_start = time.time()
-            trade2_result = await self.execute_market_order(
-                pairs[1], 'SELL', quantity1
-            )
-            timing['trade2'] = (time.time() - trade2_start) * 1000
-            
-            if trade2_result['status'] not in ['SUCCESS', 'TEST_SUCCESS']:
-                # Liquidazione d'emergenza
-                logger.warning(f"⚠️ Trade 2 fallito, liquidazione d'emergenza...")
-                liquidation_result = await self.emergency_liquidation(
-                    intermediate1, start_asset, quantity1
-                )
-                raise ValueError(f"Trade 2 fallito, liquidazione: {liquidation_result}")
-            
-            quantity2 = trade2_result['quantity']
-            method2 = trade2_result.get('method', 'unknown')
-            logger.info(f"✅ Trade 2 completato: {quantity2} {intermediate2} (tempo: {timing['trade2']:.1f}ms, metodo: {method2})")
-            
-            # Step 4: Trade 3 (intermediate2 -> start_asset)
-            trade3_start = time.time()
-            trade3_result = await self.execute_market_order(
-                pairs[2], 'SELL', quantity2
-            )
-            timing['trade3'] = (time.time() - trade3_start) * 1000
-            
-            if trade3_result['status'] not in ['SUCCESS', 'TEST_SUCCESS']:
-                # Liquidazione d'emergenza
-                logger.warning(f"⚠️ Trade 3 fallito, liquidazione d'emergenza...")
-                liquidation_result = await self.emergency_liquidation(
-                    intermediate2, start_asset, quantity2
-                )
-                raise ValueError(f"Trade 3 fallito, liquidazione: {liquidation_result}")
+            # Step 1: Ordini precompilati (query, JSON e chiave HMAC) dalla cache per (simbolo, lato):
+            # nessuna chiamata di rete e nessuna costruzione per trade, solo ricerche in un dizionario.
+            # Il saldo è già stato verificato sulla cache: nessuna lettura del conto prima della prima gamba.
+            # Anche le rotte di liquidazione hanno il loro template: il rientro parte senza ricerche
+            preparation_start = time.time()
+            if self.hybrid_executor:
+                templates = self.hybrid_executor.prepare_legs(legs)
+                liquidation_templates = [self.hybrid_executor.prepare_legs(leg.get('liquidation') or []) for leg in legs]
+            else:
+                templates = [None] * len(legs)
+                liquidation_templates = [None] * len(legs)
+            timing['preparation'] = (time.time() - preparation_start) * 1000
+            
+            # Step 2-4: le gambe usano l'importo realmente ricevuto dalla precedente
+            available = initial_amount
+            trade_results = []
+            methods = []
+            for leg_number, (leg, template) in enumerate(zip(legs, templates), start=1):
+                amount = leg['amount'] if leg_number == 1 else leg_amount(leg, available)
+                trade_start = time.time()
+                trade_result = await self.execute_leg(leg, template, amount)
+                if trade_result['status'] == 'TIMEOUT':
+                    # Esito sconosciuto: prima di liquidare si verifica se l'ordine è stato eseguito
+                    trade_result = await self._resolve_timeout(leg, trade_result)
+                timing[f'trade{leg_number}'] = (time.time() - trade_start) * 1000
+                
+                if trade_result['status'] not in ['SUCCESS', 'TEST_SUCCESS']:
+                    liquidation_results = await self._unwind_failed_leg(
+                        legs, leg_number, trade_result, available, start_asset, liquidation_templates
+                    )
+                    raise ValueError(f"Trade {leg_number} fallito: {trade_result}, liquidazione: {liquidation_results}")
+                
+                available = trade_result['received']
+                method = trade_result.get('method', 'unknown')
+                trade_results.append(trade_result)
+                methods.append(method)
+                logger.info(f"✅ Trade {leg_number} completato: {available} {leg['to_asset']} (tempo: {timing[f'trade{leg_number}']:.1f}ms, metodo: {method})")
             
-            final_quantity = trade3_result['quantity']
-            method3 = trade3_result.get('method', 'unknown')
-            logger.info(f"✅ Trade 3 completato: {final_quantity} {start_asset} (tempo: {timing['trade3']:.1f}ms, metodo: {method3})")
+            final_quantity = available
+            method1, method2, method3 = methods
             
             # Calcolo profitto/perdita
-            profit = final_quantity - config.TRADE_BUDGET_USDT
-            profit_percentage = (profit / config.TRADE_BUDGET_USDT) * 100
+            profit = final_quantity - initial_amount
+            profit_percentage = (profit / initial_amount) * 100
             
             # Calcolo tempo totale
             timing['total'] = (time.time() - start_time) * 1000
@@ -306,19 +447,20 @@ class TradingExecutor:
             result = {
                 'status': 'SUCCESS',
                 'path': path,
-                'initial_amount': config.TRADE_BUDGET_USDT,
+                'initial_amount': initial_amount,
                 'final_amount': final_quantity,
+                'expected_final_amount': Decimal(plan['expected_final']),
                 'profit': profit,
                 'profit_percentage': profit_percentage,
                 'execution_time': timing['total'] / 1000,  # in secondi
                 'timing_breakdown': timing,
-                'trades': [trade1_result, trade2_result, trade3_result],
-                'methods_used': [method1, method2, method3]
+                'trades': trade_results,
+                'methods_used': methods
             }
             
             # Log dettagliato dei tempi
             logger.info(f"⏱️ TIMING BREAKDOWN:")
-            logger.info(f"  - Verifica saldo: {timing['balance_check']:.1f}ms")
+            logger.info(f"  - Preparazione ordini: {timing['preparation']:.1f}ms")
             logger.info(f"  - Trade 1: {timing['trade1']:.1f}ms ({method1})")
             logger.info(f"  - Trade 2: {timing['trade2']:.1f}ms ({method2})")
             logger.info(f"  - Trade 3: {timing['trade3']:.1f}ms ({method3})")
@@ -335,9 +477,9 @@ class TradingExecutor:
             
             # Notifica Telegram con timing e metodi
             if profit_percentage > 0:
-                message = f"✅ ARBITRAGGIO COMPLETATO\n\n🔄 Percorso: {path}\n💰 Profitto: {profit_percentage:.4f}%\n💵 Guadagno: {profit:.4f} {start_asset}\n⏱️ Tempo Totale: {timing['total']:.1f}ms\n📊 Breakdown:\n  • Saldo: {timing['balance_check']:.1f}ms\n  • Trade 1: {timing['trade1']:.1f}ms ({method1})\n  • Trade 2: {timing['trade2']:.1f}ms ({method2})\n  • Trade 3: {timing['trade3']:.1f}ms ({method3})"
+                message = f"✅ ARBITRAGGIO COMPLETATO\n\n🔄 Percorso: {path}\n💰 Profitto: {profit_percentage:.4f}%\n💵 Guadagno: {profit:.4f} {start_asset}\n⏱️ Tempo Totale: {timing['total']:.1f}ms\n📊 Breakdown:\n  • Preparazione: {timing['preparation']:.1f}ms\n  • Trade 1: {timing['trade1']:.1f}ms ({method1})\n  • Trade 2: {timing['trade2']:.1f}ms ({method2})\n  • Trade 3: {timing['trade3']:.1f}ms ({method3})"
             else:
-                message = f"⚠️ ARBITRAGGIO COMPLETATO (PERDITA)\n\n🔄 Percorso: {path}\n📉 Perdita: {profit_percentage:.4f}%\n💸 Perdita: {abs(profit):.4f} {start_asset}\n⏱️ Tempo Totale: {timing['total']:.1f}ms\n📊 Breakdown:\n  • Saldo: {timing['balance_check']:.1f}ms\n  • Trade 1: {timing['trade1']:.1f}ms ({method1})\n  • Trade 2: {timing['trade2']:.1f}ms ({method2})\n  • Trade 3: {timing['trade3']:.1f}ms ({method3})"
+                message = f"⚠️ ARBITRAGGIO COMPLETATO (PERDITA)\n\n🔄 Percorso: {path}\n📉 Perdita: {profit_percentage:.4f}%\n💸 Perdita: {abs(profit):.4f} {start_asset}\n⏱️ Tempo Totale: {timing['total']:.1f}ms\n📊 Breakdown:\n  • Preparazione: {timing['preparation']:.1f}ms\n  • Trade 1: {timing['trade1']:.1f}ms ({method1})\n  • Trade 2: {timing['trade2']:.1f}ms ({method2})\n  • Trade 3: {timing['trade3']:.1f}ms ({method3})"
             
             self._send_telegram_notification(message)
             
@@ -366,34 +508,50 @@ class TradingExecutor:
         finally:
             # Reset flag di trading
             self.is_trading = False
+            # I saldi sono cambiati: la cache si aggiorna senza rallentare il trade successivo
+            if self._balances is not None:
+                self._schedule_balance_refresh()
 
-def trading_worker_with_affinity(trading_data: Dict) -> Dict:
-    """Worker di trading con affinità CPU dedicata"""
+# Stato persistente del processo di trading: executor e loop sopravvivono tra un trade e l'altro,
+# così le connessioni restano aperte e tenute vive dal loop in background
+_worker_executor: Optional[TradingExecutor] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def init_trading_worker():
+    """Initializer del pool di trading: affinità CPU, executor persistente e connessioni già aperte"""
+    global _worker_executor, _worker_loop
     import os
+    import threading
     import psutil
     
     try:
         # Imposta l'affinità CPU per questo processo
-        current_pid = os.getpid()
-        process = psutil.Process(current_pid)
+        process = psutil.Process(os.getpid())
         process.cpu_affinity([config.TOTAL_CORES - 1])  # Ultimo core
+    except Exception as e:
+        logger.warning(f"Affinità CPU del worker di trading non impostata: {e}")
+    
+    _worker_loop = asyncio.new_event_loop()
+    threading.Thread(target=_worker_loop.run_forever, name="trading-loop", daemon=True).start()
+    _worker_executor = TradingExecutor()
+    try:
+        asyncio.run_coroutine_threadsafe(_worker_executor.warm_up(), _worker_loop).result(timeout=config.TRADING_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"⚠️ Riscaldamento del worker di trading non completato: {e}")
+
+def trading_worker_with_affinity(trading_data: Dict) -> Dict:
+    """Worker di trading con affinità CPU dedicata"""
+    try:
+        if _worker_executor is None:
+            init_trading_worker()
         
-        # Crea l'executor e esegui
-        executor = TradingExecutor()
-        
-        # Esegui in modo sincrono (il worker è già in un processo separato)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            result = loop.run_until_complete(executor.execute_arbitrage(trading_data))
-            return result
-        finally:
-            loop.close()
+        # Il trade gira sul loop persistente del processo, dove vivono le connessioni già aperte
+        future = asyncio.run_coroutine_threadsafe(_worker_executor.execute_arbitrage(trading_data), _worker_loop)
+        return future.result()
             
     except Exception as e:
         return {
             'status': 'WORKER_ERROR',
             'error': str(e),
-            'path': trading_data.get('path', 'Unknown')
-        } 
\ No newline at end of file
+            'path': trading_data.get('plan', {}).get('path', 'Unknown')
+        } 
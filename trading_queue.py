@@ -0,0 +1,167 @@
+"""
+Coda di priorità delle opportunità da eseguire
+Ordina i candidati per profitto atteso (in una valuta comune) scontato dall'età delle
+quotazioni, unisce i triangoli che condividono un simbolo, trattiene quelli che toccano
+simboli di un'esecuzione in corso e scarta quelli con prezzi troppo vecchi prima di
+passarli all'esecutore di trading
+"""
+
+import asyncio
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TradeCandidate:
+    """Opportunità in attesa di esecuzione"""
+    __slots__ = ('key', 'path', 'symbols', 'expected_profit', 'quote_time', 'enqueued_at', 'trading_data')
+
+    def __init__(self, key: int, path: str, symbols: Tuple[str, ...], expected_profit: float, quote_time: float,
+                 trading_data: Dict):
+        self.key = key  # Chiave del triangolo (stesse valute = stessa opportunità)
+        self.path = path
+        self.symbols = symbols  # Simboli delle gambe: candidati che ne condividono uno si escludono a vicenda
+        self.expected_profit = expected_profit  # Guadagno atteso assoluto nella valuta comune della coda
+        self.quote_time = quote_time  # Istante dello snapshot dei prezzi usato per la stima
+        self.enqueued_at = time.time()
+        self.trading_data = trading_data
+
+    def score(self, now: float, max_quote_age: float) -> float:
+        """Profitto atteso scontato linearmente fino a zero all'età massima delle quotazioni"""
+        return self.expected_profit * (1 - (now - self.quote_time) / max_quote_age)
+
+class TradingQueue:
+    """Coda con coalescenza per simbolo, scarto per freschezza e metriche di attesa"""
+
+    def __init__(self, max_quote_age: float, capacity: int):
+        self.max_quote_age = max_quote_age
+        self.capacity = capacity
+        self._pending: Dict[int, TradeCandidate] = {}
+        self._by_symbol: Dict[str, int] = {}  # Simbolo -> chiave del candidato in attesa che lo usa
+        self._in_flight: Dict[str, int] = {}  # Simbolo -> esecuzioni in corso che lo usano
+        self._ready = asyncio.Event()
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped_stale = 0
+        self.dropped_capacity = 0
+        self.dispatched = 0
+        self.in_flight = 0
+        self._wait_sum = 0.0
+        self._wait_max = 0.0
+        self._age_sum = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _add(self, candidate: TradeCandidate):
+        self._pending[candidate.key] = candidate
+        for symbol in candidate.symbols:
+            self._by_symbol[symbol] = candidate.key
+
+    def _remove(self, candidate: TradeCandidate):
+        del self._pending[candidate.key]
+        for symbol in candidate.symbols:
+            if self._by_symbol.get(symbol) == candidate.key:
+                del self._by_symbol[symbol]
+
+    def push(self, candidate: TradeCandidate) -> bool:
+        """Accoda un candidato. Restituisce False se è stato assorbito o scartato"""
+        now = time.time()
+        self.enqueued += 1
+        score = candidate.score(now, self.max_quote_age)
+        # In attesa resta al più un candidato per simbolo: i triangoli che si sovrappongono
+        # (stesse valute, o anche una sola gamba in comune) si contendono la stessa liquidità
+        rival_keys = {self._by_symbol[symbol] for symbol in candidate.symbols if symbol in self._by_symbol}
+        if rival_keys:
+            rivals = [self._pending[key] for key in rival_keys]
+            self.coalesced += 1
+            if any(score <= rival.score(now, self.max_quote_age) for rival in rivals):
+                return False
+            # L'attesa si misura dalla prima richiesta
+            candidate.enqueued_at = min(candidate.enqueued_at, *(rival.enqueued_at for rival in rivals))
+            for rival in rivals:
+                self._remove(rival)
+        elif len(self._pending) >= self.capacity:
+            worst = min(self._pending.values(), key=lambda c: c.score(now, self.max_quote_age))
+            if score <= worst.score(now, self.max_quote_age):
+                self.dropped_capacity += 1
+                return False
+            self._remove(worst)
+            self.dropped_capacity += 1
+        self._add(candidate)
+        self._ready.set()
+        return True
+
+    def pop(self, now: Optional[float] = None) -> Optional[TradeCandidate]:
+        """
+        Estrae il candidato con il punteggio più alto, scartando quelli con quotazioni scadute.
+        I candidati che toccano simboli di un'esecuzione in corso restano in attesa: i loro prezzi
+        verranno consumati da quell'esecuzione. Il candidato estratto resta in corso fino a finished().
+        """
+        now = time.time() if now is None else now
+        best, best_score = None, 0.0
+        expired: List[TradeCandidate] = []
+        for candidate in self._pending.values():
+            if now - candidate.quote_time > self.max_quote_age:
+                expired.append(candidate)
+                continue
+            if any(symbol in self._in_flight for symbol in candidate.symbols):
+                continue
+            score = candidate.score(now, self.max_quote_age)
+            if best is None or score > best_score:
+                best, best_score = candidate, score
+        for candidate in expired:
+            self._remove(candidate)
+        self.dropped_stale += len(expired)
+
+        if best is None:
+            return None
+        self._remove(best)
+        for symbol in best.symbols:
+            self._in_flight[symbol] = self._in_flight.get(symbol, 0) + 1
+        wait = now - best.enqueued_at
+        self.dispatched += 1
+        self.in_flight += 1
+        self._wait_sum += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._age_sum += now - best.quote_time
+        return best
+
+    def finished(self, candidate: TradeCandidate):
+        """Segnala la fine dell'esecuzione di un candidato estratto: i suoi simboli tornano disponibili"""
+        self.in_flight -= 1
+        for symbol in candidate.symbols:
+            remaining = self._in_flight.get(symbol, 0) - 1
+            if remaining > 0:
+                self._in_flight[symbol] = remaining
+            else:
+                self._in_flight.pop(symbol, None)
+        if self._pending:
+            self._ready.set()
+
+    async def get(self) -> TradeCandidate:
+        """Attende il prossimo candidato ancora fresco e non bloccato da un'esecuzione in corso"""
+        while True:
+            candidate = self.pop()
+            if candidate is not None:
+                return candidate
+            # Nessun candidato pronto: si riprova al prossimo push o alla fine di un'esecuzione
+            self._ready.clear()
+            await self._ready.wait()
+
+    def get_stats(self) -> Dict:
+        dispatched = self.dispatched or 1
+        return {
+            'depth': len(self._pending),
+            'enqueued': self.enqueued,
+            'coalesced': self.coalesced,
+            'dropped_stale': self.dropped_stale,
+            'dropped_capacity': self.dropped_capacity,
+            'dispatched': self.dispatched,
+            'in_flight': self.in_flight,
+            'avg_wait_ms': self._wait_sum / dispatched * 1000,
+            'max_wait_ms': self._wait_max * 1000,
+            'avg_quote_age_ms': self._age_sum / dispatched * 1000
+        }
@@ -0,0 +1,76 @@
+"""
+Valutazione veloce dei triangoli in virgola mobile
+Replica i controlli di simulate_trade (liquidità, minQty, minNotional, stepSize)
+su gambe precompilate che leggono direttamente le colonne del TopOfBook:
+pensata per i percorsi offline o batch dove i Decimal sarebbero troppo lenti
+"""
+
+from math import floor
+from typing import Dict, List, Optional, Tuple
+
+from analysis_results import leg_symbol
+
+# Gamba precompilata: (id simbolo, è un acquisto, minQty, minNotional, stepSize)
+Leg = Tuple[int, bool, float, float, float]
+# Gamba con la quotazione letta dal book: (è un acquisto, prezzo, quantità esposta, minQty, minNotional, stepSize)
+Quote = Tuple[bool, float, float, float, float, float]
+
+# Tolleranza per l'arrotondamento allo stepSize in virgola mobile
+_STEP_EPSILON = 1e-9
+
+def build_triangle_legs(triangle: Tuple[str, str, str], existing_pairs: Dict[str, Dict[str, str]],
+                        symbol_info_map: Dict[str, Dict], symbol_ids: Dict[str, int]) -> Optional[List[Leg]]:
+    """Precompila le tre gambe di un triangolo; None se una coppia manca"""
+    p_a, p_b, p_c = triangle
+    legs = []
+    for start_asset, end_asset in ((p_a, p_b), (p_b, p_c), (p_c, p_a)):
+        symbol, side = leg_symbol(start_asset, end_asset, existing_pairs)
+        if symbol is None or symbol not in symbol_ids:
+            return None
+        info = symbol_info_map[symbol]
+        legs.append((symbol_ids[symbol], side == 'BUY', float(info['minQty']),
+                     float(info['minNotional']), float(info['stepSize'])))
+    return legs
+
+def _floor_to_step(quantity: float, step: float) -> float:
+    if step > 0:
+        return floor(quantity / step + _STEP_EPSILON) * step
+    return quantity
+
+def read_leg_quotes(legs: List[Leg], book) -> List[Quote]:
+    """Prezzo e quantità esposta di ogni gamba (ask per gli acquisti, bid per le vendite)"""
+    bid, ask, bid_qty, ask_qty = book.bid, book.ask, book.bid_qty, book.ask_qty
+    return [(is_buy, ask[sid], ask_qty[sid], min_qty, min_notional, step) if is_buy
+            else (is_buy, bid[sid], bid_qty[sid], min_qty, min_notional, step)
+            for sid, is_buy, min_qty, min_notional, step in legs]
+
+def simulate_quotes(quotes: List[Quote], amount: float, keep: float) -> Tuple[str, float]:
+    """
+    Simula le tre gambe su quotazioni già lette (keep = 1 - commissione).
+    Restituisce ('SUCCESS', importo finale dopo le commissioni) o (motivo del fallimento, 0.0).
+    """
+    for is_buy, price, available, min_qty, min_notional, step in quotes:
+        if price <= 0: return 'FAIL_NO_DATA', 0.0
+        if is_buy:
+            quantity = _floor_to_step(amount / price, step)
+            if quantity <= 0: return 'FAIL_STEP_SIZE', 0.0
+            if quantity < min_qty: return 'FAIL_MIN_QTY', 0.0
+            if quantity > available: return 'FAIL_LIQUIDITY', 0.0
+            if quantity * price < min_notional: return 'FAIL_MIN_NOTIONAL', 0.0
+            amount_out = quantity
+        else:
+            quantity = _floor_to_step(amount, step)
+            if quantity <= 0: return 'FAIL_STEP_SIZE', 0.0
+            if quantity < min_qty: return 'FAIL_MIN_QTY', 0.0
+            if quantity > available: return 'FAIL_LIQUIDITY', 0.0
+            amount_out = quantity * price
+            if amount_out < min_notional: return 'FAIL_MIN_NOTIONAL', 0.0
+        amount = amount_out * keep
+    return 'SUCCESS', amount
+
+def simulate_triangle(legs: List[Leg], book, amount: float, fee: float) -> Tuple[str, float]:
+    """
+    Simula le tre gambe sulle colonne di un TopOfBook/snapshot.
+    Restituisce ('SUCCESS', importo finale dopo le commissioni) o (motivo del fallimento, 0.0).
+    """
+    return simulate_quotes(read_leg_quotes(legs, book), amount, 1 - fee)
@@ -0,0 +1,140 @@
+"""
+Indice incrementale del grafo di trading e dei triangoli di arbitraggio
+Mantiene coppie esistenti, grafo delle valute e triangoli che partono dagli asset
+di partenza, aggiornandoli simbolo per simbolo quando l'universo cambia
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+Triangle = Tuple[str, str, str]
+
+class TriangleIndex:
+    """Grafo delle coppie e triangoli orientati (a→b→c→a) con a tra gli asset di partenza"""
+
+    def __init__(self, symbol_info_map: Dict[str, Dict], starting_assets: Iterable[str]):
+        self.starting_assets = frozenset(starting_assets)
+        self.existing_pairs: Dict[str, Dict[str, str]] = {}  # base -> quote -> simbolo
+        self.graph: Dict[str, Set[str]] = {}
+        self._edge_symbols: Dict[frozenset, Set[str]] = {}  # Simboli che collegano due valute
+        self._triangles: Set[Triangle] = set()
+        self.non_priority_count = 0  # Triangoli orientati che partono da un asset non prioritario
+        self.version = 0
+
+        self._pairs_snapshot: Optional[Dict[str, Dict[str, str]]] = None
+        self._triangle_list: Optional[List[Triangle]] = None
+
+        for symbol, info in symbol_info_map.items():
+            self._add(symbol, info)
+        self.version = 1
+
+    def __len__(self) -> int:
+        return len(self._triangles)
+
+    def currencies(self) -> List[str]:
+        return sorted(self.graph)
+
+    def triangles(self) -> List[Triangle]:
+        """Lista ordinata dei triangoli (ricostruita solo quando l'indice cambia)"""
+        if self._triangle_list is None:
+            self._triangle_list = sorted(self._triangles)
+        return self._triangle_list
+
+    def pairs_snapshot(self) -> Dict[str, Dict[str, str]]:
+        """
+        Copia delle coppie esistenti (base -> quote -> simbolo) per i worker.
+        Viene ricreata a ogni modifica, quindi non cambia mentre è in serializzazione.
+        """
+        if self._pairs_snapshot is None:
+            self._pairs_snapshot = {base: dict(quotes) for base, quotes in self.existing_pairs.items()}
+        return self._pairs_snapshot
+
+    def add_symbol(self, symbol: str, info: Dict) -> int:
+        """Aggiunge un simbolo all'indice. Restituisce il numero di triangoli aggiunti"""
+        before = len(self._triangles)
+        self._add(symbol, info)
+        return len(self._triangles) - before
+
+    def remove_symbol(self, symbol: str, info: Dict) -> int:
+        """Rimuove un simbolo dall'indice. Restituisce il numero di triangoli rimossi"""
+        before = len(self._triangles)
+        base, quote = info['base'], info['quote']
+        if self.existing_pairs.get(base, {}).get(quote) == symbol:
+            del self.existing_pairs[base][quote]
+            self._invalidate()
+
+        edge = frozenset((base, quote))
+        edge_symbols = self._edge_symbols.get(edge)
+        if not edge_symbols or symbol not in edge_symbols:
+            return 0
+        edge_symbols.discard(symbol)
+        if not edge_symbols:
+            # Ultimo simbolo tra le due valute: l'arco sparisce insieme ai suoi triangoli
+            del self._edge_symbols[edge]
+            for third in self.graph[base] & self.graph[quote]:
+                self._update_triangles(base, quote, third, add=False)
+            self.graph[base].discard(quote)
+            self.graph[quote].discard(base)
+            for currency in (base, quote):
+                if not self.graph[currency]:
+                    del self.graph[currency]
+            self._invalidate()
+        return before - len(self._triangles)
+
+    def set_starting_assets(self, starting_assets: Iterable[str]) -> Tuple[int, int]:
+        """
+        Cambia gli asset di partenza senza ricostruire il grafo: rimuove i triangoli degli asset
+        tolti e aggiunge quelli degli asset nuovi. Restituisce (triangoli aggiunti, rimossi).
+        """
+        new_assets = frozenset(starting_assets)
+        dropped = self.starting_assets - new_assets
+        gained = new_assets - self.starting_assets
+        self.starting_assets = new_assets
+        if not (dropped or gained):
+            return 0, 0
+
+        before = len(self._triangles)
+        self._triangles = {t for t in self._triangles if t[0] not in dropped}
+        removed = before - len(self._triangles)
+        added = 0
+        for a in gained:
+            neighbors = self.graph.get(a, set())
+            for b in neighbors:
+                for c in self.graph[b] & neighbors:
+                    self._triangles.add((a, b, c))
+                    added += 1
+        self.non_priority_count += removed - added
+        self._invalidate()
+        return added, removed
+
+    def _add(self, symbol: str, info: Dict):
+        base, quote = info['base'], info['quote']
+        self.existing_pairs.setdefault(base, {})[quote] = symbol
+
+        edge = frozenset((base, quote))
+        edge_symbols = self._edge_symbols.setdefault(edge, set())
+        is_new_edge = not edge_symbols
+        edge_symbols.add(symbol)
+        if is_new_edge:
+            base_neighbors = self.graph.setdefault(base, set())
+            quote_neighbors = self.graph.setdefault(quote, set())
+            for third in base_neighbors & quote_neighbors:
+                self._update_triangles(base, quote, third, add=True)
+            base_neighbors.add(quote)
+            quote_neighbors.add(base)
+        self._invalidate()
+
+    def _update_triangles(self, x: str, y: str, z: str, add: bool):
+        """Aggiunge o rimuove i 6 triangoli orientati formati da tre valute"""
+        for a, b, c in ((x, y, z), (x, z, y), (y, x, z), (y, z, x), (z, x, y), (z, y, x)):
+            if a in self.starting_assets:
+                if add:
+                    self._triangles.add((a, b, c))
+                else:
+                    self._triangles.discard((a, b, c))
+            else:
+                self.non_priority_count += 1 if add else -1
+
+    def _invalidate(self):
+        self.version += 1
+        self._pairs_snapshot = None
+        self._triangle_list = None
@@ -0,0 +1,196 @@
+"""
+Potatura adattiva dei triangoli persistentemente ineseguibili
+Un triangolo che fallisce la simulazione per liquidità, minNotional, stepSize o minQty
+per N cicli consecutivi viene declassato: i worker lo rivalutano solo un ciclo ogni
+PRUNING_RECHECK_EVERY (a rotazione) e torna attivo appena una rivalutazione riesce o
+quando la quantità esposta sulla gamba che falliva aumenta abbastanza.
+Lo stato per triangolo (livello e serie di fallimenti) segue gli shard: i worker
+ricevono una copia dello stato del proprio shard, la aggiornano e la restituiscono con gli eventi.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analysis_results import leg_symbol
+
+# Fallimenti che tendono a ripetersi identici a ogni ciclo (gli altri azzerano la serie)
+PERSISTENT_FAILURES = frozenset(('FAIL_LIQUIDITY', 'FAIL_MIN_NOTIONAL', 'FAIL_STEP_SIZE', 'FAIL_MIN_QTY'))
+
+ACTIVE = 0
+DEMOTED = 1
+
+class PruningState:
+    """Stato di potatura di uno shard, inviato al worker e restituito aggiornato"""
+    __slots__ = ('tier', 'streaks', 'cycle', 'recheck_every', 'demote_after', 'demoted', 'promoted')
+
+    def __init__(self, size: int, recheck_every: int, demote_after: int):
+        self.tier = bytearray(size)
+        self.streaks = bytearray(size)  # Fallimenti persistenti consecutivi (saturati a 255)
+        self.cycle = 0
+        self.recheck_every = recheck_every
+        self.demote_after = demote_after
+        self.demoted: List[Tuple[int, int]] = []  # (posizione, gamba fallita) declassati in questo ciclo
+        self.promoted: List[int] = []  # Posizioni riattivate da una rivalutazione riuscita
+
+    def copy(self) -> 'PruningState':
+        """Copia per il worker del ciclo: un worker abbandonato non modifica lo stato dei cicli successivi"""
+        state = PruningState.__new__(PruningState)
+        state.tier = bytearray(self.tier)
+        state.streaks = bytearray(self.streaks)
+        state.cycle = self.cycle
+        state.recheck_every = self.recheck_every
+        state.demote_after = self.demote_after
+        state.demoted = []
+        state.promoted = []
+        return state
+
+    def skip(self, position: int) -> bool:
+        """True se il triangolo è declassato e non è il suo turno di rivalutazione"""
+        return self.tier[position] == DEMOTED and (position + self.cycle) % self.recheck_every != 0
+
+    def failed(self, position: int, status: str, leg: int):
+        if status not in PERSISTENT_FAILURES:
+            self.streaks[position] = 0
+            return
+        streak = self.streaks[position]
+        if streak < 255:
+            self.streaks[position] = streak = streak + 1
+        if streak >= self.demote_after and self.tier[position] == ACTIVE:
+            self.tier[position] = DEMOTED
+            self.demoted.append((position, leg))
+
+    def evaluated(self, position: int):
+        """Simulazione completata (profittevole o no): il triangolo è eseguibile"""
+        self.streaks[position] = 0
+        if self.tier[position] == DEMOTED:
+            self.tier[position] = ACTIVE
+            self.promoted.append(position)
+
+class TrianglePruner:
+    """Stato di potatura di tutti gli shard, con riattivazione sui miglioramenti di liquidità"""
+
+    def __init__(self, demote_after: int, recheck_every: int, liquidity_gain: float):
+        self.demote_after = demote_after
+        self.recheck_every = max(1, recheck_every)
+        self.liquidity_gain = liquidity_gain
+        self.cycle = 0
+
+        self._shards: Optional[List[List[tuple]]] = None
+        self._states: List[PruningState] = []
+        # Simbolo della gamba fallita -> {(shard, posizione): (è un acquisto, quantità esposta al declassamento)}
+        self._watch: Dict[str, Dict[Tuple[int, int], Tuple[bool, float]]] = {}
+        self._watched: Dict[Tuple[int, int], str] = {}
+
+        self.demotions = 0
+        self.recheck_promotions = 0
+        self.liquidity_promotions = 0
+
+    def __len__(self) -> int:
+        """Triangoli attualmente declassati"""
+        return sum(state.tier.count(DEMOTED) for state in self._states)
+
+    def states(self, shards: List[List[tuple]]) -> List[PruningState]:
+        """
+        Copie degli stati da passare ai worker per il ciclo corrente (riallineati se gli shard sono cambiati).
+        Con i backend a thread o inline i worker riceverebbero altrimenti gli oggetti del pruner:
+        quelli di un ciclo abbandonato continuerebbero a modificarli durante il ciclo successivo.
+        Lo stato aggiornato da un worker viene adottato solo con record().
+        """
+        if shards is not self._shards:
+            self._remap(shards)
+        for state in self._states:
+            state.cycle = self.cycle
+            state.recheck_every = self.recheck_every
+            state.demote_after = self.demote_after
+        return [state.copy() for state in self._states]
+
+    def _remap(self, shards: List[List[tuple]]):
+        """Riporta livello e serie di ogni triangolo sulle nuove posizioni (ribilanciamento o cambio dell'indice)"""
+        previous: Dict[tuple, Tuple[int, int, Optional[str], Optional[Tuple[bool, float]]]] = {}
+        if self._shards is not None:
+            for shard_id, (shard, state) in enumerate(zip(self._shards, self._states)):
+                for position, triangle in enumerate(shard):
+                    if state.tier[position] or state.streaks[position]:
+                        key = (shard_id, position)
+                        symbol = self._watched.get(key)
+                        exposure = self._watch[symbol][key] if symbol is not None else None
+                        previous[triangle] = (state.tier[position], state.streaks[position], symbol, exposure)
+
+        self._shards = shards
+        self._states = [PruningState(len(shard), self.recheck_every, self.demote_after) for shard in shards]
+        self._watch = {}
+        self._watched = {}
+        if not previous:
+            return
+        for shard_id, (shard, state) in enumerate(zip(shards, self._states)):
+            for position, triangle in enumerate(shard):
+                entry = previous.get(triangle)
+                if entry is None:
+                    continue
+                state.tier[position], state.streaks[position], symbol, exposure = entry
+                if symbol is not None:
+                    self._add_watch(symbol, (shard_id, position), exposure)
+
+    def _add_watch(self, symbol: str, key: Tuple[int, int], exposure: Tuple[bool, float]):
+        self._watch.setdefault(symbol, {})[key] = exposure
+        self._watched[key] = symbol
+
+    def _drop_watch(self, key: Tuple[int, int]):
+        symbol = self._watched.pop(key, None)
+        if symbol is None:
+            return
+        watchers = self._watch[symbol]
+        del watchers[key]
+        if not watchers:
+            del self._watch[symbol]
+
+    def record(self, shard_id: int, state: PruningState, prices, existing_pairs: Dict[str, Dict[str, str]]):
+        """Adotta lo stato restituito dal worker e registra la gamba fallita dei nuovi declassati"""
+        if shard_id >= len(self._states):
+            return
+        self._states[shard_id] = state
+        shard = self._shards[shard_id]
+        for position in state.promoted:
+            self._drop_watch((shard_id, position))
+        self.recheck_promotions += len(state.promoted)
+        self.demotions += len(state.demoted)
+        for position, leg in state.demoted:
+            triangle = shard[position]
+            start_asset, end_asset = triangle[leg - 1], triangle[leg % 3]
+            symbol, side = leg_symbol(start_asset, end_asset, existing_pairs)
+            sid = prices.symbol_ids.get(symbol) if symbol is not None else None
+            if sid is None:
+                continue
+            is_buy = side == 'BUY'
+            self._add_watch(symbol, (shard_id, position), (is_buy, prices.ask_qty[sid] if is_buy else prices.bid_qty[sid]))
+
+    def promote_on_liquidity(self, changed_symbols: Iterable[str], prices) -> int:
+        """Riattiva i triangoli declassati la cui gamba fallita espone ora più quantità. Restituisce quanti"""
+        promoted = 0
+        gain = 1 + self.liquidity_gain
+        for symbol in changed_symbols:
+            watchers = self._watch.get(symbol)
+            sid = prices.symbol_ids.get(symbol) if watchers else None
+            if sid is None:
+                continue
+            ask_qty, bid_qty = prices.ask_qty[sid], prices.bid_qty[sid]
+            for key, (is_buy, quantity) in list(watchers.items()):
+                if (ask_qty if is_buy else bid_qty) > quantity * gain:
+                    shard_id, position = key
+                    state = self._states[shard_id]
+                    state.tier[position] = ACTIVE
+                    state.streaks[position] = 0
+                    self._drop_watch(key)
+                    promoted += 1
+        self.liquidity_promotions += promoted
+        return promoted
+
+    def end_cycle(self):
+        self.cycle += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'demoted': len(self),
+            'demotions': self.demotions,
+            'recheck_promotions': self.recheck_promotions,
+            'liquidity_promotions': self.liquidity_promotions
+        }
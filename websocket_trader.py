@@ -10,30 +10,95 @@ import hashlib
 import time
 import logging
 from decimal import Decimal
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import websockets
-from binance.exceptions import BinanceAPIException
 import config
+from order_plan import format_amount
+from rest_trader import AsyncRestTrader, new_client_order_id, order_result
 
 logger = logging.getLogger(__name__)
 
+class OrderNotSent(Exception):
+    """La richiesta non è partita: l'ordine non può essere stato eseguito"""
+
+class OrderRejected(Exception):
+    """L'exchange ha risposto con un errore: l'ordine non è stato eseguito"""
+
+class OrderOutcomeUnknown(Exception):
+    """Ordine inviato senza risposta: può essere stato eseguito, va cercato per newClientOrderId"""
+
+    def __init__(self, message: str, symbol: str, client_order_id: str, expires_at: float):
+        super().__init__(message)
+        self.symbol = symbol
+        self.client_order_id = client_order_id
+        self.expires_at = expires_at  # Oltre questo istante (timestamp + recvWindow) l'exchange rifiuta la richiesta
+
+def _is_open(websocket) -> bool:
+    """Connessione aperta (l'attributo closed non esiste più dalla versione 14 di websockets)"""
+    if websocket is None:
+        return False
+    closed = getattr(websocket, 'closed', None)
+    if closed is not None:
+        return not closed
+    return websocket.state.name == 'OPEN'
+
+class OrderTemplate:
+    """
+    Ordine di mercato precompilato per una gamba del piano.
+    Query da firmare e richiesta JSON sono già formattate: all'invio si aggiungono
+    solo importo, newClientOrderId, timestamp e firma (con una copia dell'HMAC già inizializzato con la chiave).
+    """
+    __slots__ = ('symbol', 'side', 'amount_field', '_query', '_request', '_signer')
+
+    def __init__(self, symbol: str, side: str, amount_field: str, signer, recv_window: int = config.WEBSOCKET_RECV_WINDOW):
+        self.symbol = symbol
+        self.side = side
+        self.amount_field = amount_field
+        # Parametri in ordine alfabetico, come in _generate_signature
+        self._query = (f"newClientOrderId={{client_order_id}}&{amount_field}={{amount}}&recvWindow={recv_window}"
+                       f"&side={side}&symbol={symbol}&timestamp={{timestamp}}&type=MARKET")
+        self._request = (
+            '{{"method":"order.place","id":{request_id},"params":{{'
+            f'"newClientOrderId":"{{client_order_id}}","{amount_field}":"{{amount}}","recvWindow":{recv_window},'
+            f'"side":"{side}","symbol":"{symbol}",'
+            '"timestamp":{timestamp},"type":"MARKET","signature":"{signature}"}}}}'
+        )
+        self._signer = signer
+
+    def stamp(self, amount: str, request_id: int, client_order_id: str, timestamp: int) -> str:
+        """Richiesta pronta da inviare con timestamp e firma correnti"""
+        signer = self._signer.copy()
+        signer.update(self._query.format(client_order_id=client_order_id, amount=amount, timestamp=timestamp).encode('utf-8'))
+        return self._request.format(request_id=request_id, client_order_id=client_order_id, amount=amount,
+                                    timestamp=timestamp, signature=signer.hexdigest())
+
 class BinanceWebSocketTrader:
     """Trader WebSocket per ordini ultra-veloci su Binance"""
     
-    def __init__(self, api_key: str, secret_key: str):
+    def __init__(self, api_key: str, secret_key: str, ws_url: str = "wss://stream.binance.com:9443/ws/",
+                 reply_timeout: float = config.WEBSOCKET_TIMEOUT, recv_window: int = config.WEBSOCKET_RECV_WINDOW):
         self.api_key = api_key
         self.secret_key = secret_key
-        self.ws_url = "wss://stream.binance.com:9443/ws/"
+        self.ws_url = ws_url
+        self.reply_timeout = reply_timeout
+        self.recv_window = recv_window
         self.websocket = None
         self.connected = False
         self.last_ping = 0
         self.ping_interval = 20  # secondi
         self.request_id = 0
+        # Richieste in attesa di risposta per id: le risposte tardive non vengono lette dalla richiesta successiva
+        self._pending: Dict[int, Tuple[object, asyncio.Future]] = {}
+        self.late_replies = 0
+        # HMAC già inizializzato con la chiave: ogni firma ne usa una copia
+        self._signer = hmac.new(secret_key.encode('utf-8'), digestmod=hashlib.sha256)
+        # Template per (simbolo, lato, campo importo): un trade applica solo importo e timestamp
+        self._templates: Dict[Tuple[str, str, str], OrderTemplate] = {}
         
     async def connect(self):
         """Stabilisce connessione WebSocket persistente"""
         try:
-            if self.websocket and not self.websocket.closed:
+            if _is_open(self.websocket):
                 return
                 
             self.websocket = await websockets.connect(
@@ -45,7 +110,8 @@ class BinanceWebSocketTrader:
             self.connected = True
             logger.info("✅ Connessione WebSocket trading stabilita")
             
-            # Avvia task per mantenere la connessione
+            # Lettura delle risposte e task per mantenere la connessione
+            asyncio.create_task(self._read_replies(self.websocket))
             asyncio.create_task(self._keep_alive())
             
         except Exception as e:
@@ -55,7 +121,7 @@ class BinanceWebSocketTrader:
     
     async def disconnect(self):
         """Chiude la connessione WebSocket"""
-        if self.websocket and not self.websocket.closed:
+        if _is_open(self.websocket):
             await self.websocket.close()
             self.connected = False
             logger.info("🔌 Connessione WebSocket trading chiusa")
@@ -65,7 +131,7 @@ class BinanceWebSocketTrader:
         while self.connected:
             try:
                 await asyncio.sleep(self.ping_interval)
-                if self.websocket and not self.websocket.closed:
+                if _is_open(self.websocket):
                     await self.websocket.ping()
                     self.last_ping = time.time()
             except Exception as e:
@@ -82,6 +148,47 @@ class BinanceWebSocketTrader:
         except Exception as e:
             logger.error(f"❌ Errore riconnessione WebSocket: {e}")
     
+    async def _read_replies(self, websocket):
+        """Consegna ogni risposta alla richiesta con lo stesso id; quelle senza richiesta in attesa vengono scartate"""
+        try:
+            async for message in websocket:
+                try:
+                    reply = json.loads(message)
+                except ValueError:
+                    continue
+                _, future = self._pending.pop(reply.get('id'), (None, None))
+                if future is None:
+                    self.late_replies += 1
+                    logger.warning(f"⚠️ Risposta WebSocket tardiva scartata (id {reply.get('id')}): {message[:200]}")
+                elif not future.done():
+                    future.set_result(reply)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            # Le richieste ancora in attesa non riceveranno risposta su questa connessione
+            closed = [request_id for request_id, (socket, _) in self._pending.items() if socket is websocket]
+            for request_id in closed:
+                _, future = self._pending.pop(request_id)
+                if not future.done():
+                    future.set_exception(ConnectionError("Connessione WebSocket chiusa prima della risposta"))
+    
+    async def _request(self, request: str, request_id: int) -> Dict:
+        """
+        Invia una richiesta e ne attende la risposta per id.
+        OrderNotSent se l'invio fallisce; asyncio.TimeoutError o ConnectionError se la risposta non arriva.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (self.websocket, future)
+        try:
+            await self.websocket.send(request)
+        except Exception as e:
+            self._pending.pop(request_id, None)
+            raise OrderNotSent(f"Invio WebSocket fallito: {e}") from e
+        try:
+            return await asyncio.wait_for(future, timeout=self.reply_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+    
     def _generate_signature(self, params: Dict) -> str:
         """Genera firma HMAC per autenticazione"""
         query_string = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
@@ -99,73 +206,64 @@ class BinanceWebSocketTrader:
     
     async def place_market_order(self, symbol: str, side: str, quantity: Decimal) -> Dict:
         """Piazza ordine di mercato via WebSocket"""
+        return await self.place_prepared_order(self.prepare_order(symbol, side, 'quantity'), format_amount(quantity))
+
+    def prepare_order(self, symbol: str, side: str, amount_field: str) -> OrderTemplate:
+        """
+        Ordine precompilato di una gamba (amount_field: 'quantity' o 'quoteOrderQty').
+        I template non cambiano tra un invio e l'altro: ognuno viene costruito una volta sola
+        """
+        key = (symbol, side, amount_field)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = OrderTemplate(symbol, side, amount_field, self._signer, self.recv_window)
+        return template
+
+    async def place_prepared_order(self, template: OrderTemplate, amount: str) -> Dict:
+        """Invia un ordine precompilato: resta solo da applicare importo, id e timestamp"""
         if not self.connected:
-            await self.connect()
-        
+            try:
+                await self.connect()
+            except Exception as e:
+                raise OrderNotSent(f"WebSocket non connesso: {e}") from e
+        request_id, client_order_id = self._get_request_id(), new_client_order_id()
         timestamp = int(time.time() * 1000)
-        
-        # Parametri dell'ordine
-        params = {
-            'symbol': symbol,
-            'side': side,
-            'type': 'MARKET',
-            'quantity': f"{quantity:.8f}".rstrip('0').rstrip('.'),
-            'timestamp': timestamp
-        }
-        
-        # Genera firma
-        signature = self._generate_signature(params)
-        params['signature'] = signature
-        
-        # Prepara richiesta WebSocket
-        request = {
-            'method': 'order.place',
-            'id': self._get_request_id(),
-            'params': params
-        }
-        
+        request = template.stamp(amount, request_id, client_order_id, timestamp)
+        return await self._send_order(request, request_id, template, amount, client_order_id,
+                                      (timestamp + self.recv_window) / 1000)
+
+    async def _send_order(self, request: str, request_id: int, template: OrderTemplate, amount: str,
+                          client_order_id: str, expires_at: float) -> Dict:
+        """
+        Invia una richiesta order.place già firmata e ne interpreta la risposta.
+        OrderNotSent e OrderRejected garantiscono che l'ordine non è stato eseguito;
+        OrderOutcomeUnknown no (richiesta partita senza risposta).
+        """
+        symbol, side = template.symbol, template.side
         start_time = time.time()
-        
         try:
-            # Invia ordine
-            await self.websocket.send(json.dumps(request))
-            logger.info(f"⚡ WS ORDER SENT: {side} {quantity} {symbol}")
-            
-            # Attendi risposta con timeout
-            response = await asyncio.wait_for(
-                self.websocket.recv(), 
-                timeout=5.0  # 5 secondi timeout
-            )
-            
-            response_data = json.loads(response)
-            execution_time = (time.time() - start_time) * 1000
-            
-            # Verifica risposta
-            if 'result' in response_data and response_data['result'].get('status') == 'FILLED':
-                result = response_data['result']
-                logger.info(f"✅ WS ORDER SUCCESS: {side} {quantity} {symbol} ({execution_time:.1f}ms)")
-                
-                return {
-                    'status': 'SUCCESS',
-                    'symbol': symbol,
-                    'side': side,
-                    'quantity': Decimal(result.get('executedQty', str(quantity))),
-                    'price': Decimal(result.get('price', '0')),
-                    'execution_time': execution_time,
-                    'order_id': result.get('orderId'),
-                    'method': 'websocket'
-                }
-            else:
-                error_msg = response_data.get('error', {}).get('msg', 'Unknown error')
-                logger.error(f"❌ WS ORDER ERROR: {error_msg}")
-                raise BinanceAPIException(f"WebSocket order failed: {error_msg}")
-                
-        except asyncio.TimeoutError:
-            logger.error(f"⏰ WS ORDER TIMEOUT: {side} {quantity} {symbol}")
-            raise BinanceAPIException("WebSocket order timeout")
-        except Exception as e:
-            logger.error(f"❌ WS ORDER EXCEPTION: {e}")
+            response_data = await self._request(request, request_id)
+        except OrderNotSent as e:
+            logger.error(f"❌ WS ORDER NOT SENT: {side} {amount} {symbol}: {e}")
             raise
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.error(f"⏰ WS ORDER SENZA RISPOSTA: {side} {amount} {symbol} ({client_order_id})")
+            raise OrderOutcomeUnknown(f"Nessuna risposta all'ordine {client_order_id}: {e or 'timeout'}",
+                                      symbol, client_order_id, expires_at) from e
+        execution_time = (time.time() - start_time) * 1000
+        
+        if 'result' not in response_data:
+            error_msg = response_data.get('error', {}).get('msg', 'Unknown error')
+            logger.error(f"❌ WS ORDER ERROR: {error_msg}")
+            raise OrderRejected(f"Ordine WebSocket rifiutato: {error_msg}")
+        
+        result = order_result(response_data['result'], symbol, side, 'websocket', execution_time)
+        if result['status'] == 'SUCCESS':
+            logger.info(f"✅ WS ORDER SUCCESS: {side} {amount} {symbol} ({execution_time:.1f}ms)")
+        else:
+            # Ordine accettato ma non eseguito per intero: non va reinviato
+            logger.error(f"❌ WS ORDER NOT FILLED: {side} {amount} {symbol}: {result['error']}")
+        return result
     
     async def get_account_info(self) -> Dict:
         """Ottiene informazioni account via WebSocket"""
@@ -177,23 +275,22 @@ class BinanceWebSocketTrader:
         signature = self._generate_signature(params)
         params['signature'] = signature
         
+        request_id = self._get_request_id()
         request = {
             'method': 'account.status',
-            'id': self._get_request_id(),
+            'id': request_id,
             'params': params
         }
         
         try:
-            await self.websocket.send(json.dumps(request))
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=5.0)
-            return json.loads(response)
+            return await self._request(json.dumps(request), request_id)
         except Exception as e:
             logger.error(f"❌ WS ACCOUNT INFO ERROR: {e}")
             raise
     
     def is_connected(self) -> bool:
         """Verifica se la connessione WebSocket è attiva"""
-        return self.connected and self.websocket and not self.websocket.closed
+        return self.connected and _is_open(self.websocket)
 
 class HybridTradingExecutor:
     """Executor ibrido che usa WebSocket con fallback a REST API"""
@@ -203,7 +300,7 @@ class HybridTradingExecutor:
         self.rest_client = None
         self.use_websocket = True
         self.ws_failures = 0
-        self.max_ws_failures = 3
+        self.max_ws_failures = config.WEBSOCKET_MAX_FAILURES
         
         # Inizializza WebSocket trader se le credenziali sono disponibili
         if config.BINANCE_API_KEY and config.BINANCE_SECRET_KEY:
@@ -211,47 +308,94 @@ class HybridTradingExecutor:
                 config.BINANCE_API_KEY, 
                 config.BINANCE_SECRET_KEY
             )
+            # Client REST asincrono con pool keep-alive: il ripiego non apre connessioni a freddo
+            self.rest_client = AsyncRestTrader(
+                config.BINANCE_API_KEY,
+                config.BINANCE_SECRET_KEY
+            )
     
     async def execute_market_order(self, symbol: str, side: str, quantity: Decimal) -> Dict:
         """Esegue ordine di mercato con fallback automatico"""
-        
-        # Prova WebSocket se abilitato e disponibile
-        if (self.use_websocket and 
-            self.ws_trader and 
+        leg = {'symbol': symbol, 'side': side, 'amount_field': 'quantity'}
+        template = self.ws_trader.prepare_order(symbol, side, 'quantity') if self.ws_trader else None
+        return await self.execute_planned_order(leg, template, format_amount(quantity))
+    
+    def prepare_legs(self, legs: List[Dict]) -> List[Optional[OrderTemplate]]:
+        """Precompila gli ordini di una lista di gambe (None senza WebSocket trader)"""
+        if not self.ws_trader:
+            return [None] * len(legs)
+        return [self.ws_trader.prepare_order(leg['symbol'], leg['side'], leg['amount_field']) for leg in legs]
+
+    def _record_ws_failure(self, error: Exception):
+        """Conta i fallimenti WebSocket consecutivi: il trasporto passa a REST solo dopo max_ws_failures"""
+        self.ws_failures += 1
+        logger.warning(f"⚠️ WebSocket fallito ({self.ws_failures}/{self.max_ws_failures}): {error}")
+        if self.ws_failures >= self.max_ws_failures:
+            logger.warning("🔄 Troppi fallimenti WebSocket, passaggio a REST API")
+            self.use_websocket = False
+
+    async def resolve_order(self, symbol: str, side: str, client_order_id: str, expires_at: float) -> Dict:
+        """
+        Esito di un ordine inviato senza risposta, cercato per newClientOrderId.
+        La ricerca parte dopo la scadenza del recvWindow (con un margine per lo scarto degli orologi):
+        un ordine non trovato a quel punto non può più essere eseguito.
+        """
+        wait = expires_at + config.ORDER_LOOKUP_CLOCK_MARGIN - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return await self.rest_client.query_order(symbol, side, client_order_id)
+
+    async def execute_planned_order(self, leg: Dict, template: Optional[OrderTemplate], amount: str) -> Dict:
+        """
+        Esegue una gamba del piano: ordine precompilato via WebSocket, REST come ripiego.
+        Il ripiego reinvia l'ordine solo se non è mai partito o è stato rifiutato; un ordine rimasto
+        senza risposta viene prima cercato, perché reinviarlo potrebbe eseguirlo due volte.
+        """
+        if (template is not None and
+            self.use_websocket and
             self.ws_trader.is_connected()):
             
             try:
-                result = await self.ws_trader.place_market_order(symbol, side, quantity)
-                self.ws_failures = 0  # Reset contatore fallimenti
+                result = await self.ws_trader.place_prepared_order(template, amount)
+                self.ws_failures = 0
                 return result
-                
-            except Exception as e:
-                self.ws_failures += 1
-                logger.warning(f"⚠️ WebSocket fallito ({self.ws_failures}/{self.max_ws_failures}): {e}")
-                
-                # Disabilita WebSocket se troppi fallimenti
-                if self.ws_failures >= self.max_ws_failures:
-                    logger.warning("🔄 Troppi fallimenti WebSocket, passaggio a REST API")
-                    self.use_websocket = False
+            except OrderOutcomeUnknown as e:
+                self._record_ws_failure(e)
+                if not self.rest_client:
+                    return {'status': 'TIMEOUT', 'error': str(e), 'symbol': e.symbol, 'side': leg['side'],
+                            'client_order_id': e.client_order_id, 'expires_at': e.expires_at}
+                result = await self.resolve_order(e.symbol, leg['side'], e.client_order_id, e.expires_at)
+                if result['status'] != 'NOT_FOUND':
+                    return result  # Eseguito, non eseguito o ancora sconosciuto: in nessun caso si reinvia
+                logger.warning(f"🔎 Ordine {e.client_order_id} mai arrivato all'exchange: reinvio via REST")
+            except (OrderNotSent, OrderRejected) as e:
+                self._record_ws_failure(e)
         
-        # Fallback a REST API
         if self.rest_client:
-            logger.info(f"📡 Usando REST API per {side} {quantity} {symbol}")
-            return await self._execute_rest_order(symbol, side, quantity)
+            logger.info(f"📡 Usando REST API per {leg['side']} {amount} {leg['symbol']}")
+            result = await self._execute_rest_order(leg['symbol'], leg['side'], Decimal(amount), leg['amount_field'])
+            if result['status'] == 'TEST_SUCCESS':
+                # Nessun eseguito in test: stima del piano, o l'importo inviato per le gambe di liquidazione
+                result['received'] = Decimal(leg.get('expected_received', amount))
+            return result
         else:
             raise Exception("Nessun client trading disponibile")
     
-    async def _execute_rest_order(self, symbol: str, side: str, quantity: Decimal) -> Dict:
-        """Esegue ordine via REST API (fallback)"""
-        # Implementazione REST API (già presente nel trading_executor.py)
-        # Per ora restituiamo un placeholder
-        return {
-            'status': 'REST_FALLBACK',
-            'symbol': symbol,
-            'side': side,
-            'quantity': quantity,
-            'method': 'rest_api'
-        }
+    async def _execute_rest_order(self, symbol: str, side: str, quantity: Decimal, amount_field: str = 'quantity') -> Dict:
+        """Esegue ordine via REST API (fallback) sul pool di connessioni già aperte"""
+        return await self.rest_client.place_market_order(symbol, side, format_amount(quantity), amount_field,
+                                                         test=config.DRY_RUN_MODE)
+    
+    async def warm_up(self):
+        """Apre in parallelo la connessione WebSocket di trading e il pool REST"""
+        tasks = []
+        if self.ws_trader:
+            tasks.append(self.ws_trader.connect())
+        if self.rest_client:
+            tasks.append(self.rest_client.warm_up())
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Riscaldamento connessioni di trading incompleto: {result}")
     
     async def connect_websocket(self):
         """Connette il WebSocket trader"""
@@ -269,5 +413,8 @@ class HybridTradingExecutor:
             'websocket_enabled': self.use_websocket,
             'websocket_connected': self.ws_trader.is_connected() if self.ws_trader else False,
             'websocket_failures': self.ws_failures,
-            'method_preference': 'websocket' if self.use_websocket else 'rest_api'
+            'method_preference': 'websocket' if self.use_websocket else 'rest_api',
+            'rest_orders': self.rest_client.orders_sent if self.rest_client else 0,
+            'rest_timeouts': self.rest_client.timeouts if self.rest_client else 0,
+            'rest_last_latency_ms': self.rest_client.last_latency_ms if self.rest_client else None
         } 
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Partizionamento bilanciato dei triangoli tra i worker di analisi
+Il lavoro per valuta è molto sbilanciato (USDT/BTC/ETH concentrano la maggior parte
+dei triangoli): i triangoli vengono raggruppati per prima gamba e distribuiti
+in base al costo stimato, poi ribilanciati con i tempi misurati per shard
+"""
+
+import heapq
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+GroupKey = Tuple[str, str]
+
+class WorkPartitioner:
+    """Assegna i gruppi di triangoli agli shard minimizzando il costo dello shard più lento"""
+
+    def __init__(self, rebalance_skew: float = config.PARTITION_REBALANCE_SKEW, alpha: float = 0.3):
+        self.rebalance_skew = rebalance_skew
+        self.alpha = alpha
+
+        self._group_costs: Dict[GroupKey, float] = {}  # Costo stimato (secondi) per gruppo
+        self._sec_per_triangle: Optional[float] = None
+        self._shards: Optional[List[List[tuple]]] = None
+        self._shard_groups: List[List[Tuple[GroupKey, int]]] = []
+        self._index_version: Optional[int] = None
+        self._num_shards = 0
+        self._needs_rebalance = False
+
+        self.last_skew = 1.0
+        self.last_elapsed: List[float] = []
+        self.rebalances = 0
+
+    def shards(self, index, num_shards: int) -> List[List[tuple]]:
+        """Restituisce gli shard correnti, ricalcolandoli solo se l'indice o lo sbilanciamento lo richiedono"""
+        if (self._shards is None or self._needs_rebalance or
+                index.version != self._index_version or num_shards != self._num_shards):
+            triangles = index.triangles()
+            if index.version != self._index_version:
+                self._forget_missing(triangles)
+            self._build(triangles, num_shards)
+            self._index_version = index.version
+            self._num_shards = num_shards
+            self._needs_rebalance = False
+            self.rebalances += 1
+        return self._shards
+
+    def _estimate(self, key: GroupKey, count: int) -> float:
+        cost = self._group_costs.get(key)
+        if cost is not None:
+            return cost
+        # Gruppo mai misurato: costo medio per triangolo, o numero di triangoli prima della prima misura
+        return count * self._sec_per_triangle if self._sec_per_triangle else float(count)
+
+    def _build(self, triangles: List[tuple], num_shards: int):
+        # I triangoli sono ordinati: quelli con la stessa prima gamba (a, b) sono contigui
+        groups = []
+        for key, members in groupby(triangles, key=lambda t: (t[0], t[1])):
+            members = list(members)
+            groups.append((self._estimate(key, len(members)), key, members))
+
+        # Longest Processing Time: il gruppo più costoso va allo shard meno carico
+        groups.sort(key=lambda g: g[0], reverse=True)
+        shards: List[List[tuple]] = [[] for _ in range(num_shards)]
+        shard_groups: List[List[Tuple[GroupKey, int]]] = [[] for _ in range(num_shards)]
+        loads = [(0.0, i) for i in range(num_shards)]
+        for cost, key, members in groups:
+            load, i = heapq.heappop(loads)
+            shards[i].extend(members)
+            shard_groups[i].append((key, len(members)))
+            heapq.heappush(loads, (load + cost, i))
+
+        self._shards = shards
+        self._shard_groups = shard_groups
+
+    def record(self, elapsed: List[Optional[float]]):
+        """Aggiorna i costi stimati con i tempi misurati per shard (None se lo shard non ha risposto)"""
+        measured = [(i, t) for i, t in enumerate(elapsed) if t is not None and i < len(self._shard_groups)]
+        if not measured:
+            return
+
+        total_time, total_triangles = 0.0, 0
+        for i, shard_time in measured:
+            shard_triangles = sum(count for _, count in self._shard_groups[i])
+            if shard_triangles == 0:
+                continue
+            total_time += shard_time
+            total_triangles += shard_triangles
+            per_triangle = shard_time / shard_triangles
+            for key, count in self._shard_groups[i]:
+                new_cost = per_triangle * count
+                old_cost = self._group_costs.get(key)
+                self._group_costs[key] = new_cost if old_cost is None else (1 - self.alpha) * old_cost + self.alpha * new_cost
+        if total_triangles:
+            self._sec_per_triangle = total_time / total_triangles
+
+        times = [t for _, t in measured]
+        mean_time = sum(times) / len(times)
+        self.last_elapsed = times
+        self.last_skew = max(times) / mean_time if mean_time > 0 else 1.0
+        if self.last_skew > self.rebalance_skew:
+            self._needs_rebalance = True
+
+    def _forget_missing(self, triangles: List[tuple]):
+        """Elimina le stime dei gruppi spariti dall'indice (delisting)"""
+        current = {(t[0], t[1]) for t in triangles}
+        for key in list(self._group_costs):
+            if key not in current:
+                del self._group_costs[key]
+
+    def get_stats(self) -> Dict:
+        times = self.last_elapsed
+        return {
+            'skew': self.last_skew,
+            'max_ms': max(times) * 1000 if times else 0,
+            'min_ms': min(times) * 1000 if times else 0,
+            'rebalances': self.rebalances
+        }